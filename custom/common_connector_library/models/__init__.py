@@ -1,12 +1,15 @@
 # coding: utf-8
 # See LICENSE file for full copyright and licensing details.
 from . import res_partner
+from . import res_country
+from . import res_country_state
 from . import sale_workflow_process
 from . import sale_order
 from . import product_product
 from . import stock_quant
 from . import stock_package
 from . import stock_picking
+from . import stock_location
 from . import product_pricelist
 from . import product_attribute
 from . import product_attribute_value
@@ -14,6 +17,7 @@ from . import common_log_book_ept
 from . import common_log_lines_ept
 from . import account_fiscal_position
 from . import common_product_image_ept
+from . import common_product_image_source_ept
 from . import product_template
 from . import account_move
 from . import ir_cron
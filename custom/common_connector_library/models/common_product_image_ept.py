@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 # See LICENSE file for full copyright and licensing details.
 import base64
-import requests
+import hashlib
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
@@ -17,6 +17,17 @@ class ProductImageEpt(models.Model):
     image = fields.Image()
     url = fields.Char(string="Image URL", help="External URL of image")
     sequence = fields.Integer(help="Sequence of images.", index=True, default=10)
+    image_hash = fields.Char(compute="_compute_image_hash", store=True, index=True, copy=False,
+                             help="MD5 of the base64 image, used to find an image without reading the binaries.")
+
+    @api.depends('image')
+    def _compute_image_hash(self):
+        """
+        Define this method for computing the hash of the image.
+        """
+        for record in self:
+            image = record.with_context(bin_size=False).image
+            record.image_hash = hashlib.md5(image).hexdigest() if image else False
 
     @api.model
     def get_image_ept(self, url, verify=False):
@@ -29,9 +40,10 @@ class ProductImageEpt(models.Model):
         image_types = ["image/jpeg", "image/png", "image/tiff",
                        "image/vnd.microsoft.icon", "image/x-icon",
                        "image/vnd.djvu", "image/svg+xml", "image/gif"]
-        response = requests.get(url, stream=True, verify=verify, timeout=10)
-        if response.status_code == 200 and response.headers["Content-Type"] in image_types:
-            image = base64.b64encode(response.content)
+        image_source_obj = self.env['common.product.image.source.ept']
+        image_data = image_source_obj.download_images_ept([url], verify=verify).get(url)
+        if image_data and image_data.get('content_type') in image_types:
+            image = image_source_obj.get_downloaded_image_ept(image_data)
             if image:
                 return image
         raise UserError(_("Can't find image.\nPlease provide valid Image URL."))
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+import base64
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger("Common Product Image")
+
+IMAGE_DOWNLOAD_WORKERS = 8
+IMAGE_DOWNLOAD_TIMEOUT = 10
+
+_sessions = threading.local()
+
+
+def _fetch_image(url, headers, verify, timeout):
+    """
+    Downloads one image, it runs in the worker threads of download_images_ept and must not use the environment.
+    The pooled session of the thread keeps the connections to the image host open between the images.
+    :return: dict with the status, base64 image, hash and validators of the response.
+    """
+    session = getattr(_sessions, 'session', None)
+    if session is None:
+        session = _sessions.session = requests.Session()
+    result = {'url': url, 'status': False, 'image': False, 'image_hash': False}
+    try:
+        response = session.get(url, headers=headers, verify=verify, timeout=timeout)
+    except Exception as error:
+        _logger.info("Image %s could not be downloaded: %s", url, error)
+        return result
+    result.update({'status': response.status_code,
+                   'etag': response.headers.get('ETag'),
+                   'last_modified': response.headers.get('Last-Modified'),
+                   'content_type': response.headers.get('Content-Type')})
+    if response.status_code == 200 and response.content:
+        image = base64.b64encode(response.content)
+        result.update({'image': image, 'image_hash': hashlib.md5(image).hexdigest()})
+    return result
+
+
+class ProductImageSourceEpt(models.Model):
+    _name = 'common.product.image.source.ept'
+    _description = 'Downloaded Product Image URL'
+
+    url = fields.Char(string="Image URL", required=True, index=True)
+    image_hash = fields.Char(help="MD5 of the base64 image last downloaded from the URL.")
+    etag = fields.Char(string="ETag")
+    last_modified = fields.Char()
+    content_type = fields.Char()
+
+    _unique_url = models.Constraint('unique(url)', "The image URL must be unique!")
+
+    @api.model
+    def download_images_ept(self, urls, verify=True, max_workers=IMAGE_DOWNLOAD_WORKERS):
+        """
+        Downloads the images of the URLs concurrently. A URL downloaded before is requested with its ETag and
+        Last-Modified validators when an image with its hash is still stored, so an unchanged image is not
+        transferred again and its stored copy is reused.
+        :param urls: List of image URLs.
+        :param verify: True/False to verify the SSL certificate.
+        :param max_workers: Maximum number of concurrent downloads.
+        :return: Dictionary of URL and dictionary with image_hash, image (base64) and content_type. URLs which
+        could not be downloaded are left out.
+        """
+        urls = list(dict.fromkeys(url for url in urls if url))
+        if not urls:
+            return {}
+        sources = {source.url: source for source in self.search([('url', 'in', urls)])}
+        stored_hashes = set(self.env['common.product.image.ept'].search(
+            [('image_hash', 'in', list({source.image_hash for source in sources.values() if source.image_hash}))]
+        ).mapped('image_hash')) if sources else set()
+        requests_headers = {}
+        for url in urls:
+            source = sources.get(url)
+            headers = {}
+            if source and source.image_hash in stored_hashes:
+                if source.etag:
+                    headers['If-None-Match'] = source.etag
+                if source.last_modified:
+                    headers['If-Modified-Since'] = source.last_modified
+            requests_headers[url] = headers
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls)))) as executor:
+            results = list(executor.map(lambda url: _fetch_image(url, requests_headers[url], verify,
+                                                                 IMAGE_DOWNLOAD_TIMEOUT), urls))
+
+        images = {}
+        create_vals = []
+        for result in results:
+            url = result['url']
+            source = sources.get(url)
+            if result['status'] == 304 and source:
+                images[url] = {'image_hash': source.image_hash, 'image': False, 'content_type': source.content_type}
+                continue
+            if not result['image']:
+                continue
+            images[url] = {'image_hash': result['image_hash'], 'image': result['image'],
+                           'content_type': result.get('content_type')}
+            vals = {'image_hash': result['image_hash'], 'etag': result.get('etag'),
+                    'last_modified': result.get('last_modified'), 'content_type': result.get('content_type')}
+            if source:
+                source.write(vals)
+            else:
+                vals.update({'url': url})
+                create_vals.append(vals)
+        if create_vals:
+            self.create(create_vals)
+        _logger.info("Downloaded %s of %s images, %s were unchanged.",
+                     len([1 for result in results if result['image']]), len(urls),
+                     len([1 for result in results if result['status'] == 304]))
+        return images
+
+    @api.model
+    def get_downloaded_image_ept(self, image_data):
+        """
+        Returns the base64 image of a result of download_images_ept, reading the stored copy of an unchanged image.
+        :param image_data: Dictionary of one URL returned by download_images_ept.
+        :return: base64 image or False.
+        """
+        if not image_data:
+            return False
+        if image_data.get('image'):
+            return image_data['image']
+        stored_image = self.env['common.product.image.ept'].search([('image_hash', '=', image_data['image_hash'])],
+                                                                   limit=1)
+        return stored_image.image or False
@@ -29,6 +29,38 @@ class ProductPriceList(models.Model):
             price_list_item = price_list_item_obj.create(new_vals)
         return price_list_item
 
+    def set_products_price_ept(self, product_prices, min_qty=1):
+        """
+        Define this method for create or update the prices of many products in the pricelist, with one search, one
+        write per distinct price and one create.
+        :param: product_prices: dict {product.product() id: price}
+        :param: min_qty: float
+        :return: product.pricelist.item()
+        """
+        price_list_item_obj = self.env['product.pricelist.item']
+        if not product_prices:
+            return price_list_item_obj
+        price_list_items = price_list_item_obj.search([('pricelist_id', '=', self.id),
+                                                       ('product_id', 'in', list(product_prices)),
+                                                       ('min_quantity', '=', min_qty)])
+        items_by_price = {}
+        for price_list_item in price_list_items:
+            price = product_prices[price_list_item.product_id.id]
+            items_by_price[price] = items_by_price.get(price, price_list_item_obj) | price_list_item
+        for price, items in items_by_price.items():
+            items.write({'fixed_price': price})
+        if price_list_items:
+            price_list_items.invalidate_model(['fixed_price'])
+
+        vals_list = []
+        for product_id in set(product_prices) - set(price_list_items.product_id.ids):
+            vals = self.prepre_pricelistitem_vals(product_id, min_qty, product_prices[product_id])
+            new_record = price_list_item_obj.new(vals)
+            new_record._onchange_product_id()
+            vals_list.append(price_list_item_obj._convert_to_write(
+                {name: new_record[name] for name in new_record._cache}))
+        return price_list_items | price_list_item_obj.create(vals_list)
+
     def prepre_pricelistitem_vals(self, product_id, min_qty, price):
         """
         Define this method for prepare values for price list item.
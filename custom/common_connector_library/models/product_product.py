@@ -2,7 +2,7 @@
 # See LICENSE file for full copyright and licensing details.
 from datetime import datetime
 from odoo.exceptions import UserError
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 
 module_list = ['shopify_ept', 'woo_commerce_ept', 'amazon_ept', 'walmart_ept', 'ebay_ept', 'bol_ept']
 
@@ -115,8 +115,18 @@ class ProductProduct(models.Model):
         :return: ir.module.module()
         """
         module_obj = self.env['ir.module.module']
-        module = module_obj.sudo().search([('name', '=', module_name), ('state', '=', 'installed')])
-        return module
+        return module_obj.sudo().browse(self._get_installed_module_ids_ept(module_name))
+
+    @tools.ormcache('module_name')
+    def _get_installed_module_ids_ept(self, module_name):
+        """
+        Define this method for cache the installed modules, installing or uninstalling a module reloads the registry
+        and so clears this cache.
+        :param: module_name: str
+        :return: tuple of ir.module.module() ids
+        """
+        module_obj = self.env['ir.module.module']
+        return tuple(module_obj.sudo().search([('name', '=', module_name), ('state', '=', 'installed')]).ids)
 
     def get_product_movement_of_bom_product(self, date, company):
         """
@@ -144,8 +154,7 @@ class ProductProduct(models.Model):
         :param product_list: Ids of Product.
         :return: Ids of locations and products in string.
         """
-        locations = self.env['stock.location'].search([('location_id', 'child_of', warehouse.lot_stock_id.ids)])
-        location_ids = tuple(locations.ids)
+        location_ids = warehouse.lot_stock_id.get_child_location_ids_ept()
         product_ids = tuple(product_list)
         return location_ids, product_ids
 
@@ -226,25 +235,83 @@ class ProductProduct(models.Model):
 
         bom_product_ids = self.check_for_bom_products(product_ids)
         if bom_product_ids:
-            # Passed location instead of the warehouse in with_context, because it was doing export the product stock
-            # of all locations of the warehouse instead of the stock location of the warehouse.
-            bom_products = self.with_context(location=[location for location in location_ids]).browse(
-                bom_product_ids)
-            for product in bom_products:
-                actual_stock = getattr(product, 'free_qty')
-                qty_on_hand.update({product.id: actual_stock})
-
-        simple_product_list = list(set(product_list) - set(bom_product_ids))
+            qty_on_hand.update(self.get_kit_qty_ept('free_qty', location_ids, bom_product_ids))
+
+        simple_product_list = list(set(product_list) - set(qty_on_hand))
         simple_product_list_ids = tuple(simple_product_list)
         if simple_product_list_ids:
-            qry = self.prepare_free_qty_query(location_ids, simple_product_list_ids)
-            params = (location_ids, simple_product_list_ids)
-            self.env.cr.execute(qry, params)
-            result = self.env.cr.dictfetchall()
-            for i in result:
-                qty_on_hand.update({i.get('product_id'): i.get('stock')})
+            qty_on_hand.update(self.get_simple_qty_ept('free_qty', location_ids, simple_product_list_ids))
         return qty_on_hand
 
+    def get_simple_qty_ept(self, qty_type, location_ids, product_ids):
+        """
+        This method fetches the quantity of products which are not kits with one query.
+        :param qty_type: free_qty, qty_available or forecasted_qty.
+        :param location_ids: Ids of Locations.
+        :param product_ids: Tuple of product ids.
+        :return: Dictionary of product id and quantity.
+        """
+        if qty_type == 'qty_available':
+            qry = self.prepare_onhand_qty_query(location_ids, product_ids)
+            params = (location_ids, product_ids)
+        elif qty_type == 'forecasted_qty':
+            qry = self.prepare_forecasted_qty_query(location_ids, product_ids)
+            params = (location_ids, product_ids, product_ids, location_ids)
+        else:
+            qry = self.prepare_free_qty_query(location_ids, product_ids)
+            params = (location_ids, product_ids)
+        self.env.cr.execute(qry, params)
+        return {row.get('product_id'): row.get('stock') for row in self.env.cr.dictfetchall()}
+
+    def prepare_kit_components_ept(self, kit_product_ids):
+        """
+        This method explodes the kit (phantom) BoMs of the products once, nested kits included.
+        :param kit_product_ids: Ids of products having a BoM.
+        :return: Dictionary of kit product id and dictionary of storable component id and its quantity per kit, in
+        the unit of measure of the component. Products without a kit BoM are left out.
+        """
+        kit_components = {}
+        kits = self.browse(kit_product_ids)
+        boms = self.env['mrp.bom']._bom_find(kits, bom_type='phantom')
+        for kit in kits:
+            bom = boms.get(kit)
+            if not bom:
+                continue
+            _boms_done, bom_sub_lines = bom.explode(kit, 1)
+            qty_per_kit = {}
+            for bom_line, bom_line_data in bom_sub_lines:
+                component = bom_line.product_id
+                if not component.is_storable or not bom_line_data['qty']:
+                    continue
+                uom_qty_per_kit = bom_line_data['qty'] / bom_line_data['original_qty']
+                qty_per_kit[component.id] = qty_per_kit.get(component.id, 0.0) + \
+                                            bom_line.product_uom_id._compute_quantity(uom_qty_per_kit, component.uom_id,
+                                                                                      round=False,
+                                                                                      raise_if_failure=False)
+            if qty_per_kit:
+                kit_components[kit.id] = qty_per_kit
+        return kit_components
+
+    def get_kit_qty_ept(self, qty_type, location_ids, bom_product_ids):
+        """
+        This method computes the quantity of kit products from their components: the BoMs are exploded once, the
+        quantity of all components is fetched with one query and every kit gets the number of complete kits its
+        components allow.
+        :param qty_type: free_qty, qty_available or forecasted_qty.
+        :param location_ids: Ids of Locations.
+        :param bom_product_ids: Ids of products having a BoM.
+        :return: Dictionary of kit product id and quantity. Products with a BoM which is not a kit are left out, their
+        own stock is used.
+        """
+        kit_components = self.prepare_kit_components_ept(bom_product_ids)
+        component_ids = tuple({component_id for components in kit_components.values() for component_id in components})
+        if not component_ids:
+            return {}
+        component_qty = self.get_simple_qty_ept(qty_type, location_ids, component_ids)
+        return {kit_id: max(min((component_qty.get(component_id) or 0.0) / qty for component_id, qty in
+                                components.items()) // 1, 0.0)
+                for kit_id, components in kit_components.items()}
+
     # def prepare_forecasted_qty_query_for_bom_product(self, location_ids, product_ids):
     #     """
     #     Define this method for get forecasted stock of the give product list for the specified
@@ -286,21 +353,12 @@ class ProductProduct(models.Model):
         #     for i in actual_stock:
         #         forcasted_qty.update({i.get('product_id'): i.get('stock')})
         if bom_product_ids:
-            bom_products = self.with_context(warehouse=warehouse.ids).browse(bom_product_ids)
-            for product in bom_products:
-                actual_stock = getattr(product, 'free_qty') + getattr(product, 'incoming_qty') - getattr(product,
-                                                                                                         'outgoing_qty')
-                forcasted_qty.update({product.id: actual_stock})
+            forcasted_qty.update(self.get_kit_qty_ept('forecasted_qty', location_ids, bom_product_ids))
 
-        simple_product_list = list(set(product_list) - set(bom_product_ids))
+        simple_product_list = list(set(product_list) - set(forcasted_qty))
         simple_product_list_ids = tuple(simple_product_list)
         if simple_product_list_ids:
-            qry = self.prepare_forecasted_qty_query(location_ids, simple_product_list_ids)
-            params = (location_ids, simple_product_list_ids, simple_product_list_ids, location_ids)
-            self.env.cr.execute(qry, params)
-            result = self.env.cr.dictfetchall()
-            for i in result:
-                forcasted_qty.update({i.get('product_id'): i.get('stock')})
+            forcasted_qty.update(self.get_simple_qty_ept('forecasted_qty', location_ids, simple_product_list_ids))
         return forcasted_qty
 
     def get_onhand_qty_ept(self, warehouse, product_list):
@@ -315,20 +373,12 @@ class ProductProduct(models.Model):
 
         bom_product_ids = self.check_for_bom_products(product_ids)
         if bom_product_ids:
-            bom_products = self.with_context(warehouse=warehouse.ids).browse(bom_product_ids)
-            for product in bom_products:
-                actual_stock = getattr(product, 'qty_available')
-                onhand_qty.update({product.id: actual_stock})
+            onhand_qty.update(self.get_kit_qty_ept('qty_available', location_ids, bom_product_ids))
 
-        simple_product_list = list(set(product_list) - set(bom_product_ids))
+        simple_product_list = list(set(product_list) - set(onhand_qty))
         simple_product_list_ids = tuple(simple_product_list)
         if simple_product_list_ids:
-            qry = self.prepare_onhand_qty_query(location_ids, simple_product_list_ids)
-            params = (location_ids, simple_product_list_ids)
-            self.env.cr.execute(qry, params)
-            result = self.env.cr.dictfetchall()
-            for i in result:
-                onhand_qty.update({i.get('product_id'): i.get('stock')})
+            onhand_qty.update(self.get_simple_qty_ept('qty_available', location_ids, simple_product_list_ids))
         return onhand_qty
 
     def _prepare_out_svl_vals(self, quantity, company,lot=False):
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+from odoo import models, tools
+
+
+class ResCountry(models.Model):
+    _inherit = "res.country"
+
+    def write(self, vals):
+        """
+        Inherited this method to clear the cache of the countries by name or code when one of them is changed.
+        """
+        res = super(ResCountry, self).write(vals)
+        if {'name', 'code'} & set(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        """
+        Inherited this method to clear the cache of the countries by name or code.
+        """
+        res = super(ResCountry, self).unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    def _search_country_id_ept(self, name_or_code):
+        return self.sudo().search(['|', ('code', '=ilike', name_or_code), ('name', '=ilike', name_or_code)],
+                                  limit=1).id
+
+    @tools.ormcache('name_or_code', 'self.env.lang')
+    def _get_country_id_ept(self, name_or_code):
+        return self._search_country_id_ept(name_or_code)
+
+    def get_country_ept(self, name_or_code):
+        """
+        Define this method for find the Country of a name or code, compared case insensitively, from the cache. The
+        name is translated, so the cache is kept per language. A name or code without Country is searched again on
+        every call, so creating a Country never makes the cache stale.
+        :param: name_or_code: Country Name or Country Code, Type: Char
+        :return: res.country()
+        """
+        name_or_code = (name_or_code or '').strip().lower()
+        if not name_or_code:
+            return self.browse()
+        return self.browse(self._get_country_id_ept(name_or_code) or self._search_country_id_ept(name_or_code))
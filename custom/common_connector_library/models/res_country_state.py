@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+import functools
+import json
+import os
+
+from odoo import models, tools
+
+POSTAL_CODE_STATES_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data',
+                                       'postal_code_states.json')
+
+
+@functools.lru_cache(maxsize=None)
+def load_postal_code_states_ept():
+    """
+    Loads the bundled states and postal code ranges of the countries once per process.
+    :return: dict {country code: {'states': {state code: state name},
+                                  'postal_codes': [[first prefix, last prefix, state code], ...]}}
+    """
+    with open(POSTAL_CODE_STATES_FILE, encoding='utf-8') as postal_code_file:
+        return json.load(postal_code_file)
+
+
+class ResCountryState(models.Model):
+    _inherit = "res.country.state"
+
+    def write(self, vals):
+        """
+        Inherited this method to clear the cache of the states by name or code when one of them is changed.
+        """
+        res = super(ResCountryState, self).write(vals)
+        if {'name', 'code', 'country_id'} & set(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        """
+        Inherited this method to clear the cache of the states by name or code.
+        """
+        res = super(ResCountryState, self).unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    def _search_state_id_ept(self, country_id, name_or_code):
+        return self.sudo().search(['|', ('name', '=ilike', name_or_code), ('code', '=ilike', name_or_code),
+                                   ('country_id', '=', country_id)], limit=1).id
+
+    @tools.ormcache('country_id', 'name_or_code', 'self.env.lang')
+    def _get_state_id_ept(self, country_id, name_or_code):
+        return self._search_state_id_ept(country_id, name_or_code)
+
+    def get_state_ept(self, country, name_or_code):
+        """
+        Define this method for find the State of a country by its name or code, compared case insensitively, from
+        the cache, kept per language. A name or code without State is searched again on every call, so the States
+        created from the postal codes never make the cache stale.
+        :param: country: res.country()
+        :param: name_or_code: State Name or State Code, Type: Char
+        :return: res.country.state()
+        """
+        name_or_code = (name_or_code or '').strip().lower()
+        if not name_or_code:
+            return self.browse()
+        return self.browse(self._get_state_id_ept(country.id, name_or_code) or
+                           self._search_state_id_ept(country.id, name_or_code))
+
+    def get_state_from_postal_code_ept(self, country, zip_code):
+        """
+        Define this method for find the State of a zip code from the bundled postal code ranges of the country. The
+        state is searched by its code, then by its bundled name, and created when it does not exist.
+        :param: country: res.country()
+        :param: zip_code: Zip code, Type: Char
+        :return: res.country.state()
+        """
+        postal_codes = load_postal_code_states_ept().get((country.code or '').upper())
+        if not postal_codes or not zip_code:
+            return self.browse()
+        postal_code = zip_code.split('-')[0].replace(' ', '').upper()
+        for first_prefix, last_prefix, state_code in postal_codes['postal_codes']:
+            prefix = postal_code[:len(first_prefix)]
+            if len(prefix) == len(first_prefix) and first_prefix <= prefix <= last_prefix:
+                state_name = postal_codes['states'][state_code]
+                state = self.get_state_ept(country, state_code) or self.get_state_ept(country, state_name)
+                if not state:
+                    state = self.create({'name': state_name, 'code': state_code, 'country_id': country.id})
+                return state
+        return self.browse()
@@ -1,13 +1,20 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
-import ast
 import logging
-import requests
+import re
 from odoo import models, fields, api
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
 
 logger = logging.getLogger(__name__)
 
+# Normalized keys of the partner lookups, each one is backed by a functional index of res_partner.
+PARTNER_LOOKUP_KEYS_EPT = {
+    'email': "lower(email)",
+    'phone': "regexp_replace(phone, '[^0-9+]', '', 'g')",
+}
+
 
 class ResPartner(models.Model):
     _inherit = "res.partner"
@@ -16,6 +23,14 @@ class ResPartner(models.Model):
                                                                    default=False, help="Search fiscal position based "
                                                                                        "on origin warehouse")
 
+    def init(self):
+        """
+        Creates the functional indexes of the normalized email and phone used by the partner lookups.
+        """
+        super(ResPartner, self).init()
+        for key, expression in PARTNER_LOOKUP_KEYS_EPT.items():
+            create_index(self.env.cr, 'res_partner_%s_lookup_ept_index' % key, self._table, [expression])
+
     def _find_partner_ept(self, vals, key_list=[], extra_domain=[]):
         """
         This function find the partner based on domain.
@@ -35,7 +50,15 @@ class ResPartner(models.Model):
                 if not vals.get(key):
                     continue
                 if (key in vals) and isinstance(vals.get(key), str):
-                    _domain.append((key, '=ilike', self._remove_special_chars(vals.get(key))))
+                    value = self._remove_special_chars(vals.get(key))
+                    normalized_value = self.normalize_lookup_value_ept(key, value)
+                    if key in PARTNER_LOOKUP_KEYS_EPT and normalized_value:
+                        partner_ids = self.search_partner_ids_by_key_ept(key, [value]).get(normalized_value)
+                        if not partner_ids:
+                            return self.browse()
+                        _domain.append(('id', 'in', partner_ids))
+                        continue
+                    _domain.append((key, '=ilike', value))
                 else:
                     _domain.append((key, '=', vals.get(key)))
             partner = self.search(_domain, limit=1) if _domain else False
@@ -44,26 +67,91 @@ class ResPartner(models.Model):
 
     def search_partner_by_email(self, email):
         """
-        Define this method for search Partner by Email if not found then use =ilike operator for
-        ignore case sensitive search and set limit 1 because it may possible to find multiple emails
-        due to =ilike operator
+        Define this method for search Partner by Email, emails are compared case insensitively through the index of
+        the lower case email, set limit 1 because it may possible to find multiple partners of the email.
         :param email: Email Id, Type: Char
         :return: res.partner()
         """
-        partner = self.search([('email', '=ilike', email)], limit=1)
-        return partner
+        return self.search_partners_by_emails_ept([email]).get(self.normalize_lookup_value_ept('email', email),
+                                                               self.browse())
+
+    def search_partners_by_emails_ept(self, emails):
+        """
+        Define this method for search the Partners of many Emails with one query, emails are compared case
+        insensitively. When many partners share an email, the first one in the default order is returned, as
+        search_partner_by_email does.
+        :param emails: list of Email Ids
+        :return: dict {lower case email: res.partner()}
+        """
+        return self.search_partners_by_key_ept('email', emails)
+
+    def search_partners_by_phones_ept(self, phones):
+        """
+        Define this method for search the Partners of many Phones with one query, phones are compared on their digits
+        and leading plus sign only. When many partners share a phone, the first one in the default order is returned.
+        :param phones: list of Phone numbers
+        :return: dict {normalized phone: res.partner()}
+        """
+        return self.search_partners_by_key_ept('phone', phones)
+
+    @staticmethod
+    def normalize_lookup_value_ept(key, value):
+        """
+        Returns the value of a partner lookup key as it is stored in the index of the key, the lower case email or
+        the phone without its spaces, dashes and brackets.
+        :param key: field name, a key of PARTNER_LOOKUP_KEYS_EPT
+        :param value: value to normalize
+        """
+        if not value:
+            return ''
+        if key == 'phone':
+            return re.sub(r'[^0-9+]', '', value)
+        return value.lower()
+
+    def search_partner_ids_by_key_ept(self, key, values):
+        """
+        Define this method for search the ids of the partners of many values of a lookup key with one query on the
+        functional index of the key. The active and access rules are not applied.
+        :param key: field name, a key of PARTNER_LOOKUP_KEYS_EPT
+        :param values: list of values
+        :return: dict {normalized value: list of partner ids}
+        """
+        values = {self.normalize_lookup_value_ept(key, value) for value in values} - {''}
+        if not values:
+            return {}
+        expression = SQL(PARTNER_LOOKUP_KEYS_EPT[key])
+        self.flush_model([key])
+        self.env.cr.execute(SQL("SELECT %s, id FROM res_partner WHERE %s IN %s", expression, expression,
+                                tuple(values)))
+        partner_ids = {}
+        for normalized_value, partner_id in self.env.cr.fetchall():
+            partner_ids.setdefault(normalized_value, []).append(partner_id)
+        return partner_ids
+
+    def search_partners_by_key_ept(self, key, values):
+        """
+        Define this method for search the Partners of many values of a lookup key with one query. When many partners
+        share a value, the first one in the default order is returned.
+        :param key: field name, a key of PARTNER_LOOKUP_KEYS_EPT
+        :param values: list of values
+        :return: dict {normalized value: res.partner()}
+        """
+        partner_ids = self.search_partner_ids_by_key_ept(key, values)
+        if not partner_ids:
+            return {}
+        partners = {}
+        for partner in self.search([('id', 'in', [partner_id for ids in partner_ids.values() for partner_id in ids])]):
+            partners.setdefault(self.normalize_lookup_value_ept(key, partner[key]), partner)
+        return partners
 
     def get_country(self, country_name_or_code):
         """
-        Define this method for search Country by name or code if not found then use =ilike operator for
-        ignore case sensitive search and set limit 1 because it may possible to find multiple emails due
-        to =ilike operator.
+        Define this method for search Country by name or code, compared case insensitively. The countries are cached
+        by their normalized name or code.
         :param: country_name_or_code: Country Name or Country Code, Type: Char
         :return: res.country()
         """
-        country = self.env['res.country'].search(['|', ('code', '=ilike', country_name_or_code),
-                                                  ('name', '=ilike', country_name_or_code)], limit=1)
-        return country
+        return self.env['res.country'].get_country_ept(country_name_or_code)
 
     def create_or_update_state_ept(self, country_code, state_name_or_code, zip_code, country_obj=False):
         """
@@ -73,14 +161,11 @@ class ResPartner(models.Model):
         :param: zip_code: zip code str
         :param: country_obj: res.country()
         """
-        res_country_obj = self.env['res.country.state']
         if not country_obj:
             country = self.get_country(country_code)
         else:
             country = country_obj
-        state = res_country_obj.search(['|', ('name', '=ilike', state_name_or_code),
-                                        ('code', '=ilike', state_name_or_code),
-                                        ('country_id', '=', country.id)], limit=1)
+        state = self.env['res.country.state'].get_state_ept(country, state_name_or_code)
 
         if not state and zip_code:
             state = self.get_state_from_api(country_code, zip_code, country)
@@ -88,43 +173,18 @@ class ResPartner(models.Model):
 
     def get_state_from_api(self, country_code, zip_code, country):
         """
-        This method tries to find state from country and zip code from zippopotam api.
+        This method tries to find state from country and zip code from the postal code ranges bundled with the
+        module, without any request to an external service. The ranges cover AU, BR, CA, ES, IN, IT, MX and US,
+        no state is found for the zip codes of other countries. Prefixes shared by several states, e.g. some
+        Italian provinces, are left out.
         :param: country_code: Code of country.
         :param: zip_code: Zip code.
         :param: country: Record of Country.
         :return: Record of state if found, otherwise object.
         """
-        state_obj = state = self.env['res.country.state']
-        country_obj = self.env['res.country']
-        try:
-            url = 'https://api.zippopotam.us/' + country_code + '/' + zip_code.split('-')[0]
-            response = requests.get(url)
-            response = ast.literal_eval(response.content.decode('utf-8'))
-        except Exception as error:
-            logger.info("Error when a request for state: %s", error)
-            return state_obj
-        if response:
-            if not country:
-                country = self.get_country(response.get('country abbreviation'))
-            if not country:
-                country = self.get_country(response.get('country'))
-            if not country:
-                country = country_obj.create({'name': response.get('country'),
-                                              'code': response.get('country abbreviation')})
-            # State search functionality is modified because using the old method there might be
-            # chance to get the blank record from the database.
-            state_code = response.get('places')[0].get('state abbreviation')
-            state_name = response.get('places')[0].get('state', '')
-            if state_code:
-                state = state_obj.search([('code', '=ilike', state_code), ('country_id', '=', country.id)],
-                                         limit=1)
-            elif state_name:
-                state = state_obj.search([('name', '=ilike', state_name), ('country_id', '=', country.id)],
-                                         limit=1)
-            if not state and state_code:
-                state = state_obj.create({'name': state_name, 'code': state_code,
-                                          'country_id': country.id})
-        return state
+        if not country:
+            country = self.get_country(country_code)
+        return self.env['res.country.state'].get_state_from_postal_code_ept(country, zip_code)
 
     @api.model_create_multi
     def create(self, vals_list):
@@ -2,10 +2,11 @@
 # See LICENSE file for full copyright and licensing details.
 import logging
 from odoo import models, api, fields, _
-from odoo.tools.misc import format_date
+from odoo.tools.misc import format_date, split_every
 from odoo.fields import Command
 
 _logger = logging.getLogger(__name__)
+WORKFLOW_BATCH_SIZE = 50  # Orders processed together by the auto workflow.
 
 
 class SaleOrder(models.Model):
@@ -90,58 +91,153 @@ class SaleOrder(models.Model):
     def process_orders_and_invoices_ept(self):
         """
         This method will confirm sale orders, create and paid related invoices.
+        Orders are processed per auto workflow in batches, each stage is done with multi record operations. A failing
+        order of a batch is logged in the log lines and skipped, the rest of the batch is processed. When only one
+        order is processed, the error is raised to the caller.
         :return: True
         """
+        orders = self.filtered(lambda order: order.invoice_status != 'invoiced')
+        raise_error = len(self) == 1
+        for work_flow_process_record in orders.auto_workflow_process_id:
+            workflow_orders = orders.filtered(lambda order: order.auto_workflow_process_id == work_flow_process_record)
+            for order_ids in split_every(WORKFLOW_BATCH_SIZE, workflow_orders.ids):
+                workflow_orders.browse(order_ids).process_workflow_orders_ept(work_flow_process_record, raise_error)
+        return True
+
+    def process_workflow_orders_ept(self, work_flow_process_record, raise_error=False):
+        """
+        Confirms the orders of one auto workflow with one confirmation, then creates, posts and pays their invoices
+        with one call per stage.
+        :param: work_flow_process_record: sale.workflow.process.ept()
+        :param: raise_error: True to raise the error of a failing order instead of logging it.
+        :return: sale.order() processed without error.
+        """
+        orders = self
+        if work_flow_process_record.validate_order:
+            orders = orders.run_workflow_stage_ept(lambda records: records.validate_orders_ept(),
+                                                   "confirm the order", raise_error)
+        orders = orders.filter_workflow_invoiceable_orders_ept()
+        return orders.run_workflow_stage_ept(
+            lambda records: records.validate_and_paid_invoices_ept(work_flow_process_record),
+            "create and paid the invoice", raise_error)
+
+    def run_workflow_stage_ept(self, stage, stage_name, raise_error=False):
+        """
+        Runs a stage of the auto workflow for all orders in a savepoint. When it fails, the orders are split in halves
+        and each half is retried in its own savepoint, until the failing orders are found and logged.
+        :param: stage: function called with the orders.
+        :param: stage_name: name of the stage used in the log message.
+        :param: raise_error: True to raise the error of a failing order instead of logging it.
+        :return: sale.order() for which the stage is done.
+        """
+        if not self:
+            return self
+        try:
+            with self.env.cr.savepoint():
+                stage(self)
+            return self
+        except Exception as error:
+            if raise_error:
+                raise
+            if len(self) == 1:
+                message = "Order %s is skipped by the auto workflow, it could not %s: %s" % (self.name, stage_name,
+                                                                                             error)
+                _logger.info(message)
+                self.env['common.log.lines.ept'].create_common_log_line_ept(message=message, model_name=self._name,
+                                                                            res_id=self.id, order_ref=self.name,
+                                                                            sale_order_id=self.id)
+                return self.browse()
+        half = len(self) // 2
+        return self[:half].run_workflow_stage_ept(stage, stage_name) | \
+            self[half:].run_workflow_stage_ept(stage, stage_name)
+
+    def filter_workflow_invoiceable_orders_ept(self):
+        """
+        Returns the orders whose invoice can be created by the auto workflow, the orders having only products with
+        the delivered quantities invoice policy wait for their delivery.
+        :return: sale.order()
+        """
+        invoiceable_orders = self.browse()
         for order in self:
-            work_flow_process_record = order.auto_workflow_process_id
-            if order.invoice_status == 'invoiced':
-                continue
-            if work_flow_process_record.validate_order:
-                order.validate_order_ept()
-            order_lines = order.mapped('order_line').filtered(lambda l: l.product_id.invoice_policy == 'order')
+            order_lines = order.order_line.filtered(lambda l: l.product_id.invoice_policy == 'order')
             if not order_lines.filtered(lambda l: l.product_id.type == 'consu' and l.product_id.is_storable) and len(
                     order.order_line) != len(order_lines.filtered(
                 lambda l: l.product_id.type in ['service', 'consu'] and not l.product_id.is_storable)):
                 continue
-            order.validate_and_paid_invoices_ept(work_flow_process_record)
-        return True
+            invoiceable_orders |= order
+        return invoiceable_orders
 
     def validate_order_ept(self):
         """
         This function validate sales order and write date_order same as previous date because Odoo changes date_order
         to current date in action confirm process.
+        :return: True
+        """
+        self.ensure_one()
+        return self.validate_orders_ept()
+
+    def validate_orders_ept(self):
+        """
+        This function validate sales orders with one confirmation and write date_order same as previous date because
+        Odoo changes date_order to current date in action confirm process.
         Added invalidate_model line to resolve the issue of PO line description while product route has dropship and
         multi language active in Odoo.
         :return: True
         """
-        self.ensure_one()
-        date_order = self.date_order
+        orders_by_date = {}
+        for order in self:
+            orders_by_date[order.date_order] = orders_by_date.get(order.date_order, self.browse()) | order
         # invalidate_cache will be deprecated so used invalidate_model().
         self.env['product.product'].invalidate_model(fnames=['display_name'])
         self.action_confirm()
-        self.write({'date_order': date_order})
+        for date_order, orders in orders_by_date.items():
+            orders.write({'date_order': date_order})
         return True
 
     def validate_and_paid_invoices_ept(self, work_flow_process_record):
         """
         According to the workflow configuration, It will create invoices, validate them and register payment.
+        The invoices of all orders are created, posted and paid with one call per stage, one invoice per order.
         :param : work_flow_process_record: sale.workflow.process.ept()
         :return: True
         """
-        self.ensure_one()
-        if work_flow_process_record.create_invoice:
-            if work_flow_process_record.invoice_date_is_order_date:
-                if self.check_fiscal_year_lock_date_ept():
-                    return True
-            if work_flow_process_record.sale_journal_id:
-                invoices = self.with_context(journal_ept=work_flow_process_record.sale_journal_id)._create_invoices()
-            else:
-                invoices = self._create_invoices()
-            self.validate_invoice_ept(invoices)
-            if work_flow_process_record.register_payment:
-                self.paid_invoice_ept(invoices)
+        if not work_flow_process_record.create_invoice:
+            return True
+        orders = self
+        if work_flow_process_record.invoice_date_is_order_date:
+            orders = orders.filtered(lambda order: not order.check_fiscal_year_lock_date_ept())
+        if not orders:
+            return True
+        invoices = orders.create_workflow_invoices_ept(work_flow_process_record)
+        orders.validate_invoice_ept(invoices)
+        if work_flow_process_record.register_payment:
+            paid_orders = orders.filter_workflow_orders_to_pay_ept()
+            if paid_orders != orders:
+                invoices = invoices.filtered(
+                    lambda invoice: invoice.invoice_line_ids.sale_line_ids.order_id & paid_orders)
+            if paid_orders:
+                paid_orders.paid_invoice_ept(invoices)
         return True
 
+    def create_workflow_invoices_ept(self, work_flow_process_record):
+        """
+        Creates one invoice per order for the auto workflow.
+        :param : work_flow_process_record: sale.workflow.process.ept()
+        :return: account.move()
+        """
+        if work_flow_process_record.sale_journal_id:
+            return self.with_context(journal_ept=work_flow_process_record.sale_journal_id)._create_invoices(
+                grouped=True)
+        return self._create_invoices(grouped=True)
+
+    def filter_workflow_orders_to_pay_ept(self):
+        """
+        Returns the orders whose invoices are paid by the auto workflow, connectors can hold back the payment of
+        some orders.
+        :return: sale.order()
+        """
+        return self
+
     def check_fiscal_year_lock_date_ept(self):
         """
         The invoice will not create if order date as lower to fiscalyear date.
@@ -160,82 +256,147 @@ class SaleOrder(models.Model):
 
     def validate_invoice_ept(self, invoices):
         """
-        This method will validate invoice.
+        This method will validate invoices.
         :param: invoices: account.move()
         :return: True
         """
-        self.ensure_one()
-        for invoice in invoices:
-            invoice.action_post()
+        invoices = invoices.filtered(lambda invoice: invoice.state == 'draft')
+        if invoices:
+            invoices.action_post()
         return True
 
     def paid_invoice_ept(self, invoices):
         """
-        Based on the auto invoice workflow configuration, it will paid and reconcile invoice.
+        Based on the auto invoice workflow configuration, it will paid and reconcile invoices. The payments of all
+        invoices are created and posted at once and reconciled with one reconciliation.
         :param : invoices: account.move()
         :return: True
         """
-        self.ensure_one()
-        account_payment_obj = self.env['account.payment']
-        for invoice in invoices:
-            total_payment_sum = sum(
-                invoice.matched_payment_ids.filtered(lambda P: P.state in ['in_process', 'paid']).mapped('amount'))
-            invoice_amount = invoice.amount_residual
-            if (invoice_amount - total_payment_sum) > 0:
-                if invoice.amount_residual:
-                    vals = invoice.prepare_payment_dict(self.auto_workflow_process_id)
-                    vals.update({'amount': invoice_amount - total_payment_sum})
-                    payment_id = account_payment_obj.create(vals)
-                    payment_id.action_post()
-                    self.reconcile_payment_ept(payment_id, invoice)
+        payment_vals_list = []
+        payment_invoices = []
+        for order in self:
+            order_invoices = invoices if len(self) == 1 else invoices.filtered(
+                lambda invoice: order in invoice.invoice_line_ids.sale_line_ids.order_id)
+            for invoice in order_invoices:
+                for vals in order.prepare_workflow_payment_vals_ept(invoice):
+                    payment_vals_list.append(vals)
+                    payment_invoices.append(invoice)
+        if not payment_vals_list:
+            return True
+        payments = self.env['account.payment'].create(payment_vals_list)
+        payments.action_post()
+        self.reconcile_payment_ept(payments, payment_invoices)
         return True
 
+    def prepare_workflow_payment_vals_ept(self, invoice):
+        """
+        Prepares the vals of the payments registered by the auto workflow for an invoice of the order.
+        :param : invoice: account.move()
+        :return: list of dict {}
+        """
+        self.ensure_one()
+        total_payment_sum = sum(
+            invoice.matched_payment_ids.filtered(lambda P: P.state in ['in_process', 'paid']).mapped('amount'))
+        invoice_amount = invoice.amount_residual
+        if (invoice_amount - total_payment_sum) <= 0 or not invoice.amount_residual:
+            return []
+        vals = invoice.prepare_payment_dict(self.auto_workflow_process_id)
+        vals.update({'amount': invoice_amount - total_payment_sum})
+        return [vals]
+
     def reconcile_payment_ept(self, payment_id, invoice):
         """
-        Define this method for reconcile account payment.
-        :param: payment_id: account.payment()
-        :param: invoice: account.move()
+        Define this method for reconcile account payments. The lines of all payments of an invoice are reconciled
+        with it per account, all invoices with one reconciliation plan.
+        :param: payment_id: account.payment(), one or many payments.
+        :param: invoice: account.move(), or a list of the invoices of the payments in the same order.
         :return:
         """
         move_line_obj = self.env['account.move.line']
         domain = [('account_type', 'in', ('asset_receivable', 'liability_payable')), ('parent_state', '=', 'posted'),
                   ('reconciled', '=', False)]
-        line_ids = move_line_obj.search([('move_id', '=', invoice.id)])
-        to_reconcile = [line_ids.filtered(lambda line: line.account_type == 'asset_receivable')]
+        payments_by_invoice = {}
+        for payment, payment_invoice in zip(payment_id, invoice):
+            payments_by_invoice[payment_invoice] = payments_by_invoice.get(payment_invoice, payment.browse()) | payment
 
-        for payment, lines in zip([payment_id], to_reconcile):
-            # payment_lines = line_ids.filtered_domain(domain)
-            payment_lines = payment.move_id.line_ids.filtered_domain(domain)
+        reconciliation_plan = []
+        for payment_invoice, payments in payments_by_invoice.items():
+            lines = payment_invoice.line_ids.filtered(lambda line: line.account_type == 'asset_receivable')
+            payment_lines = payments.move_id.line_ids.filtered_domain(domain)
             for account in payment_lines.account_id:
-                (payment_lines + lines).filtered_domain([('account_id', '=', account.id),
-                                                         ('parent_state', '=', 'posted'),
-                                                         ('reconciled', '=', False)]).reconcile()
-            invoice.matched_payment_ids += payment
+                account_lines = (payment_lines + lines).filtered_domain([('account_id', '=', account.id),
+                                                                         ('parent_state', '=', 'posted'),
+                                                                         ('reconciled', '=', False)])
+                if account_lines:
+                    reconciliation_plan.append(account_lines)
+        if reconciliation_plan:
+            move_line_obj._reconcile_plan(reconciliation_plan)
+        for payment_invoice, payments in payments_by_invoice.items():
+            payment_invoice.matched_payment_ids += payments
 
     def auto_shipped_order_ept(self, customers_location, is_mrp_installed=False):
         """
-        This method is used to create a stock move of shipped orders.
+        This method is used to create the stock moves of shipped orders. The kits of all orders are exploded once per
+        product, the moves of all orders are created with one create and done together.
         :param : customers_location: stock.location()
         :param : is_mrp_installed: True or False, based on mrp module installation.
         :return: True
         """
-        location_obj = self.env['stock.location']
-        order_lines = self.order_line.filtered(lambda l: l.product_id.type != 'service')
-        vendor_location = location_obj.search(
-            ['|', ('company_id', '=', self.company_id.id), ('company_id', '=', False), ('usage', '=', 'supplier')],
-            limit=1)
-        for order_line in order_lines:
-            bom_lines = []
-            if is_mrp_installed:
-                bom_lines = self.check_for_bom_product(order_line.product_id)
-            for bom_line in bom_lines:
-                self.create_and_done_stock_move_ept(order_line, customers_location, bom_line=bom_line)
-            if not bom_lines and order_line.product_id.is_drop_ship_product:
-                self.create_and_done_stock_move_ept(order_line, customers_location, vendor_location=vendor_location)
-            elif not bom_lines or not is_mrp_installed:
-                self.create_and_done_stock_move_ept(order_line, customers_location)
+        bom_lines_by_product = {}
+        if is_mrp_installed:
+            order_lines = self.order_line.filtered(lambda l: l.product_id.type != 'service')
+            bom_lines_by_product = self.explode_phantom_boms_ept(order_lines.product_id)
+        vals_list = []
+        for order in self:
+            vals_list += order.prepare_shipped_order_moves_vals_ept(customers_location, bom_lines_by_product)
+        if not vals_list:
+            return True
+        stock_moves = self.env['stock.move'].create(vals_list)
+        for product in stock_moves.product_id:
+            stock_moves.filtered(lambda move: move.product_id == product).reference = _(
+                'Auto processed move : %s') % product.display_name
+        self.done_shipped_order_moves_ept(stock_moves)
         return True
 
+    def explode_phantom_boms_ept(self, products):
+        """
+        Finds the kit Bill of Materials of the products for the companies of the orders and explodes each of them once
+        for one unit of the product.
+        :param : products: product.product()
+        :return: dict {(company id, product id): bom lines}
+        """
+        bom_lines_by_product = {}
+        for company in self.company_id:
+            try:
+                bom_point_dict = self.env['mrp.bom'].sudo()._bom_find(products=products, company_id=company.id,
+                                                                      bom_type='phantom')
+            except Exception as error:
+                _logger.info("Error when BOM product explode: %s", error)
+                continue
+            for product in products:
+                if product not in bom_point_dict:
+                    continue
+                bom_lines_by_product[(company.id, product.id)] = self.explode_bom_product_ept(product,
+                                                                                            bom_point_dict[product])
+        return bom_lines_by_product
+
+    def explode_bom_product_ept(self, product, bom_point):
+        """
+        Explodes the Bill of Material for one unit of the product.
+        :param : product: product.product()
+        :param : bom_point: mrp.bom()
+        :return: list of bom lines, empty when the BOM could not be exploded.
+        """
+        try:
+            from_uom = product.uom_id
+            to_uom = bom_point.product_uom_id
+            factor = from_uom._compute_quantity(1, to_uom) / bom_point.product_qty
+            bom, lines = bom_point.explode(product, factor, picking_type=bom_point.picking_type_id)
+            return lines
+        except Exception as error:
+            _logger.info("Error when BOM product explode: %s", error)
+        return []
+
     def check_for_bom_product(self, product):
         """
         Find BOM for phantom type only if Bill of Material type is Make to Order then for shipment report there are
@@ -243,29 +404,39 @@ class SaleOrder(models.Model):
         :param : product: product.product()
         :return: dict {}
         """
-        try:
-            bom_obj = self.env['mrp.bom']
-            bom_point_dict = bom_obj.sudo()._bom_find(products=product, company_id=self.company_id.id,
-                                                      bom_type='phantom')
-            if product in bom_point_dict:
-                bom_point = bom_point_dict[product]
-                from_uom = product.uom_id
-                to_uom = bom_point.product_uom_id
-                factor = from_uom._compute_quantity(1, to_uom) / bom_point.product_qty
-                bom, lines = bom_point.explode(product, factor, picking_type=bom_point.picking_type_id)
-                return lines
-        except Exception as error:
-            _logger.info("Error when BOM product explode: %s", error)
-        return {}
+        return self.explode_phantom_boms_ept(product).get((self.company_id.id, product.id), {})
+
+    def prepare_shipped_order_moves_vals_ept(self, customers_location, bom_lines_by_product):
+        """
+        Prepares the vals of the stock moves of a shipped order, one move per order line or per component of a kit.
+        :param : customers_location: stock.location()
+        :param : bom_lines_by_product: dict {(company id, product id): bom lines} of the kits.
+        :return: list of dict {}
+        """
+        self.ensure_one()
+        vendor_location = self.env['stock.location'].get_location_by_usage_ept('supplier', self.company_id)
+        vals_list = []
+        for order_line in self.order_line.filtered(lambda l: l.product_id.type != 'service'):
+            bom_lines = bom_lines_by_product.get((self.company_id.id, order_line.product_id.id), [])
+            for bom_line in bom_lines:
+                vals_list.append(self.prepare_shipped_order_move_vals_ept(order_line, customers_location,
+                                                                          bom_line=bom_line))
+            if not bom_lines and order_line.product_id.is_drop_ship_product:
+                vals_list.append(self.prepare_shipped_order_move_vals_ept(order_line, customers_location,
+                                                                          vendor_location=vendor_location))
+            elif not bom_lines:
+                vals_list.append(self.prepare_shipped_order_move_vals_ept(order_line, customers_location))
+        return [vals for vals in vals_list if vals]
 
-    def create_and_done_stock_move_ept(self, order_line, customers_location, bom_line=False, vendor_location=False):
+    def prepare_shipped_order_move_vals_ept(self, order_line, customers_location, bom_line=False,
+                                            vendor_location=False):
         """
-        Based on the order line, it will create a stock move and done it.
+        Based on the order line, it will prepare the vals of a stock move.
         :param : order_line: sale.order.line()
         :param : customers_location: stock.location()
         :param : bom_line: If mrp is install and product has kit type then pass the bom lines of it.
         :param : vendor_location: stock.location() - vendor location
-        :return: True
+        :return: dict {}, empty when there is no quantity to move.
         """
         if bom_line:
             product = bom_line[0].product_id
@@ -276,15 +447,22 @@ class SaleOrder(models.Model):
             product_qty = order_line.product_uom_qty
             product_uom = order_line.product_uom_id
 
-        if product and product_qty and product_uom:
-            vals = self.prepare_val_for_stock_move_ept(product, product_qty, product_uom, vendor_location,
-                                                       customers_location, order_line, bom_line)
-            stock_move = self.env['stock.move'].create(vals)
-            stock_move.reference = _('Auto processed move : %s') % product.display_name
-            stock_move.sudo()._action_assign()
-            stock_move.sudo()._set_quantity_done(product_qty)
-            stock_move.sudo().picked = True
-            stock_move.with_context(is_connector=True)._action_done()
+        if not (product and product_qty and product_uom):
+            return {}
+        return self.prepare_val_for_stock_move_ept(product, product_qty, product_uom, vendor_location,
+                                                   customers_location, order_line, bom_line)
+
+    def done_shipped_order_moves_ept(self, stock_moves):
+        """
+        Reserves and done the stock moves of shipped orders together.
+        :param : stock_moves: stock.move()
+        :return: True
+        """
+        stock_moves.sudo()._action_assign()
+        for stock_move in stock_moves:
+            stock_move.sudo()._set_quantity_done(stock_move.product_uom_qty)
+        stock_moves.sudo().picked = True
+        stock_moves.with_context(is_connector=True)._action_done()
         return True
 
     def prepare_val_for_stock_move_ept(self, product, product_qty, product_uom, vendor_location, customers_location,
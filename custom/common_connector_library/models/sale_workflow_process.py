@@ -73,7 +73,8 @@ class SaleWorkflowProcess(models.Model):
     def auto_workflow_process_ept(self, auto_workflow_process_id=False, order_ids=[]):
         """
         This method will find draft sale orders which are not having invoices yet, confirmed it and done the payment
-        according to the auto invoice workflow configured in sale order.
+        according to the auto invoice workflow configured in sale order. The orders are processed in batches per
+        workflow, an order which fails is logged and skipped.
         :param auto_workflow_process_id: auto workflow process id
         :param order_ids: ids of sale orders
         :return: True
@@ -98,7 +99,8 @@ class SaleWorkflowProcess(models.Model):
 
     def shipped_order_workflow_ept(self, orders):
         """
-        Define this method for processing the shipped orders.
+        Define this method for processing the shipped orders. The stock moves of all orders are created and done
+        together.
         :param: orders: sale.order()
         :return: True
         """
@@ -106,16 +108,17 @@ class SaleWorkflowProcess(models.Model):
         stock_location_obj = self.env["stock.location"]
         product_product_obj = self.env["product.product"]
         mrp_module = product_product_obj.search_installed_module_ept('mrp')
-        customer_location = stock_location_obj.search([("usage", "=", "customer")], limit=1)
+        customer_location = stock_location_obj.get_location_by_usage_ept("customer")
         shipped_orders = orders.filtered(lambda x: x.order_line)
-        for order in shipped_orders:
-            order.state = 'sale'
-            references = order.stock_reference_ids
-            if not references:
-                self.env['stock.reference'].create({
-                    'name': order.name,
-                    'sale_ids': [(4, order.id)],
-                })
-            order.auto_shipped_order_ept(customer_location, mrp_module)
+        if not shipped_orders:
+            return True
+        shipped_orders.state = 'sale'
+        orders_without_reference = shipped_orders.filtered(lambda order: not order.stock_reference_ids)
+        if orders_without_reference:
+            self.env['stock.reference'].create([{
+                'name': order.name,
+                'sale_ids': [(4, order.id)],
+            } for order in orders_without_reference])
+        shipped_orders.auto_shipped_order_ept(customer_location, mrp_module)
         shipped_orders.validate_and_paid_invoices_ept(self)
         return True
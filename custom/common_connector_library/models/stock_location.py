@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+from odoo import models, api, tools
+
+
+class StockLocation(models.Model):
+    _inherit = "stock.location"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """
+        Inherited this method to clear the cache of the locations by usage and of the child locations.
+        """
+        locations = super(StockLocation, self).create(vals_list)
+        self.env.registry.clear_cache()
+        return locations
+
+    def write(self, vals):
+        """
+        Inherited this method to clear the cache of the locations by usage and of the child locations when its usage,
+        company, parent or active is changed.
+        """
+        res = super(StockLocation, self).write(vals)
+        if {'usage', 'company_id', 'active', 'location_id'} & set(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        """
+        Inherited this method to clear the cache of the locations by usage and of the child locations.
+        """
+        res = super(StockLocation, self).unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @tools.ormcache('usage', 'company_id')
+    def _get_location_id_by_usage_ept(self, usage, company_id):
+        domain = [('usage', '=', usage)]
+        if company_id:
+            domain = ['|', ('company_id', '=', company_id), ('company_id', '=', False)] + domain
+        return self.sudo().search(domain, limit=1).id
+
+    def get_location_by_usage_ept(self, usage, company=False):
+        """
+        Define this method for find the first location of a usage, e.g. customer or supplier, from the cache.
+        :param: usage: str
+        :param: company: res.company(), when given only the locations of the company or shared ones are found.
+        :return: stock.location()
+        """
+        return self.browse(self._get_location_id_by_usage_ept(usage, company.id if company else False))
+
+    @tools.ormcache('location_ids')
+    def _get_child_location_ids_ept(self, location_ids):
+        return tuple(self.sudo().search([('location_id', 'child_of', list(location_ids))]).ids)
+
+    def get_child_location_ids_ept(self):
+        """
+        Define this method for find the ids of the locations and of all their child locations from the cache, the
+        connectors compute the stock of the same warehouses for several of their locations.
+        :return: tuple of stock.location() ids
+        """
+        return self._get_child_location_ids_ept(tuple(sorted(self.ids)))
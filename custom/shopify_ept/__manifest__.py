@@ -62,6 +62,7 @@
         'view/delivery_carrier_view.xml',
         'view/export_stock_queue_view.xml',
         'view/export_stock_queue_line_view.xml',
+        'view/product_file_import_view.xml',
         'view/shopify_oauth_templates.xml'
     ],
     'demo_xml': [],
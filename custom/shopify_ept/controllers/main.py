@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 # See LICENSE file for full copyright and licensing details.
 
+import base64
+import hashlib
+import hmac
 import logging
 from odoo import http
 from odoo.http import request
-from .. import shopify
 from werkzeug.utils import redirect
 
 _logger = logging.getLogger("Shopify Controller")
@@ -18,34 +20,14 @@ class Main(http.Controller):
     def create_update_delete_product_webhook(self):
         """
         Route for handling the product create/update/delete webhook of Shopify. This route calls while any new product
-        create or update or delete in the Shopify store.
+        create or update or delete in the Shopify store. The webhook is stored in the webhook inbox and processed by
+        the webhook inbox cron.
         @author: Dipak Gogiya on Date 10-Jan-2020.
         """
         webhook_route = request.httprequest.path.split('/')[1]  # Here we receive two type of route
         # 1) Update and create product (shopify_odoo_webhook_for_product_update)
         # 2) Delete product (shopify_odoo_webhook_for_product_delete)
-
-        res, instance = self.get_basic_info(webhook_route)
-
-        if not res:
-            return
-
-        _logger.info("%s call for product: %s", webhook_route, res.get("title"))
-
-        shopify_template = request.env["shopify.product.template.ept"].sudo().with_context(active_test=False).search(
-            [("shopify_tmpl_id", "=", res.get("id")), ("shopify_instance_id", "=", instance.id)], limit=1)
-
-        if webhook_route in ['shopify_odoo_webhook_for_product_update',
-                             'shopify_odoo_webhook_for_product_create'] and shopify_template or res.get("published_at"):
-            # when new product is created via webhook, response does not have require_shipping field
-            # to get all data about the product, external api is being called.
-            instance.connect_in_shopify()
-            shopify_product = shopify.Product().find(ids=str(res.get('id')))[0]
-            request.env["shopify.product.data.queue.ept"].sudo().create_shopify_product_queue_from_webhook(shopify_product,
-                                                                                                           instance)
-
-        if webhook_route == 'shopify_odoo_webhook_for_product_delete' and shopify_template:
-            shopify_template.write({"active": False})
+        self.enqueue_webhook(webhook_route)
         return
 
     @http.route(['/shopify_odoo_webhook_for_customer_create', '/shopify_odoo_webhook_for_customer_update'], csrf=False,
@@ -53,77 +35,86 @@ class Main(http.Controller):
     def customer_create_or_update_webhook(self):
         """
         Route for handling customer create/update webhook for Shopify. This route calls while new customer create
-        or update customer values in the Shopify store.
+        or update customer values in the Shopify store. The webhook is stored in the webhook inbox and processed by
+        the webhook inbox cron.
         @author: Dipak Gogiya on Date 10-Jan-2020.
         """
         webhook_route = request.httprequest.path.split('/')[1]  # Here we receive two type of route
         # 1) Create Customer (shopify_odoo_webhook_for_customer_create)
         # 2) Update Customer(shopify_odoo_webhook_for_customer_update)
-
-        res, instance = self.get_basic_info(webhook_route)
-        if not res:
-            return
-        if res.get("first_name") or res.get("last_name"):
-            _logger.info(f"{webhook_route} call for Customer: {res.get('first_name')} {res.get('last_name')}")
-            self.customer_webhook_process(res, instance)
+        self.enqueue_webhook(webhook_route)
         return
 
-    def customer_webhook_process(self, response, instance):
-        """
-        This method used for call child method of customer create process.
-        @author: Maulik Barad on Date 23-Sep-2020.
-        """
-        process_import_export_model = request.env["shopify.process.import.export"].sudo()
-        process_import_export_model.webhook_customer_create_process(response, instance)
-        return True
-
     @http.route("/shopify_odoo_webhook_for_orders_partially_updated", csrf=False, auth="public", type="jsonrpc")
     def order_create_or_update_webhook(self):
         """
         Route for handling the order update webhook of Shopify. This route calls while new order create
-        or update in the Shopify store.
+        or update in the Shopify store. The webhook is stored in the webhook inbox and processed by the webhook inbox
+        cron.
         @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 13-Jan-2020.
         """
-        res, instance = self.get_basic_info("shopify_odoo_webhook_for_orders_partially_updated")
-        sale_order = request.env["sale.order"]
-        if not res:
-            return
-
-        _logger.info("UPDATE ORDER WEBHOOK call for order: %s", res.get("name"))
-
-        fulfillment_status = res.get("fulfillment_status") or "unfulfilled"
-        if sale_order.sudo().search_read([("shopify_instance_id", "=", instance.id),
-                                          ("shopify_order_id", "=", res.get("id")),
-                                          ("shopify_order_number", "=",
-                                           res.get("order_number"))],
-                                         ["id"]):
-            sale_order.sudo().process_shopify_order_via_webhook(res, instance, True)
-        elif fulfillment_status in ["fulfilled", "unfulfilled", "partial"]:
-            res["fulfillment_status"] = fulfillment_status
-            sale_order.sudo().with_context({'is_new_order': True}).process_shopify_order_via_webhook(res,
-                                                                                                     instance)
+        self.enqueue_webhook("shopify_odoo_webhook_for_orders_partially_updated")
         return
 
+    def enqueue_webhook(self, route):
+        """
+        Stores the raw body of the webhook in the webhook inbox and triggers the webhook inbox cron, so Shopify gets
+        its answer without waiting for the webhook to be processed. A delivery retried by Shopify is stored once.
+        :param route: Route which received the webhook.
+        :return: True if the webhook was stored.
+        """
+        instance_id = self.get_basic_info(route)
+        if not instance_id:
+            return False
+        headers = request.httprequest.headers
+        if request.env["shopify.webhook.inbox.ept"].sudo().enqueue_webhook_ept(
+                instance_id, route, headers.get("X-Shopify-Topic"), headers.get("X-Shopify-Webhook-Id"),
+                request.httprequest.get_data(as_text=True)):
+            cron = request.env.ref("shopify_ept.process_shopify_webhook_inbox", False)
+            if cron:
+                cron.sudo()._trigger()
+        else:
+            _logger.info("Webhook %s delivery %s is already received.", route, headers.get("X-Shopify-Webhook-Id"))
+        return True
+
     def get_basic_info(self, route):
         """
-        This method is used to check that instance and webhook are active or not. If yes then return response and
-        instance, If no then return response as False and instance.
+        This method is used to check that the webhook is signed by the store and that the instance and webhook are
+        active or not. The instance data is read from the cache of the instance model.
+        :return: Id of the instance, or False when the webhook must be skipped.
         @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 10-Jan-2020..
         """
-        res = request.get_json_data()
-        host = request.httprequest.headers.get("X-Shopify-Shop-Domain")
-        instance = request.env["shopify.instance.ept"].sudo().with_context(active_test=False).search(
-            [("shopify_host", "ilike", host)], limit=1)
-
-        webhook = request.env["shopify.webhook.ept"].sudo().search([("delivery_url", "ilike", route),
-                                                                    ("instance_id", "=", instance.id)], limit=1)
+        host = (request.httprequest.headers.get("X-Shopify-Shop-Domain") or "").lower()
+        instance_data = host and request.env["shopify.instance.ept"].sudo()._get_webhook_instance_data(host)
+        if not instance_data:
+            _logger.info("The method is skipped. No instance found for the store %s.", host)
+            return False
+
+        instance_id, active, shared_secret, delivery_urls = instance_data
+        if not self.verify_webhook_hmac(shared_secret):
+            _logger.warning("The method is skipped. The webhook %s of the store %s has an invalid HMAC signature.",
+                            route, host)
+            return False
+
+        if not active or not any(route.lower() in url for url in delivery_urls):
+            _logger.info("The method is skipped. It appears the instance of the store %s is not active or that "
+                         "the webhook %s is not active.", host, route)
+            return False
+        return instance_id
+
+    def verify_webhook_hmac(self, shared_secret):
+        """
+        Verifies the X-Shopify-Hmac-Sha256 header, the base64 HMAC-SHA256 digest of the raw body signed with the
+        secret key of the instance.
+        :param shared_secret: Secret key of the instance.
+        :return: True if the signature is valid.
+        """
+        signature = request.httprequest.headers.get("X-Shopify-Hmac-Sha256")
+        if not signature or not shared_secret:
+            return False
+        digest = hmac.new(shared_secret.encode("utf-8"), request.httprequest.get_data(), hashlib.sha256).digest()
+        return hmac.compare_digest(base64.b64encode(digest), signature.encode("utf-8"))
 
-        if not instance.active or not webhook.state == "active":
-            _logger.info("The method is skipped. It appears the instance:%s is not active or that "
-                         "the webhook %s is not active.", instance.name, webhook.webhook_name)
-            res = False
-        return res, instance
-    
     @http.route('/ept_shopify/launch', type='http', auth='public', csrf=False)
     def shopify_launch_ept(self, **kwargs):
         shop = kwargs.get("shop")
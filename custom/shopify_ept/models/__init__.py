@@ -11,6 +11,8 @@ from . import product_data_queue_line
 from . import common_log_lines_ept
 from . import order_data_queue_ept
 from . import order_data_queue_line_ept
+from . import order_bulk_operation_ept
+from . import product_file_import_ept
 from . import customer_data_queue_ept
 from . import customer_data_queue_line_ept
 from . import res_partner
@@ -38,5 +40,7 @@ from . import queue_line_dashboard
 from . import digest
 from . import export_stock_queue_ept
 from . import export_stock_queue_line_ept
+from . import export_stock_state_ept
+from . import webhook_inbox_ept
 from . import onboarding_onboarding
 from . import onboarding_onboarding_step
@@ -7,8 +7,10 @@ import time
 from datetime import datetime
 
 from odoo import models, fields, api, _
+from odoo.tools.misc import split_every
 
 _logger = logging.getLogger("Shopify Customer Queue Line")
+CUSTOMER_QUEUE_BATCH_SIZE = 100
 
 
 class ShopifyCustomerDataQueueLineEpt(models.Model):
@@ -32,16 +34,27 @@ class ShopifyCustomerDataQueueLineEpt(models.Model):
 
     def shopify_create_multi_queue(self, customer_queue_id, customer_ids):
         """
-        This method used to call child method for create a customer queue line.
+        This method used to create the customer queue lines of many customers with one search of the draft and failed
+        lines of the customers and one create.
         :param customer_queue_id: Record of the customer queue.
-        :param customer_ids: 125 records of customer response.
+        :param customer_ids: 125 records of customer response, REST resources or dictionaries.
         @author: Angel Patel @Emipro Technologies Pvt. Ltd on date 23/10/2019.
         :Task ID: 157065
         """
-        if customer_queue_id:
-            for result in customer_ids:
-                result = result.to_dict()
-                self.shopify_customer_data_queue_line_create(result, customer_queue_id)
+        if not customer_queue_id:
+            return True
+        instance_id = customer_queue_id.shopify_instance_id.id
+        customers = {}
+        for result in customer_ids:
+            result = result.to_dict() if hasattr(result, "to_dict") else result
+            customers[str(result.get("id") or "")] = result
+        existing_lines = self.search([("shopify_customer_data_id", "in", list(customers)),
+                                      ("shopify_instance_id", "=", instance_id), ("state", "in", ["draft", "failed"])])
+        for existing_line in existing_lines:
+            result = customers.pop(existing_line.shopify_customer_data_id, None)
+            if result is not None:
+                existing_line.write({"shopify_synced_customer_data": json.dumps(result)})
+        self.create([self.prepare_customer_queue_line_vals(result, customer_queue_id) for result in customers.values()])
         return True
 
     def shopify_customer_data_queue_line_create(self, result, customer_queue_id):
@@ -51,24 +64,31 @@ class ShopifyCustomerDataQueueLineEpt(models.Model):
         @author: Angel Patel @Emipro Technologies Pvt. Ltd on date 13/01/2020.
         """
         synced_shopify_customers_line_obj = self.env["shopify.customer.data.queue.line.ept"]
-        name = "%s %s" % (result.get("first_name") or "", result.get("last_name") or "")
         customer_id = result.get("id")
-        data = json.dumps(result)
         instance_id = customer_queue_id.shopify_instance_id.id
         existing_customer_data = synced_shopify_customers_line_obj.search(
             [('shopify_customer_data_id', '=', customer_id), ('shopify_instance_id', '=', instance_id),
              ('state', 'in', ['draft', 'failed'])])
-        line_vals = {
+        if not existing_customer_data:
+            return synced_shopify_customers_line_obj.create(
+                self.prepare_customer_queue_line_vals(result, customer_queue_id))
+        return existing_customer_data.write({'shopify_synced_customer_data': json.dumps(result)})
+
+    def prepare_customer_queue_line_vals(self, result, customer_queue_id):
+        """
+        This method used to prepare the vals of a customer queue line.
+        :param result: Response of 1 customer.
+        :param customer_queue_id: Record of the customer queue.
+        """
+        name = "%s %s" % (result.get("first_name") or "", result.get("last_name") or "")
+        return {
             "synced_customer_queue_id": customer_queue_id.id,
-            "shopify_customer_data_id": customer_id or "",
+            "shopify_customer_data_id": result.get("id") or "",
             "name": name.strip(),
-            "shopify_synced_customer_data": data,
-            "shopify_instance_id": instance_id,
+            "shopify_synced_customer_data": json.dumps(result),
+            "shopify_instance_id": customer_queue_id.shopify_instance_id.id,
             "last_process_date": datetime.now(),
         }
-        if not existing_customer_data:
-            return synced_shopify_customers_line_obj.create(line_vals)
-        return existing_customer_data.write({'shopify_synced_customer_data': data})
 
     @api.model
     def sync_shopify_customer_into_odoo(self):
@@ -156,31 +176,27 @@ class ShopifyCustomerDataQueueLineEpt(models.Model):
         return True
 
     def customer_queue_commit_and_process(self, queue, instance):
-        """ This method is used to commit the customer queue line after 10 customer queue line process
-            and call the child method to process the customer queue line.
+        """ This method is used to process the customer queue lines in batches of CUSTOMER_QUEUE_BATCH_SIZE lines,
+            the partners and addresses of a batch are matched and created together and the batch is committed.
             :param queue: Record of customer queue.
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 17 October 2020 .
         """
-        company_id = False
-        shopify_partner_obj = self.env["shopify.res.partner.ept"]
-        commit_count = 0
-        for line in self:
-            commit_count += 1
-            if commit_count == 10:
-                queue.is_process_queue = True
-                self.env.cr.commit()
-                commit_count = 0
-
-            customer_data = json.loads(line.shopify_synced_customer_data)
-            main_partner = shopify_partner_obj.with_context(customer_data_queue=True).shopify_create_contact_partner(customer_data, instance, line)
-            if main_partner:
-                for address in customer_data.get("addresses"):
-                    if address.get("default"):
-                        continue
-                    shopify_partner_obj.shopify_create_or_update_address(instance, address, main_partner, "other")
-
-                line.update(
-                    {"state": "done", "last_process_date": datetime.now(), 'shopify_synced_customer_data': False})
-            else:
-                line.update({"state": "failed", "last_process_date": datetime.now()})
-            queue.is_process_queue = False
+        shopify_partner_obj = self.env["shopify.res.partner.ept"].with_context(customer_data_queue=True)
+        for line_ids in split_every(CUSTOMER_QUEUE_BATCH_SIZE, self.ids):
+            lines = self.browse(line_ids)
+            queue.is_process_queue = True
+            self.env.cr.commit()
+
+            customer_datas = {line: json.loads(line.shopify_synced_customer_data or "{}") for line in lines}
+            partners_by_line = shopify_partner_obj.shopify_create_contact_partners(instance, customer_datas)
+            addresses = [(address, main_partner, "other") for line, main_partner in partners_by_line.items()
+                         if main_partner for address in customer_datas[line].get("addresses") or []
+                         if not address.get("default")]
+            if addresses:
+                shopify_partner_obj.shopify_create_or_update_addresses(instance, addresses)
+
+            done_lines = lines.filtered(lambda line: partners_by_line.get(line))
+            done_lines.write({"state": "done", "last_process_date": datetime.now(),
+                              "shopify_synced_customer_data": False})
+            (lines - done_lines).write({"state": "failed", "last_process_date": datetime.now()})
+        queue.is_process_queue = False
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+
+from odoo.addons.common_connector_library.models.res_partner import PARTNER_LOOKUP_KEYS_EPT
+
+from .import_lookup import ShopifyImportLookup
+
+
+class ShopifyCustomerImportLookup(ShopifyImportLookup):
+    """
+    Batch scoped lookups used by shopify.customer.data.queue.line.ept.customer_queue_commit_and_process.
+    The partners linked to the Shopify customer ids and the partners of the emails of all customers of a batch are
+    read with one search each, and the addresses are matched against the contacts of their parent partners and the
+    partners of the same name read with one search each, instead of searching customer by customer and address by
+    address. The partners and links created during the batch are added to the maps.
+    """
+
+    @staticmethod
+    def normalize_email(email):
+        return (email or "").lower()
+
+    def prefetch(self, customer_datas):
+        """
+        Loads the partners of the Shopify customer ids and emails of the batch.
+        :param customer_datas: List of customer dictionaries of the batch.
+        """
+        customer_ids = {str(customer_data.get("id")) for customer_data in customer_datas if customer_data.get("id")}
+        emails = {customer_data.get("email") for customer_data in customer_datas if customer_data.get("email")}
+        if customer_ids:
+            for shopify_partner in self.env["shopify.res.partner.ept"].search(
+                    [("shopify_customer_id", "in", list(customer_ids)),
+                     ("shopify_instance_id", "=", self.instance.id)]):
+                if not self.find_partner(shopify_partner.shopify_customer_id):
+                    self.set("customer", shopify_partner.shopify_customer_id, shopify_partner.partner_id)
+        for email, partner in self.env["res.partner"].search_partners_by_emails_ept(emails).items():
+            self.set("email", email, partner)
+        return self
+
+    def find_partner(self, shopify_customer_id):
+        """
+        Returns the partner linked to the Shopify customer id, or an empty record set.
+        """
+        return self.get("customer", str(shopify_customer_id), "res.partner")
+
+    def find_partner_by_email(self, email):
+        """
+        Returns the partner of the email, or an empty record set.
+        """
+        return self.get("email", self.normalize_email(email), "res.partner")
+
+    def add_partner(self, shopify_customer_id, partner, email=False):
+        """
+        Registers a partner linked or created during the batch.
+        """
+        self.set("customer", str(shopify_customer_id), partner)
+        if email and not self.find_partner_by_email(email):
+            self.set("email", self.normalize_email(email), partner)
+
+    def prefetch_addresses(self, parent_partners, partner_vals_list):
+        """
+        Loads the contacts of the parent partners and the partners having the name of one of the addresses.
+        :param parent_partners: res.partner() of the addresses.
+        :param partner_vals_list: List of the partner vals of the addresses.
+        """
+        partner_obj = self.env["res.partner"]
+        if parent_partners:
+            for contact in partner_obj.search([("parent_id", "in", parent_partners.ids)]):
+                self.add("contacts", contact.parent_id.id, contact)
+        names = {partner_vals.get("name").lower() for partner_vals in partner_vals_list if partner_vals.get("name")}
+        if names:
+            partner_obj.flush_model(["name"])
+            self.env.cr.execute("SELECT id FROM res_partner WHERE lower(name) IN %s", (tuple(names),))
+            for partner in partner_obj.search([("id", "in", [row[0] for row in self.env.cr.fetchall()])]):
+                self.add("name", partner.name.lower(), partner)
+        return self
+
+    def comparable_value(self, key, value):
+        """
+        Returns a value of an address as res.partner._find_partner_ept compares it. The email and phone, the keys of
+        PARTNER_LOOKUP_KEYS_EPT, are normalized like their lookup index, the other strings are lower cased.
+        """
+        if not isinstance(value, str):
+            return value
+        partner_obj = self.env["res.partner"]
+        value = partner_obj._remove_special_chars(value)
+        if key in PARTNER_LOOKUP_KEYS_EPT:
+            normalized_value = partner_obj.normalize_lookup_value_ept(key, value)
+            if normalized_value:
+                return normalized_value
+        return value.lower()
+
+    def match_partner_vals(self, partner, partner_vals, key_list):
+        """
+        Mirrors the domain of res.partner._find_partner_ept on a record, the values are compared by comparable_value
+        and the empty values are ignored.
+        """
+        for key in key_list:
+            value = partner_vals.get(key)
+            if not value:
+                continue
+            current_value = partner[key]
+            if partner._fields[key].type == "many2one":
+                current_value = current_value.id
+            if isinstance(value, str):
+                if self.comparable_value(key, current_value or "") != self.comparable_value(key, value):
+                    return False
+            elif current_value != value:
+                return False
+        return True
+
+    def find_address(self, partner_vals, key_list, parent_partner=None, partner_type=None):
+        """
+        Returns the first contact of the parent partner, of the type when given, matching the address, or the first
+        partner matching it when no parent partner is given.
+        """
+        partner_obj = self.env["res.partner"]
+        if parent_partner is not None:
+            candidates = self.get("contacts", parent_partner.id, "res.partner")
+            if partner_type:
+                candidates = candidates.filtered(lambda contact: contact.type == partner_type)
+        else:
+            candidates = self.get("name", (partner_vals.get("name") or "").lower(), "res.partner")
+        for candidate in candidates:
+            if self.match_partner_vals(candidate, partner_vals, key_list):
+                return candidate
+        return partner_obj
+
+    def address_key(self, partner_vals, key_list):
+        """
+        Returns the key of an address, two addresses of the batch with the same key are the same partner.
+        """
+        return tuple((key, self.comparable_value(key, partner_vals[key])) for key in key_list if partner_vals.get(key))
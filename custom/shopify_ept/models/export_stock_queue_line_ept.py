@@ -6,7 +6,6 @@ from odoo import models, fields
 
 from ..shopify.pyactiveresource.connection import ClientError
 from .. import shopify
-from ..shopify_graphql.client import ShopifyGraphQLClient
 from ..shopify_graphql.queries.inventory import InventoryQueryHelper
 
 utc = pytz.utc
@@ -184,12 +183,16 @@ class ShopifyExportStockQueueLineEpt(models.Model):
                         queue_line.write({"state": "done"})
                     else:
                         queue_line.write({"state": "failed"})
+            self.env["shopify.export.stock.state.ept"].record_exported_stock(
+                self.filtered(lambda line: line.state == "done"))
             self.env.cr.commit()
         return True
 
     def _prepare_data_and_export_stock_by_graphql(self, queue_lines):
         """
         This Method prepare the data required for the stock export to shopify and export in shopify using the GraphQL API
+        The quantities are sent in batches of 250 and every user error is logged against the queue line it belongs to.
+        Lines rejected by Shopify are failed, lines of a batch which failed as a whole stay in draft to be retried.
         @params : queue_lines : all the stock queueline associated with a queue.
         @author : Gopal Chouhan on 14/05/2025
         :param queue_lines:
@@ -199,29 +202,27 @@ class ShopifyExportStockQueueLineEpt(models.Model):
         common_log_line_obj = self.env['common.log.lines.ept']
         model = "shopify.export.stock.queue.ept"
         # Prefer client-based GraphQL mutation via InventoryQueryHelper
-        client = ShopifyGraphQLClient(instance.shopify_password, instance.shopify_host)
+        client = instance.get_graphql_client()
         inventory_helper = InventoryQueryHelper(client)
         quantities_payload = inventory_helper.build_quantities_from_queue_lines(queue_lines)
-        stock_result = inventory_helper.set_inventory_quantities(quantities_payload, reason='correction', name='available', ignore_compare=True)
-        if stock_result:
-            req_error = stock_result.get('data') and stock_result.get('data').get(
-                'inventorySetQuantities') and stock_result.get('data').get('inventorySetQuantities').get('userErrors')
-            req_other_error = stock_result.get('errors')
-            if not req_error and req_other_error:
-                req_error = req_other_error
-            if not req_error:
-                queue_lines.write({"state": "done"})
-            else:
-                message = "Error while Export stock for Queue: %s for instance: " \
-                          "'%s'\nError: %s \n\n When an error is received while exporting stock using the Shopify GraphQL API, \nthe system currently links the error message to" \
-                          "the first queue line in the queue. However, \nthe actual error may be related to any queue line, not necessarily the first one. Since the Shopify API response does not specify which particular inventory" \
-                          "item or data entry caused the error, it becomes difficult to \nidentify the exact queue line responsible for the" \
-                          "issue. " % (queue_lines.export_stock_queue_id, instance.name, str(req_error))
-                common_log_line_obj.create_common_log_line_ept(shopify_instance_id=instance.id,
-                                                               module="shopify_ept",
-                                                               message=message,
-                                                               model_name=model,
-                                                               shopify_export_stock_queue_line_id=queue_lines[0].id)
+        item_errors, batch_errors = inventory_helper.set_inventory_quantities_in_batches(
+            quantities_payload, reason='correction', name='available', ignore_compare=True)
+        failed_lines = queue_lines.browse([queue_lines[index].id for index in item_errors])
+        retry_lines = queue_lines.browse([queue_lines[index].id for index in batch_errors])
+        (queue_lines - failed_lines - retry_lines).write({"state": "done"})
+        for index, error in item_errors.items():
+            queue_line = queue_lines[index]
+            message = "Error while Export stock for Queue: %s for instance: '%s'\nProduct: %s\nError: %s" % (
+                queue_line.export_stock_queue_id.name, instance.name, queue_line.shopify_product_id.name, error)
+            common_log_line_obj.create_common_log_line_ept(shopify_instance_id=instance.id,
+                                                           module="shopify_ept",
+                                                           message=message,
+                                                           model_name=model,
+                                                           shopify_export_stock_queue_line_id=queue_line.id)
+        failed_lines.write({"state": "failed"})
+        if retry_lines:
+            _logger.info("Stock export of %s lines of queue %s failed and will be retried: %s", len(retry_lines),
+                         ', '.join(retry_lines.export_stock_queue_id.mapped('name')), set(batch_errors.values()))
 
     # No session to close when using client-based GraphQL
 
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+
+import logging
+from odoo import models, fields
+
+_logger = logging.getLogger("Shopify Export Stock Queue")
+
+
+class ShopifyExportStockStateEpt(models.Model):
+    _name = "shopify.export.stock.state.ept"
+    _description = "Shopify Exported Stock"
+    _log_access = False
+
+    shopify_instance_id = fields.Many2one("shopify.instance.ept", string="Instance", required=True,
+                                          ondelete="cascade")
+    inventory_item_id = fields.Char(required=True)
+    location_id = fields.Char(required=True, help="Id of the location in Shopify.")
+    quantity = fields.Integer(help="Quantity last exported to Shopify for the inventory item and location.")
+    export_date = fields.Datetime()
+
+    _unique_inventory_item_location = models.Constraint(
+        'unique(shopify_instance_id,inventory_item_id,location_id)',
+        "Exported stock already exists for the inventory item and location!")
+
+    def filter_changed_stock(self, instance, export_stock_data):
+        """
+        Keeps the stock data whose quantity differs from the quantity last exported for the same inventory item and
+        Shopify location, with one query for the whole list.
+        :param export_stock_data: List of dictionaries with inventory_item_id, location_id and quantity.
+        :return: List of the changed stock data.
+        """
+        if not export_stock_data:
+            return export_stock_data
+        self.flush_model()
+        self.env.cr.execute("""SELECT inventory_item_id, location_id, quantity FROM shopify_export_stock_state_ept
+                               WHERE shopify_instance_id = %s AND inventory_item_id = ANY(%s)""",
+                            (instance.id, list({str(data.get('inventory_item_id')) for data in export_stock_data})))
+        exported_quantities = {(item_id, location_id): quantity for item_id, location_id, quantity in
+                               self.env.cr.fetchall()}
+        changed_stock_data = [data for data in export_stock_data if exported_quantities.get(
+            (str(data.get('inventory_item_id')), str(data.get('location_id')))) != int(data.get('quantity'))]
+        _logger.info("%s of %s stock quantities changed since the last export for instance %s.",
+                     len(changed_stock_data), len(export_stock_data), instance.name)
+        return changed_stock_data
+
+    def record_exported_stock(self, queue_lines):
+        """
+        Stores the quantities of the exported queue lines as the last exported quantities, with one upsert.
+        :param queue_lines: Records of the exported stock queue lines.
+        """
+        rows = {(line.shopify_instance_id.id, line.inventory_item_id, line.location_id): line.quantity
+                for line in queue_lines if line.shopify_instance_id and line.inventory_item_id and line.location_id}
+        if not rows:
+            return True
+        self.flush_model()
+        self.env.cr.execute("""
+            INSERT INTO shopify_export_stock_state_ept (shopify_instance_id, inventory_item_id, location_id, quantity,
+                                                       export_date)
+            SELECT instance_id, inventory_item_id, location_id, quantity, NOW() AT TIME ZONE 'UTC'
+            FROM UNNEST(%s::int[], %s::varchar[], %s::varchar[], %s::int[])
+                AS exported(instance_id, inventory_item_id, location_id, quantity)
+            ON CONFLICT (shopify_instance_id, inventory_item_id, location_id)
+            DO UPDATE SET quantity = EXCLUDED.quantity, export_date = EXCLUDED.export_date
+        """, ([key[0] for key in rows], [key[1] for key in rows], [key[2] for key in rows], list(rows.values())))
+        self.invalidate_model()
+        return True
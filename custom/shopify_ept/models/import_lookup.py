@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+
+
+class ShopifyImportLookup:
+    """
+    Base of the batch scoped lookups of the import processes, ShopifyOrderImportLookup, ShopifyProductImportLookup and
+    ShopifyCustomerImportLookup. The records needed by all responses of a batch are read with a few set based searches
+    into named maps of key and record set, and the per record logic reads these maps instead of searching one by one.
+    The keys which were prefetched are remembered by name: a prefetched key is authoritative, find returns None for
+    any other key and the caller falls back to a search.
+    A lookup is created for one batch and passed as an argument to the methods which use it.
+    """
+
+    def __init__(self, env, instance):
+        self.env = env
+        self.instance = instance
+        self._maps = {}
+        self._keys = {}
+
+    def mark_prefetched(self, key_name, keys):
+        """
+        Remembers the keys searched for the batch, found or not.
+        """
+        self._keys.setdefault(key_name, set()).update(keys)
+
+    def forget_keys(self, key_name, keys):
+        """
+        Drops prefetched keys, the next search for them goes to the database.
+        """
+        self._keys.get(key_name, set()).difference_update(keys)
+
+    def is_prefetched(self, key_name, key):
+        return key in self._keys.get(key_name, ())
+
+    def prefetched_keys(self, key_name):
+        return set(self._keys.get(key_name, ()))
+
+    def add(self, map_name, key, records):
+        """
+        Adds records to the records of a key.
+        """
+        records_by_key = self._maps.setdefault(map_name, {})
+        records_by_key[key] = records_by_key.get(key, records.browse()) | records
+
+    def set(self, map_name, key, records):
+        """
+        Replaces the records of a key.
+        """
+        self._maps.setdefault(map_name, {})[key] = records
+
+    def get(self, map_name, key, model):
+        """
+        Returns the records of a key, or an empty record set of the model.
+        """
+        return self._maps.get(map_name, {}).get(key, self.env[model])
+
+    def find(self, map_name, key, model, key_name=None):
+        """
+        Returns the records of a key, or None when the key was not prefetched under key_name, by default the map name.
+        """
+        if not self.is_prefetched(key_name or map_name, key):
+            return None
+        return self.get(map_name, key, model)
+
+    def clear(self, *names):
+        """
+        Drops the maps and prefetched keys of the given names.
+        """
+        for name in names:
+            self._maps.pop(name, None)
+            self._keys.pop(name, None)
@@ -3,16 +3,19 @@
 
 import json
 import logging
+import threading
 
 from calendar import monthrange
 from datetime import date, datetime, timedelta
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import UserError
 from .. import shopify
 from ..shopify.pyactiveresource.connection import ForbiddenAccess
 from .. import shopify_graphql
 
 _logger = logging.getLogger("Shopify Instance")
+# Shop URL and REST site last set by connect_in_shopify in the current thread.
+_connected_shop = threading.local()
 _secondsConverter = {
     'days': lambda interval: interval * 24 * 60 * 60,
     'hours': lambda interval: interval * 60 * 60,
@@ -333,6 +336,10 @@ class ShopifyInstanceEpt(models.Model):
                                              default=_default_UOM_category,
                                              )
     ship_order_webhook = fields.Boolean("Want to ship order", help="If checked, it will fulfill order in odoo")
+    order_webhook_debounce_time = fields.Integer("Order Webhook Debounce Time", default=30,
+                                                 help="Seconds an order update webhook waits before it is processed, "
+                                                      "the earlier updates of the same order received meanwhile are "
+                                                      "cancelled and only the latest one is processed.")
     forcefully_reserve_stock_webhook = fields.Boolean("ForceFully Reserve Stock",
                                                       help="If checked, It will forcefully reserve stock in the picking")
     refund_order_webhook = fields.Boolean("Want to refund order", help="If checked, it will create a refund in odoo")
@@ -917,8 +924,42 @@ class ShopifyInstanceEpt(models.Model):
             sales_team = self.create_sales_channel(val.get('name'))
 
             val.update({"shopify_default_pos_customer_id": customer.id, "shopify_section_id": sales_team.id})
+        self.env.registry.clear_cache()
         return super(ShopifyInstanceEpt, self).create(vals)
 
+    def write(self, vals):
+        """
+        Inherited for clearing the cached webhook data of the instances when their host, secret key or active state
+        changes, and the GraphQL client of the instances when their credentials change.
+        """
+        if {"shopify_host", "shopify_shared_secret", "active"} & set(vals):
+            self.env.registry.clear_cache()
+        if {"shopify_host", "shopify_password", "shopify_api_key"} & set(vals):
+            for instance in self:
+                shopify_graphql.forget_instance_client(instance.id)
+                if vals.get("shopify_host") and vals["shopify_host"] != instance.shopify_host:
+                    shopify_graphql.close_shop_session(instance.shopify_host)
+        return super(ShopifyInstanceEpt, self).write(vals)
+
+    @api.model
+    @tools.ormcache('host')
+    def _get_webhook_instance_data(self, host):
+        """
+        Returns the data needed by the webhook routes to accept a webhook of a store, cached per host so a webhook is
+        accepted without searching the instance and its webhooks. The cache is cleared when an instance or a webhook
+        is created, changed or deleted.
+        :param host: Domain of the store, sent by Shopify in the X-Shopify-Shop-Domain header.
+        :return: Tuple of the instance id, active state, secret key and the delivery URLs of the active webhooks, or
+        False when no instance has the host.
+        """
+        instance = self.sudo().with_context(active_test=False).search([("shopify_host", "ilike", host)], limit=1)
+        if not instance:
+            return False
+        delivery_urls = self.env["shopify.webhook.ept"].sudo().search(
+            [("instance_id", "=", instance.id), ("state", "=", "active")]).mapped("delivery_url")
+        return (instance.id, instance.active, instance.shopify_shared_secret,
+                tuple(url.lower() for url in delivery_urls if url))
+
     def create_sales_channel(self, name):
         """
         It creates new sales team for Shopify instance.
@@ -970,7 +1011,14 @@ class ShopifyInstanceEpt(models.Model):
 
         shop_url = self.prepare_shopify_shop_url(self.shopify_host, api_key, password)
 
-        shopify.ShopifyResource.set_site(shop_url)
+        # The REST connection of the thread is kept when it already points to the shop with the same credentials.
+        resource = shopify.ShopifyResource
+        if getattr(_connected_shop, "shop_url", None) == shop_url and \
+                getattr(_connected_shop, "site", None) == (resource.site, resource.user, resource.password):
+            return True
+        resource.set_site(shop_url)
+        _connected_shop.shop_url = shop_url
+        _connected_shop.site = (resource.site, resource.user, resource.password)
         return True
 
     def prepare_shopify_shop_url(self, host, api_key, password):
@@ -1301,23 +1349,57 @@ class ShopifyInstanceEpt(models.Model):
                                           'res_id': object.id,
                                           'noupdate': True})
         
-    def shopify_bulk_order_import(self, shop_domain, access_token, fields=None, poll_interval=10, timeout=600):
-        """
-        Run Shopify bulk order import and download the result file.
-        :param shop_domain: Shopify shop domain
-        :param access_token: Shopify access token
-        :param fields: List of order fields to fetch
-        :param poll_interval: Seconds between status checks
-        :param timeout: Max seconds to wait for completion
-        :return: Path to downloaded file or None
-        """
-        from ..shopify_graphql.client import ShopifyGraphQLClient
-        from ..shopify_graphql.queries.bulk_order_helper import ShopifyBulkOrderHelper
-        client = ShopifyGraphQLClient(access_token,shop_domain)
-        helper = ShopifyBulkOrderHelper(client)
-        file_path = helper.run_bulk_order_export(fields=fields, poll_interval=poll_interval, timeout=timeout)
-        return file_path
+    def shopify_bulk_order_import(self, from_date, to_date, order_type="unshipped"):
+        """
+        Import the orders of the range through a Shopify bulk operation. The operation is polled and its
+        result is streamed into order queues by the bulk operation cron.
+        :param from_date: From date for importing orders.
+        :param to_date: To date for importing orders.
+        :param order_type: Which type of orders to import, shipped or unshipped.
+        :return: List of order queue ids, empty as queues are created once the operation completes.
+        """
+        self.ensure_one()
+        return self.env["shopify.order.data.queue.ept"].with_context(
+            shopify_bulk_order_import=True).shopify_create_order_data_queues(self, from_date, to_date,
+                                                                             order_type=order_type)
 
     def get_graphql_client(self):
+        """
+        Returns the warm GraphQL client of the instance from the registry of the process, it is rebuilt only when the
+        credentials of the instance change.
+        """
+        self.ensure_one()
+        return shopify_graphql.get_instance_client(self.id, self.shopify_password, self.shopify_host)
+
+    @tools.ormcache('self.id')
+    def _get_shopify_locations_data(self):
+        """
+        Returns the active Shopify locations of the instance, cached per process and cleared when a location is
+        created, changed or deleted.
+        :return: Tuple of (id, shopify_location_id, warehouse_for_order id, is_primary_location, legacy) in the
+        order of the model.
+        """
+        locations = self.env["shopify.location.ept"].sudo().search_read(
+            [("instance_id", "=", self.id)], ["shopify_location_id", "warehouse_for_order", "is_primary_location",
+                                              "legacy"])
+        return tuple((location["id"], location["shopify_location_id"],
+                      location["warehouse_for_order"] and location["warehouse_for_order"][0] or False,
+                      location["is_primary_location"], location["legacy"]) for location in locations)
+
+    def get_shopify_locations_ept(self, shopify_location_id=None, warehouse_id=None, is_primary=None, legacy=None):
+        """
+        Returns the active Shopify locations of the instance having the given values, from the cached locations
+        instead of a search.
+        :param shopify_location_id: Id of the location in Shopify.
+        :param warehouse_id: Id of the warehouse in order, False for the locations without one.
+        :param is_primary: True/False for the primary location.
+        :param legacy: True/False for the fulfillment service locations.
+        :return: Records of shopify.location.ept.
+        """
         self.ensure_one()
-        return shopify_graphql.ShopifyGraphQLClient(self.shopify_password, self.shopify_host)
+        location_ids = [location[0] for location in self._get_shopify_locations_data()
+                        if (shopify_location_id is None or location[1] == str(shopify_location_id))
+                        and (warehouse_id is None or location[2] == (warehouse_id or False))
+                        and (is_primary is None or location[3] == is_primary)
+                        and (legacy is None or location[4] == legacy)]
+        return self.env["shopify.location.ept"].browse(location_ids)
@@ -31,6 +31,30 @@ class ShopifyLocationEpt(models.Model):
                                                " Shopify location is found.")
     active = fields.Boolean(default=True)
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        """
+        Inherited for clearing the cached locations of the instances.
+        """
+        self.env.registry.clear_cache()
+        return super(ShopifyLocationEpt, self).create(vals_list)
+
+    def write(self, vals):
+        """
+        Inherited for clearing the cached locations of the instances.
+        """
+        if {"shopify_location_id", "instance_id", "warehouse_for_order", "is_primary_location", "legacy",
+            "active"} & set(vals):
+            self.env.registry.clear_cache()
+        return super(ShopifyLocationEpt, self).write(vals)
+
+    def unlink(self):
+        """
+        Inherited for clearing the cached locations of the instances.
+        """
+        self.env.registry.clear_cache()
+        return super(ShopifyLocationEpt, self).unlink()
+
     @api.constrains('export_stock_warehouse_ids')
     def _check_locations_warehouse_ids(self):
         """Not allow to set warehouse in export warehouses in the Shopify location,
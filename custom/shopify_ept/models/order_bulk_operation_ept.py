@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+
+import logging
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from odoo import models, fields
+
+from ..shopify_graphql.queries.bulk_order_helper import ShopifyBulkOrderHelper
+from ..shopify_graphql.queries.order import OrderQueryHelper
+
+_logger = logging.getLogger("Shopify Order Bulk Operation")
+
+
+class ShopifyOrderBulkOperationEpt(models.Model):
+    _name = "shopify.order.bulk.operation.ept"
+    _description = "Shopify Order Bulk Operation"
+    _order = "id desc"
+
+    name = fields.Char(string="Bulk Operation", help="GID of the bulk operation in Shopify.", copy=False)
+    shopify_instance_id = fields.Many2one("shopify.instance.ept", string="Instance", ondelete="cascade")
+    queue_type = fields.Selection([("shipped", "Shipped Order Queue"), ("unshipped", "Unshipped Order Queue")],
+                                  help="Type of the order queues created from the result.")
+    created_by = fields.Selection([("import", "By Manually Import Process"),
+                                   ("scheduled_action", "By Scheduled Action")], default="import")
+    state = fields.Selection([("running", "Running"), ("importing", "Importing"), ("done", "Done"),
+                              ("failed", "Failed")], default="running", copy=False)
+    shopify_status = fields.Char(help="Status of the bulk operation in Shopify.", copy=False)
+    error_code = fields.Char(copy=False)
+    result_url = fields.Char(copy=False)
+    root_object_count = fields.Integer(string="Orders Exported", copy=False)
+    imported_order_count = fields.Integer(string="Orders Queued", copy=False,
+                                          help="Orders of the result already added to order queues, the import "
+                                               "resumes from here.")
+
+    def submit_bulk_order_import(self, instance, filters, queue_type, created_by="import"):
+        """
+        Submits a bulk order export to Shopify and activates the cron which imports its result.
+        :param instance: Record of the Shopify instance.
+        :param filters: dict with fulfillment_status, updated_at_min and updated_at_max
+        :return: Record of the bulk operation.
+        """
+        client = instance.get_graphql_client()
+        order_helper = OrderQueryHelper(client, order_visible_currency=instance.order_visible_currency)
+        bulk_operation = ShopifyBulkOrderHelper(client, order_helper).run_bulk_order_query(filters)
+        operation = self.create({"name": bulk_operation.get("id"),
+                                 "shopify_instance_id": instance.id,
+                                 "queue_type": queue_type,
+                                 "created_by": created_by,
+                                 "shopify_status": bulk_operation.get("status")})
+        _logger.info(f"Submitted bulk order operation {operation.name} for instance {instance.name}.")
+        bulk_cron = self.env.ref("shopify_ept.process_shopify_order_bulk_operation")
+        if not bulk_cron.active:
+            bulk_cron.write({'active': True, 'nextcall': datetime.now() + timedelta(seconds=60)})
+        return operation
+
+    def auto_process_order_bulk_operations(self):
+        """
+        Polls the running bulk order operations and streams the result of the completed ones into order
+        queues, until the execution time of the cron is over. It will be called from the bulk operation cron.
+        """
+        start = time.time()
+        cron_time = self.env["shopify.instance.ept"].get_shopify_cron_execution_time(
+            "shopify_ept.process_shopify_order_bulk_operation")
+        deadline = start + cron_time - 60
+        operations = self.search([("state", "in", ["running", "importing"])], order="id asc")
+        for operation in operations:
+            if not operation.shopify_instance_id.active:
+                continue
+            operation.poll_bulk_operation()
+            if operation.state == "importing":
+                operation.import_bulk_operation_result(deadline)
+            self.env.cr.commit()
+            if time.time() > deadline:
+                return True
+        return True
+
+    def poll_bulk_operation(self):
+        """
+        Reads the status of the bulk operation from Shopify.
+        """
+        self.ensure_one()
+        if self.state != "running":
+            return True
+        instance = self.shopify_instance_id
+        client = instance.get_graphql_client()
+        bulk_operation = ShopifyBulkOrderHelper(client).get_bulk_operation(self.name)
+        status = bulk_operation.get("status")
+        vals = {"shopify_status": status, "error_code": bulk_operation.get("errorCode")}
+        if status == "COMPLETED":
+            vals.update({"state": "importing" if bulk_operation.get("url") else "done",
+                         "result_url": bulk_operation.get("url"),
+                         "root_object_count": int(bulk_operation.get("rootObjectCount") or 0)})
+        elif status in ("FAILED", "CANCELED", "EXPIRED"):
+            vals.update({"state": "failed"})
+            _logger.error(f"Bulk order operation {self.name} ended with status {status}: {vals['error_code']}")
+        self.write(vals)
+        return True
+
+    def import_bulk_operation_result(self, deadline=None, batch_size=250):
+        """
+        Streams the JSONL result and creates order queue lines batch by batch. The count of queued orders is
+        committed after every batch, so the next cron run resumes where this one stopped. When the result url
+        cannot be read anymore, e.g. it expired, the operation goes back to running to fetch a new url.
+        :param deadline: time.time() after which the import stops.
+        :param batch_size: Orders completed and queued together.
+        """
+        self.ensure_one()
+        instance = self.shopify_instance_id
+        order_data_queue_line_obj = self.env["shopify.order.data.queue.line.ept"]
+        client = instance.get_graphql_client()
+        order_helper = OrderQueryHelper(client, order_visible_currency=instance.order_visible_currency)
+        bulk_helper = ShopifyBulkOrderHelper(client, order_helper)
+        raw_orders = []
+
+        def queue_orders(batch):
+            orders = bulk_helper.complete_bulk_orders(batch)
+            order_data_queue_line_obj.create_order_data_queue_line(orders, instance, self.queue_type,
+                                                                   self.created_by)
+            self.imported_order_count += len(batch)
+            self.env.cr.commit()
+
+        try:
+            for raw_order in bulk_helper.iter_bulk_orders(self.result_url, skip=self.imported_order_count):
+                raw_orders.append(raw_order)
+                if len(raw_orders) >= batch_size:
+                    queue_orders(raw_orders)
+                    raw_orders = []
+                    if deadline and time.time() > deadline:
+                        _logger.info(f"Bulk order operation {self.name} paused after {self.imported_order_count} "
+                                     f"orders, it will resume with the next cron run.")
+                        return False
+        except requests.RequestException as error:
+            # The result url is signed and expires, the operation is polled again to get a fresh one and the
+            # import resumes from imported_order_count.
+            _logger.warning(f"Reading the result of bulk order operation {self.name} failed after "
+                            f"{self.imported_order_count} orders, it will be polled again for a new url: {error}")
+            self.write({"state": "running", "result_url": False})
+            return False
+        if raw_orders:
+            queue_orders(raw_orders)
+        self.state = "done"
+        _logger.info(f"Bulk order operation {self.name} imported {self.imported_order_count} orders.")
+        order_queue_cron = self.env.ref("shopify_ept.process_shopify_order_queue")
+        if not order_queue_cron.active:
+            order_queue_cron.write({'active': True, 'nextcall': datetime.now() + timedelta(seconds=120)})
+        return True
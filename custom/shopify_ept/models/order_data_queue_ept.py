@@ -4,6 +4,7 @@
 import time
 import re
 import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timedelta
 import pytz
 from odoo import models, fields, api, _
@@ -12,10 +13,11 @@ import dateutil.tz
 from odoo.exceptions import UserError
 from ..shopify.pyactiveresource.connection import ClientError
 from .. import shopify
-from ..shopify_graphql.client import ShopifyGraphQLClient
 from ..shopify_graphql.queries.order import OrderQueryHelper
 
 utc = pytz.utc
+ORDER_SLICE_TARGET = 250  # Orders per time slice, one page of the orders query.
+ORDER_SLICE_WORKERS = 4  # Slices fetched concurrently, all workers share the cost throttle of the shop.
 
 _logger = logging.getLogger("Shopify Order Queue")
 
@@ -51,6 +53,8 @@ class ShopifyOrderDataQueueEpt(models.Model):
                                    ("scheduled_action", "By Scheduled Action")],
                                   help="Identify the process that generated a queue.", default="import")
     is_process_queue = fields.Boolean('Is Processing Queue', default=False)
+    process_claimed_at = fields.Datetime(copy=False, help="When a cron worker claimed the queue for processing. A "
+                                                          "claim older than the cron execution time is stale.")
     running_status = fields.Char(default="Running...")
     queue_process_count = fields.Integer(string="Queue Process Times",
                                          help="it is used know queue how many time processed")
@@ -192,9 +196,8 @@ class ShopifyOrderDataQueueEpt(models.Model):
             for order_status_id in instance.shopify_order_status_ids:
                 order_status = order_status_id.status
                 if instance.use_graphql_api:
-                    order_ids = self.shopify_order_request_graphql(instance, from_date, to_date, order_status)
-                    order_queues = order_data_queue_line_obj.create_order_data_queue_line(order_ids, instance,
-                                                                                          queue_type, created_by)
+                    order_queues += self.shopify_create_order_queues_graphql(instance, from_date, to_date,
+                                                                             order_status, queue_type, created_by)
                 else:
                     order_ids = self.shopify_order_request(instance, from_date, to_date, order_status)
                     if order_ids:
@@ -208,9 +211,8 @@ class ShopifyOrderDataQueueEpt(models.Model):
                 instance.last_date_order_import = to_date - timedelta(days=2)
         elif order_type == "shipped":
             if instance.use_graphql_api:
-                order_ids = self.shopify_order_request_graphql(instance, from_date, to_date, "shipped")
-                order_queues = order_data_queue_line_obj.create_order_data_queue_line(order_ids, instance,
-                                                                                      "shipped", created_by)
+                order_queues = self.shopify_create_order_queues_graphql(instance, from_date, to_date, "shipped",
+                                                                        "shipped", created_by)
             else:
                 order_queues = self.shopify_shipped_order_request(instance, from_date, to_date, created_by="import",
                                                                   order_type="shipped")
@@ -218,10 +220,9 @@ class ShopifyOrderDataQueueEpt(models.Model):
         else:
             if order_type == "buy_with_prime" and instance.import_buy_with_prime_shopify_order:
                 if instance.use_graphql_api:
-                    order_ids = self.shopify_order_request_graphql(instance, from_date, to_date, "shipped")
-                    order_ids = self.filter_buy_with_prime_order_graphql(instance, order_ids)
-                    order_queues = order_data_queue_line_obj.create_order_data_queue_line(order_ids, instance,
-                                                                                          "shipped", created_by)
+                    order_queues = self.shopify_create_order_queues_graphql(instance, from_date, to_date, "shipped",
+                                                                            "shipped", created_by,
+                                                                            buy_with_prime=True)
                 else:
                     order_queues = self.shopify_shipped_order_request(instance, from_date, to_date, created_by="import",
                                                                       order_type="buy_with_prime")
@@ -259,8 +260,7 @@ class ShopifyOrderDataQueueEpt(models.Model):
 
     def shopify_order_request_graphql(self, instance, from_date, to_date, order_type):
         """
-        Pulls orders from Shopify Store to Odoo using the GraphQL API,
-        using time slicing only if the total order count exceeds a threshold.
+        Pulls orders from Shopify Store to Odoo using the GraphQL API, see iter_shopify_orders_graphql.
 
         :param instance: Odoo/Shopify Instance.
         :param from_date: From date for importing orders (Odoo's naive datetime).
@@ -268,13 +268,55 @@ class ShopifyOrderDataQueueEpt(models.Model):
         :param order_type: Which type of orders to pull from Shopify to Odoo.
         :return: List of order dicts
         """
+        if self.env.context.get('shopify_bulk_order_import'):
+            from_date_str, to_date_str = self.convert_dates_by_timezone(instance, from_date, to_date)
+            return self.shopify_order_request_bulk(instance, from_date_str, to_date_str, order_type)
+        final_orders = []
+        for orders in self.iter_shopify_orders_graphql(instance, from_date, to_date, order_type):
+            final_orders.extend(orders)
+        return final_orders
+
+    def shopify_create_order_queues_graphql(self, instance, from_date, to_date, order_type, queue_type, created_by,
+                                            buy_with_prime=False):
+        """
+        Pulls orders using the GraphQL API and creates the order queues slice by slice, so the orders of the
+        whole range are never held in memory together.
+        :param order_type: Which type of orders to pull from Shopify to Odoo.
+        :param queue_type: Type of the order queues to create.
+        :param buy_with_prime: Keep only Buy with Prime orders.
+        :return: List of order queue ids
+        """
+        order_data_queue_line_obj = self.env["shopify.order.data.queue.line.ept"]
+        if self.env.context.get('shopify_bulk_order_import'):
+            return self.shopify_order_request_graphql(instance, from_date, to_date, order_type)
+        order_queues = []
+        for orders in self.iter_shopify_orders_graphql(instance, from_date, to_date, order_type):
+            if buy_with_prime:
+                orders = self.filter_buy_with_prime_order_graphql(instance, orders)
+            if orders:
+                order_queues += order_data_queue_line_obj.create_order_data_queue_line(orders, instance, queue_type,
+                                                                                       created_by)
+        return order_queues
+
+    def iter_shopify_orders_graphql(self, instance, from_date, to_date, order_type):
+        """
+        Pulls orders from Shopify Store using the GraphQL API and yields them slice by slice.
+        The range is split into time slices sized by the order density returned by get_order_count, and the
+        slices are fetched concurrently by a bounded thread pool. All threads share the cost throttle of the
+        shop, and only the HTTP calls run in the threads, the caller consumes each slice in this thread.
+
+        :param instance: Odoo/Shopify Instance.
+        :param from_date: From date for importing orders (Odoo's naive datetime).
+        :param to_date: To date for importing orders (Odoo's naive datetime).
+        :param order_type: Which type of orders to pull from Shopify to Odoo.
+        :return: Generator of lists of order dicts, without duplicates across slices.
+        """
         from_date_str, to_date_str = self.convert_dates_by_timezone(instance, from_date, to_date)
         start_time = time.time()
+        order_count = 0
         try:
-            client = ShopifyGraphQLClient(instance.shopify_password, instance.shopify_host)
+            client = instance.get_graphql_client()
             order_helper = OrderQueryHelper(client, order_visible_currency=instance.order_visible_currency)
-            slice_threshold_count = 1000 # Threshold to decide when to use time slicing
-            # 1. Base Filters for the entire range
             base_filters = {
                 "fulfillment_status": order_type,
                 "updated_at_min": from_date_str,
@@ -284,46 +326,108 @@ class ShopifyOrderDataQueueEpt(models.Model):
             }
             total_orders_in_range = order_helper.get_order_count(base_filters)
             _logger.info(f"Total orders found in full range: {total_orders_in_range}")
+            if total_orders_in_range == 0:
+                return
+            time_slices = self.plan_order_time_slices(order_helper, base_filters,
+                                                      dateutil.parser.parse(from_date_str),
+                                                      dateutil.parser.parse(to_date_str), total_orders_in_range)
+            _logger.info(f"Splitting full import range into {len(time_slices)} slices.")
+            fetched_order_ids = set()
+            with ThreadPoolExecutor(max_workers=min(ORDER_SLICE_WORKERS, len(time_slices))) as executor:
+                for orders in self._fetch_order_slices(executor, order_helper, base_filters, time_slices):
+                    orders = [order for order in orders if order.get('id') not in fetched_order_ids]
+                    fetched_order_ids.update(order.get('id') for order in orders)
+                    order_count += len(orders)
+                    if orders:
+                        yield orders
+        except Exception as error:
+            _logger.exception("Error during Shopify order GraphQL request.")
+            raise UserError(str(error))
+        _logger.info(f"Total unique orders returned: {order_count}. Total time for GraphQL order import with "
+                     f"slicing: {time.time() - start_time} seconds.")
 
-            all_fetched_orders = []
-            time_slices = []
-            if total_orders_in_range > slice_threshold_count:
-                _logger.info("Order count exceeds threshold. Activating Time Slicing.")
-                full_start_dt = dateutil.parser.parse(from_date_str)
-                full_end_dt = dateutil.parser.parse(to_date_str)
-                # Generate slices
-                time_slices = self.create_time_slices(full_start_dt, full_end_dt, slice_hours=3)
-                _logger.info(f"Splitting full import range into {len(time_slices)} slices.")
-                # Iterate through slices
-                for slice_start, slice_end in time_slices:
-                    slice_min_query = slice_start.strftime('%Y-%m-%dT%H:%M:%S%z')
-                    slice_max_query = slice_end.strftime('%Y-%m-%dT%H:%M:%S%z')
-                    # Build filters for the small slice
-                    slice_filters = base_filters.copy()
-                    slice_filters.update({
-                        "updated_at_min": slice_min_query,
-                        "updated_at_max": slice_max_query
-                    })
-                    _logger.info(f"Fetching slice: {slice_min_query} to {slice_max_query}")
-                    orders_in_slice = order_helper.list_orders(slice_filters)
-                    all_fetched_orders.extend(orders_in_slice)
+    def plan_order_time_slices(self, order_helper, base_filters, start_dt, end_dt, order_count):
+        """
+        Splits the range in halves until every slice holds at most ORDER_SLICE_TARGET orders, so busy hours get
+        small slices and quiet days stay in one. A range whose count is unknown is fetched as one slice.
+        :param start_dt: Timezone aware start of the range.
+        :param end_dt: Timezone aware end of the range.
+        :param order_count: Number of orders in the range, None when Shopify did not return it.
+        :return: A list of (slice_start, slice_end) tuples.
+        """
+        if order_count is None:
+            return [(start_dt, end_dt)]
+        if order_count <= ORDER_SLICE_TARGET or end_dt - start_dt <= timedelta(minutes=1):
+            return [(start_dt, end_dt)] if order_count else []
+        middle_dt = start_dt + (end_dt - start_dt) / 2
+        time_slices = []
+        for slice_start, slice_end in ((start_dt, middle_dt), (middle_dt, end_dt)):
+            slice_count = order_helper.get_order_count(self._prepare_slice_filters(base_filters, slice_start,
+                                                                                   slice_end))
+            time_slices += self.plan_order_time_slices(order_helper, base_filters, slice_start, slice_end,
+                                                       slice_count)
+        return time_slices
 
-            else:
-                _logger.info("Order count is low. Fetching all orders without slicing.")
-                all_fetched_orders = order_helper.list_orders(base_filters)
-                time_slices = ['Full Range']
-            # 5. Final Deduplication and Return
-            unique_orders_map = {}
-            for order in all_fetched_orders:
-                unique_orders_map[order.get('id')] = order
-            final_orders = list(unique_orders_map.values())
-            _logger.info(
-                f"Total unique orders returned after processing {len(time_slices)} item(s): {len(final_orders)}")
+    @staticmethod
+    def _prepare_slice_filters(base_filters, slice_start, slice_end):
+        slice_filters = base_filters.copy()
+        slice_filters.update({
+            "updated_at_min": slice_start.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            "updated_at_max": slice_end.strftime('%Y-%m-%dT%H:%M:%S%z')
+        })
+        return slice_filters
+
+    def _fetch_order_slices(self, executor, order_helper, base_filters, time_slices):
+        """
+        Submits the slices to the executor, keeping at most two slices per worker in flight, and yields the
+        orders of every slice as soon as it is fetched.
+        """
+        pending_slices = iter(time_slices)
+        pending = set()
+
+        def submit_next_slice():
+            time_slice = next(pending_slices, None)
+            if time_slice:
+                slice_filters = self._prepare_slice_filters(base_filters, *time_slice)
+                _logger.info(f"Fetching slice: {slice_filters['updated_at_min']} to {slice_filters['updated_at_max']}")
+                pending.add(executor.submit(order_helper.list_orders, slice_filters))
+
+        for _index in range(ORDER_SLICE_WORKERS * 2):
+            submit_next_slice()
+        while pending:
+            done, _not_done = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                submit_next_slice()
+                yield future.result()
+
+    def shopify_order_request_bulk(self, instance, from_date_str, to_date_str, order_type):
+        """
+        Submits a bulk operation exporting the orders of the range instead of paginating them. The result
+        is imported into order queues by the bulk operation cron, so no orders are returned here.
+        :param from_date_str: From date converted into the store timezone.
+        :param to_date_str: To date converted into the store timezone.
+        :param order_type: Which type of orders to pull from Shopify to Odoo.
+        :return: Empty list
+        """
+        filters = {
+            "fulfillment_status": order_type,
+            "updated_at_min": from_date_str,
+            "updated_at_max": to_date_str,
+        }
+        queue_type = "shipped" if order_type == "shipped" else "unshipped"
+        created_by = "import" if self.env.context.get('queue_created_by') else "scheduled_action"
+        try:
+            operation = self.env["shopify.order.bulk.operation.ept"].submit_bulk_order_import(
+                instance, filters, queue_type, created_by)
         except Exception as error:
-            _logger.exception("Error during Shopify order GraphQL request.")
+            _logger.exception("Error during Shopify bulk order operation request.")
             raise UserError(str(error))
-        _logger.info(f"Total time for GraphQL order import with slicing: {time.time() - start_time} seconds.")
-        return final_orders
+        if self.env.context.get('queue_created_by'):
+            self.env["shopify.order.data.queue.line.ept"].generate_simple_notification(
+                _("Bulk order export %s submitted to Shopify, order queues will be created once it completes.")
+                % operation.name)
+        return []
 
     @staticmethod
     def create_time_slices(from_datetime_localized: datetime, to_datetime_localized: datetime, slice_hours: int = 2):
@@ -459,7 +563,7 @@ class ShopifyOrderDataQueueEpt(models.Model):
                 # order_ids_list is a list of all order ids which response did not given by shopify.
                 order_ids_list = list(set(re.findall(re.compile(r"(\d+)"), order_ids)))
                 if instance.use_graphql_api:
-                    client = ShopifyGraphQLClient(instance.shopify_password, instance.shopify_host)
+                    client = instance.get_graphql_client()
                     order_helper = OrderQueryHelper(client, order_visible_currency=instance.order_visible_currency)
                     results = order_helper.get_order(order_ids_list)
                     order_queues = order_data_queue_line_obj.create_order_data_queue_line(results, instance, queue_type,
@@ -3,12 +3,16 @@
 import json
 import logging
 import time
+import psycopg2.errors
 from odoo import models, fields
 from .. import shopify
 from ..shopify.pyactiveresource.connection import ClientError
+from ..shopify_graphql.queries import OrderQueryHelper
+from dateutil import parser
 from dateutil.relativedelta import relativedelta
 
 _logger = logging.getLogger("Shopify Order Queue Line")
+ORDER_QUEUE_CLAIM_BATCH = 5  # Order queues claimed at once by a cron worker.
 
 
 class ShopifyOrderDataQueueLineEpt(models.Model):
@@ -45,35 +49,79 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
         :param order_queue_id: Record of order queue.
         @author: Maulik Barad on Date 10-Sep-2020.
         """
-        order_data_queue_line_obj = self.env["shopify.order.data.queue.line.ept"]
-        # get transaction data call api
-        if not instance.use_graphql_api:
-            result = self.get_shopify_order_transanctions(instance, order_dict) or []
-            order_data.update({'transaction': result})
-
-        order_data = json.dumps(order_data)
-        existing_data = order_data_queue_line_obj.search(
-            [('shopify_order_id', '=', order_dict.get('id')), ('shopify_instance_id', '=', instance.id),
-             ('state', 'in', ['draft', 'failed']), ('shopify_order_data_queue_id.is_action_require', '=', False)], limit=1)
-        existing_queue = existing_data.shopify_order_data_queue_id
-        order_queue_line_vals = {"shopify_order_id": order_dict.get("id", False),
-                                 "shopify_instance_id": instance.id,
-                                 "order_data": order_data,
-                                 "name": order_dict.get("name", ""),
-                                 "customer_name": customer_name,
-                                 "customer_email": customer_email,
-                                 "shopify_order_data_queue_id": order_queue_id.id}
-        if not existing_data:
-            self.create(order_queue_line_vals)
-        else:
-            order_queue_line_vals.update({'shopify_order_data_queue_id':existing_queue.id})
+        return self.create_order_queue_lines([(order_dict, order_data, customer_name, customer_email)], instance,
+                                             order_queue_id)
+
+    def create_order_queue_lines(self, order_batch, instance, order_queue_id):
+        """
+        Creates the order data queue lines of a batch of orders with a single create. Orders which already have a
+        draft or failed line are found with one query for the whole batch and their line is updated instead.
+        :param order_batch: List of (order_dict, order_data, customer_name, customer_email) tuples.
+        :param order_queue_id: Record of order queue for the new lines.
+        """
+        lines_vals = {}
+        for order_dict, order_data, customer_name, customer_email in order_batch:
+            # get transaction data call api
+            if not instance.use_graphql_api:
+                order_data.update({'transaction': self.get_shopify_order_transanctions(instance, order_dict) or []})
+            # Later responses of the same order replace the earlier ones, as when each line was created alone.
+            lines_vals[str(order_dict.get("id", False))] = {"shopify_order_id": order_dict.get("id", False),
+                                                            "shopify_instance_id": instance.id,
+                                                            "order_data": json.dumps(order_data),
+                                                            "name": order_dict.get("name", ""),
+                                                            "customer_name": customer_name,
+                                                            "customer_email": customer_email,
+                                                            "shopify_order_data_queue_id": order_queue_id.id}
+        if not lines_vals:
+            return True
+        existing_lines = self.search_existing_order_queue_lines(instance, list(lines_vals))
+        for shopify_order_id, existing_data in existing_lines.items():
+            order_queue_line_vals = lines_vals.pop(shopify_order_id)
+            if self.is_order_data_superseded(order_queue_line_vals["order_data"], existing_data.order_data):
+                _logger.info("Skipped the response of order %s, queue line %s has a later update of it.",
+                             order_queue_line_vals["name"], existing_data.id)
+                continue
+            order_queue_line_vals.update({'shopify_order_data_queue_id': existing_data.shopify_order_data_queue_id.id})
             if existing_data.state == 'failed':
-                order_queue_line_vals.update({'state':'draft'})
+                order_queue_line_vals.update({'state': 'draft'})
             existing_data.write(order_queue_line_vals)
-            if not existing_queue.order_data_queue_line_ids:
-                existing_queue.unlink()
+        if lines_vals:
+            self.create(list(lines_vals.values()))
         return True
 
+    def is_order_data_superseded(self, order_data, existing_order_data):
+        """
+        Compares the updated_at of two responses of an order, webhooks of Shopify may arrive out of order and an older
+        response must not replace a later one.
+        :param order_data: Dumped response received now.
+        :param existing_order_data: Dumped response of the existing queue line.
+        :return: True if the existing response is later than the received one.
+        """
+        try:
+            updated_at = parser.isoparse(json.loads(order_data).get("updated_at") or "")
+            existing_updated_at = parser.isoparse(json.loads(existing_order_data or "{}").get("updated_at") or "")
+            return existing_updated_at > updated_at
+        except (ValueError, TypeError, AttributeError):
+            return False
+
+    def search_existing_order_queue_lines(self, instance, shopify_order_ids):
+        """
+        Searches the draft or failed queue lines of the orders, which are not in a queue requiring action, with one
+        query.
+        :param shopify_order_ids: List of Shopify order ids as strings.
+        :return: Dictionary of Shopify order id and its oldest matching queue line.
+        """
+        self.flush_model(["shopify_order_id", "shopify_instance_id", "state", "shopify_order_data_queue_id"])
+        self.env["shopify.order.data.queue.ept"].flush_model(["is_action_require"])
+        self.env.cr.execute("""SELECT DISTINCT ON (line.shopify_order_id) line.shopify_order_id, line.id
+                               FROM shopify_order_data_queue_line_ept line
+                               JOIN shopify_order_data_queue_ept queue ON queue.id = line.shopify_order_data_queue_id
+                               WHERE line.shopify_instance_id = %s AND line.shopify_order_id IN %s
+                               AND line.state IN ('draft', 'failed') AND queue.is_action_require IS NOT TRUE
+                               ORDER BY line.shopify_order_id, line.id""",
+                            (instance.id, tuple(shopify_order_ids)))
+        return {shopify_order_id: self.browse(line_id) for shopify_order_id, line_id in self.env.cr.fetchall()}
+
     def get_shopify_order_transanctions(self, instance, order_dict):
         """
         This method is used to get the transaction data from shopify.
@@ -110,9 +158,9 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
         need_to_create_queue = True
         orders_data.reverse()
         order_queue_list = []
+        order_batch = []
         fulfillment_data = []
         is_new_order = bool(self.env.context.get('is_new_order'))
-        queue_type_is_buy_with_prime = False
         for order in orders_data:
             if queue_type != 'shipped' and instance.is_delivery_multi_warehouse:
                 try:
@@ -129,6 +177,8 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
                 order = order.to_dict()
 
             if need_to_create_queue:
+                self.create_order_queue_lines(order_batch, instance, order_queue)
+                order_batch = []
                 order_queue = self.shopify_create_order_queue(instance, queue_type, created_by)
                 order_queue_list.append(order_queue.id)
                 message = "Order Queue Created %s" % ', '.join(order_queue.mapped('name'))
@@ -138,27 +188,50 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
                 need_to_create_queue = False
                 _logger.info(message)
 
-            data = json.loads(json.dumps(order))
-            if instance.import_buy_with_prime_shopify_order:
-                queue_type_is_buy_with_prime = any(
-                    buy_with_prime_tag.name in data.get("tags") for buy_with_prime_tag in
-                    instance.buy_with_prime_tag_ids)
-            data.update({'fulfillment_data': fulfillment_data, "buy_with_prime": queue_type_is_buy_with_prime})
+            data = self.prepare_order_queue_line_data(instance, order)
+            data.update({'fulfillment_data': fulfillment_data})
             customer_name, customer_email = self.get_customer_name_and_email(order)
-            self.create_order_queue_line(order, instance, data, customer_name, customer_email, order_queue)
-            if created_by == "webhook" and len(order_queue.order_data_queue_line_ids) >= 50:
-                order_queue.order_data_queue_line_ids.process_import_order_queue_data(update_order=True)
+            order_batch.append((order, data, customer_name, customer_email))
+            if created_by == "webhook":
+                self.create_order_queue_lines(order_batch, instance, order_queue)
+                order_batch = []
+                if len(order_queue.order_data_queue_line_ids) >= 50:
+                    order_queue.order_data_queue_line_ids.process_import_order_queue_data(update_order=True)
 
             count += 1
             if count == 50:
                 count = 0
                 need_to_create_queue = True
-        if order_queue and not order_queue.order_data_queue_line_ids:
-            order_queue.unlink()
-            order_queue_list.remove(order_queue.id)
-
+        self.create_order_queue_lines(order_batch, instance, order_queue)
+        order_queue_list = self.unlink_empty_order_queues(order_queue_list)
         return order_queue_list
 
+    def prepare_order_queue_line_data(self, instance, order):
+        """
+        Returns the data stored in the queue line of the order. Only top level keys are added, so a shallow copy is
+        enough and the order is serialized once, when the line is created.
+        :param order: Response of the order as dictionary.
+        """
+        data = dict(order)
+        queue_type_is_buy_with_prime = False
+        if instance.import_buy_with_prime_shopify_order:
+            queue_type_is_buy_with_prime = any(
+                buy_with_prime_tag.name in data.get("tags") for buy_with_prime_tag in
+                instance.buy_with_prime_tag_ids)
+        data.update({"buy_with_prime": queue_type_is_buy_with_prime})
+        return data
+
+    def unlink_empty_order_queues(self, order_queue_list):
+        """
+        Removes the created queues which got no line, because all their orders already had a queue line.
+        :param order_queue_list: Ids of the created order queues.
+        :return: Ids of the remaining order queues.
+        """
+        order_queues = self.env["shopify.order.data.queue.ept"].browse(order_queue_list)
+        empty_queues = order_queues.filtered(lambda queue: not queue.order_data_queue_line_ids)
+        empty_queues.unlink()
+        return [queue_id for queue_id in order_queue_list if queue_id not in empty_queues.ids]
+
     def search_webhook_order_queue(self, created_by, instance, order, queue_type, need_to_create_queue):
         """ This method is used to search the webhook order queue.
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 27 October 2020 .
@@ -223,56 +296,90 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
         This method is used to find order queue which queue lines have state in draft and is_action_require is False.
         If cronjob has tried more than 3 times to process any queue then it marks that queue has need process
         to manually. It will be called from auto queue process cron.
+        Queues are claimed in batches with claim_order_queues, so several cron workers or job runners calling this
+        method process disjoint queues side by side.
         @author: Haresh Mori @Emipro Technologies Pvt.Ltd on date 07/10/2019.
         Task Id : 157350
         """
-        shopify_order_queue_obj = self.env["shopify.order.data.queue.ept"]
-        order_queue_ids = []
+        start = time.time()
+        order_queue_process_cron_time = self.env["shopify.instance.ept"].get_shopify_cron_execution_time(
+            "shopify_ept.process_shopify_order_queue")
+        processed_queue_ids = []
+        while time.time() - start < order_queue_process_cron_time - 60:
+            queues = self.claim_order_queues(order_queue_process_cron_time, processed_queue_ids)
+            if not queues:
+                break
+            processed_queue_ids += queues.ids
+            _logger.info(f'Order Process by Cron using Queues : {queues}')
+            if self.filter_order_queue_lines_and_post_message(queues, start):
+                break
+        return True
 
-        update_query = """
+    def claim_order_queues(self, claim_timeout, excluded_queue_ids=None, limit=ORDER_QUEUE_CLAIM_BATCH):
+        """
+        Claims a batch of order queues having draft lines for this worker.
+        The queue rows are selected with FOR UPDATE SKIP LOCKED, so concurrent workers never claim the same queue,
+        and the claim is committed at once so it holds while the queues are processed over several transactions.
+        Claims older than the claim timeout belong to a worker which was killed and are taken over.
+        :param claim_timeout: Seconds after which a claim is stale, the execution time of the cron.
+        :param excluded_queue_ids: Ids of the queues this worker already processed in the current run.
+        :param limit: Number of queues claimed together.
+        :return: Records of the claimed order queues, oldest first.
+        """
+        shopify_order_queue_obj = self.env["shopify.order.data.queue.ept"]
+        self.env.cr.commit()
+        claim_query = """
             UPDATE shopify_order_data_queue_ept
-            SET is_process_queue = %s
-            WHERE is_process_queue = %s
+            SET is_process_queue = TRUE, process_claimed_at = NOW() AT TIME ZONE 'UTC'
+            WHERE id IN (
+                SELECT queue.id
+                FROM shopify_order_data_queue_ept AS queue
+                INNER JOIN shopify_instance_ept AS instance ON instance.id = queue.shopify_instance_id
+                WHERE instance.active IS TRUE AND queue.is_action_require IS NOT TRUE AND NOT queue.id = ANY(%s)
+                AND (queue.is_process_queue IS NOT TRUE OR queue.process_claimed_at IS NULL
+                     OR queue.process_claimed_at < NOW() AT TIME ZONE 'UTC' - %s * INTERVAL '1 second')
+                AND EXISTS (SELECT 1 FROM shopify_order_data_queue_line_ept AS queue_line
+                            WHERE queue_line.shopify_order_data_queue_id = queue.id AND queue_line.state = 'draft')
+                ORDER BY queue.id
+                LIMIT %s
+                FOR UPDATE OF queue SKIP LOCKED
+            )
+            RETURNING id
         """
-        self.env.cr.execute(update_query, (False, True))
+        try:
+            with self.env.cr.savepoint():
+                self.env.cr.execute(claim_query, (list(excluded_queue_ids or [0]), claim_timeout, limit))
+                queue_ids = [row[0] for row in self.env.cr.fetchall()]
+        except psycopg2.errors.SerializationFailure:
+            _logger.info("Order queues were claimed by another worker at the same time, retrying later.")
+            return shopify_order_queue_obj
         self.env.cr.commit()
+        queues = shopify_order_queue_obj.browse(sorted(queue_ids))
+        queues.invalidate_recordset(["is_process_queue", "process_claimed_at"])
+        return queues
 
-        select_query = """
-            SELECT DISTINCT queue.id, queue_line.create_date
-            FROM shopify_order_data_queue_line_ept AS queue_line
-            INNER JOIN shopify_order_data_queue_ept AS queue ON queue_line.shopify_order_data_queue_id = queue.id
-            WHERE queue_line.state = %s AND queue.is_action_require = %s
-            ORDER BY queue_line.create_date ASC
-        """
-        params = ('draft', 'False')
-        self.env.cr.execute(select_query, params)
-        order_data_queue_list = self.env.cr.dictfetchall()
-        order_queue_list = [queue_data.get('id') for queue_data in order_data_queue_list]
-        if order_queue_list:
-            queues = shopify_order_queue_obj.browse(list(set(order_queue_list)))
-            _logger.info(f'Order Process by Cron using Queues : {queues}')
-            self.filter_order_queue_lines_and_post_message(queues)
-
-    def filter_order_queue_lines_and_post_message(self, queues):
+    def filter_order_queue_lines_and_post_message(self, queues, start=None):
         """
         This method is used to post a message if the queue is process more than 3 times otherwise
         it calls the child method to process the order queue line.
         :param queues: Record of the order queues.
+        :param start: time.time() when the cron started, defaults to now.
+        :return: True when the execution time of the cron is over, the claims of the unprocessed queues are released.
         @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 16 October 2020 .
         """
         common_log_line_obj = self.env["common.log.lines.ept"]
-        start = time.time()
+        start = start or time.time()
         order_queue_process_cron_time = queues.shopify_instance_id.get_shopify_cron_execution_time(
             "shopify_ept.process_shopify_order_queue")
 
-        for queue in queues:
+        for index, queue in enumerate(queues):
             _logger.info(f"Processing the Queue {queue.name} by Process Order Queue Cron")
             order_data_queue_line_ids = queue.order_data_queue_line_ids.filtered(lambda x: x.state == "draft")
 
             # For counting the queue crashes and creating schedule activity for the queue.
             queue.queue_process_count += 1
             if queue.queue_process_count > 5:
-                queue.is_action_require = True
+                queue.write({'is_action_require': True, 'is_process_queue': False})
                 note = "<p>Need to process this order queue manually.There are 5 attempts been made by " \
                        "automated action to process this queue,<br/>- Ignore, if this queue is already processed.</p>"
                 queue.message_post(body=note)
@@ -284,7 +391,10 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
             self.env.cr.commit()
             order_data_queue_line_ids.process_import_order_queue_data()
             if time.time() - start > order_queue_process_cron_time - 60:
+                queues[index + 1:].write({'is_process_queue': False})
+                self.env.cr.commit()
                 return True
+        return False
 
     def process_import_order_queue_data(self, update_order=False):
         """This method processes order queue lines.
@@ -304,18 +414,62 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
                 _logger.info("Instance %s is not active.", instance.name)
                 return True
 
-            queue_id.is_process_queue = True
+            queue_id.write({'is_process_queue': True, 'process_claimed_at': fields.Datetime.now()})
+            queue_lines = self.complete_incomplete_order_queue_lines(instance)
             # Below two line used for When the update order webhook calls.
             if update_order or queue_id.created_by == "webhook":
                 created_by = 'Webhook'
-                sale_order_obj.update_shopify_order(self, created_by, instance)
+                sale_order_obj.update_shopify_order(queue_lines, created_by, instance)
             else:
-                sale_order_obj.import_shopify_orders(self, instance)
+                sale_order_obj.import_shopify_orders(queue_lines, instance)
             queue_id.write({'is_process_queue': False})
 
             if instance.is_shopify_create_schedule:
                 queue_id.create_schedule_activity(queue_id)
 
+    def complete_incomplete_order_queue_lines(self, instance):
+        """
+        Fetches again the field groups, e.g. refunds or fulfillment orders, which Shopify did not return when the
+        orders of the queue lines were fetched through GraphQL, so an order is never imported from partial data.
+        The lines whose groups are still missing stay in draft and are retried by the next run of the queue.
+        :return: Queue lines which can be processed.
+        """
+        incomplete_groups_key = OrderQueryHelper.INCOMPLETE_GROUPS_KEY
+        lines_by_groups = {}
+        for queue_line in self.filtered(
+                lambda line: line.order_data and '"%s"' % incomplete_groups_key in line.order_data):
+            order_data = json.loads(queue_line.order_data)
+            groups = order_data.get(incomplete_groups_key)
+            if groups:
+                lines_by_groups.setdefault(tuple(groups), []).append((queue_line, order_data))
+        if not lines_by_groups:
+            return self
+
+        incomplete_lines = self.browse()
+        order_helper = OrderQueryHelper(instance.get_graphql_client(),
+                                        order_visible_currency=instance.order_visible_currency)
+        for groups, line_list in lines_by_groups.items():
+            failed_groups = {}
+            order_gids = ["gid://shopify/Order/%s" % queue_line.shopify_order_id for queue_line, _ in line_list]
+            orders_by_id = order_helper.fetch_order_groups_by_ids(order_gids, list(groups),
+                                                                  failed_groups=failed_groups)
+            for order_gid, (queue_line, order_data) in zip(order_gids, line_list):
+                if order_gid in failed_groups or order_gid not in orders_by_id:
+                    _logger.info("Order %s is kept in the queue, Shopify did not return its %s.", queue_line.name,
+                                 ", ".join(groups))
+                    incomplete_lines |= queue_line
+                    continue
+                group_data = order_helper.prepare_rest_order(order_helper.deep_merge_dicts(orders_by_id[order_gid]))
+                order_data = order_helper.deep_merge_dicts([order_data, group_data])
+                order_data.pop(incomplete_groups_key, None)
+                queue_line.write({'order_data': json.dumps(order_data)})
+        if incomplete_lines:
+            message = ("Orders %s were not imported because Shopify did not return all their data, they are kept in "
+                       "the queue and retried by its next run.") % ", ".join(incomplete_lines.mapped('name'))
+            self.env["common.log.lines.ept"].create_common_log_line_ept(
+                shopify_instance_id=instance.id, module="shopify_ept", message=message, model_name='sale.order')
+        return self - incomplete_lines
+
     def auto_reset_order_queue_data_process_count(self):
         """
         This Method reset the process count to Zero for the queues which has been failed more than
@@ -335,34 +489,19 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
         """
         This method used to create order data queue lines from Graphql API. It creates new queue after 50 order queue lines.
         """
-        count = 0
-        order_queue = False
-        need_to_create_queue = True
         order_queue_list = []
-        queue_type_is_buy_with_prime = False
-        for order in orders_data:
-            if need_to_create_queue:
-                order_queue = self.shopify_create_order_queue(instance, queue_type, created_by)
-                order_queue_list.append(order_queue.id)
-                message = "Order Queue Created %s" % ', '.join(order_queue.mapped('name'))
-                if self.env.context.get('queue_created_by'):
-                    self.generate_simple_notification(message)
-                self.env.cr.commit()
-                need_to_create_queue = False
-                _logger.info(message)
-            data = json.loads(json.dumps(order))
-            if instance.import_buy_with_prime_shopify_order:
-                queue_type_is_buy_with_prime = any(
-                    buy_with_prime_tag.name in data.get("tags") for buy_with_prime_tag in
-                    instance.buy_with_prime_tag_ids)
-            data.update({"buy_with_prime": queue_type_is_buy_with_prime})
-            customer_name, customer_email = self.get_customer_name_and_email(order)
-            self.create_order_queue_line(order, instance, data, customer_name, customer_email, order_queue)
-            count += 1
-            if count == 50:
-                count = 0
-                need_to_create_queue = True
-        if order_queue and not order_queue.order_data_queue_line_ids:
-            order_queue.unlink()
-            order_queue_list.remove(order_queue.id)
-        return order_queue_list
+        for start in range(0, len(orders_data), 50):
+            order_queue = self.shopify_create_order_queue(instance, queue_type, created_by)
+            order_queue_list.append(order_queue.id)
+            message = "Order Queue Created %s" % ', '.join(order_queue.mapped('name'))
+            if self.env.context.get('queue_created_by'):
+                self.generate_simple_notification(message)
+            self.env.cr.commit()
+            _logger.info(message)
+            order_batch = []
+            for order in orders_data[start:start + 50]:
+                customer_name, customer_email = self.get_customer_name_and_email(order)
+                order_batch.append((order, self.prepare_order_queue_line_data(instance, order), customer_name,
+                                    customer_email))
+            self.create_order_queue_lines(order_batch, instance, order_queue)
+        return self.unlink_empty_order_queues(order_queue_list)
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+
+from odoo.tools.float_utils import float_is_zero, float_round
+
+from .import_lookup import ShopifyImportLookup
+
+
+class ShopifyOrderImportLookup(ShopifyImportLookup):
+    """
+    Batch scoped lookups used by sale.order.import_shopify_orders.
+    The Shopify variants, SKU products, taxes and existing orders of all orders of a queue batch are read with a few
+    set based searches, and the per order logic reads these maps instead of searching line by line. Keys which were
+    prefetched are authoritative, any other key falls back to a search. Records created or synced during the batch
+    must be registered with the add_* methods or by invalidate_variants, so the maps never hide them.
+    """
+
+    def __init__(self, env, instance):
+        super().__init__(env, instance)
+        self.company = instance.shopify_warehouse_id.company_id
+
+    @staticmethod
+    def tax_signature(tax, tax_included, company):
+        """
+        Returns the (price_include_override, rate, name) key of the Odoo tax of a Shopify tax line, or None when the
+        tax line does not need a tax.
+        """
+        rate = float(tax.get("rate", 0.0)) * 100
+        price = float(tax.get('price', 0.0))
+        if float_is_zero(rate, precision_digits=2) or float_is_zero(price, precision_digits=2):
+            return None
+        if tax_included:
+            name = "%s_(%s %s included)_%s" % (tax.get("title"), str(rate), "%", company.name)
+            return "tax_included", rate, name
+        name = "%s_(%s %s excluded)_%s" % (tax.get("title"), str(rate), "%", company.name)
+        return "tax_excluded", rate, name
+
+    @staticmethod
+    def _tax_key(price_include_override, rate, name):
+        return price_include_override, float_round(rate, precision_digits=4), name
+
+    def prefetch(self, order_responses):
+        """
+        Loads the maps for the given order responses.
+        :param order_responses: List of order dictionaries of the batch.
+        """
+        variant_ids, skus, product_skus, tax_signatures = set(), set(), set(), set()
+        order_keys, order_names = set(), set()
+        for order_response in order_responses:
+            order_keys.add((str(order_response.get("id")), str(order_response.get("order_number"))))
+            if order_response.get("name"):
+                order_names.add(order_response.get("name"))
+            tax_included = order_response.get("taxes_included") or False
+            tax_lines = []
+            for line in order_response.get("line_items") or []:
+                if line.get("variant_id"):
+                    variant_ids.add(str(line.get("variant_id")))
+                if line.get("sku"):
+                    skus.add(line.get("sku"))
+                    if not line.get("product_id"):
+                        product_skus.add(line.get("sku"))
+                tax_lines += line.get("tax_lines") or []
+                for duties in line.get("duties") or []:
+                    tax_lines += duties.get("tax_lines") or []
+            for line in order_response.get("shipping_lines") or []:
+                tax_lines += line.get("tax_lines") or []
+            for tax in tax_lines:
+                signature = self.tax_signature(tax, tax_included, self.company)
+                if signature:
+                    tax_signatures.add(signature)
+        self._load_variants(variant_ids, skus)
+        self._load_products(product_skus)
+        self._load_taxes(tax_signatures)
+        self._load_orders(order_keys, order_names)
+        return self
+
+    def _load_variants(self, variant_ids, skus):
+        self.mark_prefetched("variant_id", variant_ids)
+        self.mark_prefetched("variant_sku", skus)
+        if not variant_ids and not skus:
+            return
+        variants = self.env["shopify.product.product.ept"].search(
+            [("shopify_instance_id", "=", self.instance.id), ('exported_in_shopify', '=', True),
+             "|", ("variant_id", "in", list(variant_ids)), ("default_code", "in", list(skus))])
+        for variant in variants:
+            if variant.variant_id in variant_ids:
+                self.add("variant_id", variant.variant_id, variant)
+            if variant.default_code in skus:
+                self.add("variant_sku", variant.default_code, variant)
+
+    def _load_products(self, skus):
+        self.mark_prefetched("product_sku", skus)
+        if not skus:
+            return
+        for product in self.env["product.product"].search([("default_code", "in", list(skus))]):
+            self.add("product_sku", product.default_code, product)
+
+    def _load_taxes(self, tax_signatures):
+        if not tax_signatures:
+            return
+        self.mark_prefetched("tax", {self._tax_key(*signature) for signature in tax_signatures})
+        taxes = self.env["account.tax"].search([("type_tax_use", "=", "sale"), ("company_id", "=", self.company.id),
+                                                ("name", "in", list({name for _, _, name in tax_signatures}))])
+        for tax in taxes:
+            self.add("tax", self._tax_key(tax.price_include_override, tax.amount, tax.name), tax)
+
+    def _load_orders(self, order_keys, order_names):
+        self.mark_prefetched("order", order_keys)
+        self.mark_prefetched("order_name", order_names)
+        if not order_keys:
+            return
+        sale_order_obj = self.env["sale.order"]
+        for order in sale_order_obj.search([("shopify_instance_id", "=", self.instance.id),
+                                            ("shopify_order_id", "in", [order_id for order_id, _ in order_keys])]):
+            self.add("order", (order.shopify_order_id, order.shopify_order_number), order)
+        if order_names:
+            for order in sale_order_obj.search([("shopify_instance_id", "=", self.instance.id),
+                                                ("client_order_ref", "in", list(order_names))]):
+                self.add("order_name", order.client_order_ref, order)
+
+    def find_variant(self, variant_id=False, sku=False):
+        """
+        Returns the exported Shopify variants of the variant id, or of the SKU when none matches the variant id.
+        None means the keys were not prefetched and the caller has to search.
+        """
+        if (variant_id and not self.is_prefetched("variant_id", str(variant_id))) or \
+                (sku and not self.is_prefetched("variant_sku", sku)):
+            return None
+        shopify_variant = self.env["shopify.product.product.ept"]
+        if variant_id:
+            shopify_variant = self.get("variant_id", str(variant_id), "shopify.product.product.ept")
+        if not shopify_variant and sku:
+            shopify_variant = self.get("variant_sku", sku, "shopify.product.product.ept")
+        return shopify_variant
+
+    def add_variant(self, shopify_variant):
+        """
+        Registers a variant whose variant id was written during the batch.
+        """
+        for variant in shopify_variant:
+            if self.is_prefetched("variant_id", variant.variant_id):
+                self.add("variant_id", variant.variant_id, variant)
+
+    def invalidate_variants(self):
+        """
+        Reloads the variants after products were synced from Shopify during the batch.
+        """
+        variant_ids, skus = self.prefetched_keys("variant_id"), self.prefetched_keys("variant_sku")
+        self.clear("variant_id", "variant_sku")
+        self._load_variants(variant_ids, skus)
+
+    def find_product_by_sku(self, sku):
+        """
+        Returns the product of the SKU, or None when the SKU was not prefetched.
+        """
+        product = self.find("product_sku", sku, "product.product")
+        return product[:1] if product is not None else None
+
+    def find_tax(self, price_include_override, rate, name):
+        """
+        Returns the sale tax of the signature, or None when the signature was not prefetched.
+        """
+        tax = self.find("tax", self._tax_key(price_include_override, rate, name), "account.tax")
+        return tax[:1] if tax is not None else None
+
+    def add_tax(self, tax):
+        key = self._tax_key(tax.price_include_override, tax.amount, tax.name)
+        self.mark_prefetched("tax", [key])
+        if not self.get("tax", key, "account.tax"):
+            self.add("tax", key, tax)
+
+    def find_order(self, shopify_order_id, order_number, order_name):
+        """
+        Returns the existing orders of the Shopify order, or None when the order was not prefetched.
+        """
+        key = (str(shopify_order_id), str(order_number))
+        if not self.is_prefetched("order", key) or not order_name or not self.is_prefetched("order_name", order_name):
+            return None
+        sale_order = self.get("order", key, "sale.order")
+        if not sale_order:
+            sale_order = self.get("order_name", order_name, "sale.order")
+        return sale_order
+
+    def add_order(self, sale_order):
+        """
+        Registers an order created during the batch, so a second response of the same order finds it.
+        """
+        key = (sale_order.shopify_order_id, sale_order.shopify_order_number)
+        self.mark_prefetched("order", [key])
+        self.add("order", key, sale_order)
+        if sale_order.client_order_ref:
+            self.mark_prefetched("order_name", [sale_order.client_order_ref])
+            self.add("order_name", sale_order.client_order_ref, sale_order)
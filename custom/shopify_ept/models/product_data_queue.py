@@ -11,7 +11,6 @@ from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 from .. import shopify
 from ..shopify.pyactiveresource.connection import ClientError
-from ..shopify_graphql.client import ShopifyGraphQLClient
 from ..shopify_graphql.queries.product import ProductQueryHelper
 from urllib.parse import urlparse, parse_qs
 
@@ -205,7 +204,7 @@ class ShopifyProductDataQueue(models.Model):
         Fetch products from Shopify using GraphQL API via ProductQueryHelper.
         Handles pagination, rate limits, and creates product queues in batches.
         """
-        client = ShopifyGraphQLClient(instance.shopify_password, instance.shopify_host)
+        client = instance.get_graphql_client()
         product_queue_list = []
         cursor = None
         retry_count = 0
@@ -7,9 +7,13 @@ import time
 
 from odoo import models, fields
 from .. import shopify
+from .product_import_lookup import ShopifyProductImportLookup
 
 _logger = logging.getLogger("Shopify Product Queue Line")
 
+IMAGE_IMPORT_BATCH_SIZE = 20
+PRODUCT_QUEUE_BATCH_SIZE = 50
+
 
 class ShopifyProductDataQueueLineEpt(models.Model):
     _name = "shopify.product.data.queue.line.ept"
@@ -112,10 +116,16 @@ class ShopifyProductDataQueueLineEpt(models.Model):
                 self.env.cr.execute(
                     """update shopify_product_data_queue_ept set is_process_queue = False where is_process_queue = True""")
                 self.env.cr.commit()
-                for product_queue_line in self:
-                    shopify_product_template_obj.shopify_sync_products(product_queue_line,
-                                                                       False,
-                                                                       shopify_instance)
+                for batch_start in range(0, len(self), PRODUCT_QUEUE_BATCH_SIZE):
+                    product_queue_lines = self[batch_start:batch_start + PRODUCT_QUEUE_BATCH_SIZE]
+                    # The Shopify and Odoo products of the whole batch are searched together before it is synced.
+                    lookup = ShopifyProductImportLookup(self.env, shopify_instance).prefetch(
+                        [json.loads(line.synced_product_data) for line in product_queue_lines if
+                         line.synced_product_data])
+                    for product_queue_line in product_queue_lines:
+                        shopify_product_template_obj.shopify_sync_products(product_queue_line, False, shopify_instance,
+                                                                           lookup=lookup)
+                    lookup.flush_prices()
                     queue_id.is_process_queue = True
                     self.env.cr.commit()
         return True
@@ -149,21 +159,28 @@ class ShopifyProductDataQueueLineEpt(models.Model):
         start_time = time.time()
         image_import_cron_time = instance_obj.get_shopify_cron_execution_time(
             "shopify_ept.shopify_ir_cron_import_image_explicitly")
-        product_queue_lines = self.query_find_queue_line_for_import_image()
-        for queue in product_queue_lines:
-            product_queue = self.browse(queue)
-            template_data = product_queue.synced_product_data
-            template_data = json.loads(template_data)
-            shopify_template = shopify_template_obj.search([('shopify_tmpl_id', '=', product_queue.product_data_id),
-                                                            ('shopify_instance_id', '=',
-                                                             product_queue.shopify_instance_id.id)], limit=1)
-            if not shopify_template:
-                continue
-            shopify_template.shopify_sync_product_images(template_data)
-            product_queue.write({'shopify_image_import_state': 'done', "synced_product_data": False})
-            self.env.cr.commit()
-            if time.time() - start_time > image_import_cron_time - 60:
-                return True
+        product_queue_line_ids = [queue[0] for queue in self.query_find_queue_line_for_import_image()]
+        for batch_start in range(0, len(product_queue_line_ids), IMAGE_IMPORT_BATCH_SIZE):
+            batch = []
+            batch_ids = product_queue_line_ids[batch_start:batch_start + IMAGE_IMPORT_BATCH_SIZE]
+            for product_queue in self.browse(batch_ids):
+                template_data = json.loads(product_queue.synced_product_data)
+                shopify_template = shopify_template_obj.search(
+                    [('shopify_tmpl_id', '=', product_queue.product_data_id),
+                     ('shopify_instance_id', '=', product_queue.shopify_instance_id.id)], limit=1)
+                if shopify_template:
+                    batch.append((product_queue, shopify_template, template_data))
+            # The missing images of all templates of the batch are downloaded concurrently before they are synced.
+            urls = []
+            for _product_queue, shopify_template, template_data in batch:
+                urls += shopify_template.prepare_shopify_image_urls_to_download(template_data)
+            downloaded_images = self.env['common.product.image.source.ept'].download_images_ept(urls)
+            for product_queue, shopify_template, template_data in batch:
+                shopify_template.shopify_sync_product_images(template_data, downloaded_images)
+                product_queue.write({'shopify_image_import_state': 'done', "synced_product_data": False})
+                self.env.cr.commit()
+                if time.time() - start_time > image_import_cron_time - 60:
+                    return True
 
         return True
 
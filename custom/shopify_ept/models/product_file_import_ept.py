@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+
+import base64
+import csv
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from io import BytesIO, TextIOWrapper
+from itertools import islice
+
+import xlrd
+
+try:
+    from openpyxl import load_workbook
+except ImportError:
+    load_workbook = None
+
+from odoo import models, fields
+from odoo.tools.misc import split_every
+
+_logger = logging.getLogger("Shopify Product File Import")
+
+FILE_IMPORT_CHUNK_SIZE = 500
+
+
+class ShopifyProductFileImportEpt(models.Model):
+    _name = "shopify.product.file.import.ept"
+    _description = "Shopify Product File Import"
+    _order = "id desc"
+
+    name = fields.Char(string="File Name", readonly=True)
+    shopify_instance_id = fields.Many2one("shopify.instance.ept", string="Instance", ondelete="cascade",
+                                          readonly=True)
+    import_file = fields.Binary(attachment=True, readonly=True)
+    state = fields.Selection([("draft", "Draft"), ("processing", "Processing"), ("done", "Done"),
+                              ("failed", "Failed")], default="draft", copy=False, readonly=True)
+    processed_row_count = fields.Integer(string="Rows Processed", copy=False, readonly=True,
+                                         help="Rows of the file already imported, the import resumes from here.")
+    error_message = fields.Text(copy=False, readonly=True)
+    last_shopify_template_id = fields.Integer(copy=False, help="Shopify template of the last imported row.")
+    last_sequence = fields.Integer(copy=False, help="Sequence of the last imported variant.")
+
+    def create_product_file_import(self, instance, file_name, import_file):
+        """
+        Records a product file to import in the Shopify layer and activates the cron which imports it chunk by
+        chunk. The header of the file is validated right away.
+        :param instance: Record of the Shopify instance.
+        :param file_name: Name of the .csv, .xls or .xlsx file.
+        :param import_file: base64 content of the file.
+        :return: Record of the product file import.
+        """
+        file_import = self.create({"name": file_name, "shopify_instance_id": instance.id,
+                                   "import_file": import_file})
+        header, _rows = file_import.read_import_file()
+        self.env["shopify.process.import.export"].validate_required_csv_header(header)
+        file_import_cron = self.env.ref("shopify_ept.process_shopify_product_file_import")
+        if not file_import_cron.active:
+            file_import_cron.write({'active': True, 'nextcall': datetime.now() + timedelta(seconds=60)})
+        return file_import
+
+    def auto_process_product_file_imports(self):
+        """
+        Imports the pending product files chunk by chunk, until the execution time of the cron is over. It will be
+        called from the product file import cron.
+        """
+        cron_time = self.env["shopify.instance.ept"].get_shopify_cron_execution_time(
+            "shopify_ept.process_shopify_product_file_import")
+        deadline = time.time() + cron_time - 60
+        for file_import in self.search([("state", "in", ["draft", "processing"])], order="id asc"):
+            if not file_import.shopify_instance_id.active:
+                continue
+            if not file_import.process_file_import(deadline):
+                return True
+        return True
+
+    def process_file_import(self, deadline=None):
+        """
+        Imports the rows of the file from the last processed row, the progress is committed after every chunk, so
+        the next cron run resumes where this one stopped. A chunk which fails rolls back and fails the import.
+        :param deadline: time.time() after which the import stops.
+        :return: False when the import stopped at the deadline.
+        """
+        self.ensure_one()
+        self.state = "processing"
+        _header, rows = self.read_import_file()
+        row_no = self.processed_row_count
+        for records in split_every(FILE_IMPORT_CHUNK_SIZE, islice(rows, row_no, None), list):
+            try:
+                self.import_file_rows(records, row_no)
+            except Exception as error:
+                self.env.cr.rollback()
+                _logger.exception("Product file %s failed at rows %s to %s.", self.name, row_no + 1,
+                                  row_no + len(records))
+                self.write({"state": "failed",
+                            "error_message": "Rows %s to %s: %s" % (row_no + 1, row_no + len(records), error)})
+                self.env.cr.commit()
+                return True
+            row_no += len(records)
+            self.processed_row_count = row_no
+            self.env.cr.commit()
+            _logger.info("Imported %s rows of the product file %s for instance %s.", row_no, self.name,
+                         self.shopify_instance_id.name)
+            if deadline and time.time() > deadline:
+                return False
+        self.state = "done"
+        self.env.cr.commit()
+        return True
+
+    def read_import_file(self):
+        """
+        Reads the header of the file and returns it with a lazy iterator of the rows as dicts.
+        .csv rows are decoded while they are read, .xlsx files are read in the read-only mode of openpyxl when it is
+        available, .xls files with xlrd.
+        :return: header of the file and iterator of the rows as dicts.
+        """
+        file_content = base64.b64decode(self.with_context(bin_size=False).import_file)
+        extension = os.path.splitext(self.name or '')[1].lower()
+        if extension == '.csv':
+            reader = csv.DictReader(TextIOWrapper(BytesIO(file_content), encoding="utf-8", newline=""),
+                                    delimiter=",")
+            return reader.fieldnames or [], reader
+        if load_workbook and extension == '.xlsx':
+            workbook = load_workbook(BytesIO(file_content), read_only=True, data_only=True)
+            rows = (tuple('' if value is None else value for value in row) for sheet in workbook.worksheets for
+                    row in sheet.iter_rows(values_only=True))
+        else:
+            sheets = xlrd.open_workbook(file_contents=file_content, on_demand=True)
+            rows = (tuple(cell.value for cell in sheet.row(row_no)) for sheet in sheets.sheets() for row_no in
+                    range(sheet.nrows))
+        headers = list(next(rows, ()))
+        header = {name: headers.index(name) for name in headers}
+
+        def iter_product_data():
+            for values in rows:
+                row = dict()
+                for k, v in header.items():
+                    cell_value = values[v] if v < len(values) else ''
+                    if isinstance(cell_value, float):
+                        if cell_value.is_integer():
+                            cell_value = int(cell_value)
+                    row.update({k: cell_value})
+                yield row
+
+        return headers, iter_product_data()
+
+    @staticmethod
+    def _get_record_id(value):
+        return int(value) if value and value not in ("False", "false", False) else False
+
+    def import_file_rows(self, records, row_no):
+        """
+        Creates or updates the Shopify templates and variants of a chunk of rows. The rows are matched in memory
+        against the existing templates and variants, read with one search, following the rules of the row by row
+        import: a row uses the template of its Odoo template having a variant of its default code, or a new
+        template. The templates and variants are then created with one create and written with one write per
+        distinct values, and their images are added in one batch.
+        :param records: Rows of the chunk.
+        :param row_no: Number of the rows of the file before the chunk.
+        """
+        instance = self.shopify_instance_id
+        common_log_line_obj = self.env["common.log.lines.ept"]
+        valid_records = []
+        for record in records:
+            row_no += 1
+            if not record["PRODUCT_TEMPLATE_ID"] or not record["PRODUCT_ID"] or not record["CATEGORY_ID"]:
+                message = ("While processing the file, PRODUCT_TEMPLATE_ID or PRODUCT_ID or CATEGORY_ID did not match any existing Odoo product at row %s.\n"
+                           "Action Items:\n"
+                           "- Check the file and verify the data at the mentioned row.\n"
+                           "- Correct the file data and re-import the product using the operation wizard.") % row_no
+                common_log_line_obj.create_common_log_line_ept(shopify_instance_id=instance.id, module="shopify_ept",
+                                                               message=message,
+                                                               model_name="shopify.product.product.ept")
+                continue
+            valid_records.append(record)
+        if not valid_records:
+            return True
+
+        import_plan = self._prepare_file_import_plan(valid_records)
+        template_ids = self._create_or_update_file_templates(import_plan)
+        shopify_variants = self._create_or_update_file_variants(import_plan, template_ids)
+
+        prepare_product_for_export_obj = self.env["shopify.prepare.product.for.export.ept"]
+        for shopify_template in self.env["shopify.product.template.ept"].browse(
+                [template_ids[ref] for ref in import_plan["used_templates"]]):
+            prepare_product_for_export_obj.create_shopify_template_images(shopify_template)
+        prepare_product_for_export_obj.create_shopify_variants_images(shopify_variants)
+
+        self.write({"last_shopify_template_id": template_ids.get(import_plan["current_template"], False),
+                    "last_sequence": import_plan["sequence"]})
+        return True
+
+    def _prepare_file_import_plan(self, records):
+        """
+        Matches the rows of a chunk against the Shopify templates of their Odoo templates and the variants of these
+        templates, read with one search. Templates created by the chunk are referenced by ("new", index).
+        :return: dict with the vals of the new templates, the vals written on the existing templates, the variants
+                 of the templates as dicts holding the record, when it exists, and the vals of the rows, the templates
+                 used by the rows, and the template and sequence of the last row.
+        """
+        instance = self.shopify_instance_id
+        set_description = self.env["ir.config_parameter"].sudo().get_param("shopify_ept.set_sales_description")
+        templates_by_product_template = {}
+        variants_by_template = {}
+        shopify_templates = self.env["shopify.product.template.ept"].search(
+            [("shopify_instance_id", "=", instance.id),
+             ("product_tmpl_id", "in", list({int(record["PRODUCT_TEMPLATE_ID"]) for record in records}))],
+            order="id")
+        for shopify_template in shopify_templates:
+            templates_by_product_template.setdefault(shopify_template.product_tmpl_id.id, []).append(
+                shopify_template.id)
+            variants_by_template[shopify_template.id] = [
+                {"record": variant, "order": variant.id, "product_id": variant.product_id.id,
+                 "default_code": variant.default_code, "sequence": variant.sequence, "vals": None}
+                for variant in shopify_template.shopify_product_ids]
+
+        import_plan = {"new_templates": [], "template_writes": {}, "variants_by_template": variants_by_template,
+                       "used_templates": [], "current_template": self.last_shopify_template_id or False,
+                       "sequence": self.last_sequence}
+        new_variant_order = 0
+        for record in records:
+            product_tmpl_id = int(record["PRODUCT_TEMPLATE_ID"])
+            default_code = record["shopify_product_default_code"]
+            if isinstance(default_code, int) and not isinstance(default_code, bool):
+                # The numeric cells of xlsx files are stored as text by the ORM.
+                default_code = str(default_code)
+            template_vals = {"product_tmpl_id": self._get_record_id(record.get("PRODUCT_TEMPLATE_ID")),
+                             "shopify_instance_id": instance.id,
+                             "shopify_product_category": self._get_record_id(record.get("CATEGORY_ID")),
+                             "name": record["template_name"]}
+            if set_description:
+                template_vals.update({"description": record["product_description"]})
+
+            template_ref = next((ref for ref in templates_by_product_template.get(product_tmpl_id, []) if any(
+                variant["default_code"] == default_code for variant in variants_by_template[ref])), False)
+            if not template_ref:
+                template_ref = ("new", len(import_plan["new_templates"]))
+                import_plan["new_templates"].append(template_vals)
+                templates_by_product_template.setdefault(product_tmpl_id, []).append(template_ref)
+                variants_by_template[template_ref] = []
+                import_plan["sequence"] = 1
+                import_plan["current_template"] = template_ref
+            elif import_plan["current_template"] != template_ref:
+                if isinstance(template_ref, tuple):
+                    import_plan["new_templates"][template_ref[1]].update(template_vals)
+                else:
+                    import_plan["template_writes"][template_ref] = template_vals
+                import_plan["current_template"] = template_ref
+            if template_ref not in import_plan["used_templates"]:
+                import_plan["used_templates"].append(template_ref)
+
+            template_variants = variants_by_template[template_ref]
+            if template_variants and min(template_variants,
+                                         key=lambda variant: (variant["sequence"], variant["order"]))["sequence"]:
+                import_plan["sequence"] += 1
+
+            product_id = int(record["PRODUCT_ID"])
+            variants = [variant for variant in template_variants if variant["product_id"] == product_id]
+            if not variants:
+                new_variant_order += 1
+                variants = [{"record": False, "order": float("inf"), "new_order": new_variant_order,
+                             "product_id": product_id}]
+                template_variants += variants
+            for variant in variants:
+                variant.update({"default_code": default_code, "sequence": import_plan["sequence"],
+                                "vals": {"shopify_instance_id": instance.id,
+                                         "product_id": product_id,
+                                         "default_code": default_code,
+                                         "name": record["product_name"],
+                                         "sequence": import_plan["sequence"]}})
+        return import_plan
+
+    def _create_or_update_file_templates(self, import_plan):
+        """
+        Creates the new templates of a chunk with one create and writes the existing ones grouped by values.
+        :return: dict of the template reference of the plan to the template id.
+        """
+        shopify_template_obj = self.env["shopify.product.template.ept"]
+        template_ids = {ref: ref for ref in import_plan["variants_by_template"] if not isinstance(ref, tuple)}
+        new_templates = shopify_template_obj.create(import_plan["new_templates"])
+        for index, shopify_template in enumerate(new_templates):
+            template_ids[("new", index)] = shopify_template.id
+        self._write_grouped_ept([(shopify_template_obj.browse(template_id), vals) for template_id, vals in
+                                 import_plan["template_writes"].items()])
+        if isinstance(import_plan["current_template"], int) and import_plan["current_template"] not in template_ids:
+            template_ids[import_plan["current_template"]] = import_plan["current_template"]
+        return template_ids
+
+    def _create_or_update_file_variants(self, import_plan, template_ids):
+        """
+        Creates the new variants of a chunk with one create and writes the changed values of the existing ones
+        grouped by values.
+        :return: shopify.product.product.ept() of the rows.
+        """
+        shopify_product_obj = self.env["shopify.product.product.ept"]
+        new_variant_vals = []
+        variant_writes = []
+        shopify_variants = shopify_product_obj
+        for template_ref, variants in import_plan["variants_by_template"].items():
+            for variant in variants:
+                if not variant["vals"]:
+                    continue
+                vals = dict(variant["vals"], shopify_template_id=template_ids[template_ref])
+                if not variant["record"]:
+                    new_variant_vals.append((variant["new_order"], vals))
+                    continue
+                shopify_variants |= variant["record"]
+                changed_vals = {}
+                for field_name, value in vals.items():
+                    current_value = variant["record"][field_name]
+                    if variant["record"]._fields[field_name].type == "many2one":
+                        current_value = current_value.id
+                    if current_value != value:
+                        changed_vals[field_name] = value
+                if changed_vals:
+                    variant_writes.append((variant["record"], changed_vals))
+        self._write_grouped_ept(variant_writes)
+        shopify_variants |= shopify_product_obj.create([vals for _order, vals in sorted(
+            new_variant_vals, key=lambda new_variant: new_variant[0])])
+        return shopify_variants
+
+    @staticmethod
+    def _write_grouped_ept(records_vals):
+        """
+        Writes the values of many records with one write per distinct values.
+        :param records_vals: list of (record, vals)
+        """
+        records_by_vals = {}
+        for record, vals in records_vals:
+            key = tuple(sorted(vals.items()))
+            records_by_vals[key] = records_by_vals.get(key, record.browse()) | record
+        for key, records in records_by_vals.items():
+            records.write(dict(key))
+        return True
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+
+from .import_lookup import ShopifyImportLookup
+
+
+class ShopifyProductImportLookup(ShopifyImportLookup):
+    """
+    Batch scoped lookups used by shopify.product.data.queue.line.ept.process_product_queue_line_data.
+    The Shopify templates and variants and the Odoo products matching the template ids, variant ids, SKUs and barcodes
+    of all queue lines of a batch are read with a few set based searches, and the per variant logic reads these maps
+    instead of searching variant by variant. Keys which were prefetched are authoritative, any other key falls back to
+    a search. Creating Odoo products makes the maps stale, so the keys of a template are forgotten as soon as products
+    are created for it and once it is synced, and a later template sharing a key searches again.
+    Prices are collected during the batch and written with one call per pricelist by flush_prices.
+    """
+
+    def __init__(self, env, instance):
+        super().__init__(env, instance)
+        self.prices = {}
+
+    @staticmethod
+    def _template_keys(template_data):
+        variant_ids, skus, barcodes = set(), set(), set()
+        for variant in template_data.get("variants") or []:
+            if variant.get("id"):
+                variant_ids.add(str(variant.get("id")))
+            if variant.get("sku"):
+                skus.add(variant.get("sku"))
+            if variant.get("barcode"):
+                barcodes.add(variant.get("barcode"))
+        return str(template_data.get("id")), variant_ids, skus, barcodes
+
+    def prefetch(self, template_datas):
+        """
+        Loads the maps for the given product responses.
+        :param template_datas: List of product dictionaries of the batch.
+        """
+        template_ids, variant_ids, skus, barcodes = set(), set(), set(), set()
+        for template_data in template_datas:
+            template_id, template_variant_ids, template_skus, template_barcodes = self._template_keys(template_data)
+            template_ids.add(template_id)
+            variant_ids |= template_variant_ids
+            skus |= template_skus
+            barcodes |= template_barcodes
+        self._load_templates(template_ids)
+        self._load_variants(variant_ids)
+        self._load_unlinked_variants(skus, barcodes)
+        self._load_products(skus, barcodes)
+        self.mark_prefetched("template", template_ids)
+        self.mark_prefetched("variant_id", variant_ids)
+        self.mark_prefetched("sku", skus)
+        self.mark_prefetched("barcode", barcodes)
+        return self
+
+    def _load_templates(self, template_ids):
+        if not template_ids:
+            return
+        for template in self.env["shopify.product.template.ept"].search(
+                [("shopify_tmpl_id", "in", list(template_ids)), ("shopify_instance_id", "=", self.instance.id)]):
+            self.add("template", template.shopify_tmpl_id, template)
+
+    def _load_variants(self, variant_ids):
+        if not variant_ids:
+            return
+        for variant in self.env["shopify.product.product.ept"].search(
+                [("variant_id", "in", list(variant_ids)), ("shopify_instance_id", "=", self.instance.id)]):
+            self.add("variant_id", variant.variant_id, variant)
+
+    def _load_unlinked_variants(self, skus, barcodes):
+        if not skus and not barcodes:
+            return
+        variants = self.env["shopify.product.product.ept"].search(
+            [("shopify_instance_id", "=", self.instance.id), "|", "|", ("default_code", "in", list(skus)),
+             ("product_id.default_code", "in", list(skus)), ("product_id.barcode", "in", list(barcodes))])
+        for variant in variants:
+            product = variant.product_id
+            if not variant.variant_id:
+                if variant.default_code in skus:
+                    self.add("unlinked_variant_sku", variant.default_code, variant)
+                if product.default_code in skus:
+                    self.add("unlinked_variant_product_sku", product.default_code, variant)
+                if product.barcode in barcodes:
+                    self.add("unlinked_variant_barcode", product.barcode, variant)
+            if product.barcode in barcodes:
+                self.add("variant_barcode", product.barcode, variant)
+                if not variant.exported_in_shopify:
+                    self.add("unexported_variant_barcode", product.barcode, variant)
+
+    def _load_products(self, skus, barcodes):
+        if not skus and not barcodes:
+            return
+        for product in self.env["product.product"].search(["|", ("default_code", "in", list(skus)),
+                                                           ("barcode", "in", list(barcodes))]):
+            if product.default_code in skus:
+                self.add("product_sku", product.default_code, product)
+            if product.barcode in barcodes:
+                self.add("product_barcode", product.barcode, product)
+
+    def forget(self, template_data):
+        """
+        Drops the keys of a template, the next search for them goes to the database.
+        """
+        template_id, variant_ids, skus, barcodes = self._template_keys(template_data)
+        self.forget_keys("template", [template_id])
+        self.forget_keys("variant_id", variant_ids)
+        self.forget_keys("sku", skus)
+        self.forget_keys("barcode", barcodes)
+
+    def find_template(self, shopify_tmpl_id):
+        """
+        Returns the Shopify templates of the template id, or None when the key was not prefetched.
+        """
+        return self.find("template", str(shopify_tmpl_id), "shopify.product.template.ept")
+
+    def search_odoo_product_variant(self, variant_id, product_sku, barcode):
+        """
+        Mirrors shopify.product.template.ept.shopify_search_odoo_product_variant on the maps.
+        :return: (shopify_product, odoo_product), or None when a key was not prefetched.
+        """
+        if not self.is_prefetched("variant_id", str(variant_id)) or \
+                (product_sku and not self.is_prefetched("sku", product_sku)) or \
+                (barcode and not self.is_prefetched("barcode", barcode)):
+            return None
+        shopify_variant_model, product_model = "shopify.product.product.ept", "product.product"
+        odoo_product = self.env[product_model]
+        shopify_product = self.get("variant_id", str(variant_id), shopify_variant_model)[:1]
+        match_by = self.instance.shopify_sync_product_with
+
+        if match_by in ("sku", "sku_or_barcode") and product_sku:
+            if not shopify_product:
+                shopify_product = self.get("unlinked_variant_sku", product_sku, shopify_variant_model)[:1]
+            if not shopify_product:
+                shopify_product = self.get("unlinked_variant_product_sku", product_sku, shopify_variant_model)[:1]
+            if not shopify_product:
+                odoo_product = self.get("product_sku", product_sku, product_model)[:1]
+
+        if match_by == "barcode" and barcode:
+            if not shopify_product:
+                shopify_product = self.get("unlinked_variant_barcode", barcode, shopify_variant_model)[:1]
+            if not shopify_product:
+                odoo_product = self.get("product_barcode", barcode, product_model)[:1]
+
+        elif match_by == "sku_or_barcode" and not odoo_product and not shopify_product and barcode:
+            shopify_product = self.get("variant_barcode", barcode, shopify_variant_model)[:1]
+            if not shopify_product:
+                odoo_product = self.get("product_barcode", barcode, product_model)[:1]
+
+        if shopify_product and not odoo_product:
+            odoo_product = shopify_product.product_id
+
+        return shopify_product, odoo_product
+
+    def find_barcode_matches(self, variant_id, barcode):
+        """
+        Returns the Odoo products of the barcode, the Shopify variants of the variant id and the not exported Shopify
+        variants of the barcode, or None when a key was not prefetched.
+        """
+        if not self.is_prefetched("variant_id", str(variant_id)) or not self.is_prefetched("barcode", barcode):
+            return None
+        return (self.get("product_barcode", barcode, "product.product"),
+                self.get("variant_id", str(variant_id), "shopify.product.product.ept"),
+                self.get("unexported_variant_barcode", barcode, "shopify.product.product.ept"))
+
+    def add_price(self, pricelist, product_id, price):
+        """
+        Registers the price of a product, it is written by flush_prices.
+        """
+        self.prices.setdefault(pricelist.id, {})[product_id] = price
+
+    def flush_prices(self):
+        """
+        Writes the collected prices with one call per pricelist.
+        """
+        pricelist_obj = self.env["product.pricelist"]
+        for pricelist_id, product_prices in self.prices.items():
+            pricelist_obj.browse(pricelist_id).set_products_price_ept(product_prices)
+        self.prices = {}
@@ -3,6 +3,8 @@
 
 import logging
 from odoo import models, fields, api
+from odoo.tools import escape_psql
+from odoo.tools.sql import create_index
 
 _logger = logging.getLogger("Shopify Partner")
 
@@ -13,6 +15,13 @@ class ResPartner(models.Model):
     is_shopify_customer = fields.Boolean(string="Is Shopify Customer?", default=False,
                                          help="Used for identified that the customer is imported from Shopify store.")
 
+    def init(self):
+        """
+        Creates the functional index of the lower cased name used by the address lookup of the customer import.
+        """
+        super(ResPartner, self).init()
+        create_index(self.env.cr, 'res_partner_name_lookup_ept_index', self._table, ['lower(name)'])
+
     @api.model
     def create_shopify_pos_customer(self, order_response, instance):
         """
@@ -101,9 +110,10 @@ class ResPartner(models.Model):
         """
 
         if email:
-            res_partner = self.search([("email", "=", email)], limit=1)
+            res_partner = self.search_partner_by_email(email)
         if not res_partner and phone:
-            res_partner = self.search([("phone", "=", phone)], limit=1)
+            res_partner = self.search_partners_by_phones_ept([phone]).get(
+                self.normalize_lookup_value_ept('phone', phone), self.browse())
         if res_partner and res_partner.parent_id:
             res_partner = res_partner.parent_id
 
@@ -121,3 +131,24 @@ class ResPartner(models.Model):
         if not exists_tag:
             exists_tag = res_partner_category_obj.sudo().create({'name': tag})
         return exists_tag.id
+
+    def create_or_search_tags(self, tags):
+        """
+        Searches the tags by their exact name, ignoring the case, with one search and creates the missing ones with
+        one create. The LIKE wildcards of the names are escaped, so a tag never matches another tag name.
+        :param tags: list of tag names
+        :return: dict {lower case tag name: tag id}
+        """
+        res_partner_category_obj = self.env['res.partner.category']
+        tags = {tag.lower(): tag for tag in tags if tag}
+        if not tags:
+            return {}
+        tag_ids = {}
+        domain = ['|'] * (len(tags) - 1) + [('name', '=ilike', escape_psql(tag)) for tag in tags.values()]
+        for exists_tag in res_partner_category_obj.search(domain):
+            if exists_tag.name.lower() in tags:
+                tag_ids.setdefault(exists_tag.name.lower(), exists_tag.id)
+        missing_tags = [tag for tag_key, tag in tags.items() if tag_key not in tag_ids]
+        for new_tag in res_partner_category_obj.sudo().create([{'name': tag} for tag in missing_tags]):
+            tag_ids[new_tag.name.lower()] = new_tag.id
+        return tag_ids
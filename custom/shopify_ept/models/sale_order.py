@@ -14,7 +14,9 @@ from odoo.exceptions import UserError
 from markupsafe import Markup
 from ..shopify.pyactiveresource.util import xml_to_dict
 from .. import shopify
+from .. import shopify_graphql
 from ..shopify.pyactiveresource.connection import ClientError
+from .order_import_lookup import ShopifyOrderImportLookup
 from odoo.tools.float_utils import float_is_zero, float_compare
 import re
 import urllib.parse
@@ -196,7 +198,7 @@ class SaleOrder(models.Model):
         This method sets shopify location and warehouse related to that location in order.
         @author: Maulik Barad on Date 11-Sep-2020.
         """
-        shopify_location = shopify_location_obj = self.env["shopify.location.ept"]
+        shopify_location = self.env["shopify.location.ept"]
         if order_response.get("location_id"):
             shopify_location_id = order_response.get("location_id")
         elif order_response.get("fulfillments"):
@@ -205,10 +207,7 @@ class SaleOrder(models.Model):
             shopify_location_id = False
 
         if shopify_location_id:
-            shopify_location = shopify_location_obj.search(
-                [("shopify_location_id", "=", shopify_location_id),
-                 ("instance_id", "=", instance.id)],
-                limit=1)
+            shopify_location = instance.get_shopify_locations_ept(shopify_location_id=shopify_location_id)[:1]
 
         if shopify_location and shopify_location.warehouse_for_order:
             warehouse_id = shopify_location.warehouse_for_order.id
@@ -221,22 +220,23 @@ class SaleOrder(models.Model):
         return {"shopify_location_id": shopify_location and shopify_location.id or False,
                 "warehouse_id": warehouse_id, "is_pos_order": pos_order}
 
-    def create_shopify_order_lines(self, lines, order_response, instance):
+    def create_shopify_order_lines(self, lines, order_response, instance, lookup=None):
         """
         This method creates sale order line and discount line for Shopify order.
+        :param lookup: ShopifyOrderImportLookup of the batch, if any.
         @author: Maulik Barad on Date 11-Sep-2020.
         """
         sale_order_line_obj = self.env["sale.order.line"]
         total_discount = order_response.get("total_discounts", 0.0)
         order_number = order_response.get("order_number")
         for line in lines:
-            is_custom_line, is_gift_card_line, product = self.search_custom_tip_gift_card_product(line, instance)
+            is_custom_line, is_gift_card_line, product = self.search_custom_tip_gift_card_product(line, instance, lookup)
             price = line.get("price")
             if instance.order_visible_currency:
                 price = self.get_price_based_on_customer_visible_currency(line.get("price_set"), order_response, price)
             order_line = self.shopify_create_sale_order_line(line, product, line.get("quantity"),
                                                              product.name, price,
-                                                             order_response)
+                                                             order_response, lookup=lookup)
             if is_gift_card_line:
                 line_vals = {'is_gift_card_line': True}
                 if line.get('name'):
@@ -247,7 +247,7 @@ class SaleOrder(models.Model):
                 order_line.write({'name': line.get('name')})
 
             if line.get('duties'):
-                self.create_shopify_duties_lines(line.get('duties'), order_response, instance)
+                self.create_shopify_duties_lines(line.get('duties'), order_response, instance, lookup=lookup)
 
             if float(total_discount) > 0.0:
                 discount_amount = self._get_shopify_discount_allocation_amount(instance, line, order_response)
@@ -258,7 +258,7 @@ class SaleOrder(models.Model):
                     self.shopify_create_sale_order_line({}, instance.discount_product_id, 1,
                                                         product.name, float(discount_amount) * -1,
                                                         order_response, previous_line=order_line,
-                                                        is_discount=True)
+                                                        is_discount=True, lookup=lookup)
                     _logger.info("Created discount line for Odoo order(%s) and Shopify order is (%s)", self.name,
                                  order_number)
         # add gift card as product in sale order line
@@ -314,9 +314,10 @@ class SaleOrder(models.Model):
             price = price_set['presentment_money']['amount']
         return float(price)
 
-    def create_shopify_duties_lines(self, duties_line, order_response, instance):
+    def create_shopify_duties_lines(self, duties_line, order_response, instance, lookup=None):
         """
         Creates duties lines for shopify orders.
+        :param lookup: ShopifyOrderImportLookup of the batch, if any.
         @author: Meera Sidapara on Date 17-June-2022.
         """
         order_number = order_response.get("order_number")
@@ -345,13 +346,14 @@ class SaleOrder(models.Model):
                              order_number)
                 self.shopify_create_sale_order_line(duties, instance.duties_product_id, 1,
                                                     product.name, float(duties_amount),
-                                                    order_response, is_duties=True)
+                                                    order_response, is_duties=True, lookup=lookup)
                 _logger.info("Created duties line for Odoo order(%s) and Shopify order is (%s)", self.name,
                              order_number)
 
-    def search_custom_tip_gift_card_product(self, line, instance):
+    def search_custom_tip_gift_card_product(self, line, instance, lookup=None):
         """
         Search the products of the custom option, Tip, and Gift card product..
+        :param lookup: ShopifyOrderImportLookup of the batch, if any.
         @author: Haresh Mori on Date 12-June-2021.
         Task: 172889 - TIP order import
         """
@@ -360,7 +362,9 @@ class SaleOrder(models.Model):
         product = False
         if not line.get('product_id'):
             if line.get('sku'):
-                product = self.env["product.product"].search([("default_code", "=", line.get('sku'))], limit=1)
+                product = lookup.find_product_by_sku(line.get('sku')) if lookup else None
+                if product is None:
+                    product = self.env["product.product"].search([("default_code", "=", line.get('sku'))], limit=1)
             if not product:
                 if line.get('requires_shipping'):
                     product = instance.custom_storable_product_id
@@ -375,14 +379,15 @@ class SaleOrder(models.Model):
             is_gift_card_line = True
         else:
             if not is_custom_line:
-                shopify_product = self.search_shopify_product_for_order_line(line, instance)
+                shopify_product = self.search_shopify_product_for_order_line(line, instance, lookup)
                 product = shopify_product.product_id
 
         return is_custom_line, is_gift_card_line, product
 
-    def create_shopify_shipping_lines(self, order_response, instance):
+    def create_shopify_shipping_lines(self, order_response, instance, lookup=None):
         """
         Creates shipping lines for shopify orders.
+        :param lookup: ShopifyOrderImportLookup of the batch, if any.
         @author: Maulik Barad on Date 11-Sep-2020.
         """
         delivery_carrier_obj = self.env["delivery.carrier"]
@@ -405,7 +410,7 @@ class SaleOrder(models.Model):
                     order_line = self.shopify_create_sale_order_line(line, shipping_product, 1,
                                                                      shipping_product.name or line.get("title"),
                                                                      shipping_price,
-                                                                     order_response, is_shipping=True)
+                                                                     order_response, is_shipping=True, lookup=lookup)
                 discount_amount = self._get_shopify_discount_allocation_amount(instance, line, order_response)
                 if discount_amount > 0.0:
                     _logger.info("Creating discount line for Odoo order(%s) and Shopify order is (%s)", self.name,
@@ -413,7 +418,7 @@ class SaleOrder(models.Model):
                     self.shopify_create_sale_order_line({}, instance.discount_product_id, 1,
                                                         shipping_product.name, float(discount_amount) * -1,
                                                         order_response, previous_line=order_line,
-                                                        is_discount=True)
+                                                        is_discount=True, lookup=lookup)
                     _logger.info("Created discount line for Odoo order(%s) and Shopify order is (%s)", self.name,
                                  order_number)
 
@@ -432,13 +437,17 @@ class SaleOrder(models.Model):
 
         instance.connect_in_shopify()
 
+        order_responses = {order_data_line.id: json.loads(order_data_line.order_data) for order_data_line in
+                           order_data_lines if order_data_line.order_data}
+        lookup = ShopifyOrderImportLookup(self.env, instance).prefetch(list(order_responses.values()))
+
         for order_data_line in order_data_lines:
             if commit_count == 5:
                 self.env.cr.commit()
                 commit_count = 0
             commit_count += 1
             order_data = order_data_line.order_data
-            order_response = json.loads(order_data)
+            order_response = order_responses.get(order_data_line.id) or json.loads(order_data)
 
             order_number = order_response.get("order_number")
             shopify_financial_status = order_response.get("financial_status")
@@ -461,7 +470,7 @@ class SaleOrder(models.Model):
                 order_data_line.write({'state': 'failed', 'processed_at': datetime.now()})
                 continue
 
-            sale_order = self.search_existing_shopify_order(order_response, instance, order_number)
+            sale_order = self.search_existing_shopify_order(order_response, instance, order_number, lookup=lookup)
 
             if sale_order:
                 order_data_line.write({"state": "done", "processed_at": datetime.now(),
@@ -477,14 +486,15 @@ class SaleOrder(models.Model):
                 continue
 
             lines = order_response.get("line_items")
-            if self.check_mismatch_details(lines, instance, order_number, order_data_line):
+            if self.check_mismatch_details(lines, instance, order_number, order_data_line, lookup=lookup):
                 _logger.info("Mismatch details found in this Shopify Order(%s) and id (%s)", order_number,
                              order_response.get("id"))
                 order_data_line.write({"state": "failed", "processed_at": datetime.now()})
                 continue
 
             sale_order = self.shopify_create_order(instance, partner, delivery_address, invoice_address,
-                                                   order_data_line, order_response, lines, order_number)
+                                                   order_data_line, order_response, lines, order_number,
+                                                   lookup=lookup)
             if not sale_order:
                 message = "Configuration missing in Odoo while importing Shopify Order(%s) and id (%s)" % (
                     order_number, order_response.get("id"))
@@ -495,6 +505,7 @@ class SaleOrder(models.Model):
                                                                order_ref=order_response.get('name'),
                                                                shopify_order_data_queue_line_id=order_data_line.id if order_data_line else False)
                 continue
+            lookup.add_order(sale_order)
             order_ids.append(sale_order.id)
 
             location_vals = self.set_shopify_location_and_warehouse(order_response, instance, pos_order, sale_order)
@@ -586,34 +597,30 @@ class SaleOrder(models.Model):
 
         return order_ids
 
-    def validate_and_paid_invoices_ept(self, work_flow_process_record):
+    def create_workflow_invoices_ept(self, work_flow_process_record):
         """
-        According to the workflow configuration, It will create invoices, validate them and register payment.
+        Creates the final invoices of the Shopify orders having invoiceable lines, one invoice per order.
         @param : work_flow_process_record: Record of auto invoice workflow.
         """
-        self.ensure_one()
-        if not self.shopify_instance_id:
-            return super(SaleOrder, self).validate_and_paid_invoices_ept(work_flow_process_record)
-        if work_flow_process_record.create_invoice:
-            if work_flow_process_record.invoice_date_is_order_date:
-                if self.check_fiscal_year_lock_date_ept():
-                    return True
-            invoiceable_lines = self._get_invoiceable_lines(False)
-            invoices = self.env['account.move']
-            if invoiceable_lines:
-                if work_flow_process_record.sale_journal_id:
-                    invoices = self.with_context(journal_ept=work_flow_process_record.sale_journal_id)._create_invoices(
-                        final=True)
-                else:
-                    invoices = self._create_invoices(final=True)
-            self.validate_invoice_ept(invoices)
-            if self.shopify_instance_id and self.env.context.get(
-                    'shopify_order_financial_status') and self.env.context.get(
-                'shopify_order_financial_status') == 'pending':
-                return False
-            if work_flow_process_record.register_payment:
-                self.paid_invoice_ept(invoices)
-        return True
+        shopify_orders = self.filtered(lambda order: order.shopify_instance_id)
+        invoices = self.env['account.move']
+        if self - shopify_orders:
+            invoices = super(SaleOrder, self - shopify_orders).create_workflow_invoices_ept(work_flow_process_record)
+        shopify_orders = shopify_orders.filtered(lambda order: order._get_invoiceable_lines(False))
+        if shopify_orders:
+            if work_flow_process_record.sale_journal_id:
+                shopify_orders = shopify_orders.with_context(journal_ept=work_flow_process_record.sale_journal_id)
+            invoices |= shopify_orders._create_invoices(grouped=True, final=True)
+        return invoices
+
+    def filter_workflow_orders_to_pay_ept(self):
+        """
+        The payment of the Shopify orders is not registered while their financial status is pending.
+        """
+        orders = super(SaleOrder, self).filter_workflow_orders_to_pay_ept()
+        if self.env.context.get('shopify_order_financial_status') == 'pending':
+            orders = orders.filtered(lambda order: not order.shopify_instance_id)
+        return orders
 
     def process_with_tracking_stock_move(self, stock_move):
         """
@@ -714,13 +721,18 @@ class SaleOrder(models.Model):
                         payment_record.write({'remaining_refund_amount': abs(total_amount)})
         return True
 
-    def search_existing_shopify_order(self, order_response, instance, order_number):
+    def search_existing_shopify_order(self, order_response, instance, order_number, lookup=None):
         """ This method is used to search the existing shopify order.
+            :param lookup: ShopifyOrderImportLookup of the batch, if any.
             @param : self
             @return: sale_order
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 27 October 2020 .
             Task_id: 167537
         """
+        sale_order = lookup.find_order(order_response.get("id"), order_number,
+                                       order_response.get("name")) if lookup else None
+        if sale_order is not None:
+            return sale_order
 
         sale_order = self.search([("shopify_order_id", "=", order_response.get("id")),
                                   ("shopify_instance_id", "=", instance.id),
@@ -731,9 +743,10 @@ class SaleOrder(models.Model):
 
         return sale_order
 
-    def check_mismatch_details(self, lines, instance, order_number, order_data_queue_line):
+    def check_mismatch_details(self, lines, instance, order_number, order_data_queue_line, lookup=None):
         """This method used to check the mismatch details in the order lines.
             @param : self, lines, instance, order_number, order_data_queue_line
+            :param lookup: ShopifyOrderImportLookup of the batch, if any.
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 11/11/2019.
             Task Id : 157350
         """
@@ -742,7 +755,7 @@ class SaleOrder(models.Model):
         mismatch = False
 
         for line in lines:
-            shopify_variant = self.search_shopify_variant(line, instance)
+            shopify_variant = self.search_shopify_variant(line, instance, lookup)
             if shopify_variant:
                 continue
             # Below lines are used for the search gift card product, Task 169381.
@@ -769,7 +782,9 @@ class SaleOrder(models.Model):
                     shopify_product_template_obj.shopify_sync_products(False, line_product_id,
                                                                        instance,
                                                                        order_data_queue_line)
-                    shopify_variant = self.search_shopify_variant(line, instance)
+                    if lookup:
+                        lookup.invalidate_variants()
+                    shopify_variant = self.search_shopify_variant(line, instance, lookup)
                     if not shopify_variant:
                         message = "Product [%s][%s] not found for Order %s" % (
                             line.get("sku"), line.get("name"), order_number)
@@ -781,9 +796,10 @@ class SaleOrder(models.Model):
                         break
         return mismatch
 
-    def search_shopify_variant(self, line, instance):
+    def search_shopify_variant(self, line, instance, lookup=None):
         """ This method is used to search the Shopify variant.
             :param line: Response of order line.
+            :param lookup: ShopifyOrderImportLookup of the batch, if any.
             @return: shopify_variant.
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 19 October 2020 .
             Task_id: 167537
@@ -791,6 +807,11 @@ class SaleOrder(models.Model):
         shopify_variant = False
         shopify_product_obj = self.env["shopify.product.product.ept"]
         sku = line.get("sku") or False
+        if lookup and (line.get("variant_id", None) or sku):
+            shopify_variant = lookup.find_variant(line.get("variant_id", None), sku)
+            if shopify_variant is not None:
+                return shopify_variant
+            shopify_variant = False
         if line.get("variant_id", None):
             shopify_variant = shopify_product_obj.search(
                 [("variant_id", "=", line.get("variant_id")),
@@ -802,9 +823,10 @@ class SaleOrder(models.Model):
         return shopify_variant
 
     def shopify_create_order(self, instance, partner, shipping_address, invoice_address,
-                             order_data_queue_line, order_response, lines, order_number):
+                             order_data_queue_line, order_response, lines, order_number, lookup=None):
         """This method used to create a sale order and it's line.
             @param : self, instance, partner, shipping_address, invoice_address,order_data_queue_line, order_response
+            :param lookup: ShopifyOrderImportLookup of the batch, if any.
             @return: order
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 12/11/2019.
             Task Id : 157350
@@ -865,15 +887,15 @@ class SaleOrder(models.Model):
         order = self.create(order_vals)
 
         _logger.info("Creating order lines for Odoo order(%s) and Shopify order is (%s).", order.name, order_number)
-        order.create_shopify_order_lines(lines, order_response, instance)
+        order.create_shopify_order_lines(lines, order_response, instance, lookup=lookup)
 
         _logger.info("Created order lines for Odoo order(%s) and Shopify order is (%s)", order.name, order_number)
 
-        order.create_shopify_shipping_lines(order_response, instance)
+        order.create_shopify_shipping_lines(order_response, instance, lookup=lookup)
         _logger.info("Created Shipping lines for order (%s).", order.name)
 
         if instance.is_delivery_fee:
-            order.create_shopify_Delivery_Fee_lines(order_response, instance)
+            order.create_shopify_Delivery_Fee_lines(order_response, instance, lookup=lookup)
             _logger.info("Created Delivery Fee for order (%s).", order.name)
 
         if instance.is_delivery_multi_warehouse:
@@ -933,9 +955,11 @@ class SaleOrder(models.Model):
 
         return is_create_order
 
-    def set_fulfilment_order_id_and_fulfillment_line_id(self, order, picking):
+    def set_fulfilment_order_id_and_fulfillment_line_id(self, order, picking, fulfillment_orders=None):
         """
         This method sets order line warehouse based on Shopify Location.
+        :param fulfillment_orders: Fulfillment orders of the order as dictionaries with their line_items, fetched
+        beforehand by update_order_status_in_shopify. They are requested from Shopify when not given.
         @author:Meera Sidapara @Emipro Technologies Pvt. Ltd on date 07 September 2022.
         Task Id : 199989 - Fulfillment location wise order
         """
@@ -947,7 +971,10 @@ class SaleOrder(models.Model):
             self.set_backorder_fulfillment_data(backorders, stock_moves)
         fulfillment_order_data = []
         fulfillment_order = False
-        if not stock_moves:
+        if not stock_moves and fulfillment_orders is not None:
+            fulfillment_order = fulfillment_orders
+            fulfillment_order_data = [data for data in fulfillment_orders if data.get('status') != 'closed']
+        elif not stock_moves:
             try:
                 fulfillment_order = shopify.fulfillment.FulfillmentOrders.find(order_id=int(shopify_order_id))
                 for order_data in fulfillment_order:
@@ -956,8 +983,9 @@ class SaleOrder(models.Model):
                         fulfillment_order_data.append(order_data)
             except Exception as Error:
                 _logger.info("Error in Request of shopify fulfillment order for the fulfilment. Error: %s", Error)
+        if not stock_moves:
             for data in fulfillment_order_data:
-                for line in data.get('line_items'):
+                for line in data.get('line_items') or []:
                     if isinstance(data.get('delivery_method'), dict) and data.get('delivery_method').get(
                             'method_type') == 'none':
                         order_line = order.order_line.filtered(
@@ -1003,7 +1031,6 @@ class SaleOrder(models.Model):
         @author:Meera Sidapara @Emipro Technologies Pvt. Ltd on date 07 September 2022.
         Task Id : 199989 - Fulfillment location wise order
         """
-        shopify_location_obj = self.env['shopify.location.ept']
         shopify_order_id = order.shopify_order_id
         fulfillment_data = order_response.get('fulfillment_data', []) or order_response.get('fulfillment_orders', [])
         if not fulfillment_data:
@@ -1023,15 +1050,16 @@ class SaleOrder(models.Model):
             if 'None' in line_item_ids:
                 line_item_ids = [str(line.get('line_item').get('id')) for line in data.get('line_items')]
             order_line = order.order_line.filtered(lambda line_item: line_item.shopify_line_id in line_item_ids)
-            line_warehouse_id = shopify_location_obj.search(
-                [('shopify_location_id', '=', shopify_location_id)]).warehouse_for_order
+            line_warehouse_id = instance.get_shopify_locations_ept(
+                shopify_location_id=shopify_location_id or False).warehouse_for_order
             order_line.write(
                 {'warehouse_id_ept': line_warehouse_id.id if line_warehouse_id else instance.shopify_warehouse_id.id})
         return True
 
-    def create_shopify_Delivery_Fee_lines(self, order_response, instance):
+    def create_shopify_Delivery_Fee_lines(self, order_response, instance, lookup=None):
         """
         Creates Delivery Fee lines for shopify orders.
+        :param lookup: ShopifyOrderImportLookup of the batch, if any.
         @author: Nilam Kubavat @Emipro Technologies Pvt. Ltd on date 09-Aug-2022
         Task Id : 197829
         """
@@ -1046,7 +1074,7 @@ class SaleOrder(models.Model):
                 order_line = self.shopify_create_sale_order_line(line, shipping_product, 1,
                                                                  line.get('title'),
                                                                  delivery_fee_price,
-                                                                 order_response)
+                                                                 order_response, lookup=lookup)
                 order_line.name = line.get('title')
 
     def prepare_shopify_order_vals(self, instance, partner, shipping_address,
@@ -1151,38 +1179,31 @@ class SaleOrder(models.Model):
             order_vals = self.prepare_order_note_with_customer_note(order_vals)
         return order_vals
 
-    def create_and_done_stock_move_ept(self, order_line, customers_location, bom_line=False, vendor_location=False):
+    def prepare_shipped_order_moves_vals_ept(self, customers_location, bom_lines_by_product):
         """
-        Based on the order line, it will create a stock move and done it.
-        @param : order_line: Single record of sale order line.
+        Sets the carrier and tracking reference of the Shopify fulfillment of the order line in its stock moves.
         @param : customers_location: Browsable record of Customer location.
-        @param : bom_line: If mrp is install and product has kit type then pass the bom lines of it.
-        @param : vendor_location: Browsable record of vendor location.
-        """
-        if not self.shopify_instance_id:
-            return super(SaleOrder, self).create_and_done_stock_move_ept(order_line, customers_location, bom_line,
-                                                                         vendor_location)
-        if bom_line:
-            product = bom_line[0].product_id
-            product_qty = bom_line[1].get('qty', 0) * order_line.product_uom_qty
-            product_uom = bom_line[0].product_uom_id
-        else:
-            product = order_line.product_id
-            product_qty = order_line.product_uom_qty
-            product_uom = order_line.product_uom_id
-
-        if product and product_qty and product_uom:
-            vals = self.prepare_val_for_stock_move_ept(product, product_qty, product_uom, vendor_location,
-                                                       customers_location, order_line, bom_line)
-            queue_id = self.env.context.get('active_ids')
-            order_response_data = {}
-            if queue_id:
-                order_data_line = self.env['shopify.order.data.queue.line.ept'].search(
-                    [('shopify_order_data_queue_id', 'in', queue_id), ('shopify_order_id', '=', self.shopify_order_id)],
-                    limit=1)
-                if order_data_line and order_data_line.order_data:
-                    order_response_data = json.loads(order_data_line.order_data)
-            fulfillments = order_response_data.get('fulfillments', [])
+        @param : bom_lines_by_product: Exploded kits of the products, by company and product.
+        """
+        vals_list = super(SaleOrder, self).prepare_shipped_order_moves_vals_ept(customers_location,
+                                                                               bom_lines_by_product)
+        if not self.shopify_instance_id or not vals_list:
+            return vals_list
+        queue_id = self.env.context.get('active_ids')
+        order_response_data = {}
+        if queue_id:
+            order_data_line = self.env['shopify.order.data.queue.line.ept'].search(
+                [('shopify_order_data_queue_id', 'in', queue_id), ('shopify_order_id', '=', self.shopify_order_id)],
+                limit=1)
+            if order_data_line and order_data_line.order_data:
+                order_response_data = json.loads(order_data_line.order_data)
+        fulfillments = order_response_data.get('fulfillments', [])
+        if not fulfillments:
+            return vals_list
+
+        carriers = {}
+        for vals in vals_list:
+            order_line = self.order_line.browse(vals.get('sale_line_id'))
             for fulfillment in fulfillments:
                 shopify_line_item_ids = [str(line.get('id')) for line in fulfillment.get('line_items', []) if
                                          line.get('id')]
@@ -1190,35 +1211,54 @@ class SaleOrder(models.Model):
                     continue
                 tracking_company = fulfillment.get('tracking_company')
                 if tracking_company:
-                    carrier = self.env['delivery.carrier'].search([('shopify_tracking_company', '=', tracking_company),
-                                                                   ('company_id', 'in',
-                                                                    [self.shopify_instance_id.shopify_company_id.id,
-                                                                     False])], limit=1)
-                    if carrier:
-                        vals.update({'carrier_id': carrier.id})
+                    if tracking_company not in carriers:
+                        carriers[tracking_company] = self.env['delivery.carrier'].search(
+                            [('shopify_tracking_company', '=', tracking_company),
+                             ('company_id', 'in', [self.shopify_instance_id.shopify_company_id.id, False])], limit=1)
+                    if carriers[tracking_company]:
+                        vals.update({'carrier_id': carriers[tracking_company].id})
                 if fulfillment.get('tracking_number'):
                     vals.update({'tracking_reference': fulfillment.get('tracking_number')})
                 break
-            stock_move = self.env['stock.move'].create(vals)
-            stock_move.reference = _('Auto processed move : %s') % product.display_name
-            stock_move._action_assign()
-            stock_move._set_quantity_done(product_qty)
-            if stock_move.state != "assigned" and self.is_buy_with_prime_order and not self.shopify_instance_id.Force_transfer_move_of_buy_with_prime_orders:
-                return True
-            if product.tracking == 'none':
-                stock_move.sudo().picked = True
-                stock_move.with_context(is_connector=True)._action_done()
-            else:
-                res = self.process_with_tracking_stock_move(stock_move)
-                if res:
-                    order_data_line = self.env.context.get('order_data_line')
-                    message = 'Stock move is not done of order %s Due to %s' % (self.name, res)
-                    self.env["common.log.lines.ept"].create_common_log_line_ept(
-                        shopify_instance_id=self.shopify_instance_id.id, module="shopify_ept",
-                        message=message,
-                        model_name='sale.order', order_ref=self.shopify_order_id,
-                        shopify_order_data_queue_line_id=order_data_line.id if order_data_line else False)
-                    order_data_line.write({'state': 'failed', 'processed_at': datetime.now()})
+        return vals_list
+
+    def done_shipped_order_moves_ept(self, stock_moves):
+        """
+        Done the stock moves of the shipped Shopify orders together. The moves of a Buy with Prime order are left
+        open when they are not reserved, unless the instance forces them, and the moves of tracked products are done
+        one by one with a lot.
+        @param : stock_moves: Stock moves of the shipped orders.
+        """
+        shopify_moves = stock_moves.filtered(lambda move: move.sale_line_id.order_id.shopify_instance_id)
+        if stock_moves - shopify_moves:
+            super(SaleOrder, self).done_shipped_order_moves_ept(stock_moves - shopify_moves)
+        if not shopify_moves:
+            return True
+        shopify_moves._action_assign()
+        for stock_move in shopify_moves:
+            stock_move._set_quantity_done(stock_move.product_uom_qty)
+
+        moves_to_done = self.env['stock.move']
+        for stock_move in shopify_moves:
+            order = stock_move.sale_line_id.order_id
+            if stock_move.state != "assigned" and order.is_buy_with_prime_order and not order.shopify_instance_id.Force_transfer_move_of_buy_with_prime_orders:
+                continue
+            if stock_move.product_id.tracking == 'none':
+                moves_to_done |= stock_move
+                continue
+            res = order.process_with_tracking_stock_move(stock_move)
+            if res:
+                order_data_line = self.env.context.get('order_data_line')
+                message = 'Stock move is not done of order %s Due to %s' % (order.name, res)
+                self.env["common.log.lines.ept"].create_common_log_line_ept(
+                    shopify_instance_id=order.shopify_instance_id.id, module="shopify_ept",
+                    message=message,
+                    model_name='sale.order', order_ref=order.shopify_order_id,
+                    shopify_order_data_queue_line_id=order_data_line.id if order_data_line else False)
+                order_data_line.write({'state': 'failed', 'processed_at': datetime.now()})
+        if moves_to_done:
+            moves_to_done.sudo().picked = True
+            moves_to_done.with_context(is_connector=True)._action_done()
         return True
 
     def set_utm_source_medium_campaign(self, order_response):
@@ -1302,31 +1342,41 @@ class SaleOrder(models.Model):
         pricelist = instance.shopify_pricelist_id if instance.shopify_pricelist_id else False
         return pricelist
 
-    def search_shopify_product_for_order_line(self, line, instance):
+    def search_shopify_product_for_order_line(self, line, instance, lookup=None):
         """This method used to search shopify product for order line.
             @param : self, line, instance
+            :param lookup: ShopifyOrderImportLookup of the batch, if any.
             @return: shopify_product
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 14/11/2019.
             Task Id : 157350
         """
         shopify_product_obj = self.env["shopify.product.product.ept"]
         variant_id = line.get("variant_id")
-        shopify_product = shopify_product_obj.search(
-            [("shopify_instance_id", "=", instance.id), ("variant_id", "=", variant_id),
-             ('exported_in_shopify', '=', True)], limit=1)
+        shopify_product = lookup.find_variant(variant_id=variant_id) if lookup and variant_id else None
+        if shopify_product is None:
+            shopify_product = shopify_product_obj.search(
+                [("shopify_instance_id", "=", instance.id), ("variant_id", "=", variant_id),
+                 ('exported_in_shopify', '=', True)], limit=1)
+        shopify_product = shopify_product[:1]
         if not shopify_product:
-            shopify_product = shopify_product_obj.search([("shopify_instance_id", "=", instance.id),
-                                                          ("default_code", "=", line.get("sku")),
-                                                          ('exported_in_shopify', '=', True)], limit=1)
+            shopify_product = lookup.find_variant(sku=line.get("sku")) if lookup and line.get("sku") else None
+            if shopify_product is None:
+                shopify_product = shopify_product_obj.search([("shopify_instance_id", "=", instance.id),
+                                                              ("default_code", "=", line.get("sku")),
+                                                              ('exported_in_shopify', '=', True)], limit=1)
+            shopify_product = shopify_product[:1]
             shopify_product.write({"variant_id": variant_id})
+            if lookup:
+                lookup.add_variant(shopify_product)
         return shopify_product
 
     def shopify_create_sale_order_line(self, line, product, quantity, product_name, price,
                                        order_response, is_shipping=False, previous_line=False,
-                                       is_discount=False, is_duties=False):
+                                       is_discount=False, is_duties=False, lookup=None):
         """
         This method used to create a sale order line.
         @param : self, line, product, quantity,product_name, order_id,price, is_shipping=False
+        :param lookup: ShopifyOrderImportLookup of the batch, if any.
         @return: order_line_id
         @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 14/11/2019.
         Task Id : 157350
@@ -1338,7 +1388,7 @@ class SaleOrder(models.Model):
         # order_line_vals = sale_order_line_obj.create_sale_order_line_ept(line_vals)
         order_line_vals = self.shopify_set_tax_in_sale_order_line(instance, line, order_response, is_shipping,
                                                                   is_discount, previous_line, line_vals,
-                                                                  is_duties)
+                                                                  is_duties, lookup=lookup)
         if is_discount:
             order_line_vals["name"] = "Discount for " + str(product_name)
             if previous_line:
@@ -1384,7 +1434,7 @@ class SaleOrder(models.Model):
         return line_vals
 
     def shopify_set_tax_in_sale_order_line(self, instance, line, order_response, is_shipping, is_discount,
-                                           previous_line, order_line_vals, is_duties):
+                                           previous_line, order_line_vals, is_duties, lookup=None):
         """ This method is used to set tax in the sale order line base on tax configuration in the
             Shopify setting in Odoo.
             :param line: Response of sale order line.
@@ -1394,6 +1444,7 @@ class SaleOrder(models.Model):
             :param is_duties: It used to identify that it a duties line.
             :param previous_line: Record of the previously created sale order line.
             :param order_line_vals: Prepared sale order line vals as the previous method.
+            :param lookup: ShopifyOrderImportLookup of the batch, if any.
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 20 October 2020 .
             Task_id: 167537
         """
@@ -1406,19 +1457,19 @@ class SaleOrder(models.Model):
                     # taxable
                     tax_ids = self.shopify_get_tax_id_ept(instance,
                                                           line.get("tax_lines"),
-                                                          taxes_included)
+                                                          taxes_included, lookup)
                 if is_shipping:
                     # In the Shopify store there is configuration regarding tax is applicable on shipping or not,
                     # if applicable then this use.
                     tax_ids = self.shopify_get_tax_id_ept(instance,
                                                           line.get("tax_lines"),
-                                                          taxes_included)
+                                                          taxes_included, lookup)
                 if is_duties:
                     # In the Shopify store there is configuration regarding tax is applicable on line duties or not,
                     # if applicable then this use.
                     tax_ids = self.shopify_get_tax_id_ept(instance,
                                                           line.get("tax_lines"),
-                                                          taxes_included)
+                                                          taxes_included, lookup)
             elif not line and previous_line:
                 # Before modification, connector set order taxes on discount line but as per connector design,
                 # we are creating discount line base on sale order line so it should apply sale order line taxes
@@ -1434,7 +1485,7 @@ class SaleOrder(models.Model):
         return order_line_vals
 
     @api.model
-    def shopify_get_tax_id_ept(self, instance, tax_lines, tax_included):
+    def shopify_get_tax_id_ept(self, instance, tax_lines, tax_included, lookup=None):
         """This method used to search tax in Odoo, If tax is not found in Odoo then it call child method to create a
             new tax in Odoo base on received tax response in order response.
             @return: tax_id
@@ -1445,23 +1496,20 @@ class SaleOrder(models.Model):
         taxes = []
         company = instance.shopify_warehouse_id.company_id
         for tax in tax_lines:
-            rate = float(tax.get("rate", 0.0))
-            price = float(tax.get('price', 0.0))
-            title = tax.get("title")
-            rate = rate * 100
-            if not float_is_zero(rate, precision_digits=2) and not float_is_zero(price, precision_digits=2):
-                if tax_included:
-                    name = "%s_(%s %s included)_%s" % (title, str(rate), "%", company.name)
-                    price_include_override = "tax_included"
-                else:
-                    name = "%s_(%s %s excluded)_%s" % (title, str(rate), "%", company.name)
-                    price_include_override = "tax_excluded"
-                tax_id = self.env["account.tax"].search([("price_include_override", "=", price_include_override),
-                                                         ("type_tax_use", "=", "sale"), ("amount", "=", rate),
-                                                         ("name", "=", name), ("company_id", "=", company.id)], limit=1)
+            signature = ShopifyOrderImportLookup.tax_signature(tax, tax_included, company)
+            if signature:
+                price_include_override, rate, name = signature
+                tax_id = lookup.find_tax(price_include_override, rate, name) if lookup else None
+                if tax_id is None:
+                    tax_id = self.env["account.tax"].search([("price_include_override", "=", price_include_override),
+                                                             ("type_tax_use", "=", "sale"), ("amount", "=", rate),
+                                                             ("name", "=", name), ("company_id", "=", company.id)],
+                                                            limit=1)
                 if not tax_id:
                     tax_id = self.sudo().shopify_create_account_tax(instance, rate, price_include_override, company,
                                                                     name)
+                    if lookup and tax_id:
+                        lookup.add_tax(tax_id.sudo(False))
                 if tax_id:
                     taxes.append(tax_id.id)
         if taxes:
@@ -1696,23 +1744,75 @@ class SaleOrder(models.Model):
         Task Id : 157905
         Migration done by Haresh Mori on October 2021
         """
-        common_log_line_obj = self.env["common.log.lines.ept"]
         log_lines = []
-        notify_customer = instance.notify_customer
         _logger.info(_("Update Order Status process start for '%s' Instance"), instance.name)
 
         instance.connect_in_shopify()
         if not picking_ids:
             picking_ids = self.shopify_search_picking_for_update_order_status(instance)
-        for picking in picking_ids:
+        fulfillment_helper = shopify_graphql.FulfillmentQueryHelper(instance.get_graphql_client())
+        # The fulfillment orders change once a picking of the order is fulfilled, so each round takes at most one
+        # picking per order and the next round fetches the orders again.
+        pending_pickings = picking_ids
+        while pending_pickings:
+            pickings = self.env["stock.picking"]
+            sale_orders = self.env["sale.order"]
+            for picking in pending_pickings:
+                if picking.sale_id and picking.sale_id in sale_orders:
+                    continue
+                pickings |= picking
+                sale_orders |= picking.sale_id
+            pending_pickings -= pickings
+            log_lines += self.update_order_status_of_pickings_in_shopify(instance, pickings, fulfillment_helper)
+
+        if log_lines and instance.is_shopify_create_schedule:
+            message = []
+            count = 0
+            for log_line in log_lines:
+                count += 1
+                if count <= 5:
+                    message.append('<' + 'li' + '>' + log_line.message + '<' + '/' + 'li' + '>')
+            if count >= 5:
+                message.append(
+                    '<' + 'p' + '>' + 'Please refer the logline' + '  ' + log_line.name + '  '
+                    + 'check it in more detail' + '<' + '/' + 'p' + '>')
+            note = "\n".join(message)
+            self.create_schedule_activity_against_loglines(log_lines, note)
+
+        self.closed_at(instance)
+        return True
+
+    def update_order_status_of_pickings_in_shopify(self, instance, pickings, fulfillment_helper):
+        """
+        Updates the status of pickings of different orders in three steps. The status and fulfillment orders of all
+        the orders are fetched with a few GraphQL nodes queries, the fulfillments are prepared from them and created
+        with fulfillmentCreate mutations running concurrently, then the results are written on the pickings.
+        :param pickings: Records of pickings, one per sale order.
+        :param fulfillment_helper: FulfillmentQueryHelper of the instance.
+        :return: List of the log lines of the pickings with missing data.
+        """
+        common_log_line_obj = self.env["common.log.lines.ept"]
+        log_lines = []
+        notify_customer = instance.notify_customer
+        try:
+            orders_data = fulfillment_helper.get_orders_fulfillment_data(pickings.sale_id.mapped("shopify_order_id"))
+            self.set_line_items_of_fulfillment_orders(pickings, orders_data, fulfillment_helper)
+        except Exception as Error:
+            _logger.info("Error in Request of shopify order for the fulfilment. Error: %s", Error)
+            return log_lines
+
+        fulfillment_vals_by_picking = {}
+        picking_data = {}
+        for picking in pickings:
             carrier_name = self.get_shopify_carrier_code(picking)
             sale_order = picking.sale_id
 
             _logger.info("We are processing Sale order '%s' and Picking '%s'", sale_order.name, picking.name)
-            is_continue_process, order_response = self.request_for_shopify_order(sale_order)
-            if is_continue_process:
+            order_response = orders_data.get(sale_order.shopify_order_id)
+            if not order_response or self.is_shopify_order_fulfilled_or_cancelled(sale_order, order_response):
                 continue
-            fulfillment_order = self.set_fulfilment_order_id_and_fulfillment_line_id(sale_order, picking)
+            fulfillment_order = self.set_fulfilment_order_id_and_fulfillment_line_id(
+                sale_order, picking, fulfillment_orders=order_response.get("fulfillment_orders"))
 
             tracking_numbers, line_items = sale_order.prepare_tracking_numbers_and_lines_for_fulfilment(picking)
 
@@ -1721,7 +1821,7 @@ class SaleOrder(models.Model):
                               "Possible reason:\n"
                               "The product is a kit product in the delivery order, and shipping status will only be "
                               "updated when all quantities are delivered. (Check 'Delivered' in the Sales Order line.)") % sale_order.name
-                
+
                 _logger.info(message)
                 log_lines.append(
                     common_log_line_obj.create_common_log_line_ept(shopify_instance_id=instance.id,
@@ -1731,14 +1831,11 @@ class SaleOrder(models.Model):
                 continue
 
             if not fulfillment_order:
-                shopify_order_id = sale_order.shopify_order_id
-                fulfillment_order = shopify.fulfillment.FulfillmentOrders.find(order_id=int(shopify_order_id))
+                fulfillment_order = order_response.get("fulfillment_orders")
             if fulfillment_order and len(fulfillment_order) > 1:
-                closed_fulfillments = []
-                for fulfillment in fulfillment_order:
-                    # when some fulfillments are closed, not to request to fulfill again.
-                    if fulfillment.attributes.get('status') == 'closed':
-                        closed_fulfillments.append(str(fulfillment.id))
+                # when some fulfillments are closed, not to request to fulfill again.
+                closed_fulfillments = [str(fulfillment.get('id')) for fulfillment in fulfillment_order if
+                                       fulfillment.get('status') == 'closed']
                 shopify_location_id, fulfillment_vals = self.prepare_vals_for_multiple_fulfillment(sale_order,
                                                                                                    tracking_numbers,
                                                                                                    picking,
@@ -1758,34 +1855,80 @@ class SaleOrder(models.Model):
 
                 fulfillment_vals = self.prepare_vals_for_fulfillment(sale_order, shopify_location_id, tracking_numbers,
                                                                      picking, carrier_name, line_items, notify_customer)
+            fulfillment_vals_by_picking[picking.id] = fulfillment_vals
+            picking_data[picking.id] = (order_response, shopify_location_id)
+
+        results = fulfillment_helper.create_fulfillments_concurrently(fulfillment_vals_by_picking)
+        self.process_shopify_fulfillment_results(instance, pickings.filtered(lambda pick: pick.id in results), results,
+                                                 picking_data)
+        return log_lines
+
+    def set_line_items_of_fulfillment_orders(self, pickings, orders_data, fulfillment_helper):
+        """
+        Adds the line_items to the open fulfillment orders of the orders whose pickings have moves without their
+        fulfillment line, they are fetched together with a few GraphQL nodes queries.
+        :param orders_data: Result of FulfillmentQueryHelper.get_orders_fulfillment_data.
+        """
+        fulfillment_orders = []
+        for picking in pickings.filtered(lambda pick: not pick.move_ids.filtered("shopify_fulfillment_line_id")):
+            order_data = orders_data.get(picking.sale_id.shopify_order_id) or {}
+            fulfillment_orders += [fulfillment_order for fulfillment_order in order_data.get("fulfillment_orders", [])
+                                   if fulfillment_order.get("status") != "closed"]
+        if not fulfillment_orders:
+            return True
+        line_items = fulfillment_helper.get_fulfillment_orders_line_items(
+            [fulfillment_order.get("id") for fulfillment_order in fulfillment_orders])
+        for fulfillment_order in fulfillment_orders:
+            fulfillment_order["line_items"] = line_items.get(fulfillment_order.get("id"), [])
+        return True
 
-            is_create_mismatch, fulfillment_result, new_fulfillment = self.post_fulfilment_in_shopify(fulfillment_vals,
-                                                                                                      sale_order,
-                                                                                                      instance)
-            if is_create_mismatch:
+    def process_shopify_fulfillment_results(self, instance, pickings, results, picking_data):
+        """
+        Writes the results of the fulfillmentCreate mutations on the pickings, the fulfilled pickings are marked as
+        updated in Shopify with one write.
+        :param results: Dictionary of picking id and result of FulfillmentQueryHelper.create_fulfillments.
+        :param picking_data: Dictionary of picking id and tuple of the order response and the Shopify location.
+        """
+        common_log_line_obj = self.env["common.log.lines.ept"]
+        updated_pickings = self.env["stock.picking"]
+        for picking in pickings:
+            sale_order = picking.sale_id
+            result = results[picking.id]
+            order_response, shopify_location_id = picking_data[picking.id]
+            if result.get("error"):
+                message = "%s" % result["error"]
+                _logger.info(message)
+                common_log_line_obj.create_common_log_line_ept(shopify_instance_id=instance.id, module="shopify_ept",
+                                                               message=message, model_name=self._name,
+                                                               order_ref=sale_order.client_order_ref)
+                continue
+            if result.get("user_errors"):
+                if order_response.get('fulfillment_status') != 'partial':
+                    picking.write({'is_manually_action_shopify_fulfillment': True})
+                sale_order.write({'is_service_tracking_updated': False})
+                message = "Order(%s) status not updated due to %s:" % (
+                    sale_order.name, [error.get("message") for error in result["user_errors"]])
+                _logger.info(message)
+                common_log_line_obj.create_common_log_line_ept(shopify_instance_id=instance.id, module="shopify_ept",
+                                                               message=message, model_name=self._name,
+                                                               order_ref=sale_order.client_order_ref)
+                sale_order.shopify_location_id = shopify_location_id
                 continue
 
-            self.process_shopify_fulfilment_result(instance, fulfillment_result, order_response, picking, sale_order,
-                                                   new_fulfillment)
-
+            fulfillments = result.get("fulfillments") or []
+            fulfilled_line_ids = {str(line_id) for fulfillment in fulfillments for line_id in
+                                  fulfillment.get("line_item_ids")}
+            service_order_lines = sale_order.order_line.filtered(
+                lambda x: x.shopify_line_id in fulfilled_line_ids and x.product_id.type == 'service'
+                          and not x.is_delivery and x.shopify_fulfillment_order_status != 'closed')
+            if service_order_lines:
+                service_order_lines.write({'shopify_fulfillment_order_status': 'closed'})
+            picking.shopify_fulfillment_id = fulfillments and str(fulfillments[-1].get("id") or '') or ''
+            updated_pickings |= picking
             sale_order.shopify_location_id = shopify_location_id
-
-        if log_lines and instance.is_shopify_create_schedule:
-            message = []
-            count = 0
-            for log_line in log_lines:
-                count += 1
-                if count <= 5:
-                    message.append('<' + 'li' + '>' + log_line.message + '<' + '/' + 'li' + '>')
-            if count >= 5:
-                message.append(
-                    '<' + 'p' + '>' + 'Please refer the logline' + '  ' + log_line.name + '  '
-                    + 'check it in more detail' + '<' + '/' + 'p' + '>')
-            note = "\n".join(message)
-            self.create_schedule_activity_against_loglines(log_lines, note)
-
-        self.closed_at(instance)
-        return True
+        updated_pickings.write({'updated_in_shopify': True})
+        _logger.info("Updated the status of %s of %s pickings in Shopify.", len(updated_pickings), len(pickings))
+        return updated_pickings
 
     def prepare_vals_for_multiple_fulfillment(self, sale_order, tracking_numbers, picking, carrier_name, line_items,
                                               **kwargs):
@@ -1798,7 +1941,6 @@ class SaleOrder(models.Model):
         tracking_info = {}
         new_fulfillment_vals = []
         shopify_location_id = False
-        shopify_location_obj = self.env["shopify.location.ept"]
         common_log_line_obj = self.env["common.log.lines.ept"]
         closed_fulfillments = kwargs.get('closed_fulfillments', [])
         notify_customer = kwargs.get('notify_customer', False)
@@ -1812,9 +1954,8 @@ class SaleOrder(models.Model):
         for pick in picking:
             location_ids_mapping = {}
             for move in pick.move_ids:
-                shopify_location_id = shopify_location_obj.search(
-                    [('warehouse_for_order', '=', move.warehouse_id.id),
-                     ("instance_id", "=", picking.shopify_instance_id.id)], limit=1)
+                shopify_location_id = picking.shopify_instance_id.get_shopify_locations_ept(
+                    warehouse_id=move.warehouse_id.id)[:1]
                 if shopify_location_id:
                     location_ids_mapping.setdefault(move.shopify_fulfillment_order_id,
                                                     shopify_location_id.shopify_location_id)
@@ -1911,22 +2052,29 @@ class SaleOrder(models.Model):
         try:
             order = shopify.Order.find(sale_order.shopify_order_id)
             order_data = order.to_dict()
-            if order_data.get('fulfillment_status') == 'fulfilled':
-                shopify_location_id = self.env["shopify.location.ept"].search(
-                    [("warehouse_for_order", "=", sale_order.warehouse_id.id),
-                     ("instance_id", "=", sale_order.shopify_instance_id.id)], limit=1)
-                sale_order.shopify_location_id = shopify_location_id
-                _logger.info('Order %s is already fulfilled', sale_order.name)
-                sale_order.picking_ids.filtered(lambda l: l.state == 'done').write({'updated_in_shopify': True})
-                return True, order_data
-            if order_data.get('cancelled_at') and order_data.get('cancel_reason'):
-                sale_order.picking_ids.filtered(lambda l: l.state == 'done').write({'is_cancelled_in_shopify': True})
-                return True, order_data
-            return False, order_data
+            return self.is_shopify_order_fulfilled_or_cancelled(sale_order, order_data), order_data
         except Exception as Error:
             _logger.info("Error in Request of shopify order for the fulfilment. Error: %s", Error)
             return True, {}
 
+    def is_shopify_order_fulfilled_or_cancelled(self, sale_order, order_data):
+        """ This method is used to mark the done pickings of an order already fulfilled or cancelled in the Shopify
+            store, so their status is not updated.
+            :param order_data: Response of the order with its fulfillment_status, cancelled_at and cancel_reason.
+            @return: True if the order is fulfilled or cancelled in the Shopify store.
+        """
+        if order_data.get('fulfillment_status') == 'fulfilled':
+            shopify_location_id = sale_order.shopify_instance_id.get_shopify_locations_ept(
+                warehouse_id=sale_order.warehouse_id.id)[:1]
+            sale_order.shopify_location_id = shopify_location_id
+            _logger.info('Order %s is already fulfilled', sale_order.name)
+            sale_order.picking_ids.filtered(lambda l: l.state == 'done').write({'updated_in_shopify': True})
+            return True
+        if order_data.get('cancelled_at') and order_data.get('cancel_reason'):
+            sale_order.picking_ids.filtered(lambda l: l.state == 'done').write({'is_cancelled_in_shopify': True})
+            return True
+        return False
+
     def search_shopify_location_for_update_order_status(self, sale_order, instance, line_items, picking):
         """ This method is used to search the shopify location for the update order status from Odoo to shopify store.
             @return: shopify_location_id
@@ -1934,15 +2082,13 @@ class SaleOrder(models.Model):
             Task_id:167537
             Migration done by Haresh Mori on October 2021
         """
-        shopify_location_obj = self.env["shopify.location.ept"]
         if instance.is_delivery_multi_warehouse:
             line_item_ids = [str(line.get('id')) for line in line_items]
             order_line = picking.move_ids.filtered(
                 lambda line: line.shopify_fulfillment_line_id in line_item_ids).sale_line_id
             if order_line.warehouse_id_ept:
-                shopify_location_id = shopify_location_obj.search(
-                    [('warehouse_for_order', '=', order_line.warehouse_id_ept.id), ("instance_id", "=", instance.id)],
-                    limit=1)
+                shopify_location_id = instance.get_shopify_locations_ept(
+                    warehouse_id=order_line.warehouse_id_ept.id)[:1]
                 if not shopify_location_id:
                     message = ("System tried to update the shipping status from the Odoo to Shopify store "
                                "but Order in the warehouse[%s] is not set the shopify location.\n"
@@ -1958,18 +2104,15 @@ class SaleOrder(models.Model):
                                                                                 order_ref=sale_order.client_order_ref)
                     return False
             else:
-                shopify_location_id = shopify_location_obj.search(
-                    [('warehouse_for_order', '=', order_line.warehouse_id_ept.id), ("instance_id", "=", instance.id),
-                     ("is_primary_location", "=", True)], limit=1)
+                shopify_location_id = instance.get_shopify_locations_ept(warehouse_id=order_line.warehouse_id_ept.id,
+                                                                         is_primary=True)[:1]
             return shopify_location_id
         shopify_location_id = sale_order.shopify_location_id or False
         if not shopify_location_id:
-            shopify_location_id = shopify_location_obj.search(
-                [("warehouse_for_order", "=", sale_order.warehouse_id.id), ("instance_id", "=", instance.id),
-                 ("is_primary_location", "=", True)])
+            shopify_location_id = instance.get_shopify_locations_ept(warehouse_id=sale_order.warehouse_id.id,
+                                                                     is_primary=True)
             if not shopify_location_id:
-                shopify_location_id = shopify_location_obj.search([("is_primary_location", "=", True),
-                                                                   ("instance_id", "=", instance.id)])
+                shopify_location_id = instance.get_shopify_locations_ept(is_primary=True)
             if not shopify_location_id:
                 message = ("System tried to update shipping order status from Odoo to the Shopify store, but the primary location"
                               "was not found for the Shopify instance: %s.\n"
@@ -3329,29 +3472,25 @@ You can take the following actions manually:\n 1. Reserve Order: If the order ha
         invoiceable_lines = super(SaleOrder, self)._get_invoiceable_lines(final)
         return invoiceable_lines
 
-    def paid_invoice_ept(self, invoices):
+    def prepare_workflow_payment_vals_ept(self, invoice):
         """
         Override the common connector library method here to create separate payment records.
         Override by Meera Sidapara on date 16/11/2021.
         """
         self.ensure_one()
-        account_payment_obj = self.env['account.payment']
-        if self.is_shopify_multi_payment:
-            for invoice in invoices:
-                total_payment_sum = sum(
-                    invoice.matched_payment_ids.filtered(lambda P: P.state in ['in_process', 'paid']).mapped('amount'))
-                invoice_amount = invoice.amount_residual
-                if (invoice_amount - total_payment_sum) > 0:
-                    if invoice.amount_residual:
-                        for payment in self.shopify_payment_ids:
-                            if payment.payment_gateway_id.code != 'gift_card':
-                                vals = invoice.prepare_payment_dict(payment.workflow_id)
-                                vals.update({'amount': payment.amount})
-                                payment_id = account_payment_obj.create(vals)
-                                payment_id.action_post()
-                                self.reconcile_payment_ept(payment_id, invoice)
-            return True
-        super(SaleOrder, self).paid_invoice_ept(invoices)
+        if not self.is_shopify_multi_payment:
+            return super(SaleOrder, self).prepare_workflow_payment_vals_ept(invoice)
+        total_payment_sum = sum(
+            invoice.matched_payment_ids.filtered(lambda P: P.state in ['in_process', 'paid']).mapped('amount'))
+        if (invoice.amount_residual - total_payment_sum) <= 0 or not invoice.amount_residual:
+            return []
+        payment_vals_list = []
+        for payment in self.shopify_payment_ids:
+            if payment.payment_gateway_id.code != 'gift_card':
+                vals = invoice.prepare_payment_dict(payment.workflow_id)
+                vals.update({'amount': payment.amount})
+                payment_vals_list.append(vals)
+        return payment_vals_list
 
     def create_schedule_activity_against_loglines(self, log_lines, note):
         """
@@ -147,17 +147,20 @@ class ShopifyPaymentReportEpt(models.Model):
             transaction_all = shopify.Transactions().find(payout_id=self.payout_reference_id, limit=250)
             if len(transaction_all) == 250:
                 transaction_all = self.shopify_list_all_transactions(transaction_all)
-        for transaction in transaction_all:
-            transaction_data = transaction.to_dict()
-            transaction_vals = self.prepare_transaction_vals(transaction_data, instance)
-            shopify_payout_report_line_obj.create(transaction_vals)
+        transactions_data = [transaction.to_dict() for transaction in transaction_all]
+        # The orders of all transactions are searched at once, and all lines are created with one create.
+        orders_by_source_id = self.search_orders_by_source_order_ids(
+            instance, [data.get('source_order_id') for data in transactions_data])
+        currency_ids = {}
+        vals_list = [self.prepare_transaction_vals(transaction_data, instance, orders_by_source_id, currency_ids)
+                     for transaction_data in transactions_data]
 
         # Create fees line
         summary = payout_data.get('summary', {})
         fees_amount = float(summary.get('charges_fee_amount', 0.0)) + float(
             summary.get('refunds_fee_amount', 0.0)) + float(
             summary.get('adjustments_fee_amount', 0.0))
-        shopify_payout_report_line_obj.create({
+        vals_list.append({
             'payout_id': self.id or False,
             'transaction_type': 'fees',
             'amount': -fees_amount,
@@ -165,6 +168,7 @@ class ShopifyPaymentReportEpt(models.Model):
             'net_amount': fees_amount,
             'is_remaining_statement': True
         })
+        shopify_payout_report_line_obj.create(vals_list)
         _logger.info("Transaction lines are added for %s.", self.payout_reference_id)
         return True
 
@@ -200,7 +204,23 @@ class ShopifyPaymentReportEpt(models.Model):
                 break
         return transactions_list
 
-    def prepare_transaction_vals(self, data, instance):
+    def search_orders_by_source_order_ids(self, instance, source_order_ids):
+        """
+        This method searches the orders of many Shopify order ids with one query.
+        :param instance: Browsable record of instance.
+        :param source_order_ids: List of Shopify order ids.
+        :return: dict {Shopify order id as string: sale.order()}
+        """
+        source_order_ids = list({str(source_order_id) for source_order_id in source_order_ids if source_order_id})
+        orders_by_source_id = {}
+        if not source_order_ids:
+            return orders_by_source_id
+        for order in self.env['sale.order'].search([('shopify_order_id', 'in', source_order_ids),
+                                                    ('shopify_instance_id', '=', instance.id)]):
+            orders_by_source_id.setdefault(order.shopify_order_id, order)
+        return orders_by_source_id
+
+    def prepare_transaction_vals(self, data, instance, orders_by_source_id=None, currency_ids=None):
         """
         Use : Based on transaction data prepare transaction vals.
         Added by : Deval Jagad
@@ -208,6 +228,9 @@ class ShopifyPaymentReportEpt(models.Model):
         Task ID : 164126
         :param data: Transaction data in dict{}.
         :param instance: Browsable record of instance.
+        :param orders_by_source_id: Orders searched by search_orders_by_source_order_ids, the order is searched
+        when it is not passed.
+        :param currency_ids: dict {currency name: id} shared by the transactions of a payout.
         :return: Payout vals{}
         """
         currency_obj = self.env['res.currency']
@@ -221,7 +244,9 @@ class ShopifyPaymentReportEpt(models.Model):
         currency = data.get('currency', '')
 
         order_id = False
-        if source_order_id:
+        if source_order_id and orders_by_source_id is not None:
+            order_id = orders_by_source_id.get(str(source_order_id), False)
+        elif source_order_id:
             order_id = sale_order_obj.search([('shopify_order_id', '=', source_order_id),
                                               ('shopify_instance_id', '=', instance.id)],
                                              limit=1)
@@ -238,9 +263,14 @@ class ShopifyPaymentReportEpt(models.Model):
             'is_remaining_statement': True
         }
 
-        currency_id = currency_obj.search([('name', '=', currency)], limit=1)
+        if currency_ids is None or currency not in currency_ids:
+            currency_id = currency_obj.search([('name', '=', currency)], limit=1).id
+            if currency_ids is not None:
+                currency_ids[currency] = currency_id
+        else:
+            currency_id = currency_ids[currency]
         if currency_id:
-            transaction_vals.update({'currency_id': currency_id.id})
+            transaction_vals.update({'currency_id': currency_id})
 
         return transaction_vals
 
@@ -320,60 +350,57 @@ class ShopifyPaymentReportEpt(models.Model):
     def create_bank_statement_lines_for_payout_report(self):
         """
         This method creates bank statement lines from the transaction lines of Payout report.
+        The missing orders of the transactions and the payments of their invoices are searched once for the payout,
+        and the statement lines are created with one create.
         @author: Maulik Barad on Date 02-Dec-2020.
         """
         partner_obj = self.env['res.partner']
         bank_statement_line_obj = self.env['account.bank.statement.line']
         log_lines = []
-        account_payment_obj = self.env['account.payment']
-        sale_order_obj = self.env["sale.order"]
+        bank_line_vals_list = []
+        payment_domains = []
 
         transaction_ids = self.payout_transaction_ids.filtered(lambda line: line.is_remaining_statement)
+        self.link_missing_orders_of_transactions(transaction_ids)
+        # Reads the invoices of all orders of the payout together.
+        transaction_ids.order_id.invoice_ids.mapped('amount_total')
+        counterpart_accounts = {}
+        for transaction_line in self.instance_id.transaction_line_ids:
+            counterpart_accounts[transaction_line.transaction_type] = counterpart_accounts.get(
+                transaction_line.transaction_type, transaction_line.account_id.browse()) | transaction_line.account_id
         for transaction in transaction_ids:
             order_id = transaction.order_id
             if transaction.transaction_type in ['charge', 'refund', 'payment_refund'] and not order_id:
-                source_order_id = transaction.source_order_id
-                order_id = sale_order_obj.search([('shopify_order_id', '=', source_order_id),
-                                                  ('shopify_instance_id', '=', self.instance_id.id)],
-                                                 limit=1)
-                if order_id:
-                    transaction.order_id = order_id
-                else:
-                    message = ("System tried to automatically reconcile, but Order: %s was not found in the system.\n"
-                               "Action Items:\n"
-                               "- Import the missing order before processing the payout report.\n"
-                               "- You can import orders using the operation wizard.") % transaction.source_order_id
-                    log_lines.append({'message': message,
-                                      'shopify_payout_report_line_id': transaction.id})
-                    # We can not use shopify order reference here because it may create duplicate name,
-                    # and name of journal entry should be unique per company. So here I have used transaction Id
-                    bank_line_vals = {
-                        # 'name': transaction.transaction_id,
-                        'payment_ref': transaction.transaction_id,
-                        'date': self.payout_date,
-                        'amount': transaction.amount,
-                        # 'statement_id': bank_statement_id.id,
-                        'shopify_transaction_id': transaction.transaction_id,
-                        "shopify_transaction_type": transaction.transaction_type,
-                        'sequence': 1000,
-                        'journal_id': self.instance_id.shopify_settlement_report_journal_id.id,
-                        'payout_id': self.id,
-                        'payout_line_id': transaction.id
-                    }
-                    bank_statement_line_obj.create(bank_line_vals)
-                    transaction.is_remaining_statement = False
-                    continue
+                message = ("System tried to automatically reconcile, but Order: %s was not found in the system.\n"
+                           "Action Items:\n"
+                           "- Import the missing order before processing the payout report.\n"
+                           "- You can import orders using the operation wizard.") % transaction.source_order_id
+                log_lines.append({'message': message,
+                                  'shopify_payout_report_line_id': transaction.id})
+                # We can not use shopify order reference here because it may create duplicate name,
+                # and name of journal entry should be unique per company. So here I have used transaction Id
+                bank_line_vals = {
+                    # 'name': transaction.transaction_id,
+                    'payment_ref': transaction.transaction_id,
+                    'date': self.payout_date,
+                    'amount': transaction.amount,
+                    # 'statement_id': bank_statement_id.id,
+                    'shopify_transaction_id': transaction.transaction_id,
+                    "shopify_transaction_type": transaction.transaction_type,
+                    'sequence': 1000,
+                    'journal_id': self.instance_id.shopify_settlement_report_journal_id.id,
+                    'payout_id': self.id,
+                    'payout_line_id': transaction.id
+                }
+                bank_line_vals_list.append((transaction, bank_line_vals))
+                continue
 
             partner = partner_obj._find_accounting_partner(order_id.partner_id)
             domain, invoice, log_line = self.check_for_invoice_refund(transaction, log_lines)
 
             if domain:
-                payment_reference = account_payment_obj.search(domain, limit=1)
-
-                if payment_reference:
-                    reference = payment_reference.name
-                else:
-                    reference = invoice.name or ''
+                # The reference is set from the payment once the payments of all transactions are searched.
+                reference = invoice.name or ''
             else:
                 reference = transaction.order_id.name
 
@@ -388,9 +415,8 @@ class ShopifyPaymentReportEpt(models.Model):
                 else:
                     if order_id.name:
                         name = transaction.transaction_type + "_" + order_id.name + "/" + transaction.transaction_id
-                counter_part_account_id = self.instance_id.transaction_line_ids.filtered(lambda l: l.transaction_type
-                                                                                                   ==
-                                                                                                   transaction.transaction_type).account_id
+                counter_part_account_id = counterpart_accounts.get(transaction.transaction_type,
+                                                                   self.env['account.account'])
                 bank_line_vals = {
                     # 'name': name or reference,
                     'payment_ref': name or reference,
@@ -409,8 +435,15 @@ class ShopifyPaymentReportEpt(models.Model):
                 }
                 if invoice and invoice.move_type == "out_refund":
                     bank_line_vals.update({"refund_invoice_id": invoice.id})
-                bank_statement_line_obj.create(bank_line_vals)
-                transaction.is_remaining_statement = False
+                if domain and not name and transaction.transaction_type in ['charge', 'refund', 'payment_refund']:
+                    payment_domains.append((bank_line_vals, domain))
+                bank_line_vals_list.append((transaction, bank_line_vals))
+
+        self.set_payment_reference_of_statement_lines(payment_domains)
+        if bank_line_vals_list:
+            bank_statement_line_obj.create([bank_line_vals for _transaction, bank_line_vals in bank_line_vals_list])
+            transaction_ids.browse([transaction.id for transaction, _bank_line_vals in bank_line_vals_list]).write(
+                {'is_remaining_statement': False})
 
         if log_lines:
             self.set_payout_log_line(log_lines)
@@ -423,6 +456,43 @@ class ShopifyPaymentReportEpt(models.Model):
                 self.common_log_line_ids.create_payout_schedule_activity(note, self)
         return True
 
+    def link_missing_orders_of_transactions(self, transactions):
+        """
+        This method searches the orders of the charge and refund transactions without order with one query and links
+        them.
+        @param transactions: Records of the transaction lines.
+        """
+        transactions = transactions.filtered(
+            lambda line: line.transaction_type in ['charge', 'refund', 'payment_refund'] and not line.order_id)
+        orders_by_source_id = self.search_orders_by_source_order_ids(self.instance_id,
+                                                                     transactions.mapped('source_order_id'))
+        transactions_by_order = {}
+        for transaction in transactions:
+            order = orders_by_source_id.get(str(transaction.source_order_id))
+            if order:
+                transactions_by_order[order] = transactions_by_order.get(order, transaction.browse()) | transaction
+        for order, order_transactions in transactions_by_order.items():
+            order_transactions.write({'order_id': order.id})
+        return True
+
+    def set_payment_reference_of_statement_lines(self, payment_domains):
+        """
+        This method searches the payments of the invoices of all transactions with one query and sets the name of the
+        matching payment as the reference of the statement line.
+        @param payment_domains: List of tuples of statement line vals and the payment domain prepared by
+        check_for_invoice_refund.
+        """
+        account_payment_obj = self.env['account.payment']
+        memos = set()
+        for _bank_line_vals, domain in payment_domains:
+            memos.update(dict((leaf[0], leaf[2]) for leaf in domain).get('memo') or [])
+        payments = account_payment_obj.search([('memo', 'in', list(memos))]) if memos else account_payment_obj
+        for bank_line_vals, domain in payment_domains:
+            payment_reference = payments.filtered_domain(domain)[:1]
+            if payment_reference:
+                bank_line_vals.update({'payment_ref': payment_reference.name})
+        return True
+
     def check_for_invoice_refund(self, transaction, log_lines):
         """
         This method is used to search for invoice or refund and then prepare domain as that..
@@ -554,7 +624,9 @@ class ShopifyPaymentReportEpt(models.Model):
         log_line = []
         shopify_payout_report_line_obj = self.env['shopify.payout.report.line.ept']
         sale_order_obj = self.env['sale.order']
-        shopify_payout_report_line_id = shopify_payout_report_line_obj.search(
+        # Statement lines created from the payout keep their transaction line, older ones are matched by the
+        # transaction id.
+        shopify_payout_report_line_id = statement_line.payout_line_id or shopify_payout_report_line_obj.search(
             [('transaction_id', '=', statement_line.shopify_transaction_id)])
         if not shopify_payout_report_line_id.order_id:
             sale_order_id = sale_order_obj.search(
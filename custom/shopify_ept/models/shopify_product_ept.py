@@ -11,7 +11,6 @@ from odoo.exceptions import UserError
 from .. import shopify
 from ..shopify.pyactiveresource.connection import ClientError
 from ..shopify.pyactiveresource.connection import ResourceNotFound
-from ..shopify_graphql.client import ShopifyGraphQLClient
 from ..shopify_graphql.queries.inventory import InventoryQueryHelper
 
 _logger = logging.getLogger("Shopify Product")
@@ -706,8 +705,7 @@ class ShopifyProductProductEpt(models.Model):
             return True
 
         instance.connect_in_shopify()
-        location_ids = self.env["shopify.location.ept"].search(
-            [("instance_id", "=", instance.id), ('legacy', '=', False)])
+        location_ids = instance.get_shopify_locations_ept(legacy=False)
         if not location_ids:
             message = ("System tried to update stock from Odoo to the Shopify store, but the Shopify location was not found for the %s instance.\n"
                           "Action Items:\n"
@@ -843,8 +841,7 @@ class ShopifyProductProductEpt(models.Model):
             return True
 
         instance.connect_in_shopify()
-        location_ids = self.env["shopify.location.ept"].search(
-            [("instance_id", "=", instance.id), ('legacy', '=', False)])
+        location_ids = instance.get_shopify_locations_ept(legacy=False)
         if not location_ids:
             message = ("System tried to update stock from Odoo to the Shopify store, but the Shopify location was not found for the %s instance.\n"
                        "Action Items:\n"
@@ -901,12 +898,18 @@ class ShopifyProductProductEpt(models.Model):
 
                     # if not self._context.get('is_process_from_selected_product'):
 
+        computed_stock_data = export_stock_data
+        if not self.env.context.get('is_process_from_selected_product'):
+            export_stock_data = self.env["shopify.export.stock.state.ept"].filter_changed_stock(instance,
+                                                                                                export_stock_data)
         export_stock_queue = export_stock_obj.create_export_stock_queue(instance, export_stock_data)
-        if export_stock_queue:
+        if export_stock_queue or (computed_stock_data and not export_stock_data):
+            # When no quantity changed since the last export, the next run starts from now as well.
             shopify_products.write({
                 'last_stock_update_date': datetime.now() - timedelta(hours=0.5)})
             instance.write({
                 'shopify_last_date_update_stock': datetime.now() - timedelta(hours=0.5)})
+        if export_stock_queue:
             queue_cron = self.env.ref("shopify_ept.process_shopify_export_stock_queue")
             if not queue_cron.active:
                 _logger.info("Active the Export stock data process queue cron job")
@@ -1028,8 +1031,7 @@ class ShopifyProductProductEpt(models.Model):
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 21 October 2020 .
             Task_id: log_line_array
         """
-        location_ids = self.env["shopify.location.ept"].search(
-            [("legacy", "=", False), ("instance_id", "=", instance.id)])
+        location_ids = instance.get_shopify_locations_ept(legacy=False)
         if not location_ids:
             message = ("System tried to import stock from Odoo to the Shopify store, but the Shopify location was not found for the %s instance.\n"
                           "Action Items:\n"
@@ -1050,7 +1052,7 @@ class ShopifyProductProductEpt(models.Model):
             inventory_levels = {}
             try:
                 # Use client-based GraphQL execution (no active shopify session)
-                client = ShopifyGraphQLClient(instance.shopify_password, instance.shopify_host)
+                client = instance.get_graphql_client()
                 inventory_helper = InventoryQueryHelper(client)
                 # Use helper to fetch all pages and return combined response
                 inventory_levels = inventory_helper.get_all_inventory_levels(location_id.shopify_location_id, first=250)
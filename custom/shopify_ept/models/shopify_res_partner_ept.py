@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 # See LICENSE file for full copyright and licensing details.
 from odoo import models, fields, api
+from .customer_import_lookup import ShopifyCustomerImportLookup
 
 
 class ShopifyResPartnerEpt(models.Model):
@@ -18,7 +19,6 @@ class ShopifyResPartnerEpt(models.Model):
         @change : pass category_id as tag on vals by Nilam Kubavat for task id : 190111 at 19/05/2022
         """
         partner_obj = self.env["res.partner"]
-        common_log_line_obj = self.env["common.log.lines.ept"]
 
         shopify_instance_id = instance.id
         shopify_customer_id = vals.get("id", False)
@@ -27,41 +27,13 @@ class ShopifyResPartnerEpt(models.Model):
         email = vals.get("email", "")
         
         if not first_name and not last_name and not email:
-            message = ("System tried to create a customer but did not receive essential details like First Name, Last Name, or Email in the response.\n"
-                        "Action Items:\n"
-                        "- Verify the customer details in the queue response or directly on the Shopify store.\n"
-                        "- Update the customer data on the Shopify store, then re-import the customer or order using the specific order import functionality.")
-            common_log_line_obj.create_common_log_line_ept(shopify_instance_id=instance.id, module="shopify_ept",
-                                                           message=message,
-                                                           model_name='res.partner',
-                                                           shopify_order_data_queue_line_id=queue_line.id if self.env.context.get(
-                                                               'order_data_queue') else False,
-                                                           shopify_customer_data_queue_line_id=queue_line.id if self.env.context.get(
-                                                               'customer_data_queue') else False,
-                                                           order_ref=queue_line.shopify_order_id if self.env.context.get(
-                                                               'order_data_queue') else False)
+            self.log_missing_customer_details(instance, queue_line)
             return False
 
-        name = ""
-        if first_name:
-            name = "%s" % first_name
-        if last_name:
-            name += " %s" % last_name if name else "%s" % last_name
-        if not name and email:
-            name = email
+        name = self.prepare_shopify_customer_name(first_name, last_name, email)
 
         partner = self.search_shopify_partner(shopify_customer_id, shopify_instance_id)
-        tag_ids = []
-        if vals.get("tags"):
-            tags_data = vals.get("tags")
-            normalized_tags_list = []
-            if isinstance(tags_data, str):
-                if tags_data.strip():
-                    normalized_tags_list = [tag.strip() for tag in tags_data.split(',')]
-            elif isinstance(tags_data, list):
-                normalized_tags_list = [tag.strip() for tag in tags_data if tag and tag.strip()]
-            for tag in normalized_tags_list:
-                tag_ids.append(partner_obj.create_or_search_tag(tag))
+        tag_ids = [partner_obj.create_or_search_tag(tag) for tag in self.get_shopify_customer_tags(vals)]
 
         if partner:
             if not partner.parent_id:
@@ -97,6 +69,50 @@ class ShopifyResPartnerEpt(models.Model):
         partner = self.update_partner_with_company(instance, vals.get("default_address", {}), False, partner)
         return partner
 
+    def log_missing_customer_details(self, instance, queue_line):
+        """
+        This method is used to log a customer which can not be created because its response has no name and email.
+        """
+        message = ("System tried to create a customer but did not receive essential details like First Name, Last Name, or Email in the response.\n"
+                    "Action Items:\n"
+                    "- Verify the customer details in the queue response or directly on the Shopify store.\n"
+                    "- Update the customer data on the Shopify store, then re-import the customer or order using the specific order import functionality.")
+        self.env["common.log.lines.ept"].create_common_log_line_ept(shopify_instance_id=instance.id, module="shopify_ept",
+                                                                    message=message,
+                                                                    model_name='res.partner',
+                                                                    shopify_order_data_queue_line_id=queue_line.id if self.env.context.get(
+                                                                        'order_data_queue') else False,
+                                                                    shopify_customer_data_queue_line_id=queue_line.id if self.env.context.get(
+                                                                        'customer_data_queue') else False,
+                                                                    order_ref=queue_line.shopify_order_id if self.env.context.get(
+                                                                        'order_data_queue') else False)
+
+    @staticmethod
+    def prepare_shopify_customer_name(first_name, last_name, email):
+        """
+        This method is used to prepare the name of a customer, its email when it has no name.
+        """
+        name = ""
+        if first_name:
+            name = "%s" % first_name
+        if last_name:
+            name += " %s" % last_name if name else "%s" % last_name
+        if not name and email:
+            name = email
+        return name
+
+    @staticmethod
+    def get_shopify_customer_tags(vals):
+        """
+        This method is used to get the tag names of a customer, its tags are a comma separated string or a list.
+        """
+        tags_data = vals.get("tags")
+        if isinstance(tags_data, str):
+            return [tag.strip() for tag in tags_data.split(',') if tag.strip()] if tags_data.strip() else []
+        if isinstance(tags_data, list):
+            return [tag.strip() for tag in tags_data if tag and tag.strip()]
+        return []
+
     def search_shopify_partner(self, shopify_customer_id, shopify_instance_id):
         """ This method is used to search the shopify partner.
             :param shopify_customer_id: Id of shopify customer which receive from customer response.
@@ -120,19 +136,11 @@ class ShopifyResPartnerEpt(models.Model):
         """
         partner_obj = self.env["res.partner"]
 
-        first_name = shopify_customer_data.get("first_name")
-        last_name = shopify_customer_data.get("last_name")
-
-        if not first_name and not last_name:
+        address_vals = self.prepare_shopify_address_vals(instance, shopify_customer_data)
+        if not address_vals:
             return False
-
+        partner_vals, address_key_list = address_vals
         company_name = shopify_customer_data.get("company")
-        partner_vals = self.shopify_prepare_partner_vals(shopify_customer_data)
-        address_key_list = ["name", "street", "street2", "city", "zip", "phone", "state_id", "country_id"]
-
-        if company_name and not instance.import_customer_as_company:
-            address_key_list.append("company_name")
-            partner_vals.update({"company_name": company_name})
 
         partner = partner_obj._find_partner_ept(partner_vals, address_key_list,
                                                 [("parent_id", "=", parent_partner.id), ("type", "=", partner_type)])
@@ -164,6 +172,193 @@ class ShopifyResPartnerEpt(models.Model):
 
         return partner
 
+    def prepare_shopify_address_vals(self, instance, shopify_customer_data):
+        """
+        This method is used to prepare the partner vals of an address and the keys an existing partner must match.
+        :return: (partner vals, key list), or False when the address has no name.
+        """
+        if not shopify_customer_data.get("first_name") and not shopify_customer_data.get("last_name"):
+            return False
+        company_name = shopify_customer_data.get("company")
+        partner_vals = self.shopify_prepare_partner_vals(shopify_customer_data)
+        address_key_list = ["name", "street", "street2", "city", "zip", "phone", "state_id", "country_id"]
+
+        if company_name and not instance.import_customer_as_company:
+            address_key_list.append("company_name")
+            partner_vals.update({"company_name": company_name})
+        return partner_vals, address_key_list
+
+    def shopify_create_contact_partners(self, instance, customer_datas):
+        """
+        Creates or updates the contact partners of the customers of a customer queue batch, as
+        shopify_create_contact_partner does for one customer. The partners are matched with the Shopify customer ids
+        and emails of the whole batch, the tags are resolved together, the tags are written with one write per
+        distinct set of tags and the new partners and Shopify customer links are created with one create each.
+        :param instance: Record of the instance.
+        :param customer_datas: dict {queue line: customer response}
+        :return: dict {queue line: partner, or False when the customer can not be created}
+        """
+        partner_obj = self.env["res.partner"]
+        lookup = ShopifyCustomerImportLookup(self.env, instance).prefetch(list(customer_datas.values()))
+        tag_ids_by_name = partner_obj.create_or_search_tags(
+            [tag for vals in customer_datas.values() for tag in self.get_shopify_customer_tags(vals)])
+
+        partners_by_line = {}
+        tag_ids_by_partner = {}
+        matched_by_email = partner_obj
+        shopify_partner_vals_list = []
+        new_partner_vals_list = []
+        new_partner_index_by_email = {}
+        new_partner_lines = {}
+        for line, vals in customer_datas.items():
+            shopify_customer_id = vals.get("id", False)
+            first_name = vals.get("first_name", "")
+            last_name = vals.get("last_name", "")
+            email = vals.get("email", "")
+            if not first_name and not last_name and not email:
+                self.log_missing_customer_details(instance, line)
+                partners_by_line[line] = False
+                continue
+            tag_ids = tuple(tag_ids_by_name[tag.lower()] for tag in self.get_shopify_customer_tags(vals))
+
+            partner = lookup.find_partner(shopify_customer_id)
+            if partner:
+                if not partner.parent_id:
+                    partner = self.update_partner_with_company(instance, vals.get("default_address", {}), False,
+                                                               partner)
+                tag_ids_by_partner[partner] = tag_ids
+                partners_by_line[line] = partner
+                continue
+
+            shopify_partner_values = {"shopify_customer_id": shopify_customer_id,
+                                      "shopify_instance_id": instance.id}
+            partner = email and lookup.find_partner_by_email(email)
+            if partner:
+                tag_ids_by_partner[partner] = tag_ids
+                matched_by_email |= partner
+                shopify_partner_values.update({"partner_id": partner.id})
+                shopify_partner_vals_list.append(shopify_partner_values)
+                lookup.add_partner(shopify_customer_id, partner)
+                partners_by_line[line] = partner
+                continue
+
+            email_key = lookup.normalize_email(email)
+            if email and email_key in new_partner_index_by_email:
+                # The partner of the email is created by an earlier customer of the batch, it gets the tags of the
+                # last customer as when the customers were imported one by one.
+                index = new_partner_index_by_email[email_key]
+                new_partner_vals_list[index]["category_id"] = [(6, 0, list(tag_ids))]
+                new_partner_lines[line] = (index, shopify_partner_values, vals, False)
+                continue
+
+            partner_vals = self.shopify_prepare_partner_vals(vals.get("default_address", {}), instance)
+            partner_vals.update({
+                "name": self.prepare_shopify_customer_name(first_name, last_name, email),
+                "email": email,
+                "customer_rank": 1,
+                "is_shopify_customer": True,
+                "type": "contact",
+                "category_id": [(6, 0, list(tag_ids))],
+                "phone": vals.get("phone", "") if not partner_vals.get("phone") else partner_vals.get("phone")
+            })
+            if email:
+                new_partner_index_by_email[email_key] = len(new_partner_vals_list)
+            new_partner_lines[line] = (len(new_partner_vals_list), shopify_partner_values, vals, True)
+            new_partner_vals_list.append(partner_vals)
+
+        partners_by_tags = {}
+        for partner, tag_ids in tag_ids_by_partner.items():
+            partners_by_tags[tag_ids] = partners_by_tags.get(tag_ids, partner_obj) | partner
+        for tag_ids, partners in partners_by_tags.items():
+            partners.write({"category_id": [(6, 0, list(tag_ids))]})
+        if matched_by_email:
+            matched_by_email.write({"is_shopify_customer": True})
+
+        new_partners = partner_obj.create(new_partner_vals_list) if new_partner_vals_list else partner_obj
+        for line, (index, shopify_partner_values, vals, is_created) in new_partner_lines.items():
+            partner = new_partners[index]
+            shopify_partner_values.update({"partner_id": partner.id})
+            shopify_partner_vals_list.append(shopify_partner_values)
+            lookup.add_partner(shopify_partner_values.get("shopify_customer_id"), partner, partner.email)
+            if is_created:
+                partner = self.update_partner_with_company(instance, vals.get("default_address", {}), False, partner)
+            partners_by_line[line] = partner
+        if shopify_partner_vals_list:
+            self.create(shopify_partner_vals_list)
+        return partners_by_line
+
+    def shopify_create_or_update_addresses(self, instance, addresses):
+        """
+        Creates or updates the partners of many addresses, as shopify_create_or_update_address does for one address.
+        The addresses are matched against the contacts of their parent partners and the partners of the same name
+        read once for all addresses, the matched partners are written with one write per value and the new partners
+        are created with one create.
+        :param instance: Record of the instance.
+        :param addresses: list of (Shopify address data, parent partner, partner type)
+        :return: list of the partners of the addresses, False for an address without name.
+        """
+        partner_obj = self.env["res.partner"]
+        items = []
+        for shopify_customer_data, parent_partner, partner_type in addresses:
+            address_vals = self.prepare_shopify_address_vals(instance, shopify_customer_data)
+            items.append(address_vals and (shopify_customer_data, parent_partner, partner_type) + address_vals)
+        lookup = ShopifyCustomerImportLookup(self.env, instance).prefetch_addresses(
+            partner_obj.union(*[item[1] for item in items if item]), [item[3] for item in items if item])
+
+        results = []
+        partners_by_email = {}
+        invoice_partners = partner_obj
+        new_partner_vals_list = []
+        new_partner_items = []
+        new_partner_index_by_key = {}
+        for item in items:
+            if not item:
+                results.append(False)
+                continue
+            shopify_customer_data, parent_partner, partner_type, partner_vals, address_key_list = item
+            partner = lookup.find_address(partner_vals, address_key_list, parent_partner, partner_type)
+            if not partner:
+                partner = lookup.find_address(partner_vals, address_key_list, parent_partner)
+            if not partner:
+                partner = lookup.find_address(partner_vals, address_key_list)
+                if partner and not partner.child_ids and partner_type == 'invoice':
+                    invoice_partners |= partner
+
+            if partner:
+                if not partner.parent_id:
+                    partner = self.update_partner_with_company(instance, shopify_customer_data, parent_partner,
+                                                               partner)
+                if parent_partner.email:
+                    partners_by_email[parent_partner.email] = partners_by_email.get(parent_partner.email,
+                                                                                    partner_obj) | partner
+                results.append(partner)
+                continue
+
+            address_key = lookup.address_key(partner_vals, address_key_list)
+            if address_key in new_partner_index_by_key:
+                results.append(new_partner_index_by_key[address_key])
+                continue
+            partner_vals.update({"type": partner_type, "parent_id": parent_partner.id})
+            if parent_partner.email:
+                partner_vals.update({'email': parent_partner.email})
+            if shopify_customer_data.get("company"):
+                partner_vals.update({"company_name": shopify_customer_data.get("company")})
+            new_partner_index_by_key[address_key] = len(new_partner_vals_list)
+            results.append(len(new_partner_vals_list))
+            new_partner_vals_list.append(partner_vals)
+            new_partner_items.append((shopify_customer_data, parent_partner))
+
+        if invoice_partners:
+            invoice_partners.write({"type": "invoice"})
+        for email, partners in partners_by_email.items():
+            partners.write({'email': email})
+        new_partners = partner_obj.create(new_partner_vals_list) if new_partner_vals_list else partner_obj
+        for partner, (shopify_customer_data, parent_partner) in zip(new_partners, new_partner_items):
+            self.update_partner_with_company(instance, shopify_customer_data, parent_partner, partner)
+            if instance.import_customer_as_company and partner.parent_id:
+                partner.company_name = False
+        return [new_partners[result] if isinstance(result, int) else result for result in results]
+
     def shopify_prepare_partner_vals(self, vals, instance=False):
         """
         This method used to prepare a partner vals.
@@ -1,14 +1,11 @@
 # -*- coding: utf-8 -*-
 # See LICENSE file for full copyright and licensing details.
 
-import base64
-import hashlib
 import json
 import logging
 import time
 from builtins import int
 from datetime import datetime, timezone
-import requests
 from dateutil import parser
 import pytz
 
@@ -287,7 +284,7 @@ class ShopifyProductTemplateEpt(models.Model):
         return product_category
 
     def shopify_sync_products(self, product_data_line_id, shopify_tmpl_id, instance,
-                              order_data_line_id=False):
+                              order_data_line_id=False, lookup=None):
         """
         This method is used to sync products from queue line or shopify template id for Order.
         @param product_data_line_id: Product Queue Line.
@@ -295,6 +292,7 @@ class ShopifyProductTemplateEpt(models.Model):
         the order.
         @param instance: Shopify Instance.
         @param order_data_line_id: Order Queue Line, when needed to import a product for a order.
+        @param lookup: ShopifyProductImportLookup of the batch of queue lines, if any.
         @author: Maulik Barad on Date 01-Sep-2020.
         """
         model_name = "shopify.product.template.ept"
@@ -315,22 +313,24 @@ class ShopifyProductTemplateEpt(models.Model):
         elif not instance.auto_create_product_category and instance.shopify_instance_product_category:
             product_category = instance.shopify_instance_product_category if instance.shopify_instance_product_category else False
 
-        shopify_template = self.search(
-            [("shopify_tmpl_id", "=", template_data.get("id")),
-             ("shopify_instance_id", "=", instance.id)])
+        shopify_template = lookup.find_template(template_data.get("id")) if lookup else None
+        if shopify_template is None:
+            shopify_template = self.search(
+                [("shopify_tmpl_id", "=", template_data.get("id")),
+                 ("shopify_instance_id", "=", instance.id)])
 
         if shopify_template:
             shopify_template = self.sync_product_with_existing_template(shopify_template, skip_existing_product,
                                                                         template_data, instance,
                                                                         product_category, model_name,
                                                                         product_data_line_id,
-                                                                        order_data_line_id)
+                                                                        order_data_line_id, lookup)
             if not skip_existing_product and instance.sync_product_with_images and shopify_template and \
                     shopify_template.shopify_tmpl_id:
                 shopify_template.shopify_sync_product_images(template_data)
         else:
             shopify_template = self.sync_new_product(template_data, instance, product_category, model_name,
-                                                     product_data_line_id, order_data_line_id)
+                                                     product_data_line_id, order_data_line_id, lookup)
             if shopify_template and instance.sync_product_with_images and shopify_template.shopify_tmpl_id:
                 shopify_template.shopify_sync_product_images(template_data)
 
@@ -339,19 +339,30 @@ class ShopifyProductTemplateEpt(models.Model):
                 {"state": "done", "last_process_date": datetime.now()})
         if shopify_template:
             self.update_weight_product_variants(instance, shopify_template, template_data.get("variants"))
+        self.forget_product_lookup_keys(template_data, lookup)
 
         _logger.info("Process completed of Product- %s || %s.", template_data.get("id"), template_data.get("title"))
 
         return shopify_template
 
     def update_weight_product_variants(self, instance, shopify_template, variant_data):
+        company_uom = instance._default_UOM_category()
+        product_variants = shopify_template.product_tmpl_id.product_variant_ids
+        variants_by_sku = {}
+        for product_variant in product_variants:
+            variants_by_sku[product_variant.default_code] = variants_by_sku.get(product_variant.default_code,
+                                                                                product_variants.browse()) | \
+                                                            product_variant
+        # The variants are written once per distinct weight.
+        variants_by_weight = {}
         for variant in variant_data:
-            company_uom = instance._default_UOM_category()
             weight = instance.shopify_product_uom_id._compute_quantity(variant.get("weight"),
                                                                        company_uom)
-            product_varinat = shopify_template.product_tmpl_id.product_variant_ids.filtered(
-                lambda x: x.default_code == variant.get('sku'))
-            product_varinat.write({'weight': weight})
+            product_variant = variants_by_sku.get(variant.get('sku'))
+            if product_variant:
+                variants_by_weight[weight] = variants_by_weight.get(weight, product_variants.browse()) | product_variant
+        for weight, product_variant in variants_by_weight.items():
+            product_variant.write({'weight': weight})
 
     def convert_shopify_template_response(self, shopify_tmpl_id, product_data_line_id, model_name,
                                           order_data_line_id, instance):
@@ -377,9 +388,10 @@ class ShopifyProductTemplateEpt(models.Model):
 
     def sync_product_with_existing_template(self, shopify_template, skip_existing_product, template_data, instance,
                                             product_category, model_name, product_data_line_id,
-                                            order_data_line_id):
+                                            order_data_line_id, lookup=None):
         """
         This method is used for importing existing template.
+        @param lookup: ShopifyProductImportLookup of the batch of queue lines, if any.
         @author: Maulik Barad on Date 03-Sep-2020.
         """
         if skip_existing_product:
@@ -395,7 +407,7 @@ class ShopifyProductTemplateEpt(models.Model):
                                                                                      template_vals,
                                                                                      product_data_line_id,
                                                                                      order_data_line_id,
-                                                                                     model_name)
+                                                                                     model_name, lookup)
         if need_to_archive:
             products_to_archive = shopify_template.shopify_product_ids.filtered(
                 lambda x: int(x.variant_id) not in variant_ids)
@@ -403,8 +415,10 @@ class ShopifyProductTemplateEpt(models.Model):
         return shopify_template if len(variant_ids) == len(variant_data) else False
 
     def sync_variant_data_with_existing_template(self, instance, variant_data, template_data, shopify_template,
-                                                 template_vals, product_data_line_id, order_data_line_id, model_name):
+                                                 template_vals, product_data_line_id, order_data_line_id, model_name,
+                                                 lookup=None):
         """ This method is used to sync Shopify variant data in which the Shopify template is existing in Odoo.
+            @param lookup: ShopifyProductImportLookup of the batch of queue lines, if any.
             @return: variant_ids, need_to_archive
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 22 October 2020 .
             Task_id: 167537
@@ -427,7 +441,8 @@ class ShopifyProductTemplateEpt(models.Model):
                 continue
             # Here we are not passing SKU and Barcode while searching shopify product, Because We
             # are updating same existing product so.
-            shopify_product, odoo_product = self.shopify_search_odoo_product_variant(instance, variant_id, False, False)
+            shopify_product, odoo_product = self.shopify_search_odoo_product_variant(instance, variant_id, False, False,
+                                                                                     lookup)
             variant_vals = self.prepare_variant_vals(instance, variant)
             domain = [("variant_id", "=", False), ("shopify_instance_id", "=", instance.id),
                       ("shopify_template_id", "=", shopify_template.id)]
@@ -445,7 +460,7 @@ class ShopifyProductTemplateEpt(models.Model):
                     if attribute_value_domain:
                         odoo_product = odoo_product.search(attribute_value_domain)
 
-                message = self.is_product_importable(template_data, instance, odoo_product, shopify_product)
+                message = self.is_product_importable(template_data, instance, odoo_product, shopify_product, lookup)
                 if message:
                     self.create_log_line_for_queue_line(instance, message, model_name, product_data_line_id,
                                                         order_data_line_id, sku, create_activity=True)
@@ -457,11 +472,12 @@ class ShopifyProductTemplateEpt(models.Model):
 
                 elif not shopify_product:
                     shopify_product, odoo_product = self.shopify_search_odoo_product_variant(instance, variant_id, sku,
-                                                                                             False)
+                                                                                             False, lookup)
                     shopify_product = self.create_or_update_shopify_variant(variant_vals, shopify_product,
                                                                             shopify_template, odoo_product)
                     if not shopify_product:
                         if instance.auto_import_product:
+                            self.forget_product_lookup_keys(template_data, lookup)
                             if odoo_template.attribute_line_ids:
                                 shopify_product = self.check_for_new_variant(odoo_template, shopify_attributes, variant,
                                                                              shopify_template, variant_vals)
@@ -531,17 +547,16 @@ class ShopifyProductTemplateEpt(models.Model):
                     continue
             else:
                 self.create_or_update_shopify_variant(variant_vals, shopify_product)
-            instance.shopify_pricelist_id.set_product_price_ept(shopify_product.product_id.id, variant.get("price"))
-            if instance.shopify_compare_pricelist_id:
-                instance.shopify_compare_pricelist_id.set_product_price_ept(shopify_product.product_id.id, variant.get("compare_at_price"))
+            self.set_shopify_variant_prices(instance, shopify_product, variant, lookup)
             variant_ids.append(variant_id)
 
         return variant_ids, need_to_archive
 
     def sync_new_product(self, template_data, instance, product_category, model_name, product_data_line_id,
-                         order_data_line_id):
+                         order_data_line_id, lookup=None):
         """
         This method is used for importing new products from Shopify to Odoo.
+        @param lookup: ShopifyProductImportLookup of the batch of queue lines, if any.
         @author: Maulik Barad on Date 05-Sep-2020.
         Migration done by Meera Sidapara 24/09/2021.
         """
@@ -557,7 +572,8 @@ class ShopifyProductTemplateEpt(models.Model):
             variant_id = variant.get("id")
             sku = variant.get("sku")
             barcode = variant.get("barcode")
-            shopify_product, odoo_product = self.shopify_search_odoo_product_variant(instance, variant_id, sku, barcode)
+            shopify_product, odoo_product = self.shopify_search_odoo_product_variant(instance, variant_id, sku, barcode,
+                                                                                     lookup)
             if odoo_product:
                 odoo_template = odoo_product.product_tmpl_id
         for variant in variant_data:
@@ -573,9 +589,10 @@ class ShopifyProductTemplateEpt(models.Model):
 
             variant_vals = self.prepare_variant_vals(instance, variant)
 
-            shopify_product, odoo_product = self.shopify_search_odoo_product_variant(instance, variant_id, sku, barcode)
+            shopify_product, odoo_product = self.shopify_search_odoo_product_variant(instance, variant_id, sku, barcode,
+                                                                                     lookup)
 
-            message = self.is_product_importable(template_data, instance, odoo_product, shopify_product)
+            message = self.is_product_importable(template_data, instance, odoo_product, shopify_product, lookup)
             if message:
                 self.create_log_line_for_queue_line(instance, message, model_name, product_data_line_id,
                                                     order_data_line_id, sku, create_activity=True)
@@ -594,6 +611,7 @@ class ShopifyProductTemplateEpt(models.Model):
                 need_to_update_template = False
 
             elif instance.auto_import_product:
+                self.forget_product_lookup_keys(template_data, lookup)
                 shopify_attributes = template_data.get("options")
                 if odoo_template and odoo_template.attribute_line_ids:
                     if not shopify_template:
@@ -656,13 +674,39 @@ class ShopifyProductTemplateEpt(models.Model):
                                                                           shopify_template)
                 need_to_update_template = False
 
-            instance.shopify_pricelist_id.set_product_price_ept(shopify_product.product_id.id, variant.get("price"))
-            if instance.shopify_compare_pricelist_id:
-                instance.shopify_compare_pricelist_id.set_product_price_ept(shopify_product.product_id.id,
-                                                                            variant.get("compare_at_price"))
+            self.set_shopify_variant_prices(instance, shopify_product, variant, lookup)
 
         return shopify_template
 
+    def set_shopify_variant_prices(self, instance, shopify_product, variant, lookup=None):
+        """
+        This method is used to set the price and compare at price of the variant in the pricelists of the instance.
+        While a batch of queue lines is processed, the prices are collected and written together at its end.
+        @param shopify_product: Shopify variant.
+        @param variant: Data of Shopify variant.
+        @param lookup: ShopifyProductImportLookup of the batch of queue lines, if any.
+        """
+        prices = [(instance.shopify_pricelist_id, variant.get("price"))]
+        if instance.shopify_compare_pricelist_id:
+            prices.append((instance.shopify_compare_pricelist_id, variant.get("compare_at_price")))
+        for pricelist, price in prices:
+            if lookup:
+                lookup.add_price(pricelist, shopify_product.product_id.id, price)
+            else:
+                pricelist.set_product_price_ept(shopify_product.product_id.id, price)
+        return True
+
+    def forget_product_lookup_keys(self, template_data, lookup=None):
+        """
+        This method is used to drop the prefetched data of the template from the lookup of the batch, once Odoo
+        products are created for it the prefetched data is stale.
+        @param template_data: Data of Shopify Template.
+        @param lookup: ShopifyProductImportLookup of the batch of queue lines, if any.
+        """
+        if lookup:
+            lookup.forget(template_data)
+        return True
+
     def check_sku_barcode(self, sku, barcode, name, variant_id, match_by):
         """
         This method is used to check for sku and barcode as per configuration in Settings for matching products.
@@ -817,7 +861,7 @@ class ShopifyProductTemplateEpt(models.Model):
 
         return shopify_product
 
-    def shopify_sync_product_images(self, template_data):
+    def shopify_sync_product_images(self, template_data, downloaded_images=None):
         """
         Author: Bhavesh Jadav 18/12/2019
         This method use for sync image from store and the add reference in shopify.product.image.ept
@@ -834,21 +878,16 @@ class ShopifyProductTemplateEpt(models.Model):
         removed in layer. So far, when no images come in response, those were not removing
         from layer.
         @version: Shopify 13.0.0.23
+        :param downloaded_images: Images already downloaded by download_images_ept, the missing images of the
+        template are downloaded together when it is not passed.
         """
         shopify_product_image_obj = shopify_product_images = self.env["shopify.product.image.ept"]
-        existing_common_template_images = {}
         is_template_image_set = bool(self.product_tmpl_id.image_1920)
-        i = 0
-        for odoo_image in self.product_tmpl_id.ept_image_ids:
-            i += 1
-            if i % 500 == 0: self.env.cache.invalidate()
-            odoo_image.read(['image'])
-            if not odoo_image.image:
-                continue
-            key = hashlib.md5(odoo_image.image).hexdigest()
-            if not key:
-                continue
-            existing_common_template_images.update({key: odoo_image.id})
+        existing_common_template_images = {odoo_image.image_hash: odoo_image.id for odoo_image in
+                                           self.product_tmpl_id.ept_image_ids if odoo_image.image_hash}
+        if downloaded_images is None:
+            downloaded_images = self.env["common.product.image.source.ept"].download_images_ept(
+                self.prepare_shopify_image_urls_to_download(template_data))
         for image in template_data.get("images", {}):
             if image.get("src"):
                 shopify_image_id = str(image.get("id"))
@@ -858,11 +897,13 @@ class ShopifyProductTemplateEpt(models.Model):
                 if not variant_ids:
                     # below method is used to sync simple product images.
                     shopify_product_images += self.sync_simple_product_images(shopify_image_id,
-                                                                              existing_common_template_images, url)
+                                                                              existing_common_template_images, url,
+                                                                              downloaded_images.get(url))
                 else:
                     # The below method is used to sync variable(variation) product images.
                     shopify_product_images += self.sync_variable_product_images(shopify_image_id, url, variant_ids,
-                                                                                is_template_image_set)
+                                                                                is_template_image_set,
+                                                                                downloaded_images.get(url))
 
         all_shopify_product_images = shopify_product_image_obj.search([("shopify_template_id",
                                                                         "=", self.id)])
@@ -881,33 +922,39 @@ class ShopifyProductTemplateEpt(models.Model):
         _logger.info("Images Updated for shopify %s", self.name)
         return True
 
-    def sync_simple_product_images(self, shopify_image_id, existing_common_template_images, url):
+    def sync_simple_product_images(self, shopify_image_id, existing_common_template_images, url, image_data=None):
         """
         This method is used to create images in the Shopify image layer and common product image layer for the
         simple product.
         :param shopify_image_id: Id of the image as received from image response.
-        :param existing_common_template_images: it is used
+        :param existing_common_template_images: Dictionary of image hash and id of the common images of the template.
+        :param image_data: Downloaded image of the url as returned by download_images_ept.
         @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 22 October 2020 .
         Task_id: 167537
         """
         shopify_product_images = self.env["shopify.product.image.ept"]
+        image_source_obj = self.env["common.product.image.source.ept"]
         shopify_product_image = self.search_shopify_product_images(self.id, False, shopify_image_id, False)
         if not shopify_product_image:
             try:
-                response = requests.get(url, stream=True, verify=True, timeout=10)
-                if response.status_code == 200:
-                    image = base64.b64encode(response.content)
-                    key = hashlib.md5(image).hexdigest()
+                if image_data is None:
+                    image_data = image_source_obj.download_images_ept([url]).get(url)
+                if image_data:
+                    key = image_data["image_hash"]
                     if key in existing_common_template_images.keys():
                         shopify_product_image = self.create_shopify_layer_image(shopify_image_id,
                                                                                 existing_common_template_images, key,
                                                                                 False)
                     else:
+                        image = image_source_obj.get_downloaded_image_ept(image_data)
                         if not self.product_tmpl_id.image_1920:
                             self.product_tmpl_id.image_1920 = image
-                            common_product_image = self.product_tmpl_id.ept_image_ids.filtered(lambda x: x.image == self.product_tmpl_id.image_1920)
+                            common_product_image = self.product_tmpl_id.ept_image_ids.filtered(
+                                lambda x: x.image_hash == key)
                         else:
                             common_product_image = self.create_common_product_image(image, url, False)
+                        if common_product_image:
+                            existing_common_template_images.update({key: common_product_image[:1].id})
                         shopify_product_image = self.search_shopify_product_images(self.id, False, False,
                                                                                    common_product_image.id)
                         if shopify_product_image:
@@ -918,6 +965,34 @@ class ShopifyProductTemplateEpt(models.Model):
 
         return shopify_product_images
 
+    def prepare_shopify_image_urls_to_download(self, template_data):
+        """
+        This method is used to find the images of the template response which are not synced to the Shopify image
+        layer yet, only those images have to be downloaded.
+        :param template_data: Data of Shopify Template.
+        :return: List of image urls.
+        """
+        images = [image for image in template_data.get("images", {}) if image.get("src")]
+        if not images:
+            return []
+        synced_images = self.env["shopify.product.image.ept"].search(
+            [("shopify_image_id", "in", [str(image.get("id")) for image in images]),
+             "|", ("shopify_template_id", "=", self.id), ("shopify_variant_id", "in", self.shopify_product_ids.ids)])
+        synced_image_keys = {(image.shopify_template_id.id, image.shopify_variant_id.id, image.shopify_image_id) for
+                             image in synced_images}
+        urls = []
+        for image in images:
+            shopify_image_id = str(image.get("id"))
+            variant_ids = image.get("variant_ids")
+            if not variant_ids:
+                image_keys = [(self.id, False, shopify_image_id)]
+            else:
+                image_keys = [(False, shopify_product.id, shopify_image_id) for shopify_product in
+                              self.shopify_product_ids.filtered(lambda x: int(x.variant_id) in variant_ids)]
+            if any(image_key not in synced_image_keys for image_key in image_keys):
+                urls.append(image.get("src"))
+        return urls
+
     def search_shopify_product_images(self, shopify_template_id, shopify_variant_id, shopify_image_id,
                                       common_product_image):
         """ This method is used to search the shopify images from shopify product images ept table.
@@ -972,41 +1047,39 @@ class ShopifyProductTemplateEpt(models.Model):
         })
         return common_product_image
 
-    def sync_variable_product_images(self, shopify_image_id, url, variant_ids, is_template_image_set):
+    def sync_variable_product_images(self, shopify_image_id, url, variant_ids, is_template_image_set,
+                                     image_data=None):
         """ This method is used to sync images of the variable products.
             :param variant_ids: An array of variant ids associated with the image.
             :param is_template_image_set: It is used to identify that the odoo template has already image set or not.
+            :param image_data: Downloaded image of the url as returned by download_images_ept.
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 22 October 2020 .
             Task_id: 167537
         """
         shopify_product_images = self.env["shopify.product.image.ept"]
+        image_source_obj = self.env["common.product.image.source.ept"]
         shopify_products = self.shopify_product_ids.filtered(lambda x: int(x.variant_id) in variant_ids)
         for shopify_product in shopify_products:
-            existing_common_variant_images = {}
-            for odoo_image in shopify_product.product_id.ept_image_ids:
-                if not odoo_image.image:
-                    continue
-                key = hashlib.md5(odoo_image.image).hexdigest()
-                if not key:
-                    continue
-                existing_common_variant_images.update({key: odoo_image.id})
+            existing_common_variant_images = {odoo_image.image_hash: odoo_image.id for odoo_image in
+                                              shopify_product.product_id.ept_image_ids if odoo_image.image_hash}
             shopify_product_image = self.search_shopify_product_images(False, shopify_product.id, shopify_image_id,
                                                                        False)
             if not shopify_product_image:
                 try:
-                    response = requests.get(url, stream=True, verify=True, timeout=10)
-                    if response.status_code == 200:
-                        image = base64.b64encode(response.content)
-                        key = hashlib.md5(image).hexdigest()
+                    if image_data is None:
+                        image_data = image_source_obj.download_images_ept([url]).get(url)
+                    if image_data:
+                        key = image_data["image_hash"]
                         if key in existing_common_variant_images.keys():
                             shopify_product_image = self.create_shopify_layer_image(shopify_image_id,
                                                                                     existing_common_variant_images,
                                                                                     key, shopify_product)
                         else:
+                            image = image_source_obj.get_downloaded_image_ept(image_data)
                             if not shopify_product.product_id.image_1920 or not is_template_image_set:
                                 shopify_product.product_id.image_1920 = image
                                 common_product_image = shopify_product.product_id.ept_image_ids.filtered(
-                                    lambda x: x.image == shopify_product.product_id.image_1920)
+                                    lambda x: x.image_hash == key)
 
                             else:
                                 common_product_image = self.create_common_product_image(image, url, shopify_product)
@@ -1084,18 +1157,23 @@ class ShopifyProductTemplateEpt(models.Model):
         shopify_product_date = parser.parse(product_date).astimezone(utc).strftime("%Y-%m-%d %H:%M:%S")
         return shopify_product_date
 
-    def shopify_search_odoo_product_variant(self, shopify_instance, variant_id, product_sku, barcode):
+    def shopify_search_odoo_product_variant(self, shopify_instance, variant_id, product_sku, barcode, lookup=None):
         """
         Searches for Shopify/Odoo product with SKU and/or Barcode.
         @param shopify_instance: It is the browsable object of shopify instance
         @param product_sku : It is the default code of product and its type is String
         @param variant_id : It is the id of the product variant and its type is Integer
         @param barcode: Barcode from Shopify product.
+        @param lookup: ShopifyProductImportLookup of the batch of queue lines, if any.
         @author: Maulik Barad on Date 01-Sep-2020.
         """
         odoo_product = self.env["product.product"]
         shopify_product_obj = self.env["shopify.product.product.ept"]
 
+        result = lookup.search_odoo_product_variant(variant_id, product_sku, barcode) if lookup else None
+        if result is not None:
+            return result
+
         shopify_product = shopify_product_obj.search([("variant_id", "=", variant_id),
                                                       ("shopify_instance_id", "=", shopify_instance.id)],
                                                      limit=1)
@@ -1184,9 +1262,10 @@ class ShopifyProductTemplateEpt(models.Model):
 
         return shopify_template
 
-    def is_product_importable(self, template_data, instance, odoo_product, shopify_product):
+    def is_product_importable(self, template_data, instance, odoo_product, shopify_product, lookup=None):
         """
         This method will check if the product can be imported or not.
+        @param lookup: ShopifyProductImportLookup of the batch of queue lines, if any.
         @author: Maulik Barad on Date 03-Sep-2020.
         Changes done by Meera Sidapara on Date 26-Feb-2022.
         """
@@ -1208,13 +1287,17 @@ class ShopifyProductTemplateEpt(models.Model):
             sku and shopify_skus.append(sku)
             barcode and shopify_barcodes.append(barcode)
             if barcode:
-                duplicate_barcode = odoo_product_obj.search([("barcode", "=", barcode)])
-                shopify_variant = shopify_product_obj.search([
-                    ("shopify_instance_id", "=", instance.id),
-                    ("variant_id", "=", variant_id)])
-                shopify_product_ids = shopify_product_obj.search(
-                    [("shopify_instance_id", "=", instance.id), ("exported_in_shopify", "=", False),
-                     ('product_id.barcode', '=', barcode)])
+                barcode_matches = lookup.find_barcode_matches(variant_id, barcode) if lookup else None
+                if barcode_matches is not None:
+                    duplicate_barcode, shopify_variant, shopify_product_ids = barcode_matches
+                else:
+                    duplicate_barcode = odoo_product_obj.search([("barcode", "=", barcode)])
+                    shopify_variant = shopify_product_obj.search([
+                        ("shopify_instance_id", "=", instance.id),
+                        ("variant_id", "=", variant_id)])
+                    shopify_product_ids = shopify_product_obj.search(
+                        [("shopify_instance_id", "=", instance.id), ("exported_in_shopify", "=", False),
+                         ('product_id.barcode', '=', barcode)])
                 shopify_product_ids_list.append(shopify_product_ids)
                 if duplicate_barcode and shopify_variant and shopify_variant.product_id and \
                         shopify_variant.product_id.id != duplicate_barcode.id:
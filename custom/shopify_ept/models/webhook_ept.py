@@ -52,6 +52,7 @@ class ShopifyWebhookEpt(models.Model):
                     raise UserError(_("Something went wrong while deleting the webhook."))
             _logger.info("Deleted %s webhook from Odoo.", record.webhook_action)
         unlink_main = super(ShopifyWebhookEpt, self).unlink()
+        self.env.registry.clear_cache()
         self.deactivate_auto_create_webhook(instance)
         return unlink_main
 
@@ -98,6 +99,14 @@ class ShopifyWebhookEpt(models.Model):
             result.get_webhook()
         return result
 
+    def write(self, vals):
+        """
+        Inherited for clearing the cached webhook data of the instances, used by the webhook routes.
+        """
+        if {"state", "delivery_url", "instance_id"} & set(vals):
+            self.env.registry.clear_cache()
+        return super(ShopifyWebhookEpt, self).write(vals)
+
     def get_route(self):
         """
         Gives delivery URL for the webhook as per the Webhook Action.
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+
+import json
+import logging
+import time
+from datetime import timedelta
+
+import psycopg2.errors
+import pytz
+from dateutil import parser
+
+from odoo import models, fields, api
+from .. import shopify
+
+_logger = logging.getLogger("Shopify Webhook Inbox")
+
+WEBHOOK_INBOX_BATCH_SIZE = 100
+WEBHOOK_INBOX_KEEP_DAYS = 7
+ORDER_WEBHOOK_ROUTE = "shopify_odoo_webhook_for_orders_partially_updated"
+
+
+def _parse_updated_at(updated_at):
+    """
+    Converts the updated_at of a payload to a naive UTC datetime, as Shopify sends it in the timezone of the store.
+    """
+    if not updated_at:
+        return None
+    try:
+        updated_at = parser.isoparse(updated_at)
+    except ValueError:
+        return None
+    if updated_at.tzinfo:
+        updated_at = updated_at.astimezone(pytz.utc).replace(tzinfo=None)
+    return updated_at
+
+
+class ShopifyWebhookInboxEpt(models.Model):
+    _name = "shopify.webhook.inbox.ept"
+    _description = "Shopify Received Webhook"
+    _order = "id"
+    _log_access = False
+
+    shopify_instance_id = fields.Many2one("shopify.instance.ept", string="Instance", required=True,
+                                          ondelete="cascade", index=True)
+    webhook_route = fields.Char(required=True, help="Route of Odoo which received the webhook.")
+    topic = fields.Char(help="Topic of the webhook, sent by Shopify in the X-Shopify-Topic header.")
+    shopify_webhook_id = fields.Char(string="Webhook Delivery Id",
+                                     help="Id of the delivery, sent by Shopify in the X-Shopify-Webhook-Id header. "
+                                          "A delivery retried by Shopify has the same id and is stored only once.")
+    payload = fields.Text(help="Raw body of the webhook.")
+    shopify_resource_id = fields.Char(help="Id of the product, customer or order of the payload.")
+    shopify_updated_at = fields.Datetime(help="Last update of the product, customer or order of the payload.")
+    received_at = fields.Datetime()
+    state = fields.Selection([("draft", "Draft"), ("processing", "Processing"), ("done", "Done"),
+                              ("failed", "Failed"), ("cancel", "Cancelled")], default="draft", index=True)
+    process_claimed_at = fields.Datetime(help="When a cron worker claimed the webhook for processing. A claim older "
+                                              "than the cron execution time is stale.")
+    message = fields.Text()
+
+    _unique_webhook_delivery = models.Constraint('unique(shopify_instance_id,shopify_webhook_id)',
+                                                 "The webhook delivery is already received!")
+
+    @api.model
+    def enqueue_webhook_ept(self, instance_id, webhook_route, topic, shopify_webhook_id, payload):
+        """
+        Stores a received webhook with one insert, it is called by the webhook routes which answer Shopify right
+        after it. A delivery already received is ignored. The id and updated_at of the payload are stored in their
+        own columns for coalescing the updates of an order.
+        :param instance_id: Id of the Shopify instance.
+        :param webhook_route: Route which received the webhook.
+        :param topic: Topic of the webhook.
+        :param shopify_webhook_id: Id of the delivery.
+        :param payload: Raw body of the webhook.
+        :return: True if the webhook was stored, False for a duplicate delivery.
+        """
+        try:
+            res = json.loads(payload or "{}")
+        except ValueError:
+            res = {}
+        resource_id = isinstance(res, dict) and res.get("id")
+        updated_at = isinstance(res, dict) and _parse_updated_at(res.get("updated_at"))
+        self.env.cr.execute("""
+            INSERT INTO shopify_webhook_inbox_ept (shopify_instance_id, webhook_route, topic, shopify_webhook_id,
+                                                   payload, shopify_resource_id, shopify_updated_at, received_at, state)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, NOW() AT TIME ZONE 'UTC', 'draft')
+            ON CONFLICT (shopify_instance_id, shopify_webhook_id) DO NOTHING
+        """, (instance_id, webhook_route, topic, shopify_webhook_id or None, payload,
+              str(resource_id) if resource_id else None, updated_at or None))
+        return bool(self.env.cr.rowcount)
+
+    def auto_process_webhook_inbox(self):
+        """
+        Processes the received webhooks in the order they were received, batch by batch, until the inbox is empty or
+        the execution time of the cron is over. It is called from the webhook inbox cron, which is also triggered
+        by the webhook routes.
+        Order updates wait for the debounce time of their instance and the superseded ones are cancelled first, so
+        an order updated many times in a few seconds is processed once with its latest payload. The cron is
+        triggered again for the order updates still waiting.
+        """
+        start = time.time()
+        cron_time = self.env["shopify.instance.ept"].get_shopify_cron_execution_time(
+            "shopify_ept.process_shopify_webhook_inbox")
+        while time.time() - start < cron_time - 60:
+            self.cancel_superseded_order_webhooks()
+            self.env.cr.commit()
+            webhooks = self.claim_webhooks(cron_time)
+            if not webhooks:
+                break
+            webhooks.process_webhooks(start + cron_time - 60)
+        self.unlink_processed_webhooks()
+        self.trigger_debounced_order_webhooks()
+        return True
+
+    def cancel_superseded_order_webhooks(self):
+        """
+        Cancels the draft order updates for which a later update of the same order is received, by updated_at and
+        then by arrival, or an update at least as recent is already processed or being processed, with one query.
+        Only draft webhooks are cancelled, a claimed webhook is in the processing state and is never touched.
+        """
+        self.flush_model()
+        self.env.cr.execute("""
+            UPDATE shopify_webhook_inbox_ept AS inbox
+            SET state = 'cancel', message = 'Superseded by a later update of the order.'
+            WHERE inbox.state = 'draft' AND inbox.webhook_route = %(route)s AND inbox.shopify_resource_id IS NOT NULL
+            AND EXISTS (
+                SELECT 1 FROM shopify_webhook_inbox_ept AS later
+                WHERE later.shopify_instance_id = inbox.shopify_instance_id AND later.webhook_route = %(route)s
+                AND later.shopify_resource_id = inbox.shopify_resource_id AND later.id != inbox.id
+                AND ((later.state = 'draft'
+                      AND (COALESCE(later.shopify_updated_at, 'epoch'::timestamp), later.id)
+                          > (COALESCE(inbox.shopify_updated_at, 'epoch'::timestamp), inbox.id))
+                     OR (later.state IN ('processing', 'done')
+                         AND later.shopify_updated_at >= inbox.shopify_updated_at)))
+        """, {"route": ORDER_WEBHOOK_ROUTE})
+        if self.env.cr.rowcount:
+            _logger.info("Cancelled %s superseded order update webhooks.", self.env.cr.rowcount)
+            self.invalidate_model(["state", "message"])
+        return True
+
+    def trigger_debounced_order_webhooks(self):
+        """
+        Triggers the cron at the end of the debounce time of the first order update still waiting.
+        """
+        self.env.cr.execute("""
+            SELECT MIN(inbox.received_at + COALESCE(instance.order_webhook_debounce_time, 0) * INTERVAL '1 second')
+            FROM shopify_webhook_inbox_ept AS inbox
+            INNER JOIN shopify_instance_ept AS instance ON instance.id = inbox.shopify_instance_id
+            WHERE inbox.state = 'draft' AND inbox.webhook_route = %s AND instance.active IS TRUE
+        """, (ORDER_WEBHOOK_ROUTE,))
+        next_call = self.env.cr.fetchone()[0]
+        cron = self.env.ref("shopify_ept.process_shopify_webhook_inbox", False)
+        if next_call and cron:
+            cron._trigger(at=max(next_call, fields.Datetime.now()) + timedelta(seconds=1))
+        return True
+
+    def claim_webhooks(self, claim_timeout, limit=WEBHOOK_INBOX_BATCH_SIZE):
+        """
+        Claims a batch of draft webhooks for this worker. The rows are selected with FOR UPDATE SKIP LOCKED and set
+        to processing, and the claim is committed at once, so it holds while the webhooks are processed in their own
+        transactions and concurrent workers never process the same webhook. Order updates are claimed once their
+        debounce time is over. Claims older than the claim timeout belong to a worker which was killed and are
+        taken over.
+        :param claim_timeout: Seconds after which a claim is stale, the execution time of the cron.
+        :param limit: Number of webhooks claimed together.
+        :return: Records of the claimed webhooks, oldest first.
+        """
+        self.flush_model()
+        self.env.cr.commit()
+        claim_query = """
+            UPDATE shopify_webhook_inbox_ept
+            SET state = 'processing', process_claimed_at = NOW() AT TIME ZONE 'UTC'
+            WHERE id IN (
+                SELECT inbox.id FROM shopify_webhook_inbox_ept AS inbox
+                INNER JOIN shopify_instance_ept AS instance ON instance.id = inbox.shopify_instance_id
+                WHERE instance.active IS TRUE
+                AND (inbox.state = 'draft'
+                     OR (inbox.state = 'processing'
+                         AND inbox.process_claimed_at < NOW() AT TIME ZONE 'UTC' - %s * INTERVAL '1 second'))
+                AND (inbox.webhook_route != %s OR inbox.received_at <= NOW() AT TIME ZONE 'UTC'
+                     - COALESCE(instance.order_webhook_debounce_time, 0) * INTERVAL '1 second')
+                ORDER BY inbox.id
+                LIMIT %s
+                FOR UPDATE OF inbox SKIP LOCKED
+            )
+            RETURNING id
+        """
+        try:
+            with self.env.cr.savepoint():
+                self.env.cr.execute(claim_query, (claim_timeout, ORDER_WEBHOOK_ROUTE, limit))
+                webhook_ids = [row[0] for row in self.env.cr.fetchall()]
+        except psycopg2.errors.SerializationFailure:
+            _logger.info("Webhooks were claimed by another worker at the same time, retrying later.")
+            return self.browse()
+        self.env.cr.commit()
+        webhooks = self.browse(sorted(webhook_ids))
+        webhooks.invalidate_recordset(["state", "process_claimed_at"])
+        return webhooks
+
+    def process_webhooks(self, deadline=None):
+        """
+        Processes the claimed webhooks one by one, each one in its own transaction as the processes of the routes
+        commit themselves. A failing webhook is rolled back and marked as failed in a new transaction. The webhooks
+        not processed before the deadline are released.
+        :param deadline: time.time() after which the remaining webhooks are released.
+        """
+        for index, webhook in enumerate(self):
+            if deadline and time.time() > deadline:
+                self[index:].write({"state": "draft", "process_claimed_at": False})
+                self.env.cr.commit()
+                break
+            try:
+                webhook.process_webhook()
+                webhook.write({"state": "done"})
+                self.env.cr.commit()
+            except Exception as error:
+                self.env.cr.rollback()
+                _logger.exception("Webhook %s of instance %s could not be processed.", webhook.webhook_route,
+                                  webhook.shopify_instance_id.name)
+                webhook.write({"state": "failed", "message": str(error)})
+                self.env.cr.commit()
+        return True
+
+    def process_webhook(self):
+        """
+        Calls the process of the route of the webhook.
+        """
+        res = json.loads(self.payload or "{}")
+        instance = self.shopify_instance_id
+        route = self.webhook_route
+        if route in ["shopify_odoo_webhook_for_product_create", "shopify_odoo_webhook_for_product_update",
+                     "shopify_odoo_webhook_for_product_delete"]:
+            self.process_product_webhook(res, instance, route)
+        elif route in ["shopify_odoo_webhook_for_customer_create", "shopify_odoo_webhook_for_customer_update"]:
+            self.process_customer_webhook(res, instance, route)
+        elif route == ORDER_WEBHOOK_ROUTE:
+            self.process_order_webhook(res, instance)
+        return True
+
+    def process_product_webhook(self, res, instance, route):
+        """
+        Creates the product queue of a created or updated product, and archives the template of a deleted product.
+        """
+        _logger.info("%s call for product: %s", route, res.get("title"))
+        shopify_template = self.env["shopify.product.template.ept"].with_context(active_test=False).search(
+            [("shopify_tmpl_id", "=", res.get("id")), ("shopify_instance_id", "=", instance.id)], limit=1)
+
+        if route in ['shopify_odoo_webhook_for_product_update',
+                     'shopify_odoo_webhook_for_product_create'] and shopify_template or res.get("published_at"):
+            # when new product is created via webhook, response does not have require_shipping field
+            # to get all data about the product, external api is being called.
+            instance.connect_in_shopify()
+            shopify_product = shopify.Product().find(ids=str(res.get('id')))[0]
+            self.env["shopify.product.data.queue.ept"].create_shopify_product_queue_from_webhook(shopify_product,
+                                                                                                 instance)
+
+        if route == 'shopify_odoo_webhook_for_product_delete' and shopify_template:
+            shopify_template.write({"active": False})
+        return True
+
+    def process_customer_webhook(self, res, instance, route):
+        """
+        Creates or updates the customer of the webhook.
+        """
+        if res.get("first_name") or res.get("last_name"):
+            _logger.info(f"{route} call for Customer: {res.get('first_name')} {res.get('last_name')}")
+            self.env["shopify.process.import.export"].webhook_customer_create_process(res, instance)
+        return True
+
+    def process_order_webhook(self, res, instance):
+        """
+        Updates the existing order of the webhook, or imports it as a new order.
+        """
+        sale_order = self.env["sale.order"]
+        _logger.info("UPDATE ORDER WEBHOOK call for order: %s", res.get("name"))
+
+        fulfillment_status = res.get("fulfillment_status") or "unfulfilled"
+        if sale_order.search_read([("shopify_instance_id", "=", instance.id),
+                                   ("shopify_order_id", "=", res.get("id")),
+                                   ("shopify_order_number", "=", res.get("order_number"))], ["id"]):
+            sale_order.process_shopify_order_via_webhook(res, instance, True)
+        elif fulfillment_status in ["fulfilled", "unfulfilled", "partial"]:
+            res["fulfillment_status"] = fulfillment_status
+            sale_order.with_context({'is_new_order': True}).process_shopify_order_via_webhook(res, instance)
+        return True
+
+    def unlink_processed_webhooks(self, days=WEBHOOK_INBOX_KEEP_DAYS):
+        """
+        Deletes the processed webhooks older than the given days. They are kept that long to ignore the deliveries
+        retried by Shopify, which retries a failed delivery for 48 hours.
+        """
+        self.flush_model()
+        self.env.cr.execute("""DELETE FROM shopify_webhook_inbox_ept
+                               WHERE state IN ('done', 'cancel') AND received_at < NOW() AT TIME ZONE 'UTC' - %s * INTERVAL '1 day'
+                            """, (days,))
+        self.invalidate_model()
+        return True
@@ -10,6 +10,8 @@ import six
 
 from .collection import PaginatedCollection
 from . pyactiveresource.collection import Collection
+from ..shopify_graphql.http_pool import get_shop_session, resolve_timeout
+import requests
 
 # Store the response from the last request in the connection object
 
@@ -26,6 +28,37 @@ class ShopifyConnection(pyactiveresource.connection.Connection):
             raise
         return self.response
 
+    def _urlopen(self, request):
+        """Send the request through the keep-alive session of the shop instead of urllib.
+
+        Returns a response for every status code, pyactiveresource raises the matching error in _handle_error.
+        """
+        session = get_shop_session(self.site)
+        try:
+            response = session.request(request.get_method(), request.full_url, data=request.data,
+                                       headers=dict(request.header_items()),
+                                       timeout=resolve_timeout(self.timeout), allow_redirects=False)
+        except requests.exceptions.RequestException as err:
+            raise urllib.error.URLError(err)
+        return PooledHTTPResponse(response)
+
+
+class PooledHTTPResponse(object):
+    """Minimal httplib.HTTPResponse interface over a requests response, as used by pyactiveresource."""
+
+    def __init__(self, response):
+        self.code = response.status_code
+        self.msg = response.reason
+        self.url = response.url
+        self.headers = response.headers
+        self._response = response
+
+    def read(self):
+        return self._response.content
+
+    def close(self):
+        self._response.close()
+
 
 # Inherit from pyactiveresource's metaclass in order to use ShopifyConnection
 
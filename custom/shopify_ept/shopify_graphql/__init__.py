@@ -2,3 +2,7 @@ from .queries import *
 from .client import *
 from .exceptions import *
 from .utils import *
+from .throttle import *
+from .http_pool import *
+from .registry import *
+from .transformer import *
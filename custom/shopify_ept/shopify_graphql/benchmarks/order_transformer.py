@@ -0,0 +1,229 @@
+"""
+Benchmark of GraphQLRestTransformer against the recursive converter it replaced.
+
+Run from the shopify_ept directory:
+    python -m shopify_graphql.benchmarks.order_transformer [order_count]
+"""
+import copy
+import re
+import sys
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from ..transformer import GraphQLRestTransformer
+
+
+def _money(amount, currency='USD', presentment_currency='EUR'):
+    return {'presentmentMoney': {'amount': str(amount), 'currencyCode': presentment_currency},
+            'shopMoney': {'amount': str(amount), 'currencyCode': currency}}
+
+
+def build_order_fixture(index):
+    """
+    Returns a raw GraphQL order shaped like the response of OrderQueryHelper.rest_order_fields.
+    """
+    order_id = 5000000000000 + index
+    line_items = [{
+        'id': f'gid://shopify/LineItem/{order_id * 10 + line}',
+        'name': f'Product {line}', 'quantity': line + 1, 'requiresShipping': True, 'taxable': True,
+        'fulfillmentStatus': 'UNFULFILLED', 'currentQuantity': line + 1, 'fulfillableQuantity': line + 1,
+        'product': {'id': f'gid://shopify/Product/{800 + line}'},
+        'variant': {'id': f'gid://shopify/ProductVariant/{900 + line}', 'sku': f'SKU-{line}', 'title': 'Default'},
+        'originalUnitPriceSet': _money(10 + line), 'originalTotalSet': _money(20 + line),
+        'totalDiscountSet': _money(0),
+        'taxLines': [{'title': 'VAT', 'rate': 0.2, 'ratePercentage': 20.0, 'priceSet': _money(2)}],
+        'discountAllocations': [{'allocatedAmountSet': _money(1)}],
+    } for line in range(3)]
+    return {
+        'id': f'gid://shopify/Order/{order_id}', 'name': f'#{1000 + index}', 'email': 'jane@example.com',
+        'clientIp': '127.0.0.1', 'createdAt': '2024-01-01T10:00:00Z', 'updatedAt': '2024-01-02T10:00:00Z',
+        'displayFinancialStatus': 'PAID', 'displayFulfillmentStatus': 'UNFULFILLED', 'sourceName': 'WEB',
+        'tags': ['b2b', 'vip'], 'taxesIncluded': False, 'presentmentCurrencyCode': 'EUR',
+        'totalPriceSet': _money(66), 'totalDiscountsSet': _money(3), 'totalTaxSet': _money(6),
+        'totalShippingPriceSet': _money(5), 'subtotalPriceSet': _money(55),
+        'customer': {'id': f'gid://shopify/Customer/{700 + index}', 'firstName': 'Jane', 'lastName': 'Doe',
+                     'defaultAddress': {'countryCodeV2': 'US', 'provinceCode': 'NY', 'zip': '10001'}},
+        'shippingAddress': {'address1': '1 Main St', 'city': 'New York', 'countryCodeV2': 'US', 'zip': '10001'},
+        'lineItems': {'nodes': line_items},
+        'shippingLines': {'nodes': [{'id': f'gid://shopify/ShippingLine/{order_id}', 'title': 'Standard',
+                                     'code': 'STD', 'source': 'shopify', 'discountedPriceSet': _money(5),
+                                     'originalPriceSet': _money(5), 'taxLines': []}]},
+        'transactions': [{'id': f'gid://shopify/OrderTransaction/{order_id}', 'kind': 'SALE',
+                          'status': 'SUCCESS', 'gateway': 'shopify_payments', 'amountSet': _money(66),
+                          'createdAt': '2024-01-01T10:00:00Z'}],
+    }
+
+
+class LegacyOrderConverter:
+    """
+    The recursive regex based converter of OrderQueryHelper before GraphQLRestTransformer.
+    """
+
+    def __init__(self, use_presentment=False):
+        self.use_presentment = use_presentment
+
+    @staticmethod
+    def _extract_id_from_gid(gid: str) -> Optional[int]:
+        """Extracts the numerical ID from a Shopify Global ID string."""
+        if not isinstance(gid, str):
+            return None
+        match = re.search(r'\/(\d+)$', gid)
+        return int(match.group(1)) if match else None
+
+    def _flatten_money_set(self, key: str, value: Dict[str, Any]) -> Tuple[str, str, str]:
+        """
+        Flattens GraphQL MoneySet objects into the REST key/value pair.
+        Conditionally selects shopMoney or presentmentMoney based on self.use_presentment.
+        """
+        # 1. Determine the REST-style key (snake_case, removing 'Set')
+        new_key_rest = key.replace('Set', '')
+        new_key_rest = re.sub(r'(?<!^)(?=[A-Z])', '_', new_key_rest).lower()
+
+        # 2. Handle specific REST key names and duplicates
+        if new_key_rest in ('totalprice', 'totaldiscounts'):
+            new_key_rest = new_key_rest.replace('total', 'total_')
+        if new_key_rest in ('original_unit_price', 'original_price'):
+            new_key_rest = 'price'
+        if new_key_rest == 'allocated_amount':
+            new_key_rest = 'amount'  # Ensures the resulting key is 'amount'
+        if self.use_presentment:
+            amount_to_use = value['presentmentMoney']['amount']
+        else:
+            amount_to_use = value['shopMoney']['amount']
+        set_key = new_key_rest + '_set'
+        return new_key_rest, set_key, amount_to_use
+
+    def _convert_graphql_to_rest_fields(self, data: Any) -> Any:
+        """
+        Recursively processes the GraphQL response to convert GIDs, flatten money sets,
+        handle list nodes, and flatten line item specific nested fields for REST compatibility.
+        @author: Gopal Chouhan @Emipro Technologies Pvt. Ltd on date 27/.
+        """
+        if isinstance(data, dict):
+            new_data = {}
+            # Assuming the class is named 'OrderQueryHelper' for static method calls
+            # If the actual class name is different, replace 'OrderQueryHelper' below.
+            OrderQueryHelper = self.__class__  # noqa: N806
+            for key, value in data.items():
+                # 1. Handle GraphQL 'nodes' list structure
+                if key == 'nodes' and isinstance(value, list):
+                    # Recursively convert all items in the list
+                    return [self._convert_graphql_to_rest_fields(item) for item in value]
+
+                # 2. Handle embedded list wrappers (e.g., lineItems: { nodes: [...] })
+                if isinstance(value, dict) and 'nodes' in value:
+                    # Convert the collection key from CamelCase (e.g., 'LineItems') to snake_case ('line_items')
+                    new_key = re.sub(r'(?<!^)(?=[A-Z])', '_', key).lower()
+                    # Recursively convert the 'nodes' list and assign it to the new snake_case key
+                    new_data[new_key] = self._convert_graphql_to_rest_fields(value.get('nodes', []))
+                    continue  # Skip the rest of the loop for this key
+
+                # 3. Flatten MoneySet fields and map to REST names
+                if key.endswith('Set') and isinstance(value, dict) and 'shopMoney' in value:
+                    # Call _flatten_money_set as an instance method
+                    new_key_rest, set_key, amount = self._flatten_money_set(key, value)
+
+                    new_data[new_key_rest] = amount
+                    new_data[set_key] = self._convert_graphql_to_rest_fields(value)
+
+                    # Add currency field based on the conditional logic
+                    if new_key_rest in ('amount', 'total_price', 'subtotal_price',
+                                        'price'):  # Applies to transactions and core price fields
+                        if self.use_presentment:
+                            new_data['currency'] = value['presentmentMoney']['currencyCode']
+                        else:
+                            new_data['currency'] = value['shopMoney']['currencyCode']
+
+                    continue
+
+                # 4. Convert GIDs
+                elif key == 'id' and isinstance(value, str) and value.startswith('gid://shopify/'):
+                    # Convert GID to numeric ID
+                    numeric_id = OrderQueryHelper._extract_id_from_gid(value)
+                    new_data[key] = numeric_id
+                    # Also keep the admin_graphql_api_id for full REST compatibility
+                    new_data['admin_graphql_api_id'] = value
+
+                # 5. Handle Line Item specific renames (originalTotalSet mapping)
+                elif key == 'originalTotalSet' and isinstance(data, dict):
+                    # Omit as it maps to 'price' which is handled by originalUnitPriceSet -> price
+                    continue
+
+                # 5.5. NEW: Flatten Line Item Nested Data (Product, Variant, Fulfillment Service)
+                elif key == 'product' and isinstance(value, dict) and 'id' in value:
+                    # Move product ID to top level as 'product_id'
+                    new_data['product_id'] = OrderQueryHelper._extract_id_from_gid(value['id'])
+                    # Don't continue here yet, in case 'product' has other fields you need to recurse over.
+
+                elif key == 'variant' and isinstance(value, dict):
+                    # Move variant ID, SKU, and Title to top level
+                    new_data['variant_id'] = OrderQueryHelper._extract_id_from_gid(value.get('id'))
+                    new_data['sku'] = value.get('sku')
+                    new_data['variant_title'] = value.get('title')
+                    # Do not recurse further on 'variant' to prevent unwanted keys from merging
+                    continue
+
+                elif key == 'fulfillment_service' and isinstance(value, dict) and 'service_name' in value:
+                    # Flatten the fulfillment service name from the dictionary
+                    new_data['fulfillment_service'] = value.get('service_name')
+                    continue
+
+                # 6. Generic recursion and key conversion (CamelCase to snake_case)
+                else:
+                    new_key = key
+                    # Only convert to snake_case if it doesn't match an already defined REST field name
+                    # and isn't a special-cased GraphQL field.
+                    # 1. Update Exclusion List: Keep only admin_graphql_api_id and currencyCode
+                    # We remove displayFinancialStatus and displayFulfillmentStatus to allow
+                    # them to be converted to snake_case first.
+                    if key not in ('admin_graphql_api_id', 'currencyCode'):
+
+                        # Apply general CamelCase to snake_case conversion (e.g., displayFinancialStatus -> display_financial_status)
+                        new_key = re.sub(r'(?<!^)(?=[A-Z])', '_', key).lower()
+
+                        # Clean up specific common conversions (These lines remain helpful)
+                        new_key = new_key.replace('code_v2', 'code')
+                        new_key = new_key.replace('client_ip', 'browser_ip')
+                        new_key = new_key.replace('legacy_resource_id', 'id')
+                        if new_key == 'display_financial_status':
+                            new_key = 'financial_status'
+                        if new_key == 'display_fulfillment_status':
+                            new_key = 'fulfillment_status'
+                        if new_key == 'name' and isinstance(data, dict):
+                            # We need to ensure this is the top-level 'name' field and not a nested one.
+                            # This will create a key 'order_number' with the same value as 'name'.
+                            new_data['order_number'] = value
+                        if new_key in ('kind', 'status', 'source_name', 'financial_status', 'fulfillment_status') and \
+                                isinstance(value, str):
+                            value = value.lower()
+                    new_data[new_key] = self._convert_graphql_to_rest_fields(value)
+            return new_data
+        elif isinstance(data, list):
+            # Recurse through list items
+            return [self._convert_graphql_to_rest_fields(item) for item in data]
+        return data
+
+
+def _run(label, convert, orders):
+    start = time.perf_counter()
+    result = [convert(order) for order in orders]
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {elapsed:8.3f}s  {len(orders) / elapsed:10.0f} orders/s")
+    return result, elapsed
+
+
+def main(order_count=10000):
+    orders = [build_order_fixture(index) for index in range(order_count)]
+    for use_presentment in (False, True):
+        print(f"{order_count} orders, use_presentment={use_presentment}")
+        legacy = LegacyOrderConverter(use_presentment)
+        transformer = GraphQLRestTransformer(use_presentment)
+        legacy_result, legacy_time = _run('legacy', legacy._convert_graphql_to_rest_fields, copy.deepcopy(orders))
+        compiled_result, compiled_time = _run('compiled', transformer.convert, copy.deepcopy(orders))
+        if legacy_result != compiled_result:
+            raise SystemExit("The compiled transformer returned different orders than the legacy converter.")
+        print(f"speedup      {legacy_time / compiled_time:8.2f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
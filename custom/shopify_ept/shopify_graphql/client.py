@@ -2,6 +2,9 @@ import requests
 import logging
 import time
 
+from .http_pool import get_shop_session, resolve_timeout
+from .throttle import get_shop_throttle
+
 _logger = logging.getLogger("Shopify GraphQL Client")
 
 
@@ -28,34 +31,72 @@ class GraphQLObject:
 
 
 class ShopifyGraphQLClient:
-    def __init__(self, access_token, shop_url):
+    def __init__(self, access_token, shop_url, timeout=None):
         self.access_token = access_token
         self.shop_url = shop_url.rstrip('/')
         self.endpoint = f"{self.shop_url}/admin/api/2026-01/graphql.json"
         self.MAX_RETRIES = 3  # Max retries for a single API execution
+        self.MAX_THROTTLE_RETRIES = 10  # Max transparent retries of a throttled API execution
         self.graphql_object = GraphQLObject
+        self.throttle = get_shop_throttle(self.shop_url)
+        self.session = get_shop_session(self.shop_url)
+        self.timeout = resolve_timeout(timeout)
+
+    @staticmethod
+    def is_throttled(result):
+        """
+        Returns True when Shopify rejected the query because the cost bucket of the shop was empty.
+        """
+        if not isinstance(result, dict):
+            return False
+        return any(isinstance(error, dict) and error.get('extensions', {}).get('code') == 'THROTTLED'
+                   for error in result.get('errors') or [])
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            return max(float(response.headers.get('Retry-After', 1.0)), 0.5)
+        except (TypeError, ValueError):
+            return 1.0
 
     def execute(self, query, variables=None):
+        """
+        Execute the query after reserving its expected cost in the leaky bucket of the shop.
+        THROTTLED and 429 responses are retried transparently up to MAX_THROTTLE_RETRIES times.
+        :param query: GraphQL query or mutation string
+        :param variables: dict of GraphQL variables
+        :return: response dict
+        """
         headers = {
             "Content-Type": "application/json",
             "X-Shopify-Access-Token": self.access_token,
         }
         payload = {"query": query}
-        response = []
         if variables:
             payload["variables"] = variables
-        for attempt in range(self.MAX_RETRIES):
+        attempt = 0
+        throttle_retries = 0
+        while True:
+            self.throttle.acquire(self.throttle.estimate_cost(query))
             try:
                 # Execute the API call
-                response = requests.post(self.endpoint, json=payload, headers=headers)
+                response = self.session.post(self.endpoint, json=payload, headers=headers, timeout=self.timeout)
+                if response.status_code == 429 and throttle_retries < self.MAX_THROTTLE_RETRIES:
+                    throttle_retries += 1
+                    wait_time = self._retry_after(response)
+                    _logger.info(f"Shopify API returned 429 (Retry {throttle_retries}/{self.MAX_THROTTLE_RETRIES}). "
+                                 f"Retrying after {wait_time}s.")
+                    time.sleep(wait_time)
+                    continue
                 response.raise_for_status()
-                return response.json()
+                result = response.json()
             except requests.exceptions.ConnectionError as e:
                 # Catch network specific errors (like Errno 101)
                 if attempt < self.MAX_RETRIES - 1:
                     wait_time = 2 ** attempt  # Exponential backoff: 1s, 2s, 4s...
+                    attempt += 1
                     _logger.warning(
-                        f"Shopify network connection failed (Attempt {attempt + 1}/{self.MAX_RETRIES}). Retrying after {wait_time}s. Error: {e.args[0]}"
+                        f"Shopify network connection failed (Attempt {attempt}/{self.MAX_RETRIES}). Retrying after {wait_time}s. Error: {e.args[0]}"
                     )
                     time.sleep(wait_time)
                     continue  # Continue to the next attempt
@@ -69,7 +110,15 @@ class ShopifyGraphQLClient:
                 # Catch other unknown exceptions
                 _logger.error(f"Unexpected error during Shopify API execution: {e}.")
                 raise e
-        return response
+            if isinstance(result, dict):
+                self.throttle.update(query, (result.get('extensions') or {}).get('cost'))
+            if self.is_throttled(result) and throttle_retries < self.MAX_THROTTLE_RETRIES:
+                throttle_retries += 1
+                _logger.info(f"Shopify GraphQL query throttled (Retry {throttle_retries}/{self.MAX_THROTTLE_RETRIES}). "
+                             f"Waiting {self.throttle.wait_time_for(self.throttle.estimate_cost(query)):.2f}s "
+                             f"for the cost bucket to refill.")
+                continue
+            return result
 
     def bulk_operation(self, query):
         bulk_query = """
@@ -0,0 +1,66 @@
+import logging
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import brotli  # noqa: F401 urllib3 decodes br responses only when brotli is installed.
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+_logger = logging.getLogger("Shopify HTTP Pool")
+
+# (connect timeout, read timeout) in seconds used when the caller does not pass its own timeout.
+DEFAULT_TIMEOUT = (10, 120)
+# Keep-alive connections kept open per shop, enough for the workers of one process.
+POOL_MAXSIZE = 10
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _shop_key(url):
+    return (urlparse(url).netloc or url or '').lower()
+
+
+def get_shop_session(url):
+    """
+    Returns the process wide keep-alive session of the shop, creating it on first use.
+    The session is shared by the GraphQL client and the REST connection of the shop, so TCP and TLS
+    connections are reused by every API call made from this process.
+    :param url: any url of the shop (GraphQL endpoint or REST site)
+    :return: requests.Session
+    """
+    key = _shop_key(url)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({"Accept-Encoding": ACCEPT_ENCODING, "Connection": "keep-alive"})
+            _sessions[key] = session
+            _logger.debug(f"Created HTTP connection pool for {key}.")
+        return session
+
+
+def close_shop_session(url):
+    """
+    Closes and forgets the session of the shop, e.g. when the credentials of the instance change.
+    :param url: any url of the shop
+    """
+    with _sessions_lock:
+        session = _sessions.pop(_shop_key(url), None)
+    if session is not None:
+        session.close()
+
+
+def resolve_timeout(timeout=None):
+    """
+    Returns the timeout to use for a request, falling back to DEFAULT_TIMEOUT.
+    """
+    return timeout if timeout else DEFAULT_TIMEOUT
@@ -4,6 +4,7 @@ from .order import OrderQueryHelper
 from .product import ProductQueryHelper
 from .refund import RefundQueryHelper
 from .fulfillment import FulfillmentQueryHelper
+from .customer import CustomerQueryHelper
 from .inventory import InventoryQueryHelper
 from .bulk_order import BulkOrderQueryHelper
 from .bulk_order_helper import ShopifyBulkOrderHelper
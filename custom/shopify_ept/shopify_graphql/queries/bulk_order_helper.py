@@ -1,92 +1,190 @@
-import time
-import requests
+import json
+import logging
+import re
+
+from ..http_pool import get_shop_session, resolve_timeout
+from .order import OrderQueryHelper
+
+_logger = logging.getLogger(__name__)
+
 
 class ShopifyBulkOrderHelper:
     """
-    Helper class to run Shopify bulk order export, poll status, and download results.
+    Helper class to run a Shopify bulk order export and stream its JSONL result.
+    Bulk queries are limited to five connections, two levels of nesting and no connections inside list
+    fields. The order fields of OrderQueryHelper.rest_order_fields which respect those limits are exported
+    in bulk, the others (refunds, fulfillments and returns) are fetched afterwards with nodes(ids:) queries
+    only for the orders which have them.
     """
-    def __init__(self, client):
+    BULK_FIELD_GROUPS = ('basic', 'customer_data', 'line_items', 'transactions')
+    BULK_EXTRA_FIELDS = '''
+        fulfillmentOrders { nodes { id orderId orderName status lineItems { nodes { id lineItem { id } } } assignedLocation { location { id } } } }
+        risk { assessments { riskLevel facts { description sentiment } provider { id title webhookApiVersion } } recommendation }
+        refunds { id } fulfillments { id } returnStatus
+    '''
+    # Connection fields of the bulk query by parent type and the connection a child GID type belongs to.
+    PARENT_CONNECTIONS = {
+        'Order': ('lineItems', 'shippingLines', 'fulfillmentOrders'),
+        'FulfillmentOrder': ('lineItems',),
+    }
+    CHILD_CONNECTIONS = {
+        'LineItem': 'lineItems',
+        'ShippingLine': 'shippingLines',
+        'FulfillmentOrder': 'fulfillmentOrders',
+        'FulfillmentOrderLineItem': 'lineItems',
+    }
+    BULK_OPERATION_FIELDS = "id status errorCode objectCount rootObjectCount fileSize url partialDataUrl"
+
+    def __init__(self, client, order_helper=None):
         self.client = client
+        self.order_helper = order_helper or OrderQueryHelper(client)
+
+    @staticmethod
+    def _gid_type(gid):
+        return gid.split('/')[-2] if isinstance(gid, str) and gid.count('/') >= 4 else None
 
-    def run_bulk_order_export(self, fields=None, poll_interval=10, timeout=600):
-        if fields is None:
-            fields = [
-                "id",
-                "name",
-                "createdAt",
-                "email",
-                "totalPriceSet { shopMoney { amount currencyCode } }",
-                "displayFinancialStatus",
-                "displayFulfillmentStatus",
-                "lineItems { edges { node { title quantity originalUnitPriceSet { shopMoney { amount currencyCode } } } } }"
-            ]
-        query_fields = "\n".join(fields)
-        bulk_query = f"""
+    def prepare_bulk_order_query(self, filters):
+        """
+        Returns the bulk query exporting the orders matching the filters.
+        :param filters: dict with fulfillment_status, updated_at_min and updated_at_max
+        """
+        order_fields = self.order_helper.rest_order_fields()
+        fields = "\n".join(order_fields[group] for group in self.BULK_FIELD_GROUPS) + self.BULK_EXTRA_FIELDS
+        # Bulk operations page through every connection by themselves and reject the first argument.
+        fields = re.sub(r'\(\s*first:\s*\d+\s*\)', '', fields)
+        shopify_query = self.order_helper.prepare_order_search_query(filters).replace('"', '\\"')
+        return f'''
         {{
-          orders {{
+          orders(query: "{shopify_query}", sortKey: UPDATED_AT) {{
             edges {{
               node {{
-                {query_fields}
+                {fields}
               }}
             }}
           }}
         }}
+        '''
+
+    def run_bulk_order_query(self, filters):
         """
-        mutation = f'''
-        mutation {{
-          bulkOperationRunQuery(
-            query: """{bulk_query}"""
-          ) {{
-            bulkOperation {{
+        Submits the bulk order export to Shopify.
+        :param filters: dict with fulfillment_status, updated_at_min and updated_at_max
+        :return: bulkOperation dict with id and status
+        """
+        mutation = '''
+        mutation bulkOperationRunQuery($query: String!) {
+          bulkOperationRunQuery(query: $query) {
+            bulkOperation {
               id
               status
-            }}
-            userErrors {{
+            }
+            userErrors {
               field
               message
+            }
+          }
+        }
+        '''
+        result = self.client.execute(mutation, {"query": self.prepare_bulk_order_query(filters)})
+        if 'errors' in result:
+            raise Exception(f"Bulk operation error: {result['errors']}")
+        data = result.get("data", {}).get("bulkOperationRunQuery", {})
+        if data.get("userErrors"):
+            raise Exception(f"Bulk operation error: {data['userErrors']}")
+        return data.get("bulkOperation", {})
+
+    def get_bulk_operation(self, operation_id):
+        """
+        Returns the current state of the bulk operation.
+        :param operation_id: GID of the bulk operation
+        """
+        query = f'''
+        {{
+          node(id: "{operation_id}") {{
+            ... on BulkOperation {{
+              {self.BULK_OPERATION_FIELDS}
             }}
           }}
         }}
         '''
-        result = self.client.execute(mutation)
-        errors = result.get("data", {}).get("bulkOperationRunQuery", {}).get("userErrors", [])
-        if errors:
-            raise Exception(f"Bulk operation error: {errors}")
-        print("Bulk operation started.")
+        result = self.client.execute(query)
+        if 'errors' in result:
+            raise Exception(f"Shopify GraphQL error: {result['errors']}")
+        return result.get("data", {}).get("node") or {}
 
-        start_time = time.time()
-        url = None
-        while time.time() - start_time < timeout:
-            status_query = '''
-            {
-              currentBulkOperation {
-                id
-                status
-                errorCode
-                objectCount
-                fileSize
-                url
-                createdAt
-                completedAt
-              }
-            }
-            '''
-            status_result = self.client.execute(status_query)
-            op = status_result.get("data", {}).get("currentBulkOperation", {})
-            status = op.get("status")
-            print(f"Bulk operation status: {status}")
-            if status == "COMPLETED":
-                url = op.get("url")
-                break
-            elif status in ("FAILED", "CANCELED"):
-                raise Exception(f"Bulk operation failed: {op.get('errorCode')}")
-            time.sleep(poll_interval)
-        if not url:
-            raise TimeoutError("Bulk operation did not complete in time.")
+    def iter_bulk_orders(self, url, skip=0):
+        """
+        Streams the JSONL result of a bulk order export and yields one raw GraphQL order at a time.
+        Child objects of nested connections come as separate lines with __parentId, after their parent and
+        before the next order, so each order is rebuilt into the same nodes structure as a paginated query
+        returns and released as soon as the next order starts.
+        :param url: url of the JSONL result
+        :param skip: number of orders already ingested from this result
+        """
+        session = get_shop_session(url)
+        response = session.get(url, stream=True, timeout=resolve_timeout())
+        response.raise_for_status()
+        order = None
+        nodes_by_id = {}
+        order_index = 0
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                record = json.loads(line)
+                parent_id = record.pop('__parentId', None)
+                if parent_id is None:
+                    if order is not None and order_index > skip:
+                        yield order
+                    order_index += 1
+                    order = record if order_index > skip else None
+                    nodes_by_id = {}
+                    if order is not None:
+                        self._add_bulk_node(order, nodes_by_id)
+                    continue
+                if order is None:
+                    continue
+                parent = nodes_by_id.get(parent_id)
+                connection = self.CHILD_CONNECTIONS.get(self._gid_type(record.get('id')))
+                if parent is None or not connection:
+                    _logger.warning(f"Skipped bulk record {record.get('id')} of unknown parent {parent_id}.")
+                    continue
+                parent[connection]['nodes'].append(record)
+                self._add_bulk_node(record, nodes_by_id)
+            if order is not None:
+                yield order
+        finally:
+            response.close()
 
-        response = requests.get(url)
-        file_path = "shopify_orders_bulk.jsonl"
-        with open(file_path, "wb") as f:
-            f.write(response.content)
-        print(f"Downloaded bulk orders to {file_path}")
-        return file_path
+    def _add_bulk_node(self, record, nodes_by_id):
+        for connection in self.PARENT_CONNECTIONS.get(self._gid_type(record.get('id')), ()):
+            record.setdefault(connection, {'nodes': []})
+        nodes_by_id[record.get('id')] = record
+
+    def complete_bulk_orders(self, raw_orders):
+        """
+        Fetches the field groups which can't be exported in bulk for the orders which have such data and
+        converts the orders into REST order dicts.
+        :param raw_orders: list of raw GraphQL orders from iter_bulk_orders
+        :return: list of REST order dicts
+        """
+        follow_up_groups = {
+            'refunds': [order['id'] for order in raw_orders if order.get('refunds')],
+            'fulfillment': [order['id'] for order in raw_orders if order.get('fulfillments')],
+            'returns_and_risks': [order['id'] for order in raw_orders
+                                  if order.get('returnStatus') not in (None, 'NO_RETURN')],
+        }
+        orders_by_id = {order['id']: [order] for order in raw_orders}
+        failed_groups = {}
+        for group, order_gids in follow_up_groups.items():
+            if not order_gids:
+                continue
+            for order_gid, order_list in self.order_helper.fetch_order_groups_by_ids(
+                    order_gids, [group], failed_groups=failed_groups).items():
+                orders_by_id.get(order_gid, []).extend(order_list)
+        response = []
+        for order_gid, order_list in orders_by_id.items():
+            raw_order = self.order_helper.deep_merge_dicts(order_list)
+            raw_order.pop('returnStatus', None)
+            response.append(self.order_helper.prepare_rest_order(raw_order, failed_groups.get(order_gid)))
+        return response
@@ -0,0 +1,124 @@
+import logging
+
+from ..transformer import gid_to_id
+from ..utils import estimate_query_cost
+
+_logger = logging.getLogger(__name__)
+
+
+class CustomerQueryHelper:
+    MAX_QUERY_COST = 1000  # Shopify rejects a single query requesting more points than this.
+    MAX_PAGE_SIZE = 250
+    ADDRESSES_PER_CUSTOMER = 20
+    ADDRESS_FIELDS = 'id firstName lastName company address1 address2 city province provinceCode country ' \
+                     'countryCodeV2 zip phone name'
+    CUSTOMER_FIELDS = f'''
+        id firstName lastName email phone tags note state taxExempt verifiedEmail createdAt updatedAt
+        defaultAddress {{ {ADDRESS_FIELDS} }}
+        addressesV2(first: {ADDRESSES_PER_CUSTOMER}) {{ nodes {{ {ADDRESS_FIELDS} }} }}
+    '''
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def page_size(cls, fields=CUSTOMER_FIELDS):
+        """
+        Returns the number of customers fetched by one query, as many as the cost of one customer allows below the
+        query cost limit.
+        """
+        return max(1, min(cls.MAX_PAGE_SIZE, (cls.MAX_QUERY_COST - 2) // estimate_query_cost(fields)))
+
+    def build_customer_query(self, updated_at_min=None, after_cursor=None, page_size=None):
+        search_query = f'query: "updated_at:>=\'{updated_at_min}\'", ' if updated_at_min else ''
+        after = f', after: "{after_cursor}"' if after_cursor else ''
+        return f'''
+        {{
+          customers(first: {page_size or self.page_size()}, {search_query}sortKey: UPDATED_AT{after}) {{
+            nodes {{
+              {self.CUSTOMER_FIELDS}
+            }}
+            pageInfo {{
+              hasNextPage endCursor
+            }}
+          }}
+        }}
+        '''
+
+    def iter_customer_pages(self, updated_at_min=None):
+        """
+        Walks the customers updated since updated_at_min, oldest update first, with the cursor of the customers
+        connection. The shared cost throttle of the client waits for the cost bucket of the shop between the pages.
+        :param updated_at_min: ISO 8601 date time string, all customers when empty.
+        :return: generator of lists of customer dicts in the shape of the REST customer response.
+        """
+        cursor = None
+        page_size = self.page_size()
+        while True:
+            result = self.client.execute(self.build_customer_query(updated_at_min, cursor, page_size)) or {}
+            if result.get('errors'):
+                raise Exception(f"Shopify GraphQL error: {result['errors']}")
+            connection = (result.get('data') or {}).get('customers') or {}
+            customers = [self.prepare_rest_customer(node) for node in connection.get('nodes') or []]
+            if customers:
+                yield customers
+            page_info = connection.get('pageInfo') or {}
+            if not page_info.get('hasNextPage'):
+                return
+            cursor = page_info.get('endCursor')
+            _logger.info("Fetched %d customers, next cursor: %s", len(customers), cursor)
+
+    @staticmethod
+    def _address_id(gid):
+        # Address ids carry the model name, e.g. gid://shopify/MailingAddress/1?model_name=CustomerAddress.
+        return gid_to_id(gid.split('?')[0]) if isinstance(gid, str) else None
+
+    @classmethod
+    def prepare_rest_address(cls, address, customer_id, default=False):
+        return {
+            'id': cls._address_id(address.get('id')),
+            'customer_id': customer_id,
+            'first_name': address.get('firstName'),
+            'last_name': address.get('lastName'),
+            'company': address.get('company'),
+            'address1': address.get('address1'),
+            'address2': address.get('address2'),
+            'city': address.get('city'),
+            'province': address.get('province'),
+            'province_code': address.get('provinceCode'),
+            'country': address.get('country'),
+            'country_code': address.get('countryCodeV2'),
+            'zip': address.get('zip'),
+            'phone': address.get('phone'),
+            'name': address.get('name'),
+            'default': default,
+        }
+
+    @classmethod
+    def prepare_rest_customer(cls, node):
+        """
+        Converts a GraphQL customer node into the REST customer dict used by the customer queue.
+        """
+        customer_id = gid_to_id(node.get('id'))
+        default_address = node.get('defaultAddress') or {}
+        default_address_id = cls._address_id(default_address.get('id'))
+        addresses = [cls.prepare_rest_address(address, customer_id,
+                                              cls._address_id(address.get('id')) == default_address_id)
+                     for address in (node.get('addressesV2') or {}).get('nodes') or []]
+        return {
+            'id': customer_id,
+            'first_name': node.get('firstName'),
+            'last_name': node.get('lastName'),
+            'email': node.get('email'),
+            'phone': node.get('phone'),
+            'tags': ', '.join(node.get('tags') or []),
+            'note': node.get('note'),
+            'state': (node.get('state') or '').lower(),
+            'tax_exempt': node.get('taxExempt'),
+            'verified_email': node.get('verifiedEmail'),
+            'created_at': node.get('createdAt'),
+            'updated_at': node.get('updatedAt'),
+            'default_address': cls.prepare_rest_address(default_address, customer_id, True) if default_address
+            else {},
+            'addresses': addresses,
+        }
@@ -1,4 +1,32 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ..transformer import GID_PREFIX, gid_to_id
+
+_logger = logging.getLogger(__name__)
+
+# REST values of the displayFulfillmentStatus of an order, the other statuses are unfulfilled (null in REST).
+_ORDER_FULFILLMENT_STATUS = {'FULFILLED': 'fulfilled', 'PARTIALLY_FULFILLED': 'partial', 'RESTOCKED': 'restocked'}
+
+
 class FulfillmentQueryHelper:
+    ORDERS_PER_QUERY = 40  # Keeps the requested cost of one nodes query below the 1000 points limit.
+    FULFILLMENT_ORDERS_PER_QUERY = 9
+    CONNECTION_PAGE_SIZE = 50
+    MAX_CONCURRENT_MUTATIONS = 4
+    FULFILLMENT_CREATE_MUTATION = '''
+    mutation FulfillmentCreate($fulfillment: FulfillmentInput!) {
+      fulfillmentCreate(fulfillment: $fulfillment) {
+        fulfillment {
+          id
+          status
+          fulfillmentLineItems(first: 100) { nodes { lineItem { id } } }
+        }
+        userErrors { field message }
+      }
+    }
+    '''
+
     def __init__(self, client):
         self.client = client
 
@@ -12,3 +40,198 @@ class FulfillmentQueryHelper:
         }}
         '''
         return self.client.execute(query)
+
+    def _get_nodes(self, gids, fields):
+        query = f'''
+        {{
+          nodes(ids: [{", ".join(f'"{gid}"' for gid in gids)}]) {{
+            {fields}
+          }}
+        }}
+        '''
+        result = self.client.execute(query) or {}
+        if result.get('errors'):
+            raise Exception(f"Shopify GraphQL error: {result['errors']}")
+        return [node for node in (result.get('data') or {}).get('nodes') or [] if node]
+
+    def _get_connection_nodes(self, node, type_name, connection_name, node_fields):
+        """
+        Returns all nodes of a connection of a node fetched by a nodes query. The first page comes with the node,
+        the next pages are fetched with the endCursor of the connection while it has a next page.
+        :param node: dict of the node, requested with the nodes and pageInfo of the connection
+        :param type_name: GraphQL type of the node, e.g. Order
+        :param connection_name: name of the connection field, e.g. fulfillmentOrders
+        :param node_fields: fields requested on the nodes of the connection
+        """
+        connection = node.get(connection_name) or {}
+        nodes = list(connection.get('nodes') or [])
+        page_info = connection.get('pageInfo') or {}
+        while page_info.get('hasNextPage') and page_info.get('endCursor'):
+            query = f'''
+            {{
+              node(id: "{node.get('id')}") {{
+                ... on {type_name} {{
+                  {connection_name}(first: {self.CONNECTION_PAGE_SIZE}, after: "{page_info.get('endCursor')}") {{
+                    nodes {{ {node_fields} }}
+                    pageInfo {{ hasNextPage endCursor }}
+                  }}
+                }}
+              }}
+            }}
+            '''
+            result = self.client.execute(query) or {}
+            if result.get('errors'):
+                raise Exception(f"Shopify GraphQL error: {result['errors']}")
+            connection = ((result.get('data') or {}).get('node') or {}).get(connection_name) or {}
+            nodes += connection.get('nodes') or []
+            page_info = connection.get('pageInfo') or {}
+        return nodes
+
+    def get_orders_fulfillment_data(self, order_ids, batch_size=ORDERS_PER_QUERY):
+        """
+        Fetches the fulfillment status, cancellation and fulfillment orders of many orders with one nodes query per
+        batch, in the shape of the REST order and fulfillment order responses.
+        :param order_ids: numeric Shopify order ids
+        :return: dict of the order id as string to a dict with fulfillment_status, cancelled_at, cancel_reason and
+                 fulfillment_orders, a list of dicts with id, status and delivery_method. Orders not found are left
+                 out. The fulfillment orders beyond the first 10 of an order are fetched page by page.
+        """
+        fulfillment_order_fields = "id status deliveryMethod { methodType }"
+        fields = f'''
+        ... on Order {{
+          id
+          displayFulfillmentStatus
+          cancelledAt
+          cancelReason
+          fulfillmentOrders(first: 10) {{
+            nodes {{ {fulfillment_order_fields} }}
+            pageInfo {{ hasNextPage endCursor }}
+          }}
+        }}
+        '''
+        order_ids = list(dict.fromkeys(str(order_id) for order_id in order_ids if order_id))
+        orders_data = {}
+        for start in range(0, len(order_ids), batch_size):
+            gids = [f"{GID_PREFIX}Order/{order_id}" for order_id in order_ids[start:start + batch_size]]
+            for node in self._get_nodes(gids, fields):
+                orders_data[str(gid_to_id(node.get('id')))] = {
+                    'fulfillment_status': _ORDER_FULFILLMENT_STATUS.get(node.get('displayFulfillmentStatus')),
+                    'cancelled_at': node.get('cancelledAt'),
+                    'cancel_reason': (node.get('cancelReason') or '').lower() or None,
+                    'fulfillment_orders': [{
+                        'id': gid_to_id(fulfillment_order.get('id')),
+                        'status': (fulfillment_order.get('status') or '').lower(),
+                        'delivery_method': {'method_type': ((fulfillment_order.get('deliveryMethod') or {}).get(
+                            'methodType') or '').lower()},
+                    } for fulfillment_order in self._get_connection_nodes(node, 'Order', 'fulfillmentOrders',
+                                                                          fulfillment_order_fields)],
+                }
+        return orders_data
+
+    def get_fulfillment_orders_line_items(self, fulfillment_order_ids, batch_size=FULFILLMENT_ORDERS_PER_QUERY):
+        """
+        Fetches the line items of many fulfillment orders with one nodes query per batch.
+        :param fulfillment_order_ids: numeric Shopify fulfillment order ids
+        :return: dict of the fulfillment order id to its list of line item dicts with id, line_item_id and
+                 fulfillment_order_id, as in the REST fulfillment order response. The line items beyond the first 50
+                 of a fulfillment order are fetched page by page.
+        """
+        line_item_fields = "id lineItem { id }"
+        fields = f'''
+        ... on FulfillmentOrder {{
+          id
+          lineItems(first: 50) {{
+            nodes {{ {line_item_fields} }}
+            pageInfo {{ hasNextPage endCursor }}
+          }}
+        }}
+        '''
+        fulfillment_order_ids = list(dict.fromkeys(fulfillment_order_ids))
+        line_items = {}
+        for start in range(0, len(fulfillment_order_ids), batch_size):
+            gids = [f"{GID_PREFIX}FulfillmentOrder/{fulfillment_order_id}"
+                    for fulfillment_order_id in fulfillment_order_ids[start:start + batch_size]]
+            for node in self._get_nodes(gids, fields):
+                fulfillment_order_id = gid_to_id(node.get('id'))
+                line_items[fulfillment_order_id] = [{
+                    'id': gid_to_id(line_item.get('id')),
+                    'line_item_id': gid_to_id((line_item.get('lineItem') or {}).get('id')),
+                    'fulfillment_order_id': fulfillment_order_id,
+                } for line_item in self._get_connection_nodes(node, 'FulfillmentOrder', 'lineItems',
+                                                              line_item_fields)]
+        return line_items
+
+    @staticmethod
+    def prepare_fulfillment_input(fulfillment_vals):
+        """
+        Converts the vals of a REST fulfillment (notify_customer, tracking_info and line_items_by_fulfillment_order
+        with numeric ids) into the FulfillmentInput of the fulfillmentCreate mutation.
+        """
+        fulfillment_input = {
+            'notifyCustomer': bool(fulfillment_vals.get('notify_customer')),
+            'lineItemsByFulfillmentOrder': [{
+                'fulfillmentOrderId': f"{GID_PREFIX}FulfillmentOrder/{order_vals.get('fulfillment_order_id')}",
+                'fulfillmentOrderLineItems': [{
+                    'id': f"{GID_PREFIX}FulfillmentOrderLineItem/{line.get('id')}",
+                    'quantity': int(line.get('quantity') or 0),
+                } for line in order_vals.get('fulfillment_order_line_items') or []],
+            } for order_vals in fulfillment_vals.get('line_items_by_fulfillment_order') or []],
+        }
+        tracking_info = fulfillment_vals.get('tracking_info')
+        if tracking_info:
+            fulfillment_input['trackingInfo'] = {key: value for key, value in tracking_info.items()
+                                                 if key in ('company', 'number', 'url') and value}
+        return fulfillment_input
+
+    def create_fulfillments(self, fulfillment_vals_list):
+        """
+        Creates the fulfillments of one picking one after the other, stopping at the first one rejected.
+        :param fulfillment_vals_list: list of REST fulfillment vals
+        :return: dict with the created fulfillments (id, status and line_item_ids as numeric ids), the userErrors of
+                 the rejected fulfillment and the error message when a request failed.
+        """
+        result = {'fulfillments': [], 'user_errors': [], 'error': False}
+        for fulfillment_vals in fulfillment_vals_list:
+            try:
+                response = self.client.execute(self.FULFILLMENT_CREATE_MUTATION,
+                                               {'fulfillment': self.prepare_fulfillment_input(fulfillment_vals)})
+            except Exception as error:
+                result['error'] = str(error)
+                return result
+            if response.get('errors'):
+                result['error'] = str(response['errors'])
+                return result
+            data = (response.get('data') or {}).get('fulfillmentCreate') or {}
+            fulfillment = data.get('fulfillment')
+            if data.get('userErrors') or not fulfillment:
+                result['user_errors'] = data.get('userErrors') or []
+                return result
+            result['fulfillments'].append({
+                'id': gid_to_id(fulfillment.get('id')),
+                'status': (fulfillment.get('status') or '').lower(),
+                'line_item_ids': [gid_to_id((line.get('lineItem') or {}).get('id'))
+                                  for line in (fulfillment.get('fulfillmentLineItems') or {}).get('nodes') or []],
+            })
+        return result
+
+    def create_fulfillments_concurrently(self, fulfillment_vals_by_key, max_workers=MAX_CONCURRENT_MUTATIONS):
+        """
+        Runs create_fulfillments for many pickings concurrently, the shared cost throttle of the client keeps the
+        mutations within the cost budget of the shop.
+        :param fulfillment_vals_by_key: dict of a key, e.g. the picking id, to its list of REST fulfillment vals
+        :return: dict of the key to the result of create_fulfillments
+        """
+        results = {}
+        if not fulfillment_vals_by_key:
+            return results
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(fulfillment_vals_by_key)))) as executor:
+            futures = {executor.submit(self.create_fulfillments, fulfillment_vals_list): key
+                       for key, fulfillment_vals_list in fulfillment_vals_by_key.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    results[key] = future.result()
+                except Exception as error:
+                    _logger.exception("Fulfillments of %s could not be created.", key)
+                    results[key] = {'fulfillments': [], 'user_errors': [], 'error': str(error)}
+        return results
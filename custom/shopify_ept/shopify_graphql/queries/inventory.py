@@ -1,4 +1,20 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+_logger = logging.getLogger(__name__)
+
+
 class InventoryQueryHelper:
+    MAX_QUANTITIES_PER_MUTATION = 250  # Shopify rejects inventorySetQuantities with more quantities.
+    MAX_CONCURRENT_MUTATIONS = 4
+    SET_QUANTITIES_MUTATION = '''
+    mutation InventorySetQuantities($input: InventorySetQuantitiesInput!) {
+      inventorySetQuantities(input: $input) {
+        userErrors { code field message }
+      }
+    }
+    '''
+
     def __init__(self, client):
         self.client = client
 
@@ -96,23 +112,26 @@ class InventoryQueryHelper:
                            or a list of dicts with keys: inventory_item_id, location_id, quantity
                            where ids are plain numeric ids (not GID). Example:
                            [{'inventory_item_id': '123', 'location_id': '456', 'quantity': 10}, ...]
+                           Lists are sent as GraphQL variables.
         :param reason: reason string for mutation (default 'correction')
         :param name: which quantity name to set (default 'available')
         :param ignore_compare: bool flag for ignoreCompareQuantity
         :return: parsed JSON response (dict) from the GraphQL API
         """
-        # Prepare quantities string
-        if isinstance(quantities, str):
-            quantities_str = quantities
-        else:
-            parts = []
-            for q in quantities:
-                inv_id = q.get('inventory_item_id')
-                loc_id = q.get('location_id')
-                qty = q.get('quantity')
-                part = f'{{inventoryItemId: "gid://shopify/InventoryItem/{inv_id}", locationId: "gid://shopify/Location/{loc_id}", quantity: {int(qty)}}}'
-                parts.append(part)
-            quantities_str = "[" + ", ".join(parts) + "]"
+        if not isinstance(quantities, str):
+            variables = {
+                "input": {
+                    "reason": reason,
+                    "name": name,
+                    "ignoreCompareQuantity": bool(ignore_compare),
+                    "quantities": [{
+                        "inventoryItemId": f"gid://shopify/InventoryItem/{q.get('inventory_item_id')}",
+                        "locationId": f"gid://shopify/Location/{q.get('location_id')}",
+                        "quantity": int(q.get('quantity') or 0),
+                    } for q in quantities],
+                }
+            }
+            return self.client.execute(self.SET_QUANTITIES_MUTATION, variables)
 
         ignore_flag = 'true' if ignore_compare else 'false'
         mutation = f'''
@@ -121,7 +140,7 @@ class InventoryQueryHelper:
             input: {{
               reason: "{reason}",
               name: "{name}",
-              quantities: {quantities_str},
+              quantities: {quantities},
               ignoreCompareQuantity: {ignore_flag}
             }}
           ) {{
@@ -132,22 +151,85 @@ class InventoryQueryHelper:
 
         return self.client.execute(mutation)
 
+    def set_inventory_quantities_in_batches(self, quantities, batch_size=MAX_QUANTITIES_PER_MUTATION,
+                                            max_workers=MAX_CONCURRENT_MUTATIONS, **kwargs):
+        """
+        Sets the quantities with one inventorySetQuantities mutation per batch of batch_size items. The batches run
+        concurrently, the shared cost throttle of the client keeps them within the cost budget of the shop.
+        Each userErrors.field (["input", "quantities", "<index>", ...]) is mapped back to the item it belongs to.
+
+        :param quantities: list of dicts with keys inventory_item_id, location_id, quantity
+        :param kwargs: reason, name and ignore_compare passed to set_inventory_quantities
+        :return: (item_errors, batch_errors) dicts of the index of an item in quantities to the error message.
+                 item_errors are rejected by Shopify, batch_errors were not applied and can be sent again.
+        """
+        item_errors, batch_errors = {}, {}
+        batches = [list(range(start, min(start + batch_size, len(quantities))))
+                   for start in range(0, len(quantities), batch_size)]
+        if not batches:
+            return item_errors, batch_errors
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            futures = [executor.submit(self._set_inventory_quantities_batch, quantities, indexes, **kwargs)
+                       for indexes in batches]
+            for future in as_completed(futures):
+                batch_item_errors, batch_batch_errors = future.result()
+                item_errors.update(batch_item_errors)
+                batch_errors.update(batch_batch_errors)
+        return item_errors, batch_errors
+
+    def _set_inventory_quantities_batch(self, quantities, indexes, **kwargs):
+        """
+        Sends one batch of quantities. inventorySetQuantities is atomic, when it returns userErrors none of the
+        quantities is applied, so the rejected items are dropped and the rest of the batch is sent again until
+        Shopify accepts it.
+
+        :param quantities: list of dicts with keys inventory_item_id, location_id, quantity
+        :param indexes: indexes in quantities of the items of the batch
+        :return: (item_errors, batch_errors) of the batch, as returned by set_inventory_quantities_in_batches
+        """
+        item_errors, batch_errors = {}, {}
+        while indexes:
+            try:
+                result = self.set_inventory_quantities([quantities[index] for index in indexes], **kwargs) or {}
+            except Exception as error:
+                _logger.exception("inventorySetQuantities batch starting at %s failed.", indexes[0])
+                batch_errors.update({index: str(error) for index in indexes})
+                break
+            if result.get('errors'):
+                batch_errors.update({index: str(result['errors']) for index in indexes})
+                break
+            user_errors = ((result.get('data') or {}).get('inventorySetQuantities') or {}).get('userErrors') or []
+            rejected = {}
+            for user_error in user_errors:
+                position = self._quantity_index_of_user_error(user_error)
+                message = f"{user_error.get('code') or ''} {user_error.get('message')}".strip()
+                if position is None or position >= len(indexes):
+                    rejected = None
+                    batch_errors.update({index: message for index in indexes})
+                    break
+                rejected[indexes[position]] = message
+            if not rejected:
+                break
+            item_errors.update(rejected)
+            indexes = [index for index in indexes if index not in rejected]
+        return item_errors, batch_errors
+
+    @staticmethod
+    def _quantity_index_of_user_error(user_error):
+        field = user_error.get('field') or []
+        if len(field) >= 3 and field[:2] == ['input', 'quantities'] and str(field[2]).isdigit():
+            return int(field[2])
+        return None
+
     def build_quantities_from_queue_lines(self, queue_lines):
         """
         Build a list of quantity dicts suitable for set_inventory_quantities from
-        export queue line records.
+        export queue line records. The list holds one dict per queue line, in the order of
+        the queue lines, so the indexes of the errors returned by
+        set_inventory_quantities_in_batches are the indexes of the queue lines.
 
         :param queue_lines: iterable of records (expected to have inventory_item_id, location_id, quantity)
         :return: list of dicts: [{'inventory_item_id': '...', 'location_id': '...', 'quantity': 10}, ...]
         """
-        quantities = []
-        for line in queue_lines:
-            try:
-                inv_id = line.inventory_item_id
-                loc_id = line.location_id
-                qty = int(line.quantity or 0)
-            except Exception:
-                # Fallback: skip malformed lines
-                continue
-            quantities.append({'inventory_item_id': inv_id, 'location_id': loc_id, 'quantity': qty})
-        return quantities
+        return [{'inventory_item_id': line.inventory_item_id, 'location_id': line.location_id,
+                 'quantity': int(line.quantity or 0)} for line in queue_lines]
@@ -1,14 +1,23 @@
 from collections.abc import Mapping
-import re
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Any, List, Optional
 import logging,time
+
+from ..transformer import GraphQLRestTransformer, gid_to_id
+from ..utils import estimate_query_cost
+
 _logger = logging.getLogger(__name__)
 
 
 class OrderQueryHelper:
+    MAX_QUERY_COST = 1000  # Shopify rejects a single query requesting more points than this.
+    LIST_FIELD_GROUPS = ('basic', 'customer_data')  # Field groups fetched by the cursor walk over orders.
+    # Key of the REST order listing the field groups which could not be fetched, such orders must not be imported.
+    INCOMPLETE_GROUPS_KEY = 'graphql_incomplete_groups'
+
     def __init__(self, client, **kwargs):
         self.client = client
         self.use_presentment = kwargs.get('order_visible_currency', False)
+        self.transformer = GraphQLRestTransformer(use_presentment=self.use_presentment)
         self.settings = kwargs
 
     @staticmethod
@@ -36,9 +45,9 @@ class OrderQueryHelper:
                           '''
             ,
             "refunds": '''
-                              id refunds(first: 25) { createdAt id note legacyResourceId orderAdjustments(first: 50) { nodes { id reason taxAmountSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } amountSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } } } duties { amountSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } originalDuty { countryCodeOfOrigin harmonizedSystemCode id price { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } taxLines { channelLiable rate ratePercentage source title priceSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } } } } 
-                              refundLineItems(first: 25) { nodes { id restocked restockType quantity location { id } subtotalSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } totalTaxSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } lineItem { id name quantity sku title currentQuantity requiresShipping } } } refundShippingLines(first: 50) { nodes { id shippingLine { id code carrierIdentifier title taxLines { channelLiable rate ratePercentage source title priceSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } } source shippingRateHandle custom discountAllocations { allocatedAmountSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } } } subtotalAmountSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } taxAmountSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } } } 
-                              transactions(first: 25) { nodes { id gateway kind authorizationCode createdAt accountNumber amountSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } amountV2 { amount currencyCode } errorCode paymentId paymentMethod processedAt status parentTransaction { id } receiptJson test paymentDetails { ... on CardPaymentDetails { avsResultCode } } } } }
+                              id refunds(first: 25) { createdAt id note legacyResourceId orderAdjustments(first: 10) { nodes { id reason taxAmountSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } amountSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } } } duties { amountSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } originalDuty { countryCodeOfOrigin harmonizedSystemCode id price { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } taxLines { channelLiable rate ratePercentage source title priceSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } } } } 
+                              refundLineItems(first: 25) { nodes { id restocked restockType quantity location { id } subtotalSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } totalTaxSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } lineItem { id name quantity sku title currentQuantity requiresShipping } } } refundShippingLines(first: 5) { nodes { id shippingLine { id code carrierIdentifier title taxLines { channelLiable rate ratePercentage source title priceSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } } source shippingRateHandle custom discountAllocations { allocatedAmountSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } } } subtotalAmountSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } taxAmountSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } } } 
+                              transactions(first: 10) { nodes { id gateway kind authorizationCode createdAt accountNumber amountSet { presentmentMoney { amount currencyCode } shopMoney { amount currencyCode } } amountV2 { amount currencyCode } errorCode paymentId paymentMethod processedAt status parentTransaction { id } receiptJson test paymentDetails { ... on CardPaymentDetails { avsResultCode } } } } }
                         '''
             ,
             "transactions": '''
@@ -60,27 +69,41 @@ class OrderQueryHelper:
                                 '''
             ,
             "fulfillment_orders": '''
-                                id fulfillmentOrders(first: 20) { nodes { orderId orderName status lineItems(first: 25) { nodes { id lineItem { id } }} assignedLocation { location { id }}      }}
+                                id fulfillmentOrders(first: 10) { nodes { orderId orderName status lineItems(first: 25) { nodes { id lineItem { id } }} assignedLocation { location { id }}      }}
                                 '''
         }
         return order_fields
 
-    def get_order_count(self, filters):
-        shopify_query = (
+    @staticmethod
+    def prepare_order_search_query(filters):
+        """
+        Returns the orders search query string for the fulfillment status and updated at range of the filters.
+        """
+        return (
             f"fulfillment_status:{filters['fulfillment_status']} "
             f"updated_at:>='{filters['updated_at_min']}' "
             f"updated_at:<='{filters['updated_at_max']}'"
         )
+
+    def get_order_count(self, filters):
+        """
+        Returns the number of orders matching the filters, or None when Shopify did not return the count, so the
+        caller never takes a range it could not count for an empty one.
+        """
+        shopify_query = self.prepare_order_search_query(filters)
         query = f"""
                 {{
                   ordersCount(query: "{shopify_query}") {{
                     count
                   }}
                 }}"""
-        result = self.client.execute(query)
-        if result and 'data' in result:
-            return result['data'].get('ordersCount', {}).get('count', 0)
-        return 0
+        result = self.client.execute(query) or {}
+        count = ((result.get('data') or {}).get('ordersCount') or {}).get('count')
+        if result.get('errors') or count is None:
+            _logger.warning("The orders count of %s could not be read, the orders are fetched without it: %s",
+                            shopify_query, result.get('errors'))
+            return None
+        return count
 
     def get_order(self, order_ids: List[str]):
         fields = self.rest_order_fields()
@@ -96,57 +119,94 @@ class OrderQueryHelper:
             '''
             order =  self.client.execute(query)
             raw_graphql_order = order.get('data', {}).get('order', {})
-            rest_order_data = self._convert_graphql_to_rest_fields(raw_graphql_order)
-            rest_order_data['order_api_name'] = 'fetched_via_graphql'
-            if 'transactions' in rest_order_data:
-                rest_order_data['transaction'] = rest_order_data.pop('transactions')
-            response.append(rest_order_data)
+            response.append(self.prepare_rest_order(raw_graphql_order))
         return response
 
+    def prepare_rest_order(self, raw_graphql_order, incomplete_groups=None):
+        """
+        Converts a raw GraphQL order into the REST order dict used by the order queue.
+        :param incomplete_groups: field groups of the order which could not be fetched, they are listed under
+        INCOMPLETE_GROUPS_KEY so the queue line of the order fails instead of importing partial data.
+        """
+        rest_order_data = self._convert_graphql_to_rest_fields(raw_graphql_order)
+        rest_order_data['order_api_name'] = 'fetched_via_graphql'
+        if incomplete_groups:
+            rest_order_data[self.INCOMPLETE_GROUPS_KEY] = sorted(set(incomplete_groups))
+        if 'transactions' in rest_order_data:
+            rest_order_data['transaction'] = rest_order_data.pop('transactions')
+        return rest_order_data
+
     def list_orders(self, filters):
         """
-        Fetches all orders in pages for each field group, merges data by order ID.
-        Returns: {order_id: [order_data_dict, ...]} (list contains dicts from each field group/page)
+        Fetches all orders of the filters with a single cursor walk, see iter_order_pages.
+        Returns: list of REST order dicts
         """
-        order_fields = self.rest_order_fields()
-        shopify_query = (
-            f"fulfillment_status:{filters['fulfillment_status']} "
-            f"updated_at:>='{filters['updated_at_min']}' "
-            f"updated_at:<='{filters['updated_at_max']}'"
-            # f"status:{filters['status']}"
-        )
-        merged_orders = {}
         start_time = time.time()
-        for group, fields in order_fields.items():
-            group_orders = self._fetch_all_orders_for_fields(fields, shopify_query, filters.get("limit", 100))
-            for order_id, order_list in group_orders.items():
-                if order_id not in merged_orders:
-                    merged_orders[order_id] = []
-                merged_orders[order_id].extend(order_list)
         response = []
-        for order_id, order_list in merged_orders.items():
-            rest_order_data = self._convert_graphql_to_rest_fields(self.deep_merge_dicts(order_list))
-            rest_order_data['order_api_name'] = 'fetched_via_graphql'
-            if 'transactions' in rest_order_data:
-                rest_order_data['transaction'] = rest_order_data.pop('transactions')
-            response.append(rest_order_data)
+        for page_orders in self.iter_order_pages(filters):
+            response.extend(page_orders)
         end_time = time.time()
         _logger.info(
             f"Total time taken to fetch and merge orders: {end_time - start_time} seconds for date range {filters['updated_at_min']} to {filters['updated_at_max']}")
         return response
 
-    def _fetch_all_orders_for_fields(self, fields, shopify_query, limit):
+    def iter_order_pages(self, filters):
         """
-        Internal helper to fetch all pages for given fields, returns {order_id: [order_data_dict, ...]}
+        Walks the orders of the filters once with the light field groups (LIST_FIELD_GROUPS) and fetches the
+        heavy nested connections of every page with nodes(ids:) queries sized to stay under MAX_QUERY_COST.
+        Yields the REST order dicts page by page.
         """
-        orders_by_id = {}
+        order_fields = self.rest_order_fields()
+        list_fields = "\n".join(order_fields[group] for group in self.LIST_FIELD_GROUPS)
+        nested_groups = [group for group in order_fields if group not in self.LIST_FIELD_GROUPS]
+        shopify_query = self.prepare_order_search_query(filters)
+        for nodes in self._walk_orders(list_fields, shopify_query, filters.get("limit", 100)):
+            orders_by_id = {order['id']: [order] for order in nodes if order.get('id')}
+            order_gids = list(orders_by_id)
+            failed_groups = {}
+            for group in nested_groups:
+                for order_gid, order_list in self.fetch_order_groups_by_ids(order_gids, [group],
+                                                                            failed_groups=failed_groups).items():
+                    orders_by_id.get(order_gid, []).extend(order_list)
+            yield [self.prepare_rest_order(self.deep_merge_dicts(order_list), failed_groups.get(order_gid))
+                   for order_gid, order_list in orders_by_id.items()]
+
+    @classmethod
+    def _batch_size(cls, per_order_cost, limit, overhead=0):
+        """
+        Returns the number of orders one query can request without exceeding MAX_QUERY_COST.
+        """
+        return max(1, min(limit, int((cls.MAX_QUERY_COST - overhead) // max(per_order_cost, 1))))
+
+    @staticmethod
+    def _requested_cost(result):
+        return result.get('extensions', {}).get('cost', {}).get('requestedQueryCost')
+
+    @staticmethod
+    def _max_cost_exceeded(result):
+        """
+        Returns the cost of the query if Shopify rejected it with MAX_COST_EXCEEDED, else None.
+        """
+        for error in result.get('errors') or []:
+            if isinstance(error, dict) and error.get('extensions', {}).get('code') == 'MAX_COST_EXCEEDED':
+                return error['extensions'].get('cost') or 0
+        return None
+
+    def _walk_orders(self, fields, shopify_query, limit):
+        """
+        Internal helper to walk all pages of the orders query, yields the list of order nodes of every page.
+        The page size starts from the estimated cost of the fields and follows the requestedQueryCost
+        reported by Shopify.
+        """
+        per_order_cost = estimate_query_cost(fields)
         has_next_page = True
         end_cursor = None
         while has_next_page:
+            page_size = self._batch_size(per_order_cost, limit, overhead=2)
             after = f', after: "{end_cursor}"' if end_cursor else ""
             query = f'''
             {{
-                orders(first: {limit}{after}, query: "{shopify_query}" sortKey: UPDATED_AT) {{
+                orders(first: {page_size}{after}, query: "{shopify_query}" sortKey: UPDATED_AT) {{
                     pageInfo {{ endCursor hasNextPage }}
                     nodes {{
                         {fields}
@@ -156,29 +216,79 @@ class OrderQueryHelper:
             '''
             result = self.client.execute(query)
             if 'errors' in result:
-                error_details = result['errors'][0] if result['errors'] else 'Unknown GraphQL Error'
-                _logger.error(
-                    f"Shopify GraphQL Error encountered. Stopping pagination for current field group.{result}")
-                if isinstance(error_details, dict) and error_details.get('extensions', {}).get(
-                        'code') == 'MAX_COST_EXCEEDED':
-                    cost = error_details['extensions'].get('cost')
-                    max_cost = error_details['extensions'].get('maxCost')
-                    _logger.error(
-                        f"MAX_COST_EXCEEDED: Query cost {cost} exceeded limit {max_cost}. Query: {shopify_query}. Result: {result}")
+                cost = self._max_cost_exceeded(result)
+                if cost is not None and page_size > 1:
+                    per_order_cost = max(per_order_cost * 2, cost / page_size)
+                    _logger.info(f"MAX_COST_EXCEEDED: Query cost {cost} for {page_size} orders, reducing the page size.")
+                    continue
+                _logger.error(f"Shopify GraphQL Error encountered. Stopping pagination for orders.{result}")
                 break
+            requested_cost = self._requested_cost(result)
+            if requested_cost:
+                per_order_cost = max((requested_cost - 2) / page_size, 1)
             orders_data = result.get('data', {}).get('orders', {})
             nodes = orders_data.get('nodes', [])
             page_info = orders_data.get('pageInfo', {})
             has_next_page = page_info.get('hasNextPage', False)
-            _logger.info(f'Has next page: {has_next_page} and end cursor: {page_info.get("endCursor")}')
             end_cursor = page_info.get('endCursor')
-            for order in nodes:
-                order_id = order.get('id')
-                if not order_id:
+            _logger.info(f'Has next page: {has_next_page} and end cursor: {end_cursor}')
+            if nodes:
+                yield nodes
+
+    def fetch_order_groups_by_ids(self, order_gids, groups, batch_size=None, failed_groups=None):
+        """
+        Fetches the given field groups of rest_order_fields for known orders with nodes(ids:) queries.
+        A batch failing for another reason than its cost is retried order by order, the orders which still fail
+        are added to failed_groups instead of being returned without the groups.
+        :param order_gids: list of order GIDs
+        :param groups: list of keys of rest_order_fields
+        :param batch_size: number of orders requested per query, by default as many as fit in MAX_QUERY_COST
+        :param failed_groups: dict {order_gid: [group, ...]} filled with the groups of the orders which failed
+        :return: {order_gid: [order_data_dict, ...]}
+        """
+        order_fields = self.rest_order_fields()
+        fields = "\n".join(order_fields[group] for group in groups)
+        per_order_cost = estimate_query_cost(fields)
+        orders_by_id = {}
+        failed_groups = {} if failed_groups is None else failed_groups
+        index = 0
+        while index < len(order_gids):
+            size = batch_size or self._batch_size(per_order_cost, 250)
+            batch_ids = order_gids[index:index + size]
+            ids = ", ".join(f'"{gid}"' for gid in batch_ids)
+            query = f'''
+            {{
+                nodes(ids: [{ids}]) {{
+                    ... on Order {{
+                        {fields}
+                    }}
+                }}
+            }}
+            '''
+            result = self.client.execute(query)
+            if 'errors' in result:
+                cost = self._max_cost_exceeded(result)
+                if cost is not None and not batch_size and len(batch_ids) > 1:
+                    per_order_cost = max(per_order_cost * 2, cost / len(batch_ids))
                     continue
-                if order_id not in orders_by_id:
-                    orders_by_id[order_id] = []
-                orders_by_id[order_id].append(order)
+                if len(batch_ids) > 1:
+                    _logger.warning(f"Shopify GraphQL Error while fetching {groups} of orders {batch_ids}, "
+                                    f"fetching them one by one: {result}")
+                    orders_by_id.update(self.fetch_order_groups_by_ids(batch_ids, groups, batch_size=1,
+                                                                       failed_groups=failed_groups))
+                else:
+                    _logger.error(f"Shopify GraphQL Error while fetching {groups} of order {batch_ids[0]}, the order "
+                                  f"will not be imported: {result}")
+                    failed_groups.setdefault(batch_ids[0], []).extend(groups)
+                index += size
+                continue
+            requested_cost = self._requested_cost(result)
+            if requested_cost and not batch_size:
+                per_order_cost = max(requested_cost / len(batch_ids), 1)
+            for order in result.get('data', {}).get('nodes', []):
+                if order and order.get('id'):
+                    orders_by_id.setdefault(order['id'], []).append(order)
+            index += size
         return orders_by_id
 
     def deep_merge_dicts(self, dicts):
@@ -200,142 +310,13 @@ class OrderQueryHelper:
     @staticmethod
     def _extract_id_from_gid(gid: str) -> Optional[int]:
         """Extracts the numerical ID from a Shopify Global ID string."""
-        if not isinstance(gid, str):
-            return None
-        match = re.search(r'\/(\d+)$', gid)
-        return int(match.group(1)) if match else None
-
-    # In OrderQueryHelper class
-    def _flatten_money_set(self, key: str, value: Dict[str, Any]) -> Tuple[str, str, str]:
-        """
-        Flattens GraphQL MoneySet objects into the REST key/value pair.
-        Conditionally selects shopMoney or presentmentMoney based on self.use_presentment.
-        """
-        # 1. Determine the REST-style key (snake_case, removing 'Set')
-        new_key_rest = key.replace('Set', '')
-        new_key_rest = re.sub(r'(?<!^)(?=[A-Z])', '_', new_key_rest).lower()
-
-        # 2. Handle specific REST key names and duplicates
-        if new_key_rest in ('totalprice', 'totaldiscounts'):
-            new_key_rest = new_key_rest.replace('total', 'total_')
-        if new_key_rest in ('original_unit_price', 'original_price'):
-            new_key_rest = 'price'
-        if new_key_rest == 'allocated_amount':
-            new_key_rest = 'amount'  # Ensures the resulting key is 'amount'
-        if self.use_presentment:
-            amount_to_use = value['presentmentMoney']['amount']
-        else:
-            amount_to_use = value['shopMoney']['amount']
-        set_key = new_key_rest + '_set'
-        return new_key_rest, set_key, amount_to_use
+        return gid_to_id(gid)
 
     def _convert_graphql_to_rest_fields(self, data: Any) -> Any:
         """
-        Recursively processes the GraphQL response to convert GIDs, flatten money sets,
-        handle list nodes, and flatten line item specific nested fields for REST compatibility.
+        Converts GIDs, flattens money sets and list nodes and renames the keys of the GraphQL response
+        for REST compatibility, see GraphQLRestTransformer.
         @author: Gopal Chouhan @Emipro Technologies Pvt. Ltd on date 27/.
         """
-        if isinstance(data, dict):
-            new_data = {}
-            # Assuming the class is named 'OrderQueryHelper' for static method calls
-            # If the actual class name is different, replace 'OrderQueryHelper' below.
-            OrderQueryHelper = self.__class__
-            for key, value in data.items():
-                # 1. Handle GraphQL 'nodes' list structure
-                if key == 'nodes' and isinstance(value, list):
-                    # Recursively convert all items in the list
-                    return [self._convert_graphql_to_rest_fields(item) for item in value]
-
-                # 2. Handle embedded list wrappers (e.g., lineItems: { nodes: [...] })
-                if isinstance(value, dict) and 'nodes' in value:
-                    # Convert the collection key from CamelCase (e.g., 'LineItems') to snake_case ('line_items')
-                    new_key = re.sub(r'(?<!^)(?=[A-Z])', '_', key).lower()
-                    # Recursively convert the 'nodes' list and assign it to the new snake_case key
-                    new_data[new_key] = self._convert_graphql_to_rest_fields(value.get('nodes', []))
-                    continue  # Skip the rest of the loop for this key
-
-                # 3. Flatten MoneySet fields and map to REST names
-                if key.endswith('Set') and isinstance(value, dict) and 'shopMoney' in value:
-                    # Call _flatten_money_set as an instance method
-                    new_key_rest, set_key, amount = self._flatten_money_set(key, value)
-
-                    new_data[new_key_rest] = amount
-                    new_data[set_key] = self._convert_graphql_to_rest_fields(value)
-
-                    # Add currency field based on the conditional logic
-                    if new_key_rest in ('amount', 'total_price', 'subtotal_price',
-                                        'price'):  # Applies to transactions and core price fields
-                        if self.use_presentment:
-                            new_data['currency'] = value['presentmentMoney']['currencyCode']
-                        else:
-                            new_data['currency'] = value['shopMoney']['currencyCode']
-
-                    continue
-
-                # 4. Convert GIDs
-                elif key == 'id' and isinstance(value, str) and value.startswith('gid://shopify/'):
-                    # Convert GID to numeric ID
-                    numeric_id = OrderQueryHelper._extract_id_from_gid(value)
-                    new_data[key] = numeric_id
-                    # Also keep the admin_graphql_api_id for full REST compatibility
-                    new_data['admin_graphql_api_id'] = value
-
-                # 5. Handle Line Item specific renames (originalTotalSet mapping)
-                elif key == 'originalTotalSet' and isinstance(data, dict):
-                    # Omit as it maps to 'price' which is handled by originalUnitPriceSet -> price
-                    continue
-
-                # 5.5. NEW: Flatten Line Item Nested Data (Product, Variant, Fulfillment Service)
-                elif key == 'product' and isinstance(value, dict) and 'id' in value:
-                    # Move product ID to top level as 'product_id'
-                    new_data['product_id'] = OrderQueryHelper._extract_id_from_gid(value['id'])
-                    # Don't continue here yet, in case 'product' has other fields you need to recurse over.
-
-                elif key == 'variant' and isinstance(value, dict):
-                    # Move variant ID, SKU, and Title to top level
-                    new_data['variant_id'] = OrderQueryHelper._extract_id_from_gid(value.get('id'))
-                    new_data['sku'] = value.get('sku')
-                    new_data['variant_title'] = value.get('title')
-                    # Do not recurse further on 'variant' to prevent unwanted keys from merging
-                    continue
-
-                elif key == 'fulfillment_service' and isinstance(value, dict) and 'service_name' in value:
-                    # Flatten the fulfillment service name from the dictionary
-                    new_data['fulfillment_service'] = value.get('service_name')
-                    continue
-
-                # 6. Generic recursion and key conversion (CamelCase to snake_case)
-                else:
-                    new_key = key
-                    # Only convert to snake_case if it doesn't match an already defined REST field name
-                    # and isn't a special-cased GraphQL field.
-                    # 1. Update Exclusion List: Keep only admin_graphql_api_id and currencyCode
-                    # We remove displayFinancialStatus and displayFulfillmentStatus to allow
-                    # them to be converted to snake_case first.
-                    if key not in ('admin_graphql_api_id', 'currencyCode'):
-
-                        # Apply general CamelCase to snake_case conversion (e.g., displayFinancialStatus -> display_financial_status)
-                        new_key = re.sub(r'(?<!^)(?=[A-Z])', '_', key).lower()
-
-                        # Clean up specific common conversions (These lines remain helpful)
-                        new_key = new_key.replace('code_v2', 'code')
-                        new_key = new_key.replace('client_ip', 'browser_ip')
-                        new_key = new_key.replace('legacy_resource_id', 'id')
-                        if new_key == 'display_financial_status':
-                            new_key = 'financial_status'
-                        if new_key == 'display_fulfillment_status':
-                            new_key = 'fulfillment_status'
-                        if new_key == 'name' and isinstance(data, dict):
-                            # We need to ensure this is the top-level 'name' field and not a nested one.
-                            # This will create a key 'order_number' with the same value as 'name'.
-                            new_data['order_number'] = value
-                        if new_key in ('kind', 'status', 'source_name', 'financial_status', 'fulfillment_status') and \
-                                isinstance(value, str):
-                            value = value.lower()
-                    new_data[new_key] = self._convert_graphql_to_rest_fields(value)
-            return new_data
-        elif isinstance(data, list):
-            # Recurse through list items
-            return [self._convert_graphql_to_rest_fields(item) for item in data]
-        return data
+        return self.transformer.convert(data)
 
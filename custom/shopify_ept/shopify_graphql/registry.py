@@ -0,0 +1,41 @@
+import hashlib
+import threading
+
+from .client import ShopifyGraphQLClient
+
+# Process wide GraphQL clients of the instances, keyed by instance id. The client of an instance is kept as long as
+# its credentials do not change, the throttle and the connection pool of the shop are shared by its clients anyway.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def credential_version(access_token, shop_url):
+    """
+    Returns a fingerprint of the credentials of an instance, a new fingerprint makes the registry build a new client.
+    """
+    return hashlib.sha256(f"{(shop_url or '').rstrip('/').lower()}|{access_token or ''}".encode('utf-8')).hexdigest()
+
+
+def get_instance_client(instance_id, access_token, shop_url):
+    """
+    Returns the warm GraphQL client of the instance, creating it on first use or when the credentials changed, e.g.
+    in another worker process.
+    :param instance_id: id of the Shopify instance
+    :param access_token: access token of the instance
+    :param shop_url: host of the shop
+    :return: ShopifyGraphQLClient
+    """
+    version = credential_version(access_token, shop_url)
+    with _clients_lock:
+        entry = _clients.get(instance_id)
+        if entry is None or entry[0] != version:
+            entry = _clients[instance_id] = (version, ShopifyGraphQLClient(access_token, shop_url))
+        return entry[1]
+
+
+def forget_instance_client(instance_id):
+    """
+    Drops the client of the instance, the next call of get_instance_client builds a new one.
+    """
+    with _clients_lock:
+        _clients.pop(instance_id, None)
@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from .utils import estimate_request_cost
+
+_logger = logging.getLogger("Shopify GraphQL Client")
+
+# Cursors, quoted literals (gids, search filters, dates) and numeric ids change from query to query but not
+# the cost of the query, so they are normalized before a query is fingerprinted for the cost cache. Each
+# quoted literal is replaced by a placeholder, so the number of ids of a nodes query, which changes its cost,
+# is kept. Page sizes are short numbers and kept as they are.
+_CURSOR_PATTERN = re.compile(r'(after|before)\s*:\s*"[^"]*"')
+_STRING_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"')
+_ID_PATTERN = re.compile(r'\b\d{5,}\b')
+# Commas are insignificant in GraphQL, they are folded into the whitespace.
+_WHITESPACE_PATTERN = re.compile(r'[\s,]+')
+
+
+class ShopifyCostThrottle:
+    """
+    Leaky bucket mirroring the GraphQL Admin API cost limit of one shop.
+    Shopify refills the bucket with restoreRate points per second up to maximumAvailable. Every request
+    reserves its expected cost before it is sent, so threads sharing the bucket wait exactly as long as
+    needed instead of being throttled by Shopify. The bucket is re-synchronised with the throttleStatus
+    returned in every response, which keeps it correct when other workers use the same shop.
+    """
+    DEFAULT_MAXIMUM_AVAILABLE = 1000.0
+    DEFAULT_RESTORE_RATE = 50.0
+    MAX_QUERY_COSTS = 512
+
+    def __init__(self, maximum_available=DEFAULT_MAXIMUM_AVAILABLE, restore_rate=DEFAULT_RESTORE_RATE):
+        self.maximum_available = float(maximum_available)
+        self.restore_rate = float(restore_rate)
+        self.currently_available = float(maximum_available)
+        self.updated_at = time.monotonic()
+        self.query_costs = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def query_signature(query):
+        """
+        Returns a fingerprint of the query which does not depend on the pagination cursor, the quoted literals
+        and the numeric ids of the query.
+        :param query: GraphQL query string
+        :return: hex digest
+        """
+        query = _CURSOR_PATTERN.sub('', query or '')
+        query = _STRING_PATTERN.sub('"?"', query)
+        query = _ID_PATTERN.sub('0', query)
+        query = _WHITESPACE_PATTERN.sub(' ', query).strip()
+        return hashlib.md5(query.encode('utf-8')).hexdigest()
+
+    def estimate_cost(self, query):
+        """
+        Returns the requested cost Shopify reported the last time the same query was sent, or a static
+        estimate of the query for the first call.
+        :param query: GraphQL query string
+        :return: expected cost in points
+        """
+        signature = self.query_signature(query)
+        with self._lock:
+            cost = self.query_costs.get(signature)
+            if cost is not None:
+                self.query_costs.move_to_end(signature)
+        if cost is None:
+            cost = estimate_request_cost(query)
+        return max(1.0, min(float(cost), self.maximum_available))
+
+    def _refill(self):
+        now = time.monotonic()
+        self.currently_available = min(self.maximum_available,
+                                       self.currently_available + (now - self.updated_at) * self.restore_rate)
+        self.updated_at = now
+
+    def acquire(self, cost):
+        """
+        Blocks until the bucket holds enough points for the cost and reserves them.
+        :param cost: expected cost of the request
+        :return: total seconds waited
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.currently_available >= cost:
+                    self.currently_available -= cost
+                    return waited
+                wait_time = (cost - self.currently_available) / self.restore_rate
+            time.sleep(wait_time)
+            waited += wait_time
+
+    def update(self, query, cost_info):
+        """
+        Re-synchronises the bucket with the cost block of a GraphQL response.
+        :param query: GraphQL query string which produced the response
+        :param cost_info: response['extensions']['cost']
+        """
+        if not cost_info:
+            return
+        throttle_status = cost_info.get('throttleStatus') or {}
+        with self._lock:
+            if throttle_status:
+                self.maximum_available = float(throttle_status.get('maximumAvailable', self.maximum_available))
+                self.restore_rate = float(throttle_status.get('restoreRate', self.restore_rate)) or \
+                                    self.DEFAULT_RESTORE_RATE
+                self.currently_available = float(throttle_status.get('currentlyAvailable',
+                                                                     self.currently_available))
+                self.updated_at = time.monotonic()
+            if cost_info.get('requestedQueryCost') is not None:
+                signature = self.query_signature(query)
+                self.query_costs[signature] = float(cost_info['requestedQueryCost'])
+                self.query_costs.move_to_end(signature)
+                while len(self.query_costs) > self.MAX_QUERY_COSTS:
+                    self.query_costs.popitem(last=False)
+
+    def wait_time_for(self, cost):
+        """
+        Returns the seconds needed until the bucket can serve the cost, without reserving anything.
+        """
+        with self._lock:
+            self._refill()
+            return max(0.0, (cost - self.currently_available) / self.restore_rate)
+
+
+_throttles = {}
+_throttles_lock = threading.Lock()
+
+
+def get_shop_throttle(shop_url):
+    """
+    Returns the process wide cost throttle of the shop, creating it on first use.
+    :param shop_url: shop url used by the client
+    :return: ShopifyCostThrottle
+    """
+    key = (shop_url or '').rstrip('/').lower()
+    with _throttles_lock:
+        throttle = _throttles.get(key)
+        if throttle is None:
+            throttle = _throttles[key] = ShopifyCostThrottle()
+        return throttle
@@ -0,0 +1,143 @@
+import re
+from collections import namedtuple
+
+GID_PREFIX = 'gid://shopify/'
+
+_SNAKE_CASE_PATTERN = re.compile(r'(?<!^)(?=[A-Z])')
+_LOWERCASE_VALUE_KEYS = frozenset(('kind', 'status', 'source_name', 'financial_status', 'fulfillment_status'))
+_CURRENCY_KEYS = frozenset(('amount', 'total_price', 'subtotal_price', 'price'))
+_UNCHANGED_KEYS = frozenset(('admin_graphql_api_id', 'currencyCode'))
+
+# Kinds of keys which get a special treatment, every other key is renamed to its REST name.
+_GENERIC, _ID, _SKIPPED, _PRODUCT, _VARIANT, _FULFILLMENT_SERVICE = range(6)
+_SPECIAL_KEYS = {
+    'id': _ID,
+    'originalTotalSet': _SKIPPED,
+    'product': _PRODUCT,
+    'variant': _VARIANT,
+    'fulfillment_service': _FULFILLMENT_SERVICE,
+}
+
+KeyRule = namedtuple('KeyRule', ['kind', 'snake_key', 'rest_key', 'money_key', 'money_set_key', 'add_currency',
+                                 'lower_value', 'add_order_number'])
+
+
+def snake_case(key):
+    return _SNAKE_CASE_PATTERN.sub('_', key).lower()
+
+
+def gid_to_id(gid):
+    """
+    Returns the numeric id of a Shopify Global ID string, e.g. 123 for gid://shopify/Order/123.
+    """
+    if not isinstance(gid, str):
+        return None
+    _prefix, separator, numeric_id = gid.rpartition('/')
+    return int(numeric_id) if separator and numeric_id.isdecimal() else None
+
+
+class GraphQLRestTransformer:
+    """
+    Converts raw GraphQL order responses into the REST order dicts expected by the order queue.
+    Every GraphQL key is compiled once into a KeyRule holding its REST names, so converting an order only
+    costs dict lookups: no regular expression runs once the keys of a field set have been seen, and GIDs
+    are converted by slicing the string.
+    """
+    _key_rules = {}
+
+    def __init__(self, use_presentment=False):
+        self.money_field = 'presentmentMoney' if use_presentment else 'shopMoney'
+
+    @classmethod
+    def key_rule(cls, key):
+        """
+        Returns the compiled KeyRule of a GraphQL key.
+        """
+        rule = cls._key_rules.get(key)
+        if rule is None:
+            rule = cls._key_rules[key] = cls._compile_key(key)
+        return rule
+
+    @staticmethod
+    def _compile_key(key):
+        money_key = money_set_key = None
+        if key.endswith('Set'):
+            money_key = snake_case(key.replace('Set', ''))
+            if money_key in ('totalprice', 'totaldiscounts'):
+                money_key = money_key.replace('total', 'total_')
+            if money_key in ('original_unit_price', 'original_price'):
+                money_key = 'price'
+            if money_key == 'allocated_amount':
+                money_key = 'amount'
+            money_set_key = money_key + '_set'
+        rest_key = key
+        if key not in _UNCHANGED_KEYS:
+            rest_key = snake_case(key).replace('code_v2', 'code').replace('client_ip', 'browser_ip').replace(
+                'legacy_resource_id', 'id')
+            rest_key = {'display_financial_status': 'financial_status',
+                        'display_fulfillment_status': 'fulfillment_status'}.get(rest_key, rest_key)
+        return KeyRule(kind=_SPECIAL_KEYS.get(key, _GENERIC),
+                       snake_key=snake_case(key),
+                       rest_key=rest_key,
+                       money_key=money_key,
+                       money_set_key=money_set_key,
+                       add_currency=money_key in _CURRENCY_KEYS,
+                       lower_value=key not in _UNCHANGED_KEYS and rest_key in _LOWERCASE_VALUE_KEYS,
+                       add_order_number=key not in _UNCHANGED_KEYS and rest_key == 'name')
+
+    def convert(self, data):
+        """
+        Converts GIDs, flattens money sets and nodes lists and renames the keys of the GraphQL data.
+        :param data: raw GraphQL dict, list or scalar
+        :return: REST compatible data
+        """
+        if isinstance(data, list):
+            return [self.convert(item) for item in data]
+        if not isinstance(data, dict):
+            return data
+        nodes = data.get('nodes')
+        if isinstance(nodes, list):
+            return [self.convert(item) for item in nodes]
+        key_rules = self._key_rules
+        new_data = {}
+        for key, value in data.items():
+            rule = key_rules.get(key) or self.key_rule(key)
+            if isinstance(value, dict):
+                if 'nodes' in value:
+                    new_data[rule.snake_key] = self.convert(value.get('nodes', []))
+                    continue
+                if rule.money_key and 'shopMoney' in value:
+                    money = value[self.money_field]
+                    new_data[rule.money_key] = money['amount']
+                    new_data[rule.money_set_key] = self.convert(value)
+                    if rule.add_currency:
+                        new_data['currency'] = money['currencyCode']
+                    continue
+            kind = rule.kind
+            if kind:
+                if kind == _ID and isinstance(value, str) and value.startswith(GID_PREFIX):
+                    new_data[key] = gid_to_id(value)
+                    new_data['admin_graphql_api_id'] = value
+                    continue
+                if kind == _SKIPPED:
+                    continue
+                if kind == _PRODUCT and isinstance(value, dict) and 'id' in value:
+                    new_data['product_id'] = gid_to_id(value['id'])
+                    continue
+                if kind == _VARIANT and isinstance(value, dict):
+                    new_data['variant_id'] = gid_to_id(value.get('id'))
+                    new_data['sku'] = value.get('sku')
+                    new_data['variant_title'] = value.get('title')
+                    continue
+                if kind == _FULFILLMENT_SERVICE and isinstance(value, dict) and 'service_name' in value:
+                    new_data['fulfillment_service'] = value.get('service_name')
+                    continue
+            if rule.add_order_number:
+                new_data['order_number'] = value
+            if isinstance(value, str):
+                new_data[rule.rest_key] = value.lower() if rule.lower_value else value
+            elif isinstance(value, (dict, list)):
+                new_data[rule.rest_key] = self.convert(value)
+            else:
+                new_data[rule.rest_key] = value
+        return new_data
@@ -1,3 +1,6 @@
+import re
+
+
 def format_graphql_query(query):
     return " ".join(line.strip() for line in query.splitlines())
 
@@ -5,3 +8,88 @@ def parse_graphql_response(response):
     if 'errors' in response:
         raise Exception(response['errors'])
     return response.get('data', {})
+
+
+_QUERY_TOKEN_PATTERN = re.compile(r'\.\.\.|"(?:[^"\\]|\\.)*"|[A-Za-z_][A-Za-z0-9_]*|-?\d+|[(){}:,\[\]$!=@]')
+_CONNECTION_WRAPPERS = ('nodes', 'edges', 'node', 'pageInfo')
+
+
+def _selection_cost(tokens, index):
+    """
+    Returns the cost of the selection set starting at index (just after '{') and the index after its '}'.
+    """
+    cost = 0
+    names = set()
+    while index < len(tokens) and tokens[index] != '}':
+        token = tokens[index]
+        if token == '...':
+            index += 1
+            if index < len(tokens) and tokens[index] == 'on':
+                index += 2
+            if index < len(tokens) and tokens[index] == '{':
+                fragment_cost, _fragment_names, index = _selection_cost(tokens, index + 1)
+                cost += fragment_cost
+            continue
+        name = token
+        index += 1
+        if index < len(tokens) and tokens[index] == ':':
+            name = tokens[index + 1]
+            index += 2
+        first = None
+        ids_count = 0
+        if index < len(tokens) and tokens[index] == '(':
+            depth = 0
+            while index < len(tokens):
+                if tokens[index] == '(':
+                    depth += 1
+                elif tokens[index] == ')':
+                    depth -= 1
+                    if not depth:
+                        index += 1
+                        break
+                elif tokens[index] in ('first', 'last') and tokens[index + 1] == ':' and tokens[index + 2].isdigit():
+                    first = int(tokens[index + 2])
+                elif tokens[index] == 'ids' and tokens[index + 1] == ':' and tokens[index + 2] == '[':
+                    index += 3
+                    while index < len(tokens) and tokens[index] != ']':
+                        ids_count += tokens[index] != ','
+                        index += 1
+                index += 1
+        names.add(name)
+        if index < len(tokens) and tokens[index] == '{':
+            child_cost, child_names, index = _selection_cost(tokens, index + 1)
+            if ids_count:
+                cost += ids_count * (1 + child_cost)
+            elif name in _CONNECTION_WRAPPERS:
+                cost += child_cost
+            elif first is not None and child_names & {'nodes', 'edges'}:
+                cost += 2 + first * (1 + child_cost)
+            else:
+                cost += 1 + child_cost
+    return cost, names, index + 1
+
+
+def estimate_query_cost(fields):
+    """
+    Estimates the requested cost Shopify calculates for one object with the given selection: 1 point per
+    object and 2 points plus first times the node object cost per connection, scalars are free.
+    :param fields: selection string of the object, e.g. a value of OrderQueryHelper.rest_order_fields()
+    :return: estimated cost in points
+    """
+    tokens = _QUERY_TOKEN_PATTERN.findall(fields or '')
+    cost, _names, _index = _selection_cost(tokens, 0)
+    return 1 + cost
+
+
+def estimate_request_cost(query):
+    """
+    Estimates the requested cost of a complete query or mutation document, used until Shopify reported
+    the real requestedQueryCost of the query.
+    :param query: GraphQL query or mutation string
+    :return: estimated cost in points
+    """
+    tokens = _QUERY_TOKEN_PATTERN.findall(query or '')
+    if '{' not in tokens:
+        return 1
+    cost, _names, _index = _selection_cost(tokens, tokens.index('{') + 1)
+    return cost + (10 if tokens[0] == 'mutation' else 0)
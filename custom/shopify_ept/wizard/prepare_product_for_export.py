@@ -2,6 +2,7 @@
 # See LICENSE file for full copyright and licensing details.
 
 import base64
+import hashlib
 import logging
 import io
 from csv import DictWriter
@@ -293,19 +294,24 @@ class PrepareProductForExport(models.TransientModel):
 
         common_product_images = common_product_image_obj.search(
             [('template_id', '=', shopify_template.product_tmpl_id.id)])
-        images = common_product_images.filtered(lambda img: img.image == shopify_template.product_tmpl_id.image_1920)
-        if not images and shopify_template.product_tmpl_id.image_1920:
+        template_image = shopify_template.product_tmpl_id.image_1920
+        # Images are compared by the stored hash, the binaries of the existing images are not read.
+        template_image_hash = hashlib.md5(template_image).hexdigest() if template_image else False
+        images = common_product_images.filtered(lambda img: img.image_hash == template_image_hash)
+        if not images and template_image:
             common_product_image_obj.create({
                 "name": shopify_template.name,
                 "template_id": shopify_template.product_tmpl_id.id,
-                "image": shopify_template.product_tmpl_id.image_1920,
+                "image": template_image,
             })
         product_template = shopify_template.product_tmpl_id
-        for odoo_image in product_template.ept_image_ids.filtered(lambda x: not x.product_id):
-            shopify_product_image = shopify_product_image_obj.search_read(
-                [("shopify_template_id", "=", shopify_template.id),
-                 ("odoo_image_id", "=", odoo_image.id)], ["id"])
-            if not shopify_product_image:
+        odoo_images = product_template.ept_image_ids.filtered(lambda x: not x.product_id)
+        synced_image_ids = {shopify_product_image["odoo_image_id"][0] for shopify_product_image in
+                            shopify_product_image_obj.search_read([("shopify_template_id", "=", shopify_template.id),
+                                                                   ("odoo_image_id", "in", odoo_images.ids)],
+                                                                  ["odoo_image_id"])}
+        for odoo_image in odoo_images:
+            if odoo_image.id not in synced_image_ids:
                 shopify_product_image_list.append({
                     "odoo_image_id": odoo_image.id,
                     "shopify_template_id": shopify_template.id
@@ -324,24 +330,74 @@ class PrepareProductForExport(models.TransientModel):
 
         common_product_images = common_product_image_obj.search(
             [('product_id', '=', shopify_variant.product_id.id)])
-        images = common_product_images.filtered(lambda img: img.image == shopify_variant.product_id.image_1920)
-        if not images and shopify_variant.product_id.image_1920:
+        variant_image = shopify_variant.product_id.image_1920
+        variant_image_hash = hashlib.md5(variant_image).hexdigest() if variant_image else False
+        images = common_product_images.filtered(lambda img: img.image_hash == variant_image_hash)
+        if not images and variant_image:
             common_product_image_obj.create({
                 "name": shopify_template.name,
                 "template_id": shopify_template.product_tmpl_id.id,
-                "image": shopify_variant.product_id.image_1920,
+                "image": variant_image,
                 "product_id": shopify_variant.product_id.id,
             })
-        for variant_image in shopify_variant.product_id.ept_image_ids:
-            shopify_product_image = shopify_product_image_obj.search_read(
-                [("shopify_template_id", "=", shopify_template.id),
-                 ("shopify_variant_id", "=", shopify_variant.id),
-                 ("odoo_image_id", "=", variant_image.id)], ["id"])
-            if not shopify_product_image:
-                shopify_product_image_obj.create({
-                    "odoo_image_id": variant_image.id,
-                    "shopify_variant_id": shopify_variant.id,
-                    "shopify_template_id": shopify_template.id,
-                    "sequence": 0
+        variant_images = shopify_variant.product_id.ept_image_ids
+        synced_image_ids = {shopify_product_image["odoo_image_id"][0] for shopify_product_image in
+                            shopify_product_image_obj.search_read([("shopify_template_id", "=", shopify_template.id),
+                                                                   ("shopify_variant_id", "=", shopify_variant.id),
+                                                                   ("odoo_image_id", "in", variant_images.ids)],
+                                                                  ["odoo_image_id"])}
+        shopify_product_image_list = [{"odoo_image_id": odoo_image.id,
+                                       "shopify_variant_id": shopify_variant.id,
+                                       "shopify_template_id": shopify_template.id,
+                                       "sequence": 0} for odoo_image in variant_images if
+                                      odoo_image.id not in synced_image_ids]
+        if shopify_product_image_list:
+            shopify_product_image_obj.create(shopify_product_image_list)
+        return True
+
+    def create_shopify_variants_images(self, shopify_variants):
+        """
+        For adding first odoo image into shopify layer for many variants, the existing images are read and the
+        missing ones are created with one query each.
+        :param shopify_variants: shopify.product.product.ept()
+        """
+        shopify_product_image_obj = self.env["shopify.product.image.ept"]
+        common_product_image_obj = self.env["common.product.image.ept"]
+        if not shopify_variants:
+            return True
+
+        image_hashes = {}
+        for common_product_image in common_product_image_obj.search_read(
+                [('product_id', 'in', shopify_variants.product_id.ids)], ["product_id", "image_hash"]):
+            image_hashes.setdefault(common_product_image["product_id"][0], set()).add(
+                common_product_image["image_hash"])
+        common_product_image_list = []
+        for product in shopify_variants.product_id:
+            variant_image = product.image_1920
+            if variant_image and hashlib.md5(variant_image).hexdigest() not in image_hashes.get(product.id, set()):
+                shopify_template = shopify_variants.filtered(
+                    lambda variant: variant.product_id == product)[:1].shopify_template_id
+                common_product_image_list.append({
+                    "name": shopify_template.name,
+                    "template_id": shopify_template.product_tmpl_id.id,
+                    "image": variant_image,
+                    "product_id": product.id,
                 })
+        if common_product_image_list:
+            common_product_image_obj.create(common_product_image_list)
+
+        synced_images = {(shopify_product_image["shopify_variant_id"][0], shopify_product_image["odoo_image_id"][0])
+                         for shopify_product_image in shopify_product_image_obj.search_read(
+                            [("shopify_variant_id", "in", shopify_variants.ids),
+                             ("odoo_image_id", "in", shopify_variants.product_id.ept_image_ids.ids)],
+                            ["shopify_variant_id", "odoo_image_id"])}
+        shopify_product_image_list = [{"odoo_image_id": odoo_image.id,
+                                       "shopify_variant_id": shopify_variant.id,
+                                       "shopify_template_id": shopify_variant.shopify_template_id.id,
+                                       "sequence": 0}
+                                      for shopify_variant in shopify_variants
+                                      for odoo_image in shopify_variant.product_id.ept_image_ids
+                                      if (shopify_variant.id, odoo_image.id) not in synced_images]
+        if shopify_product_image_list:
+            shopify_product_image_obj.create(shopify_product_image_list)
         return True
@@ -1,14 +1,12 @@
 # -*- coding: utf-8 -*-
 # See LICENSE file for full copyright and licensing details.
 
-import base64
-import csv
 import logging
 import time
 import os
-from io import StringIO, BytesIO
 from datetime import datetime, timedelta
-import xlrd
+import pytz
+from dateutil import parser
 
 from odoo.exceptions import UserError, ValidationError
 from odoo.tools.misc import split_every
@@ -17,6 +15,7 @@ from odoo import models, fields, api, _
 from odoo.addons.html_editor.tools import get_video_embed_code
 from .. import shopify
 from ..shopify.pyactiveresource.connection import ClientError
+from ..shopify_graphql.queries.customer import CustomerQueryHelper
 
 _logger = logging.getLogger("Shopify Operations")
 
@@ -95,6 +94,11 @@ class ShopifyProcessImportExport(models.TransientModel):
     shopify_video_embed_code = fields.Html(compute="_compute_shopify_video_embed_code", sanitize=False)
     is_import_draft_product = fields.Boolean(default=False, string='Import Draft products',
                                              help="If you mark it, It will be import draft products")
+    use_graphql_api = fields.Boolean(related="shopify_instance_id.use_graphql_api")
+    is_bulk_order_import = fields.Boolean(default=False, string='Import via Bulk Operation',
+                                          help="If you mark it, Shopify exports the orders of the date range in "
+                                               "a bulk operation and the order queues are created in the "
+                                               "background once it completes. Recommended for large date ranges.")
 
     @api.depends('shopify_video_url')
     def _compute_shopify_video_embed_code(self):
@@ -156,7 +160,8 @@ class ShopifyProcessImportExport(models.TransientModel):
                 form_view_name = "shopify_ept.shopify_synced_customer_data_form_view_ept"
 
         elif self.shopify_operation == "import_unshipped_orders":
-            order_queues = order_date_queue_obj.with_context(queue_created_by="manual").shopify_create_order_data_queues(instance, self.orders_from_date,
+            order_queues = order_date_queue_obj.with_context(queue_created_by="manual",
+                                                             shopify_bulk_order_import=self.is_bulk_order_import).shopify_create_order_data_queues(instance, self.orders_from_date,
                                                                                  self.orders_to_date,
                                                                                  order_type="unshipped")
             if order_queues:
@@ -165,7 +170,8 @@ class ShopifyProcessImportExport(models.TransientModel):
                 form_view_name = "shopify_ept.view_shopify_order_data_queue_ept_form"
 
         elif self.shopify_operation == "import_shipped_orders":
-            order_queues = order_date_queue_obj.with_context(queue_created_by="manual").shopify_create_order_data_queues(instance,
+            order_queues = order_date_queue_obj.with_context(queue_created_by="manual",
+                                                             shopify_bulk_order_import=self.is_bulk_order_import).shopify_create_order_data_queues(instance,
                                                                                  self.orders_from_date,
                                                                                  self.orders_to_date,
                                                                                  order_type="shipped")
@@ -229,7 +235,9 @@ class ShopifyProcessImportExport(models.TransientModel):
                                                                         instance)
 
         elif self.shopify_operation == "import_products_from_csv":
-            self.import_products_from_file()
+            queue_ids = self.import_products_from_file()
+            action_name = "shopify_ept.action_shopify_product_file_import"
+            form_view_name = "shopify_ept.shopify_product_file_import_form_view_ept"
 
         elif self.shopify_operation == "import_location":
             shopify_locations = self.import_shopify_location()
@@ -351,29 +359,68 @@ class ShopifyProcessImportExport(models.TransientModel):
         @change: Maulik Barad on Date 09-Sep-2020.
         """
         customer_queues_ids = []
+        instance = self.shopify_instance_id
+        if instance.use_graphql_api:
+            return self.sync_shopify_customers_by_graphql()
 
-        self.shopify_instance_id.connect_in_shopify()
-        if not self.shopify_instance_id.shopify_last_date_customer_import:
+        instance.connect_in_shopify()
+        if not instance.shopify_last_date_customer_import:
             customer_ids = shopify.Customer().find(limit=250)
         else:
             customer_ids = shopify.Customer().find(
-                updated_at_min=self.shopify_instance_id.shopify_last_date_customer_import, limit=250)
+                updated_at_min=instance.shopify_last_date_customer_import, limit=250)
         if customer_ids:
             customer_queues_ids = self.create_customer_data_queues(customer_ids)
             if len(customer_ids) == 250:
                 customer_queues_ids += self.shopify_list_all_customer(customer_ids)
 
-            self.shopify_instance_id.shopify_last_date_customer_import = datetime.now()
+            instance.shopify_last_date_customer_import = datetime.now()
         if not customer_ids:
             _logger.info("Customers not found while the import customers from Shopify")
         else:
-            queue_cron = self.env.ref("shopify_ept.process_shopify_customer_queue")
-            if not queue_cron.active:
-                _logger.info("Active the Customer data process queue cron job")
-                queue_cron.write(
-                    {'active': True, 'nextcall': datetime.now() + timedelta(seconds=120)})
+            self.activate_customer_queue_cron()
         return customer_queues_ids
 
+    def sync_shopify_customers_by_graphql(self):
+        """
+        This method used to sync the customers data from Shopify to Odoo with the GraphQL API. The customers are
+        fetched page by page, oldest update first, and every page is committed into customer queues with the last
+        customer import date set to the update date of its last customer, so an interrupted import resumes from the
+        last committed page.
+        :return: List of customer queue ids.
+        """
+        instance = self.shopify_instance_id
+        customer_queues_ids = []
+        import_start = datetime.now()
+        updated_at_min = instance.shopify_last_date_customer_import
+        query_helper = CustomerQueryHelper(instance.get_graphql_client())
+        for customers in query_helper.iter_customer_pages(
+                updated_at_min and updated_at_min.strftime("%Y-%m-%dT%H:%M:%SZ")):
+            customer_queues_ids += self.create_customer_data_queues(customers)
+            last_updated_at = customers[-1].get("updated_at")
+            if last_updated_at:
+                last_updated_at = parser.isoparse(last_updated_at)
+                if last_updated_at.tzinfo:
+                    last_updated_at = last_updated_at.astimezone(pytz.utc).replace(tzinfo=None)
+                instance.shopify_last_date_customer_import = last_updated_at
+                self.env.cr.commit()
+        instance.shopify_last_date_customer_import = import_start
+        if not customer_queues_ids:
+            _logger.info("Customers not found while the import customers from Shopify")
+        else:
+            self.activate_customer_queue_cron()
+        return customer_queues_ids
+
+    def activate_customer_queue_cron(self):
+        """
+        Activates the customer data process queue cron job.
+        """
+        queue_cron = self.env.ref("shopify_ept.process_shopify_customer_queue")
+        if not queue_cron.active:
+            _logger.info("Active the Customer data process queue cron job")
+            queue_cron.write(
+                {'active': True, 'nextcall': datetime.now() + timedelta(seconds=120)})
+
     def create_customer_data_queues(self, customer_data):
         """
         It creates customer data queue from data of Customer.
@@ -726,39 +773,19 @@ class ShopifyProcessImportExport(models.TransientModel):
     def import_products_from_file(self):
         """
         This method is use to import product from csv,xlsx,xls.
+        The file is recorded in a product file import, which the product file import cron imports chunk by chunk.
         @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 2 December 2021 .
         Task_id: 180489 - Prepare for export changes
+        :return: List of product file import ids.
         """
         try:
             if os.path.splitext(self.file_name)[1].lower() not in ['.csv', '.xls', '.xlsx']:
                 raise UserError(_("Invalid file format. You are only allowed to upload .csv, .xlsx file."))
-            if os.path.splitext(self.file_name)[1].lower() == '.csv':
-                self.import_products_from_csv()
-            else:
-                self.import_products_from_xlsx()
+            file_import = self.env["shopify.product.file.import.ept"].create_product_file_import(
+                self.shopify_instance_id, self.file_name, self.csv_file)
         except Exception as error:
             raise UserError(_("Receive the error while import file. %s", error))
-
-    def import_products_from_csv(self):
-        """
-        This method used to import product using csv file in shopify third layer.
-        @author: Maulik Barad on Date 12-Oct-2020.
-        """
-        file_data = self.read_file()
-        self.validate_required_csv_header(file_data.fieldnames)
-        self.create_products_from_file(file_data)
-        return True
-
-    def import_products_from_xlsx(self):
-        """
-        This method used to import product using xlsx file in shopify layer.
-        @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 2 December 2021 .
-        Task_id: 180489 - Prepare for export changes
-        """
-        header, product_data = self.read_xlsx_file()
-        self.validate_required_csv_header(header)
-        self.create_products_from_file(product_data)
-        return True
+        return file_import.ids
 
     def validate_required_csv_header(self, header):
         """ This method is used to validate required csv header while csv file import for products.
@@ -773,153 +800,6 @@ class ShopifyProcessImportExport(models.TransientModel):
             if required_field not in header:
                 raise UserError(_("Required column is not available in File."))
 
-    def create_products_from_file(self, file_data):
-        """
-        This method is used to create products in Shopify product layer from the file.
-        @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 2 December 2021 .
-        Task_id:180489 - Prepare for export changes
-        """
-        prepare_product_for_export_obj = self.env["shopify.prepare.product.for.export.ept"]
-        common_log_line_obj = self.env["common.log.lines.ept"]
-        model = "shopify.product.product.ept"
-        instance = self.shopify_instance_id
-        sequence = 0
-        row_no = 0
-        shopify_template_id = False
-        for record in file_data:
-            row_no += 1
-            message = ""
-            if not record["PRODUCT_TEMPLATE_ID"] or not record["PRODUCT_ID"] or not record["CATEGORY_ID"]:
-                message += ("While processing the file, PRODUCT_TEMPLATE_ID or PRODUCT_ID or CATEGORY_ID did not match any existing Odoo product at row %s.\n"
-                           "Action Items:\n"
-                           "- Check the file and verify the data at the mentioned row.\n"
-                           "- Correct the file data and re-import the product using the operation wizard.") % row_no
-                common_log_line_obj.create_common_log_line_ept(shopify_instance_id=instance.id, module="shopify_ept",
-                                                               message=message,
-                                                               model_name=model)
-                continue
-
-            shopify_template, shopify_template_id, sequence = self.create_or_update_shopify_template_from_csv(instance,
-                                                                                                              record,
-                                                                                                              shopify_template_id,
-                                                                                                              sequence)
-
-            shopify_variant = self.create_or_update_shopify_variant_from_csv(instance, record, shopify_template_id,
-                                                                             sequence)
-            prepare_product_for_export_obj.create_shopify_variant_images(shopify_template, shopify_variant)
-
-        return True
-
-    def create_or_update_shopify_template_from_csv(self, instance, record, shopify_template_id, sequence):
-        """ This method is used to create or update shopify template while process from csv file import.
-            :param record: One row data of csv file.
-            @return: shopify_template, shopify_template_id, sequence
-            @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 26 October 2020 .
-            Task_id: 167537 - Code refactoring
-        """
-        shopify_product_template = self.env["shopify.product.template.ept"]
-        prepare_product_for_export_obj = self.env["shopify.prepare.product.for.export.ept"]
-
-        product_tmpl_id = record.get("PRODUCT_TEMPLATE_ID")
-        category_id = record.get("CATEGORY_ID")
-
-        product_tmpl_id = int(product_tmpl_id) if product_tmpl_id and product_tmpl_id not in ("False", "false",
-                                                                                              False) else False
-        category_id = int(category_id) if category_id and category_id not in ("False", "false", False) else False
-
-        shopify_template = shopify_product_template.search(
-            [("shopify_instance_id", "=", instance.id),
-             ("product_tmpl_id", "=", int(record["PRODUCT_TEMPLATE_ID"])),
-             ("shopify_product_ids.default_code", "=", record["shopify_product_default_code"]),
-             ], limit=1)
-
-        shopify_product_template_vals = {"product_tmpl_id": product_tmpl_id,
-                                         "shopify_instance_id": instance.id,
-                                         "shopify_product_category": category_id,
-                                         "name": record["template_name"]}
-        if self.env["ir.config_parameter"].sudo().get_param("shopify_ept.set_sales_description"):
-            shopify_product_template_vals.update({"description": record["product_description"]})
-        if not shopify_template:
-            shopify_template = shopify_product_template.create(shopify_product_template_vals)
-            sequence = 1
-            shopify_template_id = shopify_template.id
-        elif shopify_template_id != shopify_template.id:
-            shopify_template.write(shopify_product_template_vals)
-            shopify_template_id = shopify_template.id
-
-        prepare_product_for_export_obj.create_shopify_template_images(shopify_template)
-
-        if shopify_template and shopify_template.shopify_product_ids and \
-                shopify_template.shopify_product_ids[0].sequence:
-            sequence += 1
-
-        return shopify_template, shopify_template_id, sequence
-
-    def create_or_update_shopify_variant_from_csv(self, instance, record, shopify_template_id, sequence):
-        """ This method is used to create or update Shopify variants while processing from CSV file import operation.
-            @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 26 October 2020 .
-            Task_id: 167537 - Code refactoring
-        """
-        shopify_product_obj = self.env["shopify.product.product.ept"]
-        shopify_variant = shopify_product_obj.search(
-            [("shopify_instance_id", "=", instance.id),
-             ("product_id", "=", int(record["PRODUCT_ID"])),
-             ("shopify_template_id", "=", shopify_template_id)])
-        shopify_variant_vals = {"shopify_instance_id": instance.id,
-                                "product_id": int(record["PRODUCT_ID"]),
-                                "shopify_template_id": shopify_template_id,
-                                "default_code": record["shopify_product_default_code"],
-                                "name": record["product_name"],
-                                "sequence": sequence}
-        if not shopify_variant:
-            shopify_variant = shopify_product_obj.create(shopify_variant_vals)
-        else:
-            shopify_variant.write(shopify_variant_vals)
-
-        return shopify_variant
-
-    def read_file(self):
-        """
-        This method reads .csv file
-        @author: Nilesh Parmar @Emipro Technologies Pvt. Ltd on date 08/11/2019
-        """
-        import_file = BytesIO(base64.decodebytes(self.csv_file))
-        file_read = StringIO(import_file.read().decode())
-        reader = csv.DictReader(file_read, delimiter=",")
-
-        return reader
-
-    def read_xlsx_file(self):
-        """
-        This method is use to read the xlsx file data.
-        @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 2 December 2021 .
-        Task_id: 180489 - Prepare for export changes
-        """
-        validation_header = []
-        product_data = []
-        sheets = xlrd.open_workbook(file_contents=base64.b64decode(self.csv_file.decode('UTF-8')))
-        header = dict()
-        is_header = False
-        for sheet in sheets.sheets():
-            for row_no in range(sheet.nrows):
-                if not is_header:
-                    headers = [d.value for d in sheet.row(row_no)]
-                    validation_header = headers
-                    [header.update({d: headers.index(d)}) for d in headers]
-                    is_header = True
-                    continue
-                row = dict()
-                # [row.update({k: sheet.row(row_no)[v].value}) for k, v in header.items() for c in
-                #  sheet.row(row_no)]
-                for k, v in header.items():
-                    cell_value = sheet.row(row_no)[v].value
-                    if isinstance(cell_value, float):
-                        if cell_value.is_integer():
-                            cell_value = int(cell_value)
-                    row.update({k: cell_value})
-                product_data.append(row)
-        return validation_header, product_data
-
     def import_shopify_location(self):
         """ This method is used to call the child method to import the Shopify location from Shopify to Odoo.
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 10 November 2020 .
@@ -412,6 +412,10 @@ class ResConfigSettings(models.TransientModel):
                                                              config_parameter="shopify_ept.use_default_terms_and_condition_of_odoo",
                                                              help="If checked, it will set the custom note and default terms and condition in order note")
     ship_order_webhook = fields.Boolean("Want to ship order", help="If checked, it will fulfill order in odoo")
+    order_webhook_debounce_time = fields.Integer("Order Webhook Debounce Time", default=30,
+                                                 help="Seconds an order update webhook waits before it is processed, "
+                                                      "the earlier updates of the same order received meanwhile are "
+                                                      "cancelled and only the latest one is processed.")
     forcefully_reserve_stock_webhook = fields.Boolean("ForceFully Reserve Stock",
                                                       help="If checked, It will forcefully reserve stock in the picking")
     refund_order_webhook = fields.Boolean("Want to refund order", help="If checked, it will create a refund in odoo")
@@ -510,6 +514,7 @@ class ResConfigSettings(models.TransientModel):
             self.import_customer_as_company = instance.import_customer_as_company or False
             self.shopify_product_uom_id = instance.shopify_product_uom_id and instance.shopify_product_uom_id.id or False
             self.ship_order_webhook = instance.ship_order_webhook
+            self.order_webhook_debounce_time = instance.order_webhook_debounce_time
             self.forcefully_reserve_stock_webhook = instance.forcefully_reserve_stock_webhook
             self.refund_order_webhook = instance.refund_order_webhook
             self.customer_order_webhook = instance.customer_order_webhook
@@ -587,6 +592,7 @@ class ResConfigSettings(models.TransientModel):
             values["import_customer_as_company"] = self.import_customer_as_company or False
             values['shopify_product_uom_id'] = self.shopify_product_uom_id and self.shopify_product_uom_id.id or False
             values['ship_order_webhook'] = self.ship_order_webhook
+            values['order_webhook_debounce_time'] = self.order_webhook_debounce_time
             values['forcefully_reserve_stock_webhook'] = self.forcefully_reserve_stock_webhook
             values['refund_order_webhook'] = self.refund_order_webhook
             values['customer_order_webhook'] = self.customer_order_webhook